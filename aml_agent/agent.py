@@ -18,14 +18,20 @@ from google.adk.agents import LlmAgent
 from google.adk.tools.agent_tool import AgentTool 
 
 from . import prompt
-from .bank_api_client import fetch_transaction_history # Import the tool
+from .transaction_table import load_review_transactions # Fetches once, returns a handle
+from .country_risk_table import COUNTRY_RISK_TABLE
 # New AML sub-agent imports will be added here later, e.g.:
 # from .sub_agents.transaction_retrieval_agent import transaction_retrieval_agent # Not creating a separate agent for this
 from .sub_agents.transaction_pattern_analysis_agent import transaction_pattern_analysis_agent
 from .sub_agents.geographic_risk_assessment_agent import geographic_risk_assessment_agent
 from .sub_agents.entity_linkage_analysis_agent import entity_linkage_analysis_agent
 from .sub_agents.aml_policy_alignment_agent import aml_policy_alignment_agent
-from config import DEFAULT_LLM_MODEL as MODEL
+from .pipeline import aml_review_pipeline  # Retrieval, concurrent analyses, then policy alignment
+from config import DEFAULT_LLM_MODEL as MODEL, COUNTRY_RISK_TABLE_ENABLED
+
+# Load the country risk table in the background so geographic scoring never waits on per-country calls.
+if COUNTRY_RISK_TABLE_ENABLED:
+    COUNTRY_RISK_TABLE.start()
 
 aml_coordinator_agent = LlmAgent(
     name="aml_coordinator_agent",
@@ -37,17 +43,15 @@ aml_coordinator_agent = LlmAgent(
     ),
     instruction=prompt.AML_COORDINATOR_PROMPT, # Uses the new AML prompt
     output_key="aml_coordinator_output",
-    #TODO Define the tools for the AML Coordinator. This should include:
-    #     1. A tool to fetch transaction history directly (hint: it's already imported as fetch_transaction_history).
-    #     2. AgentTools for each of the imported sub-agents:
-    #        - transaction_pattern_analysis_agent
-    #        - geographic_risk_assessment_agent
-    #        - entity_linkage_analysis_agent
-    #        - aml_policy_alignment_agent
-    #     Refer to the ADK documentation for how to add tools and AgentTools.
-    #====Start your code here====
-    tools=[], # Replace this with the actual list of tools
-    #====End your code here====
+    tools=[
+        AgentTool(agent=aml_review_pipeline),
+        # Individual stages, for follow-up questions after the pipeline has run.
+        load_review_transactions,
+        AgentTool(agent=transaction_pattern_analysis_agent),
+        AgentTool(agent=geographic_risk_assessment_agent),
+        AgentTool(agent=entity_linkage_analysis_agent),
+        AgentTool(agent=aml_policy_alignment_agent),
+    ],
 )
 
 root_agent = aml_coordinator_agent
@@ -0,0 +1,347 @@
+# aml_agent/async_bank_api_client.py
+# Async-def equivalents of the tools in aml_agent/bank_api_client.py.
+# Same names, arguments and return shapes, so an agent can register these in place
+# of the synchronous tools without any prompt changes. Calls go through the pooled
+# httpx client in common/async_transport.py and never block the event loop.
+import asyncio
+import httpx
+import json
+from typing import Optional, List, Dict, Any
+from config import API_BASE_URL, GOOGLE_MAPS_API_KEY, COUNTRY_RISK_TABLE_ENABLED # Import from root config
+from config import COUNTRY_RISK_FETCH_WORKERS
+from common import async_transport # Shared pooled AsyncClient with default timeouts
+from common.cache import cached
+from common.single_flight import coalesced
+from common import transaction_stream
+from common import records
+from common.geocode_cache import geocode_batch_async
+from aml_agent.country_risk_table import COUNTRY_RISK_TABLE
+from aml_agent.bank_api_client import COUNTRY_RISK_CACHE, COMPANY_DIRECTORS_CACHE, GEOCODE_CACHE
+
+AML_API_BASE_URL = API_BASE_URL
+
+def _log_status_for_http_error(e: Exception):
+    if isinstance(e, httpx.HTTPStatusError):
+        print(f"Response: {e.response.status_code}\n=================")
+
+@coalesced
+async def fetch_transaction_history(account_number: str, start_date: str, end_date: str) -> dict:
+    """
+    Retrieves a list of transactions for the specified account_number within a given date range.
+    For AML analysis, this endpoint is expected to return transactions enriched with details like
+    counterparty_name, counterparty_account_number, counterparty_bank_identifier, counterparty_country,
+    transaction_location_latitude, transaction_location_longitude, and is_cash_transaction.
+    """
+    params = {"start_date": start_date, "end_date": end_date}
+    url = f"{AML_API_BASE_URL}/users/{account_number}/transactions"
+    print(f"\n=====API Call:======\n{url} (params: {params})\n=================")
+    try:
+        # Long ranges are fetched as concurrent date windows and merged.
+        return {"status": "success", "data": await transaction_stream.load_transaction_history_async(url, start_date, end_date)}
+    except httpx.HTTPStatusError as e:
+        error_message = f"API Error (HTTP {e.response.status_code}): Failed to fetch transaction history."
+        try:
+            error_details = e.response.json().get("message", e.response.text)
+            error_message += f" Details: {error_details}"
+        except json.JSONDecodeError:
+            error_message += f" Raw: {e.response.text}"
+        print(f"API HTTPError in fetch_transaction_history (AML): {error_message}")
+        return {"status": "error", "error_message": error_message}
+    except httpx.RequestError as e:
+        print(f"API RequestException in fetch_transaction_history (AML): {e}")
+        return {"status": "error", "error_message": f"API request failed for transaction history: {e}"}
+    except json.JSONDecodeError as e:
+        print(f"API JSONDecodeError in fetch_transaction_history (AML): {e}")
+        return {"status": "error", "error_message": "Invalid JSON response from API for transaction history."}
+
+@coalesced
+async def fetch_user_profile(account_number: str) -> dict:
+    """
+    Fetches basic profile information for the user associated with the given account_number.
+    This includes full name, email, phone number, address, date of birth, account type, and account open date.
+
+    Args:
+        account_number (str): The unique identifier (e.g., "123456789") for the user's bank account.
+
+    Returns:
+        dict: A dictionary containing:
+              - 'status' (str): "success" or "error".
+              - 'data' (dict, optional): The user's profile information if status is "success".
+                Example: {'account_number': '123456789', 'full_name': 'Jane Doe', ...}
+              - 'error_message' (str, optional): A description of the error if status is "error".
+    """
+    url = f"{AML_API_BASE_URL}/users/{account_number}/profile"
+    print(f"\n=====API Call:======\n{url}\n=================")
+    try:
+        response = await async_transport.get(url)
+        print(f"Response: {response.status_code}\n=================")
+        response.raise_for_status()
+        return {"status": "success", "data": records.to_builtins(records.decode_user_profile(response.content))}
+    except httpx.HTTPStatusError as e:
+        print(f"Response: {e.response.status_code}\n=================")
+        try:
+            error_response = e.response.json()
+            status_code = error_response.get("statusCode", e.response.status_code)
+            error_type = error_response.get("error", "Unknown Error Type")
+            raw_message = error_response.get("message", "No specific error message provided by API.")
+            if isinstance(raw_message, list):
+                detailed_messages = "; ".join(raw_message)
+            else:
+                detailed_messages = raw_message
+            error_message_for_agent = f"API Error (HTTP {status_code} - {error_type}): {detailed_messages}"
+        except json.JSONDecodeError:
+            error_message_for_agent = f"API Error (HTTP {e.response.status_code}): Failed to decode error response. Raw: {e.response.text}"
+        print(f"API HTTPError fetching user profile for {account_number} (AML): {error_message_for_agent}")
+        return {"status": "error", "error_message": f"Failed to fetch user profile. {error_message_for_agent}"}
+    except httpx.RequestError as e:
+        print(f"API RequestException fetching user profile for {account_number} (AML): {e}")
+        return {"status": "error", "error_message": f"Failed to fetch user profile. API request failed: {e}"}
+    except (json.JSONDecodeError, records.DecodeError) as e:
+        print(f"API JSONDecodeError for user profile {account_number} (AML): {e}")
+        return {"status": "error", "error_message": "Failed to fetch user profile. Invalid JSON response from API."}
+
+@coalesced
+async def get_account_profile_and_history_summary(account_number: str) -> dict:
+    """
+    Provides a baseline profile of the account for AML analysis.
+    """
+    url = f"{AML_API_BASE_URL}/users/{account_number}/aml_profile_summary"
+    print(f"\n=====API Call:======\n{url}\n=================")
+    try:
+        response = await async_transport.get(url)
+        print(f"Response: {response.status_code}\n=================")
+        response.raise_for_status()
+        return {"status": "success", "data": response.json()}
+    except Exception as e:
+        _log_status_for_http_error(e)
+        print(f"API Error in get_account_profile_and_history_summary: {e}")
+        return {"status": "error", "error_message": str(e), "data": {
+            "account_type": "Unknown", "customer_since": "Unknown", "primary_business_activity": "N/A",
+            "expected_monthly_turnover": 0, "avg_transaction_size": 0,
+            "typical_counterparty_countries": [], "known_alerts_history_count": 0
+        }} # Return default structure on error
+
+async def get_country_risk_rating(country_code: str) -> dict:
+    """
+    Returns the bank's AML risk rating for a given country.
+    """
+    if COUNTRY_RISK_TABLE_ENABLED and COUNTRY_RISK_TABLE.ready(0):
+        rating = COUNTRY_RISK_TABLE.get(country_code)
+        if rating is not None:
+            return {"status": "success", "data": rating}
+    return await _fetch_country_risk_rating(country_code)
+
+async def get_country_risk_ratings(country_codes: List[str]) -> dict:
+    """
+    Returns the bank's AML risk ratings for many countries in one call. Ratings come from the
+    locally held country risk table; only codes missing from it are requested from the API.
+
+    Args:
+        country_codes (List[str]): ISO 3166-1 alpha-2 country codes; duplicates are ignored.
+
+    Returns:
+        dict: A dictionary containing:
+              - 'status' (str): "success" (even if some countries could not be rated) or "error".
+              - 'data' (dict, optional): 'ratings' (one per distinct country code, each with country_code,
+                aml_risk_rating and reason_for_rating, or an 'error_message'), 'table_version',
+                'served_locally' and 'fetched' (codes that needed an API call).
+              - 'error_message' (str, optional): A description of the error if status is "error".
+    """
+    if COUNTRY_RISK_TABLE_ENABLED and COUNTRY_RISK_TABLE.ready(0):
+        found, missing = COUNTRY_RISK_TABLE.get_many(country_codes)
+    else:
+        found, missing = {}, list(dict.fromkeys(str(c).upper() for c in country_codes))
+    semaphore = asyncio.Semaphore(max(1, COUNTRY_RISK_FETCH_WORKERS))
+
+    async def fetch_one(code: str) -> dict:
+        async with semaphore:
+            return await _fetch_country_risk_rating(code)
+
+    fetched = {}
+    for code, result in zip(missing, await asyncio.gather(*(fetch_one(code) for code in missing))):
+        fetched[code] = result["data"] if result.get("status") == "success" else {
+            "country_code": code, "error_message": result.get("error_message")}
+    ratings = [found.get(code) or fetched[code] for code in dict.fromkeys(str(c).upper() for c in country_codes)]
+    return {"status": "success", "data": {
+        "ratings": ratings,
+        "table_version": COUNTRY_RISK_TABLE.version,
+        "served_locally": len(found),
+        "fetched": missing,
+    }}
+
+@cached(COUNTRY_RISK_CACHE)
+@coalesced
+async def _fetch_country_risk_rating(country_code: str) -> dict:
+    """
+    Fetches one country's AML risk rating from the per-country endpoint.
+    """
+    url = f"{AML_API_BASE_URL}/aml_data/country_risk/{country_code}"
+    print(f"\n=====API Call:======\n{url}\n=================")
+    try:
+        response = await async_transport.get(url)
+        print(f"Response: {response.status_code}\n=================")
+        response.raise_for_status()
+        return {"status": "success", "data": response.json()}
+    except Exception as e:
+        _log_status_for_http_error(e)
+        print(f"API Error in _fetch_country_risk_rating for {country_code}: {e}")
+        return {"status": "error", "error_message": str(e), "data": {"country_code": country_code, "aml_risk_rating": "unknown", "reason_for_rating": "Error fetching data."}}
+
+async def direct_google_maps_geocoding_tool(latitude: float, longitude: float) -> dict:
+    """
+    Calls the Google Maps Geocoding API to get address details from latitude and longitude.
+    Results are cached on disk per ~40 m location cell, so repeated merchant locations are
+    answered without an API call. The API key is sourced from config.py.
+    """
+    key = GEOCODE_CACHE.key(latitude, longitude)
+    # The cache is SQLite; keep its reads and writes off the event loop.
+    cached_data = await asyncio.to_thread(GEOCODE_CACHE.get, key)
+    if cached_data is not None:
+        print(f"Geocoding cache hit for {latitude},{longitude} (geohash {key})")
+        return {"status": "success", "data": cached_data}
+    result = await _google_maps_reverse_geocode(latitude, longitude)
+    if result.get("status") == "success":
+        await asyncio.to_thread(GEOCODE_CACHE.put, key, result["data"])
+    return result
+
+async def batch_google_maps_geocoding_tool(latitudes: List[float], longitudes: List[float]) -> dict:
+    """
+    Gets address details for many coordinates at once. Coordinates are deduplicated to
+    distinct locations first; cached locations are answered from disk and only new ones are
+    sent to the Google Maps Geocoding API.
+
+    Args:
+        latitudes (List[float]): Latitudes of the locations.
+        longitudes (List[float]): Longitudes of the locations, in the same order.
+
+    Returns:
+        dict: A dictionary containing:
+              - 'status' (str): "success" or "error".
+              - 'data' (dict, optional): 'results' (one per input coordinate, in order, each with
+                'status', 'geohash' and 'data' holding formatted_address, country_code, country, city)
+                and 'stats' (coordinates, unique_locations, cache_hits, fetched, hit_rate).
+              - 'error_message' (str, optional): A description of the error if status is "error".
+    """
+    if len(latitudes) != len(longitudes):
+        return {"status": "error", "error_message": "latitudes and longitudes must have the same length."}
+    data = await geocode_batch_async(GEOCODE_CACHE, list(zip(latitudes, longitudes)), _google_maps_reverse_geocode)
+    print(f"Batch geocoding: {data['stats']}")
+    return {"status": "success", "data": data}
+
+@coalesced
+async def _google_maps_reverse_geocode(latitude: float, longitude: float) -> dict:
+    if not GOOGLE_MAPS_API_KEY or GOOGLE_MAPS_API_KEY == "YOUR_ACTUAL_GOOGLE_MAPS_API_KEY":
+        print("Warning: GOOGLE_MAPS_API_KEY is not set or is a placeholder. Geocoding will be skipped.")
+        return {"status": "error", "error_message": "Google Maps API key not configured.", "data": {"country_code": "XX"}}
+
+    maps_api_url = "https://maps.googleapis.com/maps/api/geocode/json"
+    params = {
+        "latlng": f"{latitude},{longitude}",
+        "key": GOOGLE_MAPS_API_KEY
+    }
+    log_url_with_params = f"{maps_api_url}?latlng={latitude},{longitude}&key=..." # Key placeholder for log
+    print(f"\n=====API Call:======\n{log_url_with_params}\n=================")
+    try:
+        response = await async_transport.get(maps_api_url, params=params)
+        print(f"Response: {response.status_code}\n=================")
+        response.raise_for_status()
+        data = response.json()
+
+        if data.get("status") == "OK" and data.get("results"):
+            result = data["results"][0]
+            formatted_address = result.get("formatted_address")
+            country_code = "XX"
+            country_name = "Unknown"
+            city_name = "Unknown"
+
+            for component in result.get("address_components", []):
+                if "country" in component.get("types", []):
+                    country_code = component.get("short_name")
+                    country_name = component.get("long_name")
+                if "locality" in component.get("types", []) or "postal_town" in component.get("types", []):
+                    city_name = component.get("long_name")
+
+            return {
+                "status": "success",
+                "data": {
+                    "formatted_address": formatted_address,
+                    "country_code": country_code,
+                    "country": country_name,
+                    "city": city_name,
+                    "raw_google_response": result
+                }
+            }
+        else:
+            error_message = data.get("error_message", f"Geocoding failed with status: {data.get('status')}")
+            print(f"Google Maps API Error: {error_message}")
+            return {"status": "error", "error_message": error_message, "data": {"country_code": "XX"}}
+
+    except httpx.HTTPStatusError as e:
+        print(f"HTTPError calling Google Maps API: {e}")
+        return {"status": "error", "error_message": f"HTTP error calling Google Maps API: {e}", "data": {"country_code": "XX"}}
+    except httpx.RequestError as e:
+        print(f"Response: Error (RequestException)\n=================")
+        print(f"RequestException calling Google Maps API: {e}")
+        return {"status": "error", "error_message": f"Request to Google Maps API failed: {e}", "data": {"country_code": "XX"}}
+    except json.JSONDecodeError as e:
+        print(f"JSONDecodeError parsing Google Maps API response: {e}")
+        return {"status": "error", "error_message": "Invalid JSON response from Google Maps API.", "data": {"country_code": "XX"}}
+    except Exception as e:
+        print(f"Unexpected error in direct_google_maps_geocoding_tool: {e}")
+        return {"status": "error", "error_message": f"An unexpected error occurred during geocoding: {e}", "data": {"country_code": "XX"}}
+
+async def check_entity_against_watchlists(
+    entity_name: str,
+    entity_type: str, # Must be 'individual' or 'organization'
+    country_of_residence_or_incorporation: Optional[str] = None, # ISO 3166-1 alpha-2
+    date_of_birth: Optional[str] = None, # YYYY-MM-DD
+    aliases: Optional[List[str]] = None,
+    address: Optional[Dict[str, Any]] = None,
+    identification_numbers: Optional[List[Dict[str, str]]] = None
+) -> dict:
+    """
+    Checks an entity against internal and external watchlists/sanctions lists.
+    Payload conforms to WatchlistCheckRequestDto.
+    """
+    payload: Dict[str, Any] = {"entity_name": entity_name, "entity_type": entity_type}
+    if country_of_residence_or_incorporation:
+        payload["country_of_residence_or_incorporation"] = country_of_residence_or_incorporation
+    if date_of_birth:
+        payload["date_of_birth"] = date_of_birth
+    if aliases:
+        payload["aliases"] = aliases
+    if address:
+        payload["address"] = address
+    if identification_numbers:
+        payload["identification_numbers"] = identification_numbers
+
+    url = f"{AML_API_BASE_URL}/external_services/watchlist_check"
+    print(f"\n=====API Call:======\nURL: {url}\nPayload: {json.dumps(payload)}\n=================")
+    try:
+        response = await async_transport.post(url, json=payload)
+        print(f"Response: {response.status_code}\n=================")
+        response.raise_for_status()
+        return {"status": "success", "data": response.json()}
+    except Exception as e:
+        _log_status_for_http_error(e)
+        print(f"API Error in check_entity_against_watchlists for {entity_name}: {e}")
+        return {"status": "error", "error_message": str(e), "data": {"entity_name": entity_name, "is_on_watchlist": None, "watchlist_details": []}}
+
+@cached(COMPANY_DIRECTORS_CACHE)
+@coalesced
+async def get_company_director_information(company_registration_id: str, country_code: str) -> dict:
+    """
+    Fetches company director information for business AML checks.
+    """
+    params = {"country_code": country_code}
+    url = f"{AML_API_BASE_URL}/external_services/company_info/{company_registration_id}/directors"
+    print(f"\n=====API Call:======\n{url} (params: {params})\n=================")
+    try:
+        response = await async_transport.get(url, params=params)
+        print(f"Response: {response.status_code}\n=================")
+        response.raise_for_status()
+        return {"status": "success", "data": response.json()}
+    except Exception as e:
+        _log_status_for_http_error(e)
+        print(f"API Error in get_company_director_information for {company_registration_id}: {e}")
+        return {"status": "error", "error_message": str(e), "data": {"company_name": "Unknown", "directors": []}}
@@ -1,12 +1,28 @@
 # aml_agent/bank_api_client.py
 import requests
 import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Dict, Any
-from config import API_BASE_URL, GOOGLE_MAPS_API_KEY # Import from root config
+from config import API_BASE_URL, GOOGLE_MAPS_API_KEY, CACHE_TTL_COUNTRY_RISK, CACHE_TTL_COMPANY_DIRECTORS, GEOCODE_CACHE_PATH # Import from root config
+from config import COUNTRY_RISK_FETCH_WORKERS, COUNTRY_RISK_LOAD_TIMEOUT, COUNTRY_RISK_TABLE_ENABLED
+from common import transport # Shared pooled HTTP session with default timeouts
+from common.cache import TTLCache, cached
+from common.geocode_cache import GeocodeCache, geocode_batch
+from aml_agent.country_risk_table import COUNTRY_RISK_TABLE
+from common.single_flight import coalesced
+from common import transaction_stream
+from common import records
 
 # Alias for clarity within this client, though it uses the shared base URL
 AML_API_BASE_URL = API_BASE_URL
 
+# Reference data that rarely changes; shared with async_bank_api_client.
+COUNTRY_RISK_CACHE = TTLCache("aml.country_risk", ttl=CACHE_TTL_COUNTRY_RISK)
+COMPANY_DIRECTORS_CACHE = TTLCache("aml.company_directors", ttl=CACHE_TTL_COMPANY_DIRECTORS)
+# Reverse-geocoding results persisted on disk per geohash cell; shared with async_bank_api_client.
+GEOCODE_CACHE = GeocodeCache("aml.geocodes", GEOCODE_CACHE_PATH)
+
+@coalesced
 def fetch_transaction_history(account_number: str, start_date: str, end_date: str) -> dict:
     """
     Retrieves a list of transactions for the specified account_number within a given date range.
@@ -18,14 +34,10 @@ def fetch_transaction_history(account_number: str, start_date: str, end_date: st
     url = f"{AML_API_BASE_URL}/users/{account_number}/transactions"
     print(f"\n=====API Call:======\n{url} (params: {params})\n=================")
     try:
-        response = requests.get(url, params=params)
-        print(f"Response: {response.status_code}\n=================")
-        response.raise_for_status()
-        return {"status": "success", "data": response.json()}
+        # Long ranges are fetched as concurrent date windows and merged.
+        return {"status": "success", "data": transaction_stream.load_transaction_history(url, start_date, end_date)}
     except requests.exceptions.HTTPError as e:
-        # Log status code even for HTTP errors before raising or returning
-        if hasattr(e, 'response') and e.response is not None:
-            print(f"Response: {e.response.status_code}\n=================")
+        # The status code has already been logged by transaction_stream.
         # Basic error handling, can be expanded like in financial_concierge
         error_message = f"API Error (HTTP {e.response.status_code}): Failed to fetch transaction history."
         try:
@@ -39,6 +51,26 @@ def fetch_transaction_history(account_number: str, start_date: str, end_date: st
         print(f"API RequestException in fetch_transaction_history (AML): {e}")
         return {"status": "error", "error_message": f"API request failed for transaction history: {e}"}
 
+def iter_transaction_history(account_number: str, start_date: str, end_date: str):
+    """
+    Yields the account's transactions for the date range one at a time, fetching
+    date windows concurrently and decoding them incrementally. Intended for code
+    paths (not LLM tools) that process long histories without materializing them.
+    Raises requests exceptions on failure.
+    """
+    url = f"{AML_API_BASE_URL}/users/{account_number}/transactions"
+    return transaction_stream.iter_transactions(url, start_date, end_date)
+
+def iter_transaction_records(account_number: str, start_date: str, end_date: str):
+    """
+    Same as iter_transaction_history, but yields typed common.records.Transaction
+    records decoded straight from the response bytes. Use records.to_dicts() to hand
+    a selection back to the LLM. Raises requests exceptions on failure.
+    """
+    url = f"{AML_API_BASE_URL}/users/{account_number}/transactions"
+    return transaction_stream.iter_transaction_records(url, start_date, end_date)
+
+@coalesced
 def fetch_user_profile(account_number: str) -> dict:
     """
     Fetches basic profile information for the user associated with the given account_number.
@@ -57,10 +89,10 @@ def fetch_user_profile(account_number: str) -> dict:
     url = f"{AML_API_BASE_URL}/users/{account_number}/profile"
     print(f"\n=====API Call:======\n{url}\n=================")
     try:
-        response = requests.get(url) 
+        response = transport.get(url) 
         print(f"Response: {response.status_code}\n=================")
         response.raise_for_status() 
-        return {"status": "success", "data": response.json()}
+        return {"status": "success", "data": records.to_builtins(records.decode_user_profile(response.content))}
     except requests.exceptions.HTTPError as e:
         if hasattr(e, 'response') and e.response is not None:
             print(f"Response: {e.response.status_code}\n=================")
@@ -81,10 +113,11 @@ def fetch_user_profile(account_number: str) -> dict:
     except requests.exceptions.RequestException as e:
         print(f"API RequestException fetching user profile for {account_number} (AML): {e}")
         return {"status": "error", "error_message": f"Failed to fetch user profile. API request failed: {e}"}
-    except json.JSONDecodeError as e:
+    except (json.JSONDecodeError, records.DecodeError) as e:
         print(f"API JSONDecodeError for user profile {account_number} (AML): {e}")
         return {"status": "error", "error_message": "Failed to fetch user profile. Invalid JSON response from API."}
 
+@coalesced
 def get_account_profile_and_history_summary(account_number: str) -> dict:
     """
     Provides a baseline profile of the account for AML analysis.
@@ -92,7 +125,7 @@ def get_account_profile_and_history_summary(account_number: str) -> dict:
     url = f"{AML_API_BASE_URL}/users/{account_number}/aml_profile_summary"
     print(f"\n=====API Call:======\n{url}\n=================")
     try:
-        response = requests.get(url)
+        response = transport.get(url)
         print(f"Response: {response.status_code}\n=================")
         response.raise_for_status()
         return {"status": "success", "data": response.json()}
@@ -111,17 +144,66 @@ def get_country_risk_rating(country_code: str) -> dict:
     """
     Returns the bank's AML risk rating for a given country.
     """
+    if COUNTRY_RISK_TABLE_ENABLED and COUNTRY_RISK_TABLE.ready(COUNTRY_RISK_LOAD_TIMEOUT):
+        rating = COUNTRY_RISK_TABLE.get(country_code)
+        if rating is not None:
+            return {"status": "success", "data": rating}
+    return _fetch_country_risk_rating(country_code)
+
+def get_country_risk_ratings(country_codes: List[str]) -> dict:
+    """
+    Returns the bank's AML risk ratings for many countries in one call. Ratings come from the
+    locally held country risk table; only codes missing from it are requested from the API.
+
+    Args:
+        country_codes (List[str]): ISO 3166-1 alpha-2 country codes; duplicates are ignored.
+
+    Returns:
+        dict: A dictionary containing:
+              - 'status' (str): "success" (even if some countries could not be rated) or "error".
+              - 'data' (dict, optional): 'ratings' (one per distinct country code, each with country_code,
+                aml_risk_rating and reason_for_rating, or an 'error_message'), 'table_version',
+                'served_locally' and 'fetched' (codes that needed an API call).
+              - 'error_message' (str, optional): A description of the error if status is "error".
+    """
+    if COUNTRY_RISK_TABLE_ENABLED and COUNTRY_RISK_TABLE.ready(COUNTRY_RISK_LOAD_TIMEOUT):
+        found, missing = COUNTRY_RISK_TABLE.get_many(country_codes)
+    else:
+        found, missing = {}, list(dict.fromkeys(str(c).upper() for c in country_codes))
+    fetched = {}
+    if missing:
+        # Missing codes are independent requests; fetch them COUNTRY_RISK_FETCH_WORKERS at a time.
+        with ThreadPoolExecutor(max_workers=max(1, min(COUNTRY_RISK_FETCH_WORKERS, len(missing))),
+                                thread_name_prefix="country-risk") as pool:
+            results = list(pool.map(_fetch_country_risk_rating, missing))
+        for code, result in zip(missing, results):
+            fetched[code] = result["data"] if result.get("status") == "success" else {
+                "country_code": code, "error_message": result.get("error_message")}
+    ratings = [found.get(code) or fetched[code] for code in dict.fromkeys(str(c).upper() for c in country_codes)]
+    return {"status": "success", "data": {
+        "ratings": ratings,
+        "table_version": COUNTRY_RISK_TABLE.version,
+        "served_locally": len(found),
+        "fetched": missing,
+    }}
+
+@cached(COUNTRY_RISK_CACHE)
+@coalesced
+def _fetch_country_risk_rating(country_code: str) -> dict:
+    """
+    Fetches one country's AML risk rating from the per-country endpoint.
+    """
     url = f"{AML_API_BASE_URL}/aml_data/country_risk/{country_code}"
     print(f"\n=====API Call:======\n{url}\n=================")
     try:
-        response = requests.get(url)
+        response = transport.get(url)
         print(f"Response: {response.status_code}\n=================")
         response.raise_for_status()
         return {"status": "success", "data": response.json()}
     except Exception as e:
         if isinstance(e, requests.exceptions.HTTPError) and hasattr(e, 'response') and e.response is not None:
             print(f"Response: {e.response.status_code}\n=================")
-        print(f"API Error in get_country_risk_rating for {country_code}: {e}")
+        print(f"API Error in _fetch_country_risk_rating for {country_code}: {e}")
         return {"status": "error", "error_message": str(e), "data": {"country_code": country_code, "aml_risk_rating": "unknown", "reason_for_rating": "Error fetching data."}}
 
 # get_ip_geolocation_details removed as per user feedback (not using IP address for now)
@@ -134,8 +216,45 @@ def get_country_risk_rating(country_code: str) -> dict:
 def direct_google_maps_geocoding_tool(latitude: float, longitude: float) -> dict:
     """
     Calls the Google Maps Geocoding API to get address details from latitude and longitude.
-    The API key is sourced from config.py.
+    Results are cached on disk per ~40 m location cell, so repeated merchant locations are
+    answered without an API call. The API key is sourced from config.py.
+    """
+    key = GEOCODE_CACHE.key(latitude, longitude)
+    cached_data = GEOCODE_CACHE.get(key)
+    if cached_data is not None:
+        print(f"Geocoding cache hit for {latitude},{longitude} (geohash {key})")
+        return {"status": "success", "data": cached_data}
+    result = _google_maps_reverse_geocode(latitude, longitude)
+    if result.get("status") == "success":
+        GEOCODE_CACHE.put(key, result["data"])
+    return result
+
+def batch_google_maps_geocoding_tool(latitudes: List[float], longitudes: List[float]) -> dict:
     """
+    Gets address details for many coordinates at once. Coordinates are deduplicated to
+    distinct locations first; cached locations are answered from disk and only new ones are
+    sent to the Google Maps Geocoding API.
+
+    Args:
+        latitudes (List[float]): Latitudes of the locations.
+        longitudes (List[float]): Longitudes of the locations, in the same order.
+
+    Returns:
+        dict: A dictionary containing:
+              - 'status' (str): "success" or "error".
+              - 'data' (dict, optional): 'results' (one per input coordinate, in order, each with
+                'status', 'geohash' and 'data' holding formatted_address, country_code, country, city)
+                and 'stats' (coordinates, unique_locations, cache_hits, fetched, hit_rate).
+              - 'error_message' (str, optional): A description of the error if status is "error".
+    """
+    if len(latitudes) != len(longitudes):
+        return {"status": "error", "error_message": "latitudes and longitudes must have the same length."}
+    data = geocode_batch(GEOCODE_CACHE, list(zip(latitudes, longitudes)), _google_maps_reverse_geocode)
+    print(f"Batch geocoding: {data['stats']}")
+    return {"status": "success", "data": data}
+
+@coalesced
+def _google_maps_reverse_geocode(latitude: float, longitude: float) -> dict:
     if not GOOGLE_MAPS_API_KEY or GOOGLE_MAPS_API_KEY == "YOUR_ACTUAL_GOOGLE_MAPS_API_KEY":
         print("Warning: GOOGLE_MAPS_API_KEY is not set or is a placeholder. Geocoding will be skipped.")
         return {"status": "error", "error_message": "Google Maps API key not configured.", "data": {"country_code": "XX"}}
@@ -149,7 +268,7 @@ def direct_google_maps_geocoding_tool(latitude: float, longitude: float) -> dict
     log_url_with_params = f"{maps_api_url}?latlng={latitude},{longitude}&key=..." # Key placeholder for log
     print(f"\n=====API Call:======\n{log_url_with_params}\n=================")
     try:
-        response = requests.get(maps_api_url, params=params)
+        response = transport.get(maps_api_url, params=params)
         print(f"Response: {response.status_code}\n=================")
         response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
         data = response.json()
@@ -236,7 +355,7 @@ def check_entity_against_watchlists(
     # For production, consider what level of detail is appropriate to log.
     print(f"\n=====API Call:======\nURL: {url}\nPayload: {json.dumps(payload)}\n=================")
     try:
-        response = requests.post(url, json=payload)
+        response = transport.post(url, json=payload)
         print(f"Response: {response.status_code}\n=================")
         response.raise_for_status()
         return {"status": "success", "data": response.json()}
@@ -246,6 +365,8 @@ def check_entity_against_watchlists(
         print(f"API Error in check_entity_against_watchlists for {entity_name}: {e}")
         return {"status": "error", "error_message": str(e), "data": {"entity_name": entity_name, "is_on_watchlist": None, "watchlist_details": []}}
 
+@cached(COMPANY_DIRECTORS_CACHE)
+@coalesced
 def get_company_director_information(company_registration_id: str, country_code: str) -> dict:
     """
     Fetches company director information for business AML checks.
@@ -254,7 +375,7 @@ def get_company_director_information(company_registration_id: str, country_code:
     url = f"{AML_API_BASE_URL}/external_services/company_info/{company_registration_id}/directors"
     print(f"\n=====API Call:======\n{url} (params: {params})\n=================")
     try:
-        response = requests.get(url, params=params)
+        response = transport.get(url, params=params)
         print(f"Response: {response.status_code}\n=================")
         response.raise_for_status()
         return {"status": "success", "data": response.json()}
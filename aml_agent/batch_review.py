@@ -0,0 +1,509 @@
+# aml_agent/batch_review.py
+"""Portfolio-scale AML review: many accounts, no conversation and no model calls.
+
+    python -m aml_agent.batch_review reviews.csv results.jsonl --workers 8
+    python -m aml_agent.batch_review reviews.jsonl results.parquet
+
+The input holds one review per row, with account_number, start_date and
+end_date columns. It can be CSV with a header, or JSON lines. Each review
+runs the deterministic path the agents use:
+    - the structuring, pass-through and profile-deviation detectors
+    - counterparty country ratings
+    - watchlist screening of the account holder and every counterparty
+    - the counterparty graph
+    - the policy rule engine
+
+Reviews run on a bounded thread pool inside one process and share the pooled
+HTTP transport and the response caches. Watchlist results are kept for the
+sweep per (normalised counterparty name, country), so a counterparty screened
+for one account is not sent to the rate-limited watchlist service again. When
+a local watchlist snapshot is installed it screens every counterparty first,
+and only its candidate matches are confirmed with the service.
+
+The counterparty graph belongs to the sweep and is built before any account is
+assessed. A first pass adds the flows of the first
+BATCH_REVIEW_GRAPH_MAX_ACCOUNTS accounts in the input, in input order. The
+second pass then reviews each account against that finished graph. Fund cycles
+between accounts of the sweep are therefore found whichever account comes
+first, and a decision does not depend on worker scheduling or on where an
+interrupted sweep was resumed. The first pass keeps each account's
+transactions and profile until its review takes them, so nothing is fetched
+twice; the memory held for this grows with the cap. Accounts past the cap are
+reviewed without the network, which is listed in their incomplete_sources.
+
+Results are appended as each review finishes. JSONL is flushed per review,
+while Parquet is written as part files of BATCH_REVIEW_PARQUET_ROWS reviews
+into an output directory (pyarrow is only needed for this format). Rerunning
+the same command resumes the sweep: reviews already in the output are
+skipped, and with --retry-errors the failed ones are run again (the last
+result for a review wins).
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from aml_agent.bank_api_client import (
+    check_entity_against_watchlists,
+    fetch_user_profile,
+    get_account_profile_and_history_summary,
+    get_country_risk_ratings,
+)
+from aml_agent.counterparty_graph import CounterpartyGraph
+from aml_agent.counterparty_screening import screen_counterparties
+from aml_agent.detectors.pass_through import find_pass_through
+from aml_agent.detectors.profile_deviation import profile_deviation
+from aml_agent.detectors.structuring import find_structuring
+from aml_agent.policy_engine import evaluate_policy, policy_output
+from aml_agent.transaction_table import TransactionTable, load_table, table_handle
+from aml_agent.watchlist_index import WatchlistIndex, get_watchlist_index
+from common.cache import TTLCache
+from config import (
+    BATCH_REVIEW_GRAPH_MAX_ACCOUNTS,
+    BATCH_REVIEW_PARQUET_ROWS,
+    BATCH_REVIEW_SCREENING_CACHE_SIZE,
+    BATCH_REVIEW_SCREENING_CACHE_TTL,
+    BATCH_REVIEW_WORKERS,
+)
+
+REQUEST_FIELDS = ("account_number", "start_date", "end_date")
+PROGRESS_EVERY = 100
+
+# An account's transactions and fetch_user_profile result, fetched once per sweep.
+SweepEntry = Tuple[TransactionTable, Dict[str, Any]]
+
+
+# --- Input ---------------------------------------------------------------------
+
+def read_review_requests(path: str) -> Iterator[Dict[str, str]]:
+    """Yields {"account_number", "start_date", "end_date"} per row of a CSV (with header) or JSON lines file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows: Iterator[Dict[str, Any]] = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for number, row in enumerate(rows, start=1):
+            request = {key: str(row.get(key) or "").strip() for key in REQUEST_FIELDS}
+            missing = [key for key in REQUEST_FIELDS if not request[key]]
+            if missing:
+                print(f"Batch review: skipping row {number} of {path}, missing {', '.join(missing)}")
+                continue
+            yield request
+
+
+def review_key(record: Dict[str, Any]) -> str:
+    return table_handle(record["account_number"], record["start_date"], record["end_date"])
+
+
+# --- One review ----------------------------------------------------------------
+
+def review_account(account_number: str, start_date: str, end_date: str,
+                   graph: Optional[CounterpartyGraph] = None, screening_cache: Optional[TTLCache] = None,
+                   watchlist_index: Optional[WatchlistIndex] = None, table: Optional[TransactionTable] = None,
+                   user: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Runs one account's review and returns its result record.
+
+    `graph` is the sweep's counterparty graph (see build_sweep_graph) and is
+    only read; without it the network is assessed from this account's own
+    flows. `screening_cache` and `watchlist_index` are passed on to
+    screen_counterparties. `table` and `user` (a fetch_user_profile result)
+    are used instead of fetching them when given.
+
+    Sources that fail after the transactions were loaded are listed in
+    'incomplete_sources'; the policy is still evaluated on the remaining
+    evidence. The record has status "error" only if the transactions could not
+    be fetched.
+    """
+    started = time.perf_counter()
+    record: Dict[str, Any] = {
+        "account_number": account_number, "start_date": start_date, "end_date": end_date,
+        "reviewed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    try:
+        if table is None:
+            table = load_table(account_number, start_date, end_date)
+    except ValueError as e:
+        record.update(status="error", error_message=f"Failed to fetch transaction history. {e}",
+                      elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+        return record
+
+    incomplete: List[str] = []
+    if user is None:
+        user = fetch_user_profile(account_number)
+    user_data = (user.get("data") or {}) if user.get("status") == "success" else {}
+    home_country = (user_data.get("address") or {}).get("country")
+    findings: Dict[str, Any] = {
+        "structuring": find_structuring(table),
+        "rapid_movement": find_pass_through(table, home_country=home_country),
+    }
+
+    profile = get_account_profile_and_history_summary(account_number)
+    if profile.get("status") == "success":
+        findings["account_profile"] = profile["data"]
+        findings["profile_deviation"] = profile_deviation(table, profile["data"], start_date, end_date)
+    else:
+        incomplete.append("account_profile")
+
+    holder_name = user_data.get("full_name")
+    if holder_name:
+        screening = check_entity_against_watchlists(
+            entity_name=holder_name, entity_type="individual",
+            country_of_residence_or_incorporation=home_country,
+            date_of_birth=user_data.get("date_of_birth"),
+        )
+        if screening.get("status") == "success":
+            findings["account_holder_screening"] = screening["data"]
+        else:
+            incomplete.append("account_holder_screening")
+    else:
+        incomplete.append("user_profile")
+
+    countries = table.summary()["counterparty_countries"]
+    if countries:
+        findings["country_risk"] = get_country_risk_ratings(countries)["data"]
+        if any("error_message" in rating for rating in findings["country_risk"]["ratings"]):
+            incomplete.append("country_risk")
+
+    findings["watchlist_screening"] = screen_counterparties(table, cache=screening_cache, index=watchlist_index)
+    if findings["watchlist_screening"]["errors"]:
+        incomplete.append("watchlist_screening")
+
+    if graph is None:
+        graph = CounterpartyGraph()
+        graph.add_review(account_number, table, holder_name)
+    if graph.has_review(account_number):
+        findings["counterparty_network"] = {
+            "cycles": graph.find_cycles(account_number),
+            "clusters": graph.linked_clusters(account_number, table),
+        }
+    else:
+        incomplete.append("counterparty_network")
+    network = findings.get("counterparty_network") or {"cycles": [], "clusters": []}
+
+    decision = evaluate_policy(findings)
+    output = policy_output(account_number, decision)
+    record.update(
+        status="success",
+        error_message=None,
+        overall_aml_risk_assessment=output["overall_aml_risk_assessment"],
+        recommended_action=output["recommended_action"],
+        policy_version=output["policy_version"],
+        triggered_rule_ids=output["triggered_rule_ids"],
+        key_risk_factors_summary=output["key_risk_factors_summary"],
+        transaction_count=len(table),
+        structuring_cluster_count=len(findings["structuring"]["clusters"]),
+        rapid_movement_count=len(findings["rapid_movement"]["episodes"]),
+        deviation_flags=(findings.get("profile_deviation") or {}).get("deviation_flags") or [],
+        watchlist_hits=[hit["counterparty_name"] for hit in findings["watchlist_screening"]["hits"]],
+        cycle_count=len(network["cycles"]),
+        linked_cluster_count=len(network["clusters"]),
+        incomplete_sources=incomplete,
+        decision=decision,
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+    )
+    return record
+
+
+def _review_safely(request: Dict[str, str], fetched: Optional[SweepEntry] = None, **sweep: Any) -> Dict[str, Any]:
+    # One malformed history must not stop a sweep over thousands of accounts.
+    table, user = fetched or (None, None)
+    try:
+        return review_account(request["account_number"], request["start_date"], request["end_date"],
+                              table=table, user=user, **sweep)
+    except Exception as e:
+        print(f"Batch review failed for {review_key(request)}: {e!r}")
+        return dict(request, status="error", error_message=f"Review failed: {e!r}",
+                    reviewed_at=datetime.now(timezone.utc).isoformat(timespec="seconds"))
+
+
+# --- Output --------------------------------------------------------------------
+
+class JsonlResultWriter:
+    """Appends one JSON line per review to `path`, flushed after every line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._repair_tail()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _repair_tail(self) -> None:
+        # A run killed mid-write leaves a partial last line; cut it so appended lines stay valid.
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            position = size
+            while position > 0:
+                step = min(1 << 16, position)
+                position -= step
+                f.seek(position)
+                newline = f.read(step).rfind(b"\n")
+                if newline >= 0:
+                    if position + newline + 1 < size:
+                        f.truncate(position + newline + 1)
+                    return
+            f.truncate(0)
+
+    def completed(self) -> Dict[str, str]:
+        """Review key -> status of the last result recorded for it."""
+        statuses: Dict[str, str] = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    statuses[review_key(record)] = record.get("status")
+                except (ValueError, KeyError, TypeError):
+                    continue
+        return statuses
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, default=str) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetResultWriter:
+    """Writes reviews to `directory` as part-NNNNN.parquet files of `rows_per_file` reviews each.
+
+    The decision is stored as JSON text. Part files are written under a
+    temporary name and renamed, so a part is either complete or absent.
+    """
+
+    def __init__(self, directory: str, rows_per_file: int = BATCH_REVIEW_PARQUET_ROWS):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow); use JSONL output instead.") from e
+        self._pa, self._pq = pa, pq
+        self.directory = directory
+        self.rows_per_file = max(1, rows_per_file)
+        self._rows: List[Dict[str, Any]] = []
+        text, count, texts = pa.string(), pa.int64(), pa.list_(pa.string())
+        self.schema = pa.schema([
+            ("account_number", text), ("start_date", text), ("end_date", text), ("status", text),
+            ("error_message", text), ("overall_aml_risk_assessment", text), ("recommended_action", text),
+            ("policy_version", text), ("triggered_rule_ids", texts), ("key_risk_factors_summary", texts),
+            ("transaction_count", count), ("structuring_cluster_count", count), ("rapid_movement_count", count),
+            ("deviation_flags", texts), ("watchlist_hits", texts), ("cycle_count", count),
+            ("linked_cluster_count", count), ("incomplete_sources", texts), ("decision", text),
+            ("reviewed_at", text), ("elapsed_ms", pa.float64()),
+        ])
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(directory, name))
+        self._next_part = 1 + max((int(name[5:10]) for name in self._parts()), default=-1)
+
+    def _parts(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.startswith("part-") and name.endswith(".parquet"))
+
+    def completed(self) -> Dict[str, str]:
+        statuses: Dict[str, str] = {}
+        for name in self._parts():
+            part = self._pq.read_table(os.path.join(self.directory, name), columns=list(REQUEST_FIELDS) + ["status"])
+            for record in part.to_pylist():
+                statuses[review_key(record)] = record["status"]
+        return statuses
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._rows.append({name: json.dumps(record[name], default=str) if isinstance(record.get(name), dict)
+                           else record.get(name) for name in self.schema.names})
+        if len(self._rows) >= self.rows_per_file:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        path = os.path.join(self.directory, f"part-{self._next_part:05d}.parquet")
+        self._pq.write_table(self._pa.Table.from_pylist(self._rows, schema=self.schema), path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self._next_part += 1
+        self._rows = []
+
+    def close(self) -> None:
+        self.flush()
+
+
+def open_result_writer(path: str, output_format: Optional[str] = None):
+    """JSONL unless `output_format` is "parquet" or the path ends in .parquet."""
+    output_format = output_format or ("parquet" if path.rstrip("/").endswith(".parquet") else "jsonl")
+    if output_format == "parquet":
+        return ParquetResultWriter(path)
+    if output_format == "jsonl":
+        return JsonlResultWriter(path)
+    raise ValueError(f"Unknown output format {output_format!r}; expected 'jsonl' or 'parquet'.")
+
+
+# --- Sweep ---------------------------------------------------------------------
+
+def _graph_entry(request: Dict[str, str]) -> Optional[SweepEntry]:
+    """The transactions and profile an account contributes to the sweep graph, or None if they cannot be fetched."""
+    try:
+        table = load_table(request["account_number"], request["start_date"], request["end_date"])
+        user = fetch_user_profile(request["account_number"])
+    except Exception as e:
+        print(f"Batch review: {review_key(request)} left out of the counterparty graph: {e!r}")
+        return None
+    return table, user
+
+
+def _holder_name(user: Dict[str, Any]) -> Optional[str]:
+    return (user.get("data") or {}).get("full_name") if user.get("status") == "success" else None
+
+
+def build_sweep_graph(requests: Iterable[Dict[str, str]], pool: ThreadPoolExecutor,
+                      max_accounts: int = BATCH_REVIEW_GRAPH_MAX_ACCOUNTS, window: int = 16,
+                      fetched: Optional[Dict[str, SweepEntry]] = None) -> CounterpartyGraph:
+    """First pass of a sweep: a new graph with the flows of the first `max_accounts` accounts in `requests`.
+
+    Histories are fetched on `pool`, at most `window` at a time, and added in
+    input order. An account listed for several periods contributes its first.
+    With `fetched`, each account's table and profile are also kept there under
+    its review key, for the second pass to review without fetching them again.
+    """
+    graph = CounterpartyGraph()
+    accounts: Set[str] = set()
+    queue: Deque[Tuple[Dict[str, str], Future]] = deque()
+
+    def add(request: Dict[str, str], future: Future) -> None:
+        entry = future.result()
+        if entry is None:
+            return
+        table, user = entry
+        graph.add_review(request["account_number"], table, _holder_name(user))
+        if fetched is not None:
+            fetched[review_key(request)] = entry
+
+    for request in requests:
+        account_number = request["account_number"]
+        if account_number in accounts:
+            continue
+        if len(accounts) >= max_accounts:
+            print(f"Batch review: counterparty graph capped at {max_accounts} accounts; "
+                  f"the network of later accounts is not assessed")
+            break
+        accounts.add(account_number)
+        queue.append((request, pool.submit(_graph_entry, request)))
+        if len(queue) >= window:
+            add(*queue.popleft())
+    while queue:
+        add(*queue.popleft())
+    print(f"Batch review: counterparty graph built, {graph.stats()}")
+    return graph
+
+
+def _local_watchlist() -> Optional[WatchlistIndex]:
+    try:
+        return get_watchlist_index()
+    except (OSError, ValueError) as e:
+        print(f"Batch review: no local watchlist snapshot ({e}); every new counterparty is screened by the watchlist service")
+        return None
+
+
+def run_batch_review(input_path: str, output_path: str, output_format: Optional[str] = None,
+                     max_workers: int = BATCH_REVIEW_WORKERS, retry_errors: bool = False) -> Dict[str, Any]:
+    """Reviews every request in `input_path` not yet in `output_path` and appends the results.
+
+    The sweep's counterparty graph is built first (build_sweep_graph), then the
+    reviews run on the transactions and profiles it fetched. At most twice `max_workers` reviews are in flight, so memory
+    stays flat however long the input is. On Ctrl-C, queued reviews are
+    dropped, finished and running ones are written, and the counts are
+    returned with 'interrupted' set.
+    """
+    writer = open_result_writer(output_path, output_format)
+    done = writer.completed()
+    if done:
+        print(f"Batch review: resuming, {len(done)} reviews already in {output_path}")
+    counts = {"reviewed": 0, "errors": 0, "skipped": 0, "interrupted": False}
+    levels: Dict[str, int] = {}
+    started = time.perf_counter()
+
+    def record(future: Future) -> None:
+        result = future.result()
+        writer.write(result)
+        if result.get("status") == "success":
+            counts["reviewed"] += 1
+            level = result["overall_aml_risk_assessment"]
+            levels[level] = levels.get(level, 0) + 1
+        else:
+            counts["errors"] += 1
+        finished = counts["reviewed"] + counts["errors"]
+        if finished % PROGRESS_EVERY == 0:
+            print(f"Batch review: {finished} done ({finished / (time.perf_counter() - started):.1f}/s), "
+                  f"{counts['errors']} errors, risk levels {levels}")
+
+    def record_finished() -> None:
+        # A future leaves `pending` only once its result is written, so an interrupt cannot lose it.
+        for future in wait(pending, return_when=FIRST_COMPLETED).done:
+            record(future)
+            pending.discard(future)
+
+    def due(key: str) -> bool:
+        return key not in done or (done[key] != "success" and retry_errors)
+
+    seen: Set[str] = set()
+    pending: Set[Future] = set()
+    fetched: Dict[str, SweepEntry] = {}
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="batch-review")
+    try:
+        # The graph covers already reviewed accounts too, so a resumed sweep evaluates against the same graph.
+        sweep = {
+            "graph": build_sweep_graph(read_review_requests(input_path), pool, window=2 * max(1, max_workers),
+                                       fetched=fetched),
+            "screening_cache": TTLCache("batch_review.watchlist", ttl=BATCH_REVIEW_SCREENING_CACHE_TTL,
+                                        maxsize=BATCH_REVIEW_SCREENING_CACHE_SIZE, stale_ttl=0),
+            "watchlist_index": _local_watchlist(),
+        }
+        for key in [key for key in fetched if not due(key)]:
+            del fetched[key]  # Already reviewed; only needed for the graph.
+        for request in read_review_requests(input_path):
+            key = review_key(request)
+            if key in seen or not due(key):
+                counts["skipped"] += 1
+                continue
+            seen.add(key)
+            pending.add(pool.submit(_review_safely, request, fetched.pop(key, None), **sweep))
+            if len(pending) >= 2 * max_workers:
+                record_finished()
+        while pending:
+            record_finished()
+    except KeyboardInterrupt:
+        counts["interrupted"] = True
+        pool.shutdown(wait=True, cancel_futures=True)
+        for future in pending:
+            if not future.cancelled():
+                record(future)
+    finally:
+        pool.shutdown(wait=True)
+        writer.close()
+    counts["risk_levels"] = levels
+    counts["elapsed_seconds"] = round(time.perf_counter() - started, 1)
+    print(f"Batch review {'interrupted' if counts['interrupted'] else 'complete'}: {counts}")
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m aml_agent.batch_review",
+                                     description="Rule-based AML review of many accounts.")
+    parser.add_argument("input", help="CSV (with header) or .jsonl file of account_number, start_date, end_date.")
+    parser.add_argument("output", help="Results file (.jsonl) or directory (.parquet); existing results are resumed.")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), help="Output format; defaults to the output's extension.")
+    parser.add_argument("--workers", type=int, default=BATCH_REVIEW_WORKERS, help="Accounts reviewed concurrently.")
+    parser.add_argument("--retry-errors", action="store_true", help="Run reviews that failed in an earlier run again.")
+    args = parser.parse_args()
+    counts = run_batch_review(args.input, args.output, args.format, args.workers, args.retry_errors)
+    if counts["interrupted"]:
+        raise SystemExit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+# aml_agent/counterparty_graph.py
+"""Counterparty graph: linked entities and circular fund flows across reviews.
+
+Nodes are accounts (reviewed accounts and counterparty accounts, keyed by bank
+identifier and account number; reviewed accounts carry the bank's own
+COUNTERPARTY_GRAPH_BANK_IDENTIFIER) and named parties (counterparty names,
+companies and directors, normalised with the watchlist index's normalize_name).
+There are two kinds of edge:
+
+* Link edges join nodes that belong to the same party or network. Examples: a
+  counterparty name and the account it trades through, two names paying from
+  one account, and a company and its directors (get_company_director_information).
+  Links are merged with union-find, so each cluster of connected parties is one
+  set. Directors are matched by normalised name.
+* Flow edges carry money between accounts, aggregated per (payer, payee).
+
+Round-tripping is a cycle of flow edges once every cluster is contracted to a
+single node: money that leaves the reviewed account and comes back through
+parties linked to one another. Cycles through the reviewed account are found
+by a depth-first search of at most COUNTERPARTY_GRAPH_MAX_CYCLE_LENGTH hops,
+pruned by a reverse breadth-first search from the account.
+
+The graph lives for the whole process and grows as accounts are reviewed.
+add_review replaces the flows an account contributed before, so reviewing it
+again does not double count. A transfer seen from both ends (in the payer's and
+the payee's reviews) is counted once.
+"""
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from google.adk.tools import ToolContext
+
+from aml_agent.director_prefetch import prefetch_company_directors
+from aml_agent.transaction_table import TransactionTable, resolve_table
+from aml_agent.watchlist_index import normalize_name
+from config import (
+    COUNTERPARTY_GRAPH_BANK_IDENTIFIER,
+    COUNTERPARTY_GRAPH_MAX_CYCLE_LENGTH,
+    COUNTERPARTY_GRAPH_MIN_CYCLE_AMOUNT,
+    DETECTOR_MAX_FINDINGS,
+)
+
+Node = Tuple[str, str]  # ("account", key), ("entity", normalised name) or ("company", "CC/registration id")
+Flow = Tuple[int, int, Tuple[str, ...]]  # (pence, transaction count, sample transaction ids)
+
+MAX_EDGE_TRANSACTION_IDS = 5
+MAX_LISTED_MEMBERS = 15
+MAX_ENUMERATED_CYCLES = 1000
+
+
+def _bank_key(bank_identifier: Any) -> str:
+    bank = str(bank_identifier or "").strip().upper()
+    # An 11-character BIC ending in XXX is the head office of the 8-character one.
+    return bank[:8] if len(bank) == 11 and bank.endswith("XXX") else bank
+
+
+def account_node(account_number: Any, bank_identifier: Any = None) -> Node:
+    """Accounts are keyed "BANK/number", the same way TransactionTable keys counterparty accounts.
+
+    Reviewed accounts (no `bank_identifier`) belong to the bank itself and take
+    COUNTERPARTY_GRAPH_BANK_IDENTIFIER, so one of them paid by another reviewed
+    account is the same node in both reviews.
+    """
+    bank = _bank_key(COUNTERPARTY_GRAPH_BANK_IDENTIFIER if bank_identifier is None else bank_identifier)
+    return ("account", f"{bank}/{str(account_number).strip()}")
+
+
+def entity_node(name: str) -> Optional[Node]:
+    normalized = normalize_name(name)
+    return ("entity", normalized) if normalized else None
+
+
+class _UnionFind:
+    """Disjoint sets with path halving and union by size; each root also keeps its members and link log."""
+
+    def __init__(self):
+        self.parent: Dict[Node, Node] = {}
+        self.members: Dict[Node, List[Node]] = {}
+        self.links: Dict[Node, List[Tuple[Node, Node, str]]] = {}
+
+    def add(self, node: Node) -> None:
+        if node not in self.parent:
+            self.parent[node] = node
+            self.members[node] = [node]
+            self.links[node] = []
+
+    def find(self, node: Node) -> Node:
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(self, a: Node, b: Node, reason: str) -> None:
+        self.add(a)
+        self.add(b)
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            if len(self.members[root_a]) < len(self.members[root_b]):
+                root_a, root_b = root_b, root_a
+            self.parent[root_b] = root_a
+            self.members[root_a].extend(self.members.pop(root_b))
+            self.links[root_a].extend(self.links.pop(root_b))
+        self.links[root_a].append((a, b, reason))
+
+
+class CounterpartyGraph:
+    """Thread-safe, incrementally extended graph of accounts, parties and fund flows."""
+
+    def __init__(self):
+        self._sets = _UnionFind()
+        self._labels: Dict[Node, str] = {}
+        self._seen_links: Set[Tuple[Node, Node, str]] = set()
+        # payer -> payee -> contributing reviewed account -> flow seen in that account's review.
+        self._flows: Dict[Node, Dict[Node, Dict[Node, Flow]]] = {}
+        self._payers: Dict[Node, Set[Node]] = {}
+        self._contributed: Dict[Node, List[Tuple[Node, Node]]] = {}
+        self._lock = threading.RLock()
+
+    # --- Building ------------------------------------------------------------------
+
+    def _node(self, node: Node, label: str) -> Node:
+        self._sets.add(node)
+        self._labels.setdefault(node, label)
+        return node
+
+    def _link(self, a: Node, b: Node, reason: str) -> None:
+        key = (a, b, reason) if a <= b else (b, a, reason)
+        if a != b and key not in self._seen_links:
+            self._seen_links.add(key)
+            self._sets.union(a, b, reason)
+
+    def link(self, a: Node, b: Node, reason: str) -> None:
+        with self._lock:
+            self._link(a, b, reason)
+
+    def add_review(self, account_number: str, table: TransactionTable,
+                   account_holder_name: Optional[str] = None) -> None:
+        """Adds (or replaces) the flows and links seen in one account's transactions."""
+        with self._lock:
+            if not COUNTERPARTY_GRAPH_BANK_IDENTIFIER and not self._contributed:
+                print("Warning: MONEYPENNY_COUNTERPARTY_GRAPH_BANK_IDENTIFIER is not set; payments between "
+                      "reviewed accounts only meet in the counterparty graph if they carry no bank identifier.")
+            reviewed = self._node(account_node(account_number), str(account_number))
+            self._drop_contribution(reviewed)
+            if account_holder_name and entity_node(account_holder_name):
+                holder = self._node(entity_node(account_holder_name), account_holder_name)
+                self._link(reviewed, holder, "account holder")
+
+            has_account = (table.account_code > 0) & ~table.is_cash
+            codes = table.account_code[has_account]
+            # One flow edge per (counterparty account, direction): code * 2 + is_debit.
+            keys = codes.astype(np.int64) * 2 + (table.amount_pence[has_account] < 0)
+            groups, inverse = np.unique(keys, return_inverse=True)
+            inverse = inverse.ravel()
+            pence = np.bincount(inverse, weights=np.abs(table.amount_pence[has_account]), minlength=len(groups))
+            counts = np.bincount(inverse, minlength=len(groups))
+            order = np.argsort(inverse, kind="stable")
+            starts = np.concatenate(([0], np.cumsum(counts)))
+            ids = table.ids[has_account]
+
+            nodes: Dict[int, Node] = {}
+            for code in np.unique(codes):
+                bank, _, number = table.accounts[code].partition("/")
+                node = account_node(number, bank)
+                nodes[int(code)] = self._node(node, node[1])
+            edges = []
+            for g, key in enumerate(groups):
+                counterparty = nodes[int(key) // 2]
+                payer, payee = (reviewed, counterparty) if key % 2 else (counterparty, reviewed)
+                if payer == payee:
+                    continue
+                sample = tuple(str(i) for i in ids[order[starts[g]:min(starts[g] + MAX_EDGE_TRANSACTION_IDS, starts[g + 1])]])
+                self._flows.setdefault(payer, {}).setdefault(payee, {})[reviewed] = (
+                    int(pence[g]), int(counts[g]), sample)
+                self._payers.setdefault(payee, set()).add(payer)
+                edges.append((payer, payee))
+            self._contributed[reviewed] = edges
+
+            # Names link to the accounts they trade through (and so to other names on the same account).
+            pairs = np.unique(np.stack([codes, table.counterparty_code[has_account]], axis=1), axis=0)
+            for code, name_code in pairs:
+                name = table.counterparties[name_code]
+                party = entity_node(name)
+                if party is not None:
+                    self._link(self._node(party, name), nodes[int(code)], "trades through account")
+
+    def has_review(self, account_number: str) -> bool:
+        """True if add_review has been called for the account."""
+        with self._lock:
+            return account_node(account_number) in self._contributed
+
+    def _drop_contribution(self, reviewed: Node) -> None:
+        for payer, payee in self._contributed.pop(reviewed, []):
+            flows = self._flows[payer][payee]
+            flows.pop(reviewed, None)
+            if not flows:
+                del self._flows[payer][payee]
+                self._payers[payee].discard(payer)
+
+    def add_company_directors(self, company_name: Optional[str], company_registration_id: str,
+                              country_code: str, director_information: Dict[str, Any]) -> None:
+        """Links a company (by registration and by name) to its directors from get_company_director_information data."""
+        with self._lock:
+            company = self._node(("company", f"{str(country_code).upper()}/{company_registration_id}"),
+                                 f"{company_registration_id} ({str(country_code).upper()})")
+            for name in {company_name, director_information.get("company_name")} - {None, "", "Unknown"}:
+                party = entity_node(name)
+                if party is not None:
+                    self._link(company, self._node(party, name), "registered company")
+            label = company_name or director_information.get("company_name") or company_registration_id
+            for director in director_information.get("directors") or []:
+                person = entity_node(director.get("name") or "")
+                if person is not None:
+                    role = director.get("role") or "Director"
+                    self._link(company, self._node(person, director["name"]), f"{role} of {label}")
+
+    # --- Queries -------------------------------------------------------------------------
+
+    def _flow(self, payer: Node, payee: Node) -> Flow:
+        # A transfer seen in both the payer's and the payee's review is one transfer: take the larger view.
+        return max(self._flows[payer][payee].values())
+
+    def _cluster_flows(self, root: Node, outgoing: bool, memo: Dict[Tuple[Node, bool], Dict[Node, int]]) -> Dict[Node, int]:
+        """Money (pence) from (or, with outgoing=False, to) a cluster, per other cluster."""
+        if (root, outgoing) in memo:
+            return memo[(root, outgoing)]
+        find = self._sets.find
+        totals: Dict[Node, int] = {}
+        for member in self._sets.members[root]:
+            others = self._flows.get(member, {}) if outgoing else self._payers.get(member, ())
+            for other in others:
+                other_root = find(other)
+                if other_root != root:
+                    flow = self._flow(member, other) if outgoing else self._flow(other, member)
+                    totals[other_root] = totals.get(other_root, 0) + flow[0]
+        memo[(root, outgoing)] = totals
+        return totals
+
+    def _hop(self, source: Node, target: Node) -> Dict[str, Any]:
+        find = self._sets.find
+        pence, count, ids, edges = 0, 0, [], []
+        for member in self._sets.members[source]:
+            for payee in self._flows.get(member, {}):
+                if find(payee) == target:
+                    flow = self._flow(member, payee)
+                    pence += flow[0]
+                    count += flow[1]
+                    ids.extend(flow[2])
+                    edges.append(f"{self._labels[member]} -> {self._labels[payee]}")
+        return {"from": self._cluster_label(source), "to": self._cluster_label(target), "amount": round(pence / 100, 2),
+                "transaction_count": count, "accounts": edges[:MAX_LISTED_MEMBERS],
+                "sample_transaction_ids": ids[:MAX_EDGE_TRANSACTION_IDS]}
+
+    def find_cycles(self, account_number: str, max_length: int = COUNTERPARTY_GRAPH_MAX_CYCLE_LENGTH,
+                    min_amount: float = COUNTERPARTY_GRAPH_MIN_CYCLE_AMOUNT,
+                    max_cycles: int = DETECTOR_MAX_FINDINGS) -> List[Dict[str, Any]]:
+        """Fund-flow cycles through the account between clusters, at most `max_length` hops,
+        every hop carrying at least `min_amount`; largest bottleneck amount first."""
+        with self._lock:
+            reviewed = account_node(account_number)
+            if reviewed not in self._sets.parent:
+                return []
+            start = self._sets.find(reviewed)
+            min_pence = int(round(min_amount * 100))
+            memo: Dict[Tuple[Node, bool], Dict[Node, int]] = {}
+
+            # Hops needed from each cluster back to the start, up to max_length - 1.
+            distance = {start: 0}
+            frontier = [start]
+            for hops in range(1, max_length):
+                following = []
+                for cluster in frontier:
+                    for payer, pence in self._cluster_flows(cluster, False, memo).items():
+                        if pence >= min_pence and payer not in distance:
+                            distance[payer] = hops
+                            following.append(payer)
+                frontier = following
+
+            found: List[Tuple[List[Node], List[int]]] = []
+            path, amounts = [start], []
+
+            def extend(cluster: Node) -> None:
+                for following, pence in self._cluster_flows(cluster, True, memo).items():
+                    if len(found) >= MAX_ENUMERATED_CYCLES or pence < min_pence:
+                        continue
+                    if following == start:
+                        if len(path) > 1:
+                            found.append((list(path), amounts + [pence]))
+                    elif following not in path and len(path) + distance.get(following, max_length) <= max_length:
+                        path.append(following)
+                        amounts.append(pence)
+                        extend(following)
+                        path.pop()
+                        amounts.pop()
+
+            extend(start)
+            found.sort(key=lambda cycle: min(cycle[1]), reverse=True)
+            cycles = []
+            for clusters, hop_amounts in found[:max_cycles]:
+                hops = [self._hop(clusters[i], clusters[(i + 1) % len(clusters)]) for i in range(len(clusters))]
+                cycles.append({
+                    "length": len(clusters),
+                    "amount_round_tripped": round(min(hop_amounts) / 100, 2),
+                    "parties": [self._cluster_label(c) for c in clusters],
+                    "hops": hops,
+                })
+            return cycles
+
+    def _cluster_label(self, root: Node) -> str:
+        members = self._sets.members[root]
+        entities = sorted(self._labels[m] for m in members if m[0] == "entity")
+        accounts = sorted(self._labels[m] for m in members if m[0] == "account")
+        return " / ".join(entities[:3]) or (accounts[0] if accounts else self._labels[root])
+
+    def describe_cluster(self, root: Node, reviewed: Optional[Node] = None) -> Dict[str, Any]:
+        members = self._sets.members[root]
+        entities = sorted(self._labels[m] for m in members if m[0] == "entity")
+        accounts = sorted(self._labels[m] for m in members if m[0] == "account")
+        companies = sorted(self._labels[m] for m in members if m[0] == "company")
+        links = [f"{self._labels[a]} ~ {self._labels[b]}: {reason}" for a, b, reason in self._sets.links[root]]
+        return {
+            "label": self._cluster_label(root),
+            "includes_reviewed_account": reviewed is not None and reviewed in members,
+            "entity_count": len(entities),
+            "entities": entities[:MAX_LISTED_MEMBERS],
+            "accounts": accounts[:MAX_LISTED_MEMBERS],
+            "companies": companies[:MAX_LISTED_MEMBERS],
+            "links": links[:MAX_LISTED_MEMBERS],
+        }
+
+    def linked_clusters(self, account_number: str, table: TransactionTable,
+                        max_clusters: int = DETECTOR_MAX_FINDINGS) -> List[Dict[str, Any]]:
+        """Clusters holding two or more of the review's parties, or a party linked to the account itself.
+
+        Each comes with the review's inflow from and outflow to the cluster, largest flows first.
+        """
+        with self._lock:
+            find = self._sets.find
+            reviewed = account_node(account_number)
+            reviewed_root = find(reviewed) if reviewed in self._sets.parent else None
+            size = len(table.counterparties)
+            amount = table.amount_pence
+            inflows = np.bincount(table.counterparty_code, weights=np.where(amount > 0, amount, 0), minlength=size)
+            outflows = np.bincount(table.counterparty_code, weights=np.where(amount < 0, -amount, 0), minlength=size)
+            flows: Dict[Node, List[float]] = {}
+            for code, label in enumerate(table.counterparties):
+                node = entity_node(label)
+                if node is None or node not in self._sets.parent:
+                    continue
+                totals = flows.setdefault(find(node), [0.0, 0.0])
+                totals[0] += float(inflows[code]) / 100
+                totals[1] += float(outflows[code]) / 100
+            clusters = []
+            for root, (inflow, outflow) in flows.items():
+                described = self.describe_cluster(root, reviewed)
+                if described["entity_count"] < 2 and root != reviewed_root:
+                    continue
+                described.update(review_inflow=round(inflow, 2), review_outflow=round(outflow, 2))
+                clusters.append(described)
+            clusters.sort(key=lambda c: c["review_inflow"] + c["review_outflow"], reverse=True)
+            return clusters[:max_clusters]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "nodes": len(self._sets.parent),
+                "clusters": len(self._sets.members),
+                "links": len(self._seen_links),
+                "flow_edges": sum(len(payees) for payees in self._flows.values()),
+                "reviewed_accounts": len(self._contributed),
+            }
+
+
+COUNTERPARTY_GRAPH = CounterpartyGraph()
+
+
+def analyze_counterparty_network(review_handle: str, account_holder_name: Optional[str] = None,
+                                 companies: Optional[List[Dict[str, str]]] = None,
+                                 tool_context: Optional[ToolContext] = None) -> dict:
+    """
+    Adds the review's transactions to the bank-wide counterparty graph (built up across every
+    account reviewed so far) and returns circular fund flows through the account and clusters of
+    linked counterparties. Counterparties are linked when they share an account number, a
+    registered company or a director.
+
+    Args:
+        review_handle (str): The handle returned by load_review_transactions.
+        account_holder_name (str, optional): Name of the account holder, to link the account to the
+            companies and directors it is connected with.
+        companies (List[Dict[str, str]], optional): Business counterparties whose directors should be
+            added to the graph first, each {"counterparty_name", "company_registration_id", "country_code"}.
+
+    Returns:
+        dict: A dictionary containing:
+              - 'status' (str): "success" or "error".
+              - 'data' (dict, optional): 'cycle_count' and 'cycles' (each with the parties in order, the
+                amount round-tripped and per-hop amounts and sample transaction ids), 'cluster_count'
+                and 'clusters' (linked parties with the links joining them and the review's inflow
+                and outflow), 'errors' (companies whose directors could not be fetched) and 'graph'
+                (overall graph size).
+              - 'error_message' (str, optional): A description of the error if status is "error".
+    """
+    try:
+        table = resolve_table(review_handle, tool_context)
+    except ValueError as e:
+        return {"status": "error", "error_message": str(e)}
+    account_number = str(review_handle).split(":")[0]
+    directors = prefetch_company_directors(companies or [])
+    errors = directors["errors"]
+    for company in directors["companies"].values():
+        for counterparty_name in company["counterparty_names"] or [None]:
+            COUNTERPARTY_GRAPH.add_company_directors(counterparty_name, company["company_registration_id"],
+                                                     company["country_code"], company)
+    COUNTERPARTY_GRAPH.add_review(account_number, table, account_holder_name)
+    cycles = COUNTERPARTY_GRAPH.find_cycles(account_number)
+    clusters = COUNTERPARTY_GRAPH.linked_clusters(account_number, table)
+    print(f"Counterparty graph for {account_number}: {len(cycles)} cycles, {len(clusters)} linked clusters "
+          f"({COUNTERPARTY_GRAPH.stats()})")
+    return {"status": "success", "data": {
+        "cycle_count": len(cycles),
+        "cycles": cycles,
+        "cluster_count": len(clusters),
+        "clusters": clusters,
+        "errors": errors,
+        "graph": COUNTERPARTY_GRAPH.stats(),
+    }}
@@ -0,0 +1,173 @@
+# aml_agent/counterparty_screening.py
+"""Batch watchlist screening of a review's counterparties.
+
+The same counterparty usually appears on many transactions, often spelt
+slightly differently ("ACME LTD", "Acme Ltd."). Counterparties are normalised
+with the watchlist index's normalize_name and deduplicated per (name, country),
+each distinct one is screened once through check_entity_against_watchlists
+on a bounded thread pool (the endpoint's client-side rate limit still applies),
+and the results are mapped back to the transactions they cover.
+
+Callers screening many reviews (batch_review) can pass a cache, so a
+counterparty already screened is not checked again, and a local watchlist
+index, so only counterparties with a local candidate match go to the service.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from google.adk.tools import ToolContext
+
+from aml_agent.bank_api_client import check_entity_against_watchlists
+from aml_agent.transaction_table import TransactionTable, resolve_table
+from aml_agent.watchlist_index import LEGAL_SUFFIXES, WatchlistIndex, normalize_name
+from common.cache import MISS, TTLCache
+from config import WATCHLIST_BATCH_CONCURRENCY
+
+MAX_LISTED_TRANSACTIONS = 20
+MAX_LISTED_CLEAR = 50
+_ORGANIZATION_WORDS = LEGAL_SUFFIXES | {"bank", "trading", "group", "services", "international", "trust", "partners"}
+
+
+def infer_entity_type(name: str) -> str:
+    """'organization' if the name carries a legal form or business word, else 'individual'."""
+    tokens = normalize_name(name).split() + str(name).lower().replace(".", "").split()
+    return "organization" if any(t in _ORGANIZATION_WORDS for t in tokens) else "individual"
+
+
+def group_counterparties(table: TransactionTable) -> List[Dict[str, Any]]:
+    """Distinct (normalised name, country) counterparties with the rows they appear on."""
+    groups: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    codes = np.stack([table.counterparty_code, table.country_code], axis=1) if len(table) else np.empty((0, 2), int)
+    pairs, inverse = np.unique(codes, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    # Rows of each (counterparty, country) pair, found with one sort instead of a scan per pair.
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(inverse, minlength=len(pairs)))))
+    for pair_index, (name_code, country_code) in enumerate(pairs):
+        raw_name = table.counterparties[name_code]
+        normalized = normalize_name(raw_name)
+        if not normalized:
+            continue
+        country = table.countries[country_code]
+        group = groups.setdefault((normalized, country), {
+            "entity_name": raw_name, "country": country or None, "spellings": [], "rows": []})
+        group["spellings"].append(raw_name)
+        group["rows"].append(order[bounds[pair_index]:bounds[pair_index + 1]])
+    for group in groups.values():
+        group["rows"] = np.sort(np.concatenate(group["rows"]))
+    return list(groups.values())
+
+
+def screen_counterparties(table: TransactionTable, names: Optional[List[str]] = None,
+                          max_workers: int = WATCHLIST_BATCH_CONCURRENCY, cache: Optional[TTLCache] = None,
+                          index: Optional[WatchlistIndex] = None) -> Dict[str, Any]:
+    """Screens each distinct counterparty of `table` (or only those in `names`) once.
+
+    Successful results are kept in `cache` per (normalised name, country). With
+    `index`, counterparties without a local candidate match count as clear and
+    only the candidates are checked with the service.
+
+    Returns hits first, each with the transaction ids it covers.
+    """
+    groups = group_counterparties(table)
+    if names:
+        wanted = {normalize_name(n) for n in names}
+        groups = [g for g in groups if normalize_name(g["entity_name"]) in wanted]
+
+    keys = [(normalize_name(g["entity_name"]), g["country"] or "") for g in groups]
+    results: List[Optional[dict]] = [None] * len(groups)
+    if cache is not None:
+        for i, key in enumerate(keys):
+            state, result = cache.lookup(key)
+            if state != MISS:
+                results[i] = result
+    unscreened = [i for i, result in enumerate(results) if result is None]
+    new = list(unscreened)
+    if index is not None and unscreened:
+        # No entity type: a company name without a legal form must not escape the prefilter as an 'individual'.
+        local = index.screen_many([{"entity_name": groups[i]["entity_name"], "country": groups[i]["country"],
+                                    "aliases": groups[i]["spellings"]} for i in unscreened])
+        for i, matches in zip(unscreened, local):
+            if not matches:
+                results[i] = {"status": "success", "data": {"is_on_watchlist": False, "watchlist_details": []}}
+        unscreened = [i for i in unscreened if results[i] is None]
+
+    def screen(group: Dict[str, Any]) -> dict:
+        return check_entity_against_watchlists(
+            entity_name=group["entity_name"],
+            entity_type=infer_entity_type(group["entity_name"]),
+            country_of_residence_or_incorporation=group["country"],
+            aliases=sorted(set(group["spellings"]) - {group["entity_name"]}) or None,
+        )
+
+    if unscreened:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="watchlist-screen") as pool:
+            for i, result in zip(unscreened, pool.map(screen, [groups[i] for i in unscreened])):
+                results[i] = result
+    if cache is not None:
+        for i in new:
+            if results[i].get("status") == "success":
+                cache.set(keys[i], results[i])
+
+    screened, errors = [], []
+    for group, result in zip(groups, results):
+        rows = group["rows"]
+        entry = {
+            "counterparty_name": group["entity_name"],
+            "counterparty_country": group["country"],
+            "entity_type": infer_entity_type(group["entity_name"]),
+            "spellings": sorted(set(group["spellings"])),
+            "transaction_count": len(rows),
+            "amount": round(float(np.abs(table.amount_pence[rows]).sum()) / 100, 2),
+            "transaction_ids": [str(i) for i in table.ids[rows[:MAX_LISTED_TRANSACTIONS]]],
+        }
+        if result.get("status") != "success":
+            errors.append(dict(entry, error_message=result.get("error_message")))
+            continue
+        data = result.get("data") or {}
+        entry["is_on_watchlist"] = bool(data.get("is_on_watchlist"))
+        entry["watchlist_details"] = data.get("watchlist_details") or []
+        screened.append(entry)
+    screened.sort(key=lambda e: (e["is_on_watchlist"], e["amount"]), reverse=True)
+    hits = [e for e in screened if e["is_on_watchlist"]]
+    return {
+        "transactions": len(table),
+        "unique_counterparties": len(groups),
+        "screened": len(screened),
+        "hit_count": len(hits),
+        "hits": hits,
+        "clear_count": len(screened) - len(hits),
+        "clear": [{"counterparty_name": e["counterparty_name"], "counterparty_country": e["counterparty_country"],
+                   "transaction_count": e["transaction_count"]} for e in screened if not e["is_on_watchlist"]][:MAX_LISTED_CLEAR],
+        "errors": errors,
+    }
+
+
+def batch_check_counterparties_against_watchlists(review_handle: str, counterparty_names: Optional[List[str]] = None,
+                                                  tool_context: Optional[ToolContext] = None) -> dict:
+    """
+    Screens the review's counterparties against the watchlist service in one call. Counterparty
+    names are normalised and deduplicated across all transactions, each distinct counterparty is
+    checked once (concurrently), and hits are mapped back to the transactions involved.
+
+    Args:
+        review_handle (str): The handle returned by load_review_transactions.
+        counterparty_names (List[str], optional): Only screen these counterparties; defaults to all of them.
+
+    Returns:
+        dict: A dictionary containing:
+              - 'status' (str): "success" or "error".
+              - 'data' (dict, optional): 'unique_counterparties', 'screened', 'hit_count', 'hits' (each with
+                counterparty_name, entity_type, watchlist_details, transaction_count, amount and transaction_ids),
+                'clear_count' and 'clear' (counterparties with no hit, largest first) and 'errors' (counterparties that could not be screened).
+              - 'error_message' (str, optional): A description of the error if status is "error".
+    """
+    try:
+        table = resolve_table(review_handle, tool_context)
+    except ValueError as e:
+        return {"status": "error", "error_message": str(e)}
+    data = screen_counterparties(table, counterparty_names)
+    print(f"Batch watchlist screening: {data['unique_counterparties']} unique counterparties "
+          f"from {data['transactions']} transactions, {data['hit_count']} hits, {len(data['errors'])} errors")
+    return {"status": "success", "data": data}
@@ -0,0 +1,152 @@
+# aml_agent/country_risk_table.py
+"""In-memory copy of the bank's country risk table.
+
+The whole table (a few hundred rows at most) is fetched in one call from
+GET /aml_data/country_risk and kept in memory, so country ratings are looked
+up locally instead of with one API call per country. A daemon thread
+re-validates it every COUNTRY_RISK_REFRESH_SECONDS with If-None-Match; an
+unchanged table costs a 304 and no body. Codes missing from the table (or all
+codes, while the table has not loaded) are left to the per-country endpoint.
+"""
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from common import transport
+from common.cache import register_cache
+from config import API_BASE_URL, COUNTRY_RISK_REFRESH_SECONDS
+
+COUNTRY_RISK_TABLE_URL = f"{API_BASE_URL}/aml_data/country_risk"
+
+
+def _rows(body: Any) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Accepts either a bare list of ratings or {"version": ..., "countries": [...]}."""
+    if isinstance(body, list):
+        return body, None
+    if isinstance(body, dict):
+        rows = body.get("countries") or body.get("data") or []
+        version = body.get("version")
+        return rows, str(version) if version is not None else None
+    raise ValueError("Unexpected country risk table format")
+
+
+class CountryRiskTable:
+    """Thread-safe in-memory country risk table with conditional background refresh."""
+
+    def __init__(self, name: str, url: str, refresh_seconds: float = COUNTRY_RISK_REFRESH_SECONDS):
+        self.name = name
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self._ratings: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._attempted = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.etag: Optional[str] = None
+        self.version: Optional[str] = None
+        self.loaded_at: Optional[float] = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.not_modified = 0
+        self.failures = 0
+        register_cache(self)
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def refresh(self) -> bool:
+        """Re-validates the table once; returns True if it is loaded afterwards."""
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        print(f"\n=====API Call:======\n{self.url} (If-None-Match: {self.etag or '-'})\n=================")
+        try:
+            response = transport.get(self.url, headers=headers)
+            print(f"Response: {response.status_code}\n=================")
+            if response.status_code == 304:
+                with self._lock:
+                    self.not_modified += 1
+                    self.loaded_at = time.time()
+                return True
+            response.raise_for_status()
+            rows, version = _rows(response.json())
+            ratings = {str(row["country_code"]).upper(): row for row in rows if row.get("country_code")}
+            etag = response.headers.get("ETag")
+            with self._lock:
+                self._ratings = ratings
+                self.etag = etag
+                self.version = version or etag
+                self.loaded_at = time.time()
+                self.refreshes += 1
+            print(f"Country risk table loaded: {len(ratings)} countries, version {self.version}")
+            return True
+        except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as e:
+            with self._lock:
+                self.failures += 1
+            print(f"Country risk table refresh failed: {e}")
+            return self.loaded
+        finally:
+            self._attempted.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.refresh_seconds)
+
+    def start(self) -> None:
+        """Starts the background loader/refresher (idempotent, non-blocking)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="country-risk-table", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def ready(self, timeout: float) -> bool:
+        """Starts the loader if needed and waits up to `timeout` seconds for the first load
+        attempt; True if the table is loaded."""
+        if not self.loaded:
+            self.start()
+            self._attempted.wait(timeout)
+        return self.loaded
+
+    def get(self, country_code: str) -> Optional[Dict[str, Any]]:
+        return self.get_many([country_code])[0].get(str(country_code).upper())
+
+    def get_many(self, country_codes: Iterable[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Returns ({code: rating} for codes in the table, [codes that are not])."""
+        found: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        with self._lock:
+            for code in dict.fromkeys(str(c).upper() for c in country_codes):
+                row = self._ratings.get(code)
+                if row is not None:
+                    found[code] = dict(row)
+                else:
+                    missing.append(code)
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._ratings),
+                "version": self.version,
+                "loaded_at": self.loaded_at,
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "not_modified": self.not_modified,
+                "failures": self.failures,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+COUNTRY_RISK_TABLE = CountryRiskTable("aml.country_risk_table", COUNTRY_RISK_TABLE_URL)
@@ -0,0 +1,5 @@
+# aml_agent/detectors/__init__.py
+# Deterministic, vectorized AML pattern detectors. Each detector works on the
+# review's shared TransactionTable (aml_agent/transaction_table.py) and returns
+# only its findings, so agents reason over a handful of flagged clusters
+# instead of thousands of rows.
@@ -0,0 +1,152 @@
+# aml_agent/detectors/pass_through.py
+"""Pass-through / rapid-movement-of-funds detector.
+
+Large credits are matched to the debits that follow them, first in first out:
+credit money is paired with later outflow money in time order, so two credits
+close together never claim the same outflow twice. With the outflows in time
+order (TransactionTable) and prefix-summed in pence, each credit's matched
+amount, its holding time (until `min_ratio` of it has left the account) and the
+outflows involved are found with searchsorted, giving O(n log n) over the whole
+history.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from google.adk.tools import ToolContext
+
+from aml_agent.transaction_table import TransactionTable, load_table
+from config import (
+    BANK_HOME_COUNTRY,
+    DETECTOR_MAX_FINDINGS,
+    PASS_THROUGH_MIN_CREDIT,
+    PASS_THROUGH_MIN_RATIO,
+    PASS_THROUGH_WINDOW_HOURS,
+    PEAK_DROP_MIN_OUTFLOWS,
+)
+
+MAX_LISTED_OUTFLOWS = 25
+
+
+def find_pass_through(history: Any, min_credit: float = PASS_THROUGH_MIN_CREDIT,
+                      window_hours: float = PASS_THROUGH_WINDOW_HOURS, min_ratio: float = PASS_THROUGH_MIN_RATIO,
+                      peak_drop_min_outflows: int = PEAK_DROP_MIN_OUTFLOWS,
+                      max_episodes: int = DETECTOR_MAX_FINDINGS,
+                      home_country: Optional[str] = None) -> Dict[str, Any]:
+    """Returns the pass-through episodes found in a transaction history, largest first.
+
+    An episode is a credit of at least `min_credit` of which at least `min_ratio`
+    left the account within `window_hours`. Episodes drained by
+    `peak_drop_min_outflows` or more debits, none carrying half the money, are
+    reported as "Peak and Drop"; the rest as "Rapid Movement of Funds".
+    Money arriving from or leaving for a country other than `home_country` (the
+    customer's, defaulting to BANK_HOME_COUNTRY) makes an episode cross-border.
+    """
+    home_country = (home_country or BANK_HOME_COUNTRY).upper()
+    table = TransactionTable.from_history(history)
+    window = int(window_hours * 3600)
+
+    outflows = table.filter(table.valid_time, direction="debit")
+    # prefix[k] is the money (pence) paid out by the first k outflows.
+    prefix = np.concatenate(([0], np.cumsum(-outflows.amount_pence)))
+    out_countries = outflows.country
+
+    credits = table.filter(table.valid_time, direction="credit", min_amount=min_credit)
+    # First outflow strictly after each credit, and first outflow past its window.
+    first_out = np.searchsorted(outflows.epoch, credits.epoch, side="right")
+    window_end = np.searchsorted(outflows.epoch, credits.epoch + window, side="right")
+
+    episodes: List[Dict[str, Any]] = []
+    consumed = 0  # Outflow money already matched to earlier credits.
+    for credit in range(len(credits)):
+        amount = int(credits.amount_pence[credit])
+        level = max(int(prefix[first_out[credit]]), consumed)
+        available = int(prefix[window_end[credit]]) - level
+        if available <= 0:
+            continue
+        matched = min(amount, available)
+        consumed = level + matched
+        ratio = matched / amount
+        if ratio < min_ratio:
+            continue
+
+        # Outflows k with prefix[k] < consumed and prefix[k + 1] > level carry the matched money.
+        lo = int(np.searchsorted(prefix, level, side="right")) - 1
+        hi = int(np.searchsorted(prefix, consumed, side="left"))
+        drained_at = int(np.searchsorted(prefix, level + min_ratio * amount, side="left")) - 1
+        holding_hours = (outflows.epoch[drained_at] - credits.epoch[credit]) / 3600
+        countries = sorted({c for c in out_countries[lo:hi] if c})
+        largest = int(-outflows.amount_pence[lo:hi].min())
+        # Many small debits draining the credit is peak-and-drop; one or two big ones forward it.
+        many_small = hi - lo >= peak_drop_min_outflows and largest < matched / 2
+        pattern = "Peak and Drop" if many_small else "Rapid Movement of Funds"
+        credit_country = credits.countries[credits.country_code[credit]]
+        cross_border = any(c != home_country for c in countries) or bool(credit_country and credit_country != home_country)
+        episodes.append({
+            "pattern_type": pattern,
+            "credit_transaction_id": str(credits.ids[credit]),
+            "credit_timestamp": credits.iso(credit),
+            "credit_amount": amount / 100,
+            "credit_counterparty": credits.counterparties[credits.counterparty_code[credit]],
+            "credit_counterparty_country": credit_country,
+            "matched_outflow_amount": matched / 100,
+            "pass_through_ratio": round(ratio, 3),
+            "holding_time_hours": round(float(holding_hours), 2),
+            "outflow_count": hi - lo,
+            "largest_outflow_amount": largest / 100,
+            "outflow_counterparty_countries": countries,
+            "outflow_transaction_ids": [str(i) for i in outflows.ids[lo:min(hi, lo + MAX_LISTED_OUTFLOWS)]],
+            "risk_level": "High" if ratio >= 0.9 and (holding_hours <= 24 or cross_border) else "Medium",
+        })
+
+    episodes.sort(key=lambda e: e["matched_outflow_amount"], reverse=True)
+    return {
+        "min_credit_amount": min_credit,
+        "window_hours": window_hours,
+        "min_pass_through_ratio": min_ratio,
+        "transactions_scanned": len(table),
+        "large_credits_scanned": len(credits),
+        "outflows_scanned": len(outflows),
+        "episode_count": len(episodes),
+        "total_passed_through": round(sum(e["matched_outflow_amount"] for e in episodes), 2),
+        "episodes": episodes[:max_episodes],
+        "episodes_truncated": len(episodes) > max_episodes,
+    }
+
+
+def detect_rapid_movement(account_number: str, start_date: str, end_date: str,
+                          min_credit_amount: Optional[float] = None, window_hours: Optional[float] = None,
+                          home_country: Optional[str] = None, tool_context: Optional[ToolContext] = None) -> dict:
+    """
+    Detects rapid movement of funds ("pass-through") and peak-and-drop activity: large
+    credits of which most is paid out again shortly afterwards. Matches credits to later
+    debits in code over the review's shared transaction table for the period and returns
+    ranked episodes with holding times and pass-through ratios.
+
+    Args:
+        account_number (str): The account number under review.
+        start_date (str): Start of the review period (YYYY-MM-DD).
+        end_date (str): End of the review period (YYYY-MM-DD).
+        min_credit_amount (float, optional): Smallest credit considered; defaults to 10,000.
+        window_hours (float, optional): How long after the credit outflows are matched; defaults to 72.
+        home_country (str, optional): The customer's country of residence (ISO alpha-2) from their profile;
+                                      money from or to any other country makes an episode cross-border.
+
+    Returns:
+        dict: A dictionary containing:
+              - 'status' (str): "success" or "error".
+              - 'data' (dict, optional): Scan counts and 'episodes', each with pattern_type, the credit,
+                matched_outflow_amount, pass_through_ratio, holding_time_hours, outflow_transaction_ids and risk_level.
+              - 'error_message' (str, optional): A description of the error if status is "error".
+    """
+    try:
+        table = load_table(account_number, start_date, end_date, tool_context)
+        data = find_pass_through(
+            table,
+            min_credit=min_credit_amount if min_credit_amount else PASS_THROUGH_MIN_CREDIT,
+            window_hours=window_hours if window_hours else PASS_THROUGH_WINDOW_HOURS,
+            home_country=home_country,
+        )
+    except ValueError as e:
+        print(f"Pass-through detection failed for {account_number}: {e}")
+        return {"status": "error", "error_message": f"Pass-through detection failed: {e}"}
+    return {"status": "success", "data": data}
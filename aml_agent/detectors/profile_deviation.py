@@ -0,0 +1,231 @@
+# aml_agent/detectors/profile_deviation.py
+"""Profile-deviation engine: the review period measured against the account's AML baseline.
+
+Compares the transactions of a review period with the aml_profile_summary
+baseline (expected_monthly_turnover, avg_transaction_size,
+typical_counterparty_countries) and reports turnover ratios, transaction-size
+z-scores, new counterparty countries and dormant-to-active reactivation as a
+compact dict. profile_deviation_bulk runs the same computation over many
+accounts for portfolio sweeps.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+from google.adk.tools import ToolContext
+
+from aml_agent.bank_api_client import get_account_profile_and_history_summary
+from aml_agent.transaction_table import SECONDS_PER_DAY, TransactionTable, load_table
+from config import (
+    DORMANT_DAYS,
+    PROFILE_BULK_WORKERS,
+    PROFILE_SIZE_Z_THRESHOLD,
+    PROFILE_TURNOVER_RATIO_THRESHOLD,
+)
+
+DAYS_PER_MONTH = 30.44
+MAX_LISTED_OUTLIERS = 5
+
+
+def _period_days(table: TransactionTable, start_date: Optional[str], end_date: Optional[str]) -> float:
+    try:
+        return float((date.fromisoformat(end_date) - date.fromisoformat(start_date)).days + 1)
+    except (TypeError, ValueError):
+        epoch = table.epoch[table.valid_time]
+        if not len(epoch):
+            return 1.0
+        return max(1.0, float(epoch[-1] - epoch[0]) / SECONDS_PER_DAY)
+
+
+def _size_outliers(table: TransactionTable, baseline_size: float, z_threshold: float) -> Dict[str, Any]:
+    size = np.abs(table.amount)
+    # The baseline only gives a mean, so the spread comes from the period itself (robust MAD),
+    # floored at the baseline mean so a very regular account does not turn every payment into an outlier.
+    mad = float(np.median(np.abs(size - np.median(size)))) if len(size) else 0.0
+    scale = max(1.4826 * mad, baseline_size, 1.0)
+    z = (size - baseline_size) / scale
+    flagged = np.flatnonzero(z >= z_threshold)
+    top = flagged[np.argsort(-z[flagged], kind="stable")][:MAX_LISTED_OUTLIERS]
+    return {
+        "mean_size": round(float(size.mean()), 2) if len(size) else 0.0,
+        "mean_size_ratio": round(float(size.mean()) / baseline_size, 2) if len(size) and baseline_size else None,
+        "max_z": round(float(z.max()), 2) if len(z) else 0.0,
+        "outlier_count": len(flagged),
+        "outlier_amount": round(float(size[flagged].sum()), 2),
+        "top_outliers": [
+            {"transaction_id": str(table.ids[i]), "amount": int(table.amount_pence[i]) / 100, "z": round(float(z[i]), 1)}
+            for i in top
+        ],
+    }
+
+
+def _new_countries(table: TransactionTable, typical: List[str]) -> Dict[str, Any]:
+    typical_set = {str(c).upper() for c in typical or []}
+    new = sorted(c for c in set(table.countries[code] for code in np.unique(table.country_code))
+                 if c and c not in typical_set)
+    in_new = table.filter(countries=new)
+    return {
+        "new_country_count": len(new),
+        "new_countries": new,
+        "new_country_transactions": len(in_new),
+        "new_country_amount": round(float(np.abs(in_new.amount_pence).sum()) / 100, 2),
+    }
+
+
+def _dormancy(table: TransactionTable, start_date: Optional[str], expected_turnover: float,
+              dormant_days: int) -> Dict[str, Any]:
+    epoch = table.epoch[table.valid_time]
+    if not len(epoch):
+        return {"dormant_to_active": False}
+    # The quiet spell before the first transaction counts too, measured from the period start.
+    # Without a start date there is none: np.datetime64(None) is NaT, which would read as the
+    # earliest representable time and make every account look dormant.
+    period_start = int(epoch[0])
+    if start_date is not None:
+        try:
+            start = np.datetime64(start_date, "s")
+        except (TypeError, ValueError):
+            start = np.datetime64("NaT", "s")
+        if not np.isnat(start):
+            period_start = int(start.astype("int64"))
+    edges = np.concatenate(([min(period_start, int(epoch[0]))], epoch))
+    gaps = np.diff(edges)
+    longest = int(np.argmax(gaps))
+    if gaps[longest] < dormant_days * SECONDS_PER_DAY:
+        return {"dormant_to_active": False, "longest_gap_days": round(float(gaps[longest]) / SECONDS_PER_DAY, 1)}
+    resumed = int(edges[longest + 1])
+    month_after = table.window(resumed, resumed + int(DAYS_PER_MONTH * SECONDS_PER_DAY))
+    volume_after = float(np.abs(month_after.amount_pence).sum()) / 100
+    return {
+        # Reactivation only counts when the first month back reaches a normal month's turnover.
+        "dormant_to_active": volume_after >= max(expected_turnover, 1.0),
+        "longest_gap_days": round(float(gaps[longest]) / SECONDS_PER_DAY, 1),
+        "reactivated_on": str(np.datetime64(resumed, "s"))[:10],
+        "first_month_transactions": len(month_after),
+        "first_month_volume": round(volume_after, 2),
+    }
+
+
+def profile_deviation(history: Any, profile: Dict[str, Any], start_date: Optional[str] = None,
+                      end_date: Optional[str] = None, z_threshold: float = PROFILE_SIZE_Z_THRESHOLD,
+                      turnover_ratio_threshold: float = PROFILE_TURNOVER_RATIO_THRESHOLD,
+                      dormant_days: int = DORMANT_DAYS) -> Dict[str, Any]:
+    """Measures a review period against the aml_profile_summary baseline.
+
+    `history` is a TransactionTable or anything TransactionTable.from_history
+    accepts; `profile` is the aml_profile_summary data (or the
+    get_account_profile_and_history_summary result).
+    Monthly turnover is the larger of monthly inflow and outflow, so abuse in either
+    direction shows up.
+    """
+    if "status" in profile and "data" in profile:
+        profile = profile["data"] or {}
+    table = TransactionTable.from_history(history)
+    months = _period_days(table, start_date, end_date) / DAYS_PER_MONTH
+    inflow = float(table.amount_pence[table.amount_pence > 0].sum()) / 100
+    outflow = float(-table.amount_pence[table.amount_pence < 0].sum()) / 100
+    monthly_turnover = max(inflow, outflow) / months
+    expected_turnover = float(profile.get("expected_monthly_turnover") or 0)
+    baseline_size = float(profile.get("avg_transaction_size") or 0)
+
+    turnover_ratio = round(monthly_turnover / expected_turnover, 2) if expected_turnover else None
+    sizes = _size_outliers(table, baseline_size, z_threshold)
+    countries = _new_countries(table, profile.get("typical_counterparty_countries"))
+    dormancy = _dormancy(table, start_date, expected_turnover, dormant_days)
+
+    flags = []
+    if turnover_ratio is not None and turnover_ratio >= turnover_ratio_threshold:
+        flags.append("turnover_above_profile")
+    if sizes["outlier_count"]:
+        flags.append("transaction_size_outliers")
+    if countries["new_country_count"]:
+        flags.append("new_counterparty_countries")
+    if dormancy["dormant_to_active"]:
+        flags.append("dormant_to_active")
+    return {
+        "transactions": len(table),
+        "period_months": round(months, 2),
+        "monthly_inflow": round(inflow / months, 2),
+        "monthly_outflow": round(outflow / months, 2),
+        "expected_monthly_turnover": expected_turnover,
+        "turnover_ratio": turnover_ratio,
+        "transaction_size": sizes,
+        "counterparty_countries": countries,
+        "dormancy": dormancy,
+        "deviation_flags": flags,
+    }
+
+
+def assess_profile_deviation(account_number: str, start_date: str, end_date: str,
+                             tool_context: Optional[ToolContext] = None) -> dict:
+    """
+    Compares the account's activity in the review period with its AML profile baseline
+    (expected monthly turnover, average transaction size, typical counterparty countries).
+    Computes the turnover ratio, transaction-size z-score outliers, counterparty countries
+    new to the profile and dormant-to-active reactivation in code.
+
+    Args:
+        account_number (str): The account number under review.
+        start_date (str): Start of the review period (YYYY-MM-DD).
+        end_date (str): End of the review period (YYYY-MM-DD).
+
+    Returns:
+        dict: A dictionary containing:
+              - 'status' (str): "success" or "error".
+              - 'data' (dict, optional): 'turnover_ratio', 'transaction_size', 'counterparty_countries',
+                'dormancy', 'deviation_flags' and the 'profile' baseline used.
+              - 'error_message' (str, optional): A description of the error if status is "error".
+    """
+    profile = get_account_profile_and_history_summary(account_number)
+    if profile.get("status") != "success":
+        return {"status": "error", "error_message": f"Failed to fetch the AML profile baseline. {profile.get('error_message', '')}".strip()}
+    try:
+        table = load_table(account_number, start_date, end_date, tool_context)
+        data = profile_deviation(table, profile["data"], start_date, end_date)
+    except ValueError as e:
+        print(f"Profile deviation failed for {account_number}: {e}")
+        return {"status": "error", "error_message": f"Profile deviation failed: {e}"}
+    data["profile"] = profile["data"]
+    return {"status": "success", "data": data}
+
+
+def iter_profile_deviations(account_numbers: List[str], start_date: str, end_date: str,
+                            max_workers: int = PROFILE_BULK_WORKERS) -> Iterator[Dict[str, Any]]:
+    """Yields {"account_number", "status", "data" | "error_message"} per account, in input order.
+
+    Accounts are fetched and scored on `max_workers` threads; at most that many
+    results are buffered ahead of the consumer.
+    """
+    def score(account_number: str) -> Dict[str, Any]:
+        result = assess_profile_deviation(account_number, start_date, end_date)
+        result = dict(result, account_number=account_number)
+        if result.get("status") == "success":
+            result["data"].pop("profile", None)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="profile-deviation") as pool:
+        pending = []
+        for account_number in account_numbers:
+            pending.append(pool.submit(score, account_number))
+            if len(pending) >= max_workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def profile_deviation_bulk(account_numbers: List[str], start_date: str, end_date: str,
+                           max_workers: int = PROFILE_BULK_WORKERS) -> dict:
+    """Runs the profile-deviation engine over many accounts for a portfolio sweep.
+
+    Returns {"status": "success", "data": {"accounts": [...], "errors": [...]}} with
+    accounts ordered by number of deviation flags, then turnover ratio, highest first.
+    """
+    accounts, errors = [], []
+    for result in iter_profile_deviations(account_numbers, start_date, end_date, max_workers):
+        if result.get("status") == "success":
+            accounts.append(dict(result["data"], account_number=result["account_number"]))
+        else:
+            errors.append({"account_number": result["account_number"], "error_message": result.get("error_message")})
+    accounts.sort(key=lambda a: (len(a["deviation_flags"]), a["turnover_ratio"] or 0), reverse=True)
+    return {"status": "success", "data": {"accounts": accounts, "errors": errors}}
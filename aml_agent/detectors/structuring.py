@@ -0,0 +1,117 @@
+# aml_agent/detectors/structuring.py
+"""Structuring (smurfing) detector: near-threshold cash clustered in time.
+
+Cash transactions of each direction whose size falls in the band just below the
+reporting threshold are time-ordered; a sliding window of `window_days` is
+evaluated at every such transaction (TransactionTable.rolling), and windows
+holding at least `min_transactions` that together reach the threshold are merged
+into clusters. Runs in O(n log n) on the whole history.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from google.adk.tools import ToolContext
+
+from aml_agent.transaction_table import SECONDS_PER_DAY, TransactionTable, load_table
+from config import (
+    DETECTOR_MAX_FINDINGS,
+    STRUCTURING_BAND,
+    STRUCTURING_MIN_TRANSACTIONS,
+    STRUCTURING_THRESHOLD,
+    STRUCTURING_WINDOW_DAYS,
+)
+
+
+def find_structuring(history: Any, threshold: float = STRUCTURING_THRESHOLD, band: float = STRUCTURING_BAND,
+                     window_days: int = STRUCTURING_WINDOW_DAYS, min_transactions: int = STRUCTURING_MIN_TRANSACTIONS,
+                     max_clusters: int = DETECTOR_MAX_FINDINGS) -> Dict[str, Any]:
+    """Returns the structuring clusters found in a transaction history.
+
+    `history` is a TransactionTable or anything TransactionTable.from_history accepts.
+    """
+    table = TransactionTable.from_history(history)
+    size = np.abs(table.amount)
+    near_threshold = table.is_cash & table.valid_time & (size >= threshold * (1 - band)) & (size < threshold)
+    window = window_days * SECONDS_PER_DAY
+
+    clusters: List[Dict[str, Any]] = []
+    for direction in ("credit", "debit"):
+        candidates = table.filter(near_threshold, direction=direction)
+        if len(candidates) < min_transactions:
+            continue
+        ends, counts, totals = candidates.rolling(window)
+        hits = np.flatnonzero((counts >= min_transactions) & (totals >= threshold * 100))
+
+        # Merge overlapping qualifying windows [start, end) into maximal clusters.
+        merged = []
+        for start in hits:
+            end = ends[start]
+            if merged and start < merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        for start, end in merged:
+            amounts = np.abs(candidates.amount_pence[start:end]) / 100
+            total = float(amounts.sum())
+            count = int(end - start)
+            clusters.append({
+                "direction": "deposit" if direction == "credit" else "withdrawal",
+                "first_timestamp": candidates.iso(start),
+                "last_timestamp": candidates.iso(end - 1),
+                "transaction_count": count,
+                "distinct_days": int(len(np.unique(candidates.epoch[start:end] // SECONDS_PER_DAY))),
+                "total_amount": round(total, 2),
+                "max_single_amount": round(float(amounts.max()), 2),
+                "transaction_ids": [str(i) for i in candidates.ids[start:end]],
+                "risk_level": "High" if count >= 4 or total >= 3 * threshold else "Medium",
+            })
+
+    clusters.sort(key=lambda c: c["total_amount"], reverse=True)
+    return {
+        "threshold": threshold,
+        "band_lower_bound": round(threshold * (1 - band), 2),
+        "window_days": window_days,
+        "min_transactions": min_transactions,
+        "transactions_scanned": len(table),
+        "cash_transactions_scanned": int(table.is_cash.sum()),
+        "near_threshold_cash_transactions": int(near_threshold.sum()),
+        "cluster_count": len(clusters),
+        "clusters": clusters[:max_clusters],
+        "clusters_truncated": len(clusters) > max_clusters,
+    }
+
+
+def detect_structuring(account_number: str, start_date: str, end_date: str,
+                       threshold: Optional[float] = None, window_days: Optional[int] = None,
+                       tool_context: Optional[ToolContext] = None) -> dict:
+    """
+    Detects potential structuring (smurfing): clusters of cash deposits or withdrawals
+    just below the cash reporting threshold within a short sliding time window.
+    Scans the review's shared transaction table for the period in code and returns
+    only the flagged clusters.
+
+    Args:
+        account_number (str): The account number under review.
+        start_date (str): Start of the review period (YYYY-MM-DD).
+        end_date (str): End of the review period (YYYY-MM-DD).
+        threshold (float, optional): Cash reporting threshold; defaults to the bank's configured threshold (10,000).
+        window_days (int, optional): Sliding window length in days; defaults to 7.
+
+    Returns:
+        dict: A dictionary containing:
+              - 'status' (str): "success" or "error".
+              - 'data' (dict, optional): Scan counts and 'clusters', each with direction,
+                first/last timestamp, transaction_count, total_amount, transaction_ids and risk_level.
+              - 'error_message' (str, optional): A description of the error if status is "error".
+    """
+    try:
+        table = load_table(account_number, start_date, end_date, tool_context)
+        data = find_structuring(
+            table,
+            threshold=threshold if threshold else STRUCTURING_THRESHOLD,
+            window_days=window_days if window_days else STRUCTURING_WINDOW_DAYS,
+        )
+    except ValueError as e:
+        print(f"Structuring detection failed for {account_number}: {e}")
+        return {"status": "error", "error_message": f"Structuring detection failed: {e}"}
+    return {"status": "success", "data": data}
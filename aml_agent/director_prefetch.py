@@ -0,0 +1,132 @@
+# aml_agent/director_prefetch.py
+"""Concurrent director lookups for all of a review's business counterparties.
+
+Companies are deduplicated per (registration id, country code) and their
+director information is fetched on a bounded thread pool through
+get_company_director_information. That call is already cached per
+(registration id, country code) in COMPANY_DIRECTORS_CACHE
+(CACHE_TTL_COMPANY_DIRECTORS) and coalesced, so a company seen in an earlier
+review costs nothing. The results are merged into one map keyed by director,
+which shows shared directors directly.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.tools import ToolContext
+
+from aml_agent.bank_api_client import get_company_director_information
+from aml_agent.counterparty_screening import group_counterparties, infer_entity_type
+from aml_agent.transaction_table import resolve_table
+from aml_agent.watchlist_index import normalize_name
+from config import DIRECTOR_PREFETCH_WORKERS
+
+MAX_LISTED_UNRESOLVED = 50
+
+
+def _company_key(company: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    registration_id = str(company.get("company_registration_id") or "").strip()
+    country_code = str(company.get("country_code") or "").strip().upper()
+    return (registration_id, country_code) if registration_id and country_code else None
+
+
+def prefetch_company_directors(companies: List[Dict[str, Any]],
+                               max_workers: int = DIRECTOR_PREFETCH_WORKERS) -> Dict[str, Any]:
+    """Fetches director information for every distinct company concurrently and merges it.
+
+    Each company is {"company_registration_id", "country_code"} plus an optional
+    "counterparty_name". Returns 'companies' (one entry per company with its
+    directors), 'directors' (keyed by normalised director name, with every
+    company and role the person holds), 'shared_directors' (names that appear
+    in more than one company) and 'errors'.
+    """
+    names: Dict[Tuple[str, str], List[str]] = {}
+    errors = []
+    for company in companies:
+        key = _company_key(company)
+        if key is None:
+            errors.append({"company": company, "error_message": "company_registration_id and country_code are required."})
+            continue
+        spellings = names.setdefault(key, [])
+        if company.get("counterparty_name") and company["counterparty_name"] not in spellings:
+            spellings.append(company["counterparty_name"])
+    keys = list(names)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="director-prefetch") as pool:
+        results = list(pool.map(lambda key: get_company_director_information(*key), keys))
+
+    merged_companies: Dict[str, Dict[str, Any]] = {}
+    directors: Dict[str, Dict[str, Any]] = {}
+    for (registration_id, country_code), result in zip(keys, results):
+        counterparty_names = names[(registration_id, country_code)]
+        if result.get("status") != "success":
+            errors.append({"company_registration_id": registration_id, "country_code": country_code,
+                           "counterparty_names": counterparty_names, "error_message": result.get("error_message")})
+            continue
+        data = result.get("data") or {}
+        company_name = data.get("company_name") or (counterparty_names[0] if counterparty_names else registration_id)
+        company_key = f"{country_code}/{registration_id}"
+        merged_companies[company_key] = {
+            "company_registration_id": registration_id,
+            "country_code": country_code,
+            "company_name": data.get("company_name"),
+            "counterparty_names": counterparty_names,
+            "directors": data.get("directors") or [],
+        }
+        for director in data.get("directors") or []:
+            person = normalize_name(director.get("name") or "")
+            if not person:
+                continue
+            entry = directors.setdefault(person, {"name": director["name"], "appointments": []})
+            entry["appointments"].append({
+                "company": company_key, "company_name": company_name, "role": director.get("role"),
+                "appointed_on": director.get("appointed_on"), "nationality": director.get("nationality"),
+            })
+
+    shared = sorted((entry for entry in directors.values()
+                     if len({a["company"] for a in entry["appointments"]}) > 1),
+                    key=lambda entry: len(entry["appointments"]), reverse=True)
+    return {
+        "companies_requested": len(keys),
+        "companies": merged_companies,
+        "directors": directors,
+        "shared_directors": [{"name": entry["name"], "companies": sorted({a["company_name"] for a in entry["appointments"]})}
+                             for entry in shared],
+        "errors": errors,
+    }
+
+
+def get_business_counterparty_directors(companies: List[Dict[str, str]], review_handle: Optional[str] = None,
+                                        tool_context: Optional[ToolContext] = None) -> dict:
+    """
+    Fetches director information for many companies at once (concurrently, cached per registration
+    ID and country) and merges it into one map keyed by director. Use it instead of calling
+    get_company_director_information once per company.
+
+    Args:
+        companies (List[Dict[str, str]]): Companies to look up, each {"counterparty_name",
+            "company_registration_id", "country_code"} (country_code is ISO 3166-1 alpha-2).
+        review_handle (str, optional): The handle returned by load_review_transactions. If given, the
+            result also lists the review's business counterparties that were not looked up.
+
+    Returns:
+        dict: A dictionary containing:
+              - 'status' (str): "success" or "error".
+              - 'data' (dict, optional): 'companies' (per company: name, counterparty names and directors),
+                'directors' (per director: every company and role held), 'shared_directors' (directors of
+                more than one company), 'errors' and, with a review handle, 'unresolved_business_counterparties'.
+              - 'error_message' (str, optional): A description of the error if status is "error".
+    """
+    data = prefetch_company_directors(companies or [])
+    if review_handle:
+        try:
+            table = resolve_table(review_handle, tool_context)
+        except ValueError as e:
+            return {"status": "error", "error_message": str(e)}
+        requested = {normalize_name(c.get("counterparty_name") or "") for c in companies or []}
+        unresolved = [g["entity_name"] for g in group_counterparties(table)
+                      if infer_entity_type(g["entity_name"]) == "organization"
+                      and normalize_name(g["entity_name"]) not in requested]
+        data["unresolved_business_counterparties"] = unresolved[:MAX_LISTED_UNRESOLVED]
+    print(f"Director prefetch: {data['companies_requested']} companies, {len(data['directors'])} directors, "
+          f"{len(data['shared_directors'])} shared, {len(data['errors'])} errors")
+    return {"status": "success", "data": data}
@@ -0,0 +1,95 @@
+# aml_agent/pipeline.py
+"""The AML review as a fixed pipeline of agents.
+
+    review_retrieval_agent          loads the transactions once (no model call)
+    aml_analysis_stage (parallel)   transaction_pattern_analysis_agent
+                                    geographic_risk_assessment_agent
+                                    entity_linkage_analysis_agent
+    aml_policy_alignment_agent      waits for the three analyses
+
+The three analyses only read the review's shared transaction table, so they
+run concurrently. A review then takes as long as the slowest analysis instead
+of the sum of all three. Each analysis writes its output_key to session
+state (also under the review's handle), where the policy rule engine
+(aml_agent/policy_engine.py) picks it up together with the customer's AML
+profile loaded here.
+"""
+import asyncio
+import json
+from typing import AsyncGenerator
+
+from google.adk.agents import BaseAgent, ParallelAgent, SequentialAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from aml_agent.bank_api_client import get_account_profile_and_history_summary
+from aml_agent.policy_engine import REVIEW_STATE_KEY, parse_agent_output
+from aml_agent.transaction_table import STATE_KEY_PREFIX, load_table, table_handle
+from .sub_agents.transaction_pattern_analysis_agent import transaction_pattern_analysis_agent
+from .sub_agents.geographic_risk_assessment_agent import geographic_risk_assessment_agent
+from .sub_agents.entity_linkage_analysis_agent import entity_linkage_analysis_agent
+from .sub_agents.aml_policy_alignment_agent import aml_policy_alignment_agent
+
+class ReviewRetrievalAgent(BaseAgent):
+    """Loads the review's transaction table and hands its handle to the following stages.
+
+    Reads {"account_number", "start_date", "end_date"} from the request and
+    replies with the same request plus "review_handle", the table overview and
+    the customer's "account_profile" (the AML profile baseline, when it can be
+    fetched), which the analysis agents and the policy engine receive as context. Stops the pipeline if the
+    request is incomplete or the history cannot be fetched.
+    """
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        request_text = "".join(part.text or "" for part in (ctx.user_content.parts or [])) if ctx.user_content else ""
+        request = parse_agent_output(request_text)
+        missing = [key for key in ("account_number", "start_date", "end_date") if not request.get(key)]
+        if missing:
+            yield self._reply(ctx, {"status": "error", "error_message": f"Review request is missing {', '.join(missing)}."})
+            ctx.end_invocation = True
+            return
+        account_number, start_date, end_date = (str(request[key]) for key in ("account_number", "start_date", "end_date"))
+        try:
+            table = await asyncio.to_thread(load_table, account_number, start_date, end_date)
+        except ValueError as e:
+            yield self._reply(ctx, {"status": "error", "error_message": f"Failed to fetch transaction history. {e}"})
+            ctx.end_invocation = True
+            return
+        handle = table_handle(account_number, start_date, end_date)
+        review = dict(request, review_handle=handle, **table.summary())
+        profile = await asyncio.to_thread(get_account_profile_and_history_summary, account_number)
+        if profile.get("status") == "success":
+            review["account_profile"] = profile["data"]
+        yield self._reply(ctx, review, {STATE_KEY_PREFIX + handle: handle, REVIEW_STATE_KEY: review})
+
+    def _reply(self, ctx: InvocationContext, body: dict, state_delta: dict = None) -> Event:
+        return Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=json.dumps(body))]),
+            actions=EventActions(state_delta=state_delta or {}),
+        )
+
+
+review_retrieval_agent = ReviewRetrievalAgent(
+    name="review_retrieval_agent",
+    description="Loads the account's transactions for the review period and returns a review handle.",
+)
+
+aml_analysis_stage = ParallelAgent(
+    name="aml_analysis_stage",
+    description="Runs transaction pattern, geographic risk and entity linkage analysis concurrently.",
+    sub_agents=[transaction_pattern_analysis_agent, geographic_risk_assessment_agent, entity_linkage_analysis_agent],
+)
+
+aml_review_pipeline = SequentialAgent(
+    name="aml_review_pipeline",
+    description=(
+        "Runs a complete AML review for one account and period: loads the transactions, analyses "
+        "transaction patterns, geographic risk and entity linkages concurrently, then aligns the "
+        "findings with the bank's AML policy. Returns the final AML risk assessment."
+    ),
+    sub_agents=[review_retrieval_agent, aml_analysis_stage, aml_policy_alignment_agent],
+)
@@ -0,0 +1,413 @@
+# aml_agent/policy_engine.py
+"""Deterministic AML policy evaluation.
+
+The bank's AML policy (risk factors with their severities, the aggregation
+rules and the action per risk level) is written down as plain data in
+POLICY_RULESET. The rule set carries a version, and every decision records the
+version and rule ids it came from. evaluate_policy turns the sub-agents'
+findings (their JSON outputs, or raw detector results in batch mode) into
+flat facts. It then matches the risk factors against the facts, most severe
+first, and applies the first aggregation rule that fits the severity counts.
+A review costs a few dozen dict lookups instead of a model round-trip.
+
+apply_policy_rules is the aml_policy_alignment_agent's before_agent_callback.
+It evaluates the findings in the agent's request, or else those the analysis
+agents stored in session state for the same review (scope_findings copies each
+output under a key carrying the review handle, so a session that reviews
+several accounts never mixes them up). It stores the decision for the agent's
+instruction, so the model only writes the narrative. With AML_POLICY_NARRATIVE off, or the review's
+state flag BATCH_MODE_STATE_KEY set, it returns the decision as the agent's
+output and the model is not called at all.
+"""
+import json
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from google.adk.agents.callback_context import CallbackContext
+from google.genai import types
+
+from config import AML_POLICY_NARRATIVE
+
+Condition = Tuple[str, str, Any]  # (field, operator, operand)
+Fact = Dict[str, Any]
+
+DECISION_STATE_KEY = "aml_policy_decision"
+BATCH_MODE_STATE_KEY = "aml_batch_mode"
+OUTPUT_KEY = "aml_policy_alignment_output"
+# The review request with its handle and the customer's AML profile, stored by the pipeline's retrieval agent.
+REVIEW_STATE_KEY = "aml_review"
+# Session state keys (sub-agent output_keys) and request keys holding each sub-agent's findings.
+FINDINGS_SOURCES = {
+    "transaction_pattern_analysis": "transaction_pattern_analysis_output",
+    "geographic_risk_assessment": "geographic_risk_assessment_output",
+    "entity_linkage_analysis": "entity_linkage_analysis_output",
+}
+MAX_LISTED_EVIDENCE = 5
+MAX_LISTED_TRANSACTION_IDS = 20
+
+SANCTIONS_LISTS = ("sanction", "ofac", "sdn", "ofsi", "hmt", "hm treasury", "un security council", "un consolidated",
+                   "eu consolidated", "eu financial sanctions")
+STRUCTURING = ("structuring", "smurf")
+RAPID_MOVEMENT = ("rapid movement", "pass-through", "pass through", "peak and drop")
+LAYERING = ("layering", "integration", "circular", "round-trip", "round trip", "round-tripping")
+PROFILE_DEVIATION = ("inconsistent with profile", "profile", "unusual volume", "unusual frequency", "volume",
+                     "frequency", "dormant", "turnover")
+
+POLICY_RULESET: Dict[str, Any] = {
+    "version": "2025.1",
+    "risk_factors": (
+        # --- High severity ---------------------------------------------------------------
+        {"id": "HS-01", "severity": "High", "escalate_to": "Critical",
+         "factor": "Confirmed match on a sanctions list",
+         "when": (("kind", "eq", "watchlist_hit"), ("label", "contains_any", SANCTIONS_LISTS))},
+        {"id": "HS-02", "severity": "High",
+         "factor": "Transactions with or through a sanctioned jurisdiction",
+         "when": (("kind", "eq", "jurisdiction"), ("level", "eq", "Sanctioned"))},
+        {"id": "HS-03", "severity": "High",
+         "factor": "Strong evidence of structuring to evade reporting thresholds",
+         "when": (("kind", "eq", "pattern"), ("label", "contains_any", STRUCTURING), ("level", "eq", "High"))},
+        {"id": "HS-04", "severity": "High",
+         "factor": "Credible evidence of layering of funds",
+         "when": (("kind", "eq", "pattern"), ("label", "contains_any", RAPID_MOVEMENT + LAYERING),
+                  ("level", "eq", "High"))},
+        {"id": "HS-05", "severity": "High",
+         "factor": "Use of shell companies to obscure the origin or destination of funds",
+         "when": (("kind", "in", ("pattern", "linked_entity")), ("label", "contains_any", ("shell",)),
+                  ("level", "eq", "High"))},
+        # --- Medium severity -------------------------------------------------------------
+        {"id": "MS-01", "severity": "Medium",
+         "factor": "Transactions with high-risk jurisdictions not explained by the customer profile",
+         "when": (("kind", "eq", "jurisdiction"), ("level", "eq", "High"), ("expected", "eq", False))},
+        {"id": "MS-02", "severity": "Medium",
+         "factor": "Transaction patterns deviating significantly from the customer profile",
+         "when": (("kind", "eq", "pattern"), ("label", "contains_any", RAPID_MOVEMENT + PROFILE_DEVIATION),
+                  ("level", "eq", "Medium"))},
+        {"id": "MS-03", "severity": "Medium",
+         "factor": "Activity outside the customer's expected turnover or dormancy profile",
+         "when": (("kind", "eq", "profile_flag"), ("label", "in", ("turnover_above_profile", "dormant_to_active")))},
+        {"id": "MS-04", "severity": "Medium",
+         "factor": "Possible structuring of cash deposits",
+         "when": (("kind", "eq", "pattern"), ("label", "contains_any", STRUCTURING), ("level", "eq", "Medium"))},
+        {"id": "MS-05", "severity": "Medium",
+         "factor": "Connections to entities on internal (non-sanctions) high-risk watchlists",
+         "when": (("kind", "eq", "watchlist_hit"), ("label", "not_contains_any", SANCTIONS_LISTS))},
+        {"id": "MS-06", "severity": "Medium",
+         "factor": "Use of multiple accounts that appear to be for obfuscation",
+         "when": (("kind", "in", ("pattern", "linked_cluster")),
+                  ("label", "contains_any", ("multiple accounts", "shared account")))},
+        {"id": "MS-07", "severity": "Medium",
+         "factor": "Funds round-tripped through connected counterparties",
+         "when": (("kind", "eq", "fund_cycle"),)},
+        {"id": "MS-08", "severity": "Medium",
+         "factor": "IP address mismatches from high-risk locations",
+         "when": (("kind", "eq", "pattern"), ("label", "contains_any", ("ip address", "ip mismatch")))},
+        # --- Low severity (accumulates) ----------------------------------------------------
+        {"id": "LS-01", "severity": "Low",
+         "factor": "Transactions with medium-risk (or profile-explained high-risk) jurisdictions",
+         "when": (("kind", "eq", "jurisdiction"), ("level", "in", ("Medium", "High")))},
+        {"id": "LS-02", "severity": "Low",
+         "factor": "Minor, isolated deviations from typical activity",
+         "when": (("kind", "in", ("pattern", "profile_flag")), ("level", "in", ("Low", None)))},
+        {"id": "LS-03", "severity": "Low",
+         "factor": "Counterparties of concern without a watchlist match",
+         "when": (("kind", "eq", "linked_entity"),)},
+    ),
+    # First matching rule wins. Conditions are on the number of distinct factors triggered per severity,
+    # factors escalating to Critical ("escalations") and findings behind Low factors ("low_evidence").
+    "aggregation": (
+        {"id": "AG-01", "risk": "Critical", "rationale": "A factor that escalates to Critical was triggered.",
+         "when": (("escalations", "gte", 1),)},
+        {"id": "AG-02", "risk": "Critical", "rationale": "Three or more High severity factors.",
+         "when": (("High", "gte", 3),)},
+        {"id": "AG-03", "risk": "High", "rationale": "Any High severity factor.",
+         "when": (("High", "gte", 1),)},
+        {"id": "AG-04", "risk": "High", "rationale": "Two or more Medium severity factors.",
+         "when": (("Medium", "gte", 2),)},
+        {"id": "AG-05", "risk": "Medium", "rationale": "One Medium severity factor.",
+         "when": (("Medium", "gte", 1),)},
+        {"id": "AG-06", "risk": "Medium", "rationale": "Five or more Low severity findings accumulate.",
+         "when": (("low_evidence", "gte", 5),)},
+        {"id": "AG-07", "risk": "Low", "rationale": "Only isolated Low severity factors, or none.",
+         "when": ()},
+    ),
+    "actions": {
+        "Low": "No immediate action required. Continue standard monitoring.",
+        "Medium": "Conduct Enhanced Due Diligence (EDD).",
+        "High": "Consider SAR filing and escalate to a senior AML compliance officer.",
+        "Critical": "Escalate immediately for SAR filing and potential account restrictions, subject to legal review.",
+    },
+}
+
+
+# --- Rule evaluation --------------------------------------------------------------------
+
+def _contains_any(value: Any, words: Iterable[str]) -> bool:
+    text = str(value or "").lower()
+    return any(word in text for word in words)
+
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "eq": lambda value, operand: value == operand,
+    "in": lambda value, operand: value in operand,
+    "gte": lambda value, operand: value is not None and value >= operand,
+    "contains_any": _contains_any,
+    "not_contains_any": lambda value, operand: not _contains_any(value, operand),
+}
+
+
+def matches(record: Dict[str, Any], conditions: Iterable[Condition]) -> bool:
+    return all(_OPERATORS[op](record.get(field), operand) for field, op, operand in conditions)
+
+
+def evaluate_facts(facts: List[Fact], ruleset: Dict[str, Any] = POLICY_RULESET) -> Dict[str, Any]:
+    """Applies the rule set to extracted facts; see evaluate_policy."""
+    started = time.perf_counter()
+    triggered = []
+    claimed = set()
+    # Risk factors are listed most severe first; each fact counts towards the first factor it matches.
+    for rule in ruleset["risk_factors"]:
+        matched = [i for i, fact in enumerate(facts) if i not in claimed and matches(fact, rule["when"])]
+        if not matched:
+            continue
+        claimed.update(matched)
+        evidence = [facts[i] for i in matched]
+        transaction_ids = list(dict.fromkeys(i for fact in evidence for i in fact.get("transaction_ids") or []))
+        triggered.append({
+            "rule_id": rule["id"],
+            "severity": rule["severity"],
+            "factor": rule["factor"],
+            "escalate_to": rule.get("escalate_to"),
+            "evidence_count": len(evidence),
+            "evidence": list(dict.fromkeys(fact["detail"] for fact in evidence))[:MAX_LISTED_EVIDENCE],
+            "transaction_ids": transaction_ids[:MAX_LISTED_TRANSACTION_IDS],
+        })
+    counts = {severity: sum(1 for t in triggered if t["severity"] == severity) for severity in ("High", "Medium", "Low")}
+    counts["escalations"] = sum(1 for t in triggered if t["escalate_to"])
+    counts["low_evidence"] = sum(t["evidence_count"] for t in triggered if t["severity"] == "Low")
+    aggregation = next(rule for rule in ruleset["aggregation"] if matches(counts, rule["when"]))
+    risk = aggregation["risk"]
+    return {
+        "policy_version": ruleset["version"],
+        "overall_aml_risk_assessment": risk,
+        "recommended_action": ruleset["actions"][risk],
+        "aggregation_rule": {"rule_id": aggregation["id"], "rationale": aggregation["rationale"]},
+        "severity_counts": counts,
+        "triggered_factors": triggered,
+        "key_risk_factors_summary": [
+            f"{t['factor']} ({t['severity']} Severity, {t['rule_id']}): {'; '.join(t['evidence'])}" for t in triggered
+        ],
+        "evaluation_microseconds": round((time.perf_counter() - started) * 1e6, 1),
+    }
+
+
+# --- Fact extraction ---------------------------------------------------------------------------
+
+def parse_agent_output(value: Any) -> Dict[str, Any]:
+    """Returns a sub-agent's output as a dict; accepts dicts and JSON text (optionally in a ```json fence)."""
+    if isinstance(value, dict):
+        return value
+    if not isinstance(value, str):
+        return {}
+    start, end = value.find("{"), value.rfind("}")
+    if start < 0 or end <= start:
+        return {}
+    try:
+        parsed = json.loads(value[start:end + 1])
+    except ValueError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def _level(value: Any) -> Optional[str]:
+    text = str(value or "").strip().capitalize()
+    return text if text in ("Low", "Medium", "High", "Critical", "Sanctioned") else None
+
+
+def _pattern(label: Any, level: Any, detail: Any, transaction_ids: Iterable[Any]) -> Fact:
+    level = _level(level)
+    return {"kind": "pattern", "label": str(label or "").lower(), "level": "High" if level == "Critical" else level,
+            "detail": str(detail or label), "transaction_ids": [str(i) for i in transaction_ids or []]}
+
+
+def _watchlist_facts(entity: Any, details: Iterable[Dict[str, Any]], transaction_ids: Iterable[Any] = ()) -> List[Fact]:
+    return [{"kind": "watchlist_hit", "label": str(d.get("list_name") or ""),
+             "detail": f"{entity} on {d.get('list_name') or 'a watchlist'}: {d.get('match_reason') or 'match'}",
+             "transaction_ids": [str(i) for i in transaction_ids or []]}
+            for d in details or [] if isinstance(d, dict)]
+
+
+def _expected_countries(findings: Dict[str, Any]) -> set:
+    profile = parse_agent_output(findings.get("account_profile"))
+    pattern = parse_agent_output(findings.get("transaction_pattern_analysis"))
+    countries = profile.get("typical_counterparty_countries") or \
+        (pattern.get("account_profile_summary_used") or {}).get("typical_counterparty_countries") or []
+    return {str(c).upper() for c in countries}
+
+
+def extract_facts(findings: Dict[str, Any]) -> List[Fact]:
+    """Flattens sub-agent outputs and raw detector results into facts the rules match on.
+
+    Recognised keys: transaction_pattern_analysis, geographic_risk_assessment,
+    entity_linkage_analysis and account_profile (sub-agent outputs, dicts or
+    JSON text), and for batch reviews structuring, rapid_movement,
+    profile_deviation, country_risk, watchlist_screening, account_holder_screening
+    and counterparty_network (the 'data' of the corresponding tools).
+    """
+    facts: List[Fact] = []
+    expected = _expected_countries(findings)
+
+    def jurisdiction(code: Any, rating: Any, detail: str, transaction_ids: Iterable[Any] = ()) -> None:
+        level = _level(rating)
+        if level is None or level == "Low":
+            return
+        code = str(code or "").upper()
+        facts.append({"kind": "jurisdiction", "label": code, "level": level, "expected": code in expected,
+                      "detail": detail, "transaction_ids": [str(i) for i in transaction_ids]})
+
+    pattern = parse_agent_output(findings.get("transaction_pattern_analysis"))
+    for item in pattern.get("flagged_patterns") or []:
+        facts.append(_pattern(item.get("pattern_type"), item.get("risk_level_assessment") or item.get("risk_level"),
+                              item.get("description"), item.get("implicated_transaction_ids")))
+
+    geographic = parse_agent_output(findings.get("geographic_risk_assessment"))
+    for item in geographic.get("flagged_transactions_geo") or []:
+        code = item.get("determined_country_code")
+        jurisdiction(code, item.get("country_aml_risk_rating"),
+                     item.get("reason_for_flagging") or f"Transaction in {code}", [item.get("transaction_id")])
+
+    entity = parse_agent_output(findings.get("entity_linkage_analysis"))
+    holder = entity.get("account_holder_watchlist_check") or {}
+    if holder.get("is_on_watchlist"):
+        facts.extend(_watchlist_facts("Account holder", holder.get("details") or holder.get("watchlist_details")))
+    for item in entity.get("linked_entities_of_concern") or []:
+        details = item.get("watchlist_details") or []
+        if details:
+            facts.extend(_watchlist_facts(item.get("entity_name"), details, item.get("implicated_transaction_ids")))
+        else:
+            reason = item.get("reason_for_concern") or ""
+            facts.append({"kind": "linked_entity", "label": reason.lower(), "level": _level(item.get("risk_level")),
+                          "detail": f"{item.get('entity_name')}: {reason}",
+                          "transaction_ids": [str(i) for i in item.get("implicated_transaction_ids") or []]})
+
+    # Raw detector and tool results (batch reviews).
+    for cluster in (findings.get("structuring") or {}).get("clusters") or []:
+        facts.append(_pattern("Structuring", cluster.get("risk_level"),
+                              f"{cluster.get('transaction_count')} cash transactions totalling {cluster.get('total_amount')}"
+                              f" between {cluster.get('first_timestamp')} and {cluster.get('last_timestamp')}",
+                              cluster.get("transaction_ids")))
+    for episode in (findings.get("rapid_movement") or {}).get("episodes") or []:
+        facts.append(_pattern(episode.get("pattern_type"), episode.get("risk_level"),
+                              f"{episode.get('pattern_type')}: credit of {episode.get('credit_amount')}, "
+                              f"{episode.get('pass_through_ratio')} out within {episode.get('holding_time_hours')}h",
+                              [episode.get("credit_transaction_id")] + list(episode.get("outflow_transaction_ids") or [])))
+    for flag in (findings.get("profile_deviation") or {}).get("deviation_flags") or []:
+        facts.append({"kind": "profile_flag", "label": flag, "level": None, "detail": flag.replace("_", " "),
+                      "transaction_ids": []})
+    for rating in (findings.get("country_risk") or {}).get("ratings") or []:
+        jurisdiction(rating.get("country_code"), rating.get("aml_risk_rating"),
+                     f"Counterparty country {rating.get('country_code')} rated {rating.get('aml_risk_rating')}")
+    for hit in (findings.get("watchlist_screening") or {}).get("hits") or []:
+        facts.extend(_watchlist_facts(hit.get("counterparty_name"), hit.get("watchlist_details"), hit.get("transaction_ids")))
+    holder_screening = findings.get("account_holder_screening") or {}
+    if holder_screening.get("is_on_watchlist"):
+        facts.extend(_watchlist_facts("Account holder", holder_screening.get("watchlist_details")))
+    network = findings.get("counterparty_network") or {}
+    for cycle in network.get("cycles") or []:
+        ids = [i for hop in cycle.get("hops") or [] for i in hop.get("sample_transaction_ids") or []]
+        facts.append({"kind": "fund_cycle", "label": "cycle", "level": None, "transaction_ids": ids,
+                      "detail": f"{cycle.get('amount_round_tripped')} round-tripped via {' -> '.join(cycle.get('parties') or [])}"})
+    for cluster in network.get("clusters") or []:
+        shared_account = cluster.get("entity_count", 0) > len(cluster.get("accounts") or []) > 0
+        facts.append({"kind": "linked_cluster", "label": "shared account" if shared_account else "linked parties",
+                      "level": None, "transaction_ids": [], "detail": f"Linked parties: {cluster.get('label')}"})
+    return facts
+
+
+def evaluate_policy(findings: Dict[str, Any], ruleset: Dict[str, Any] = POLICY_RULESET) -> Dict[str, Any]:
+    """Returns the overall risk level, recommended action and the triggered risk factors
+    (with rule ids and evidence) for a review's findings under `ruleset`."""
+    return evaluate_facts(extract_facts(findings), ruleset)
+
+
+# --- aml_policy_alignment_agent callback ------------------------------------------------------------
+
+def policy_output(account_number: Optional[str], decision: Dict[str, Any]) -> Dict[str, Any]:
+    """The agent's output structure filled from the decision alone (no narrative)."""
+    return {
+        "aml_policy_alignment_status": "success",
+        "account_number": account_number,
+        "policy_version": decision["policy_version"],
+        "overall_aml_risk_assessment": decision["overall_aml_risk_assessment"],
+        "triggered_rule_ids": [t["rule_id"] for t in decision["triggered_factors"]] + [decision["aggregation_rule"]["rule_id"]],
+        "key_risk_factors_summary": decision["key_risk_factors_summary"],
+        "mitigating_factors_summary": [],
+        "recommended_action": decision["recommended_action"],
+        "summary_of_findings_for_action": decision["aggregation_rule"]["rationale"],
+        "message_to_user": (f"AML policy review complete. Overall AML risk assessment for account {account_number} is "
+                            f"{decision['overall_aml_risk_assessment']}. Recommended action: {decision['recommended_action']}"),
+        "error_message": None,
+    }
+
+
+def scoped_state_key(state_key: str, review_handle: str) -> str:
+    return f"{state_key}:{review_handle}"
+
+
+def _request(callback_context: CallbackContext) -> Dict[str, Any]:
+    content = callback_context.user_content
+    return parse_agent_output("".join(part.text or "" for part in (content.parts or [])) if content else "")
+
+
+def _review_handle(request: Dict[str, Any], state: Any) -> Optional[str]:
+    if request.get("review_handle"):
+        return str(request["review_handle"])
+    if all(request.get(key) for key in ("account_number", "start_date", "end_date")):
+        # Same format as aml_agent.transaction_table.table_handle.
+        return f"{request['account_number']}:{request['start_date']}:{request['end_date']}"
+    return (state.get(REVIEW_STATE_KEY) or {}).get("review_handle")
+
+
+def scope_findings(callback_context: CallbackContext) -> Optional[types.Content]:
+    """after_agent_callback of the analysis agents: copies the agent's output under its review's handle."""
+    state_key = FINDINGS_SOURCES.get(callback_context.agent_name.removesuffix("_agent"))
+    handle = _review_handle(_request(callback_context), callback_context.state)
+    if state_key and handle and callback_context.state.get(state_key) is not None:
+        callback_context.state[scoped_state_key(state_key, handle)] = callback_context.state[state_key]
+    return None
+
+
+def review_findings(request: Dict[str, Any], state: Any) -> Dict[str, Any]:
+    """The findings evaluate_policy receives: values in the request win over session state,
+    and state is only read under the review's handle (unscoped only when the review is unknown)."""
+    handle = _review_handle(request, state)
+    findings = {}
+    for key, state_key in FINDINGS_SOURCES.items():
+        findings[key] = request.get(key) or state.get(scoped_state_key(state_key, handle) if handle else state_key)
+    review = state.get(REVIEW_STATE_KEY) or {}
+    if review.get("review_handle") != handle:
+        review = {}
+    findings["account_profile"] = request.get("account_profile") or review.get("account_profile")
+    return findings
+
+
+def apply_policy_rules(callback_context: CallbackContext) -> Optional[types.Content]:
+    """Evaluates the policy before aml_policy_alignment_agent runs.
+
+    The decision is stored under DECISION_STATE_KEY for the agent's instruction.
+    In batch mode the decision itself becomes the agent's output and the model
+    call is skipped.
+    """
+    state = callback_context.state
+    request = _request(callback_context)
+    findings = review_findings(request, state)
+    decision = evaluate_policy(findings)
+    state[DECISION_STATE_KEY] = json.dumps(decision)
+    print(f"AML policy {decision['policy_version']}: {decision['overall_aml_risk_assessment']} "
+          f"({decision['aggregation_rule']['rule_id']}, {decision['evaluation_microseconds']} µs)")
+    if AML_POLICY_NARRATIVE and not state.get(BATCH_MODE_STATE_KEY):
+        return None
+    account_number = request.get("account_number") or parse_agent_output(
+        findings["transaction_pattern_analysis"]).get("account_number")
+    output = json.dumps(policy_output(account_number, decision))
+    state[OUTPUT_KEY] = output
+    return types.Content(role="model", parts=[types.Part(text=output)])
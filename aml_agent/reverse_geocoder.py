@@ -0,0 +1,408 @@
+# aml_agent/reverse_geocoder.py
+"""Offline reverse geocoding of coordinates to ISO country codes.
+
+Country boundary polygons are loaded once from a GeoJSON file (Natural Earth
+"Admin 0 - Countries" or any FeatureCollection with an ISO alpha-2 property)
+and indexed on a regular lat/lon grid: each cell lists the polygons whose
+bounding box touches it. Per polygon and cell, one reference point is located
+by ray casting; every other point in the cell is inside iff the segment to the
+reference point crosses the polygon's edges within that cell an even number of
+times when the reference is inside. Points are resolved in NumPy batches
+grouped by cell, with no network and no API key.
+
+Points that fall just outside every polygon (coarse coastlines, harbours) are
+assigned to the nearest boundary vertex within GEOCODER_NEAREST_KM. Countries
+too small for the polygons (Singapore, Hong Kong, Monaco...) are Point features
+with a RADIUS_KM property; points within that distance of one are assigned to
+it, whichever polygon they fall in.
+
+The package ships a Natural Earth 1:110m derivative in aml_agent/data (see the
+README there). resolve_transaction_countries geocodes only the points it cannot
+resolve through the cached batch Google Maps geocoder, and all of them if the
+boundaries file cannot be loaded.
+"""
+import json
+import math
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from google.adk.tools import ToolContext
+
+from aml_agent.bank_api_client import batch_google_maps_geocoding_tool
+from aml_agent.transaction_table import resolve_table
+from config import GEOCODER_BOUNDARIES_PATH, GEOCODER_GRID_DEGREES, GEOCODER_NEAREST_KM
+
+ISO_PROPERTIES = ("ISO_A2_EH", "ISO_A2", "iso_a2_eh", "iso_a2", "ISO3166-1-Alpha-2", "iso_3166_1_alpha_2")
+NAME_PROPERTIES = ("NAME", "ADMIN", "name", "admin", "NAME_EN", "name_en")
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.19
+# Upper bound on points x edges evaluated in one NumPy operation.
+MAX_BLOCK = 2_000_000
+MAX_LISTED_TRANSACTIONS = 10
+
+
+def _first_property(properties: Dict[str, Any], names: Sequence[str]) -> Optional[str]:
+    for name in names:
+        value = properties.get(name)
+        if isinstance(value, str) and value and value != "-99":
+            return value
+    return None
+
+
+class _Part:
+    """One polygon of a country: all of its rings as edge arrays (x = lon, y = lat)."""
+
+    __slots__ = ("country", "x1", "y1", "x2", "y2", "bbox", "_cells")
+
+    def __init__(self, country: int, rings: List[List[List[float]]]):
+        x1, y1, x2, y2 = [], [], [], []
+        for ring in rings:
+            ring = np.asarray(ring, dtype=np.float64)[:, :2]
+            if len(ring) < 3:
+                continue
+            closed = ring if np.array_equal(ring[0], ring[-1]) else np.vstack([ring, ring[:1]])
+            x1.append(closed[:-1, 0])
+            y1.append(closed[:-1, 1])
+            x2.append(closed[1:, 0])
+            y2.append(closed[1:, 1])
+        self.country = country
+        self.x1, self.y1 = np.concatenate(x1), np.concatenate(y1)
+        self.x2, self.y2 = np.concatenate(x2), np.concatenate(y2)
+        self.bbox = (float(min(self.x1.min(), self.x2.min())), float(min(self.y1.min(), self.y2.min())),
+                     float(max(self.x1.max(), self.x2.max())), float(max(self.y1.max(), self.y2.max())))
+        self._cells: Dict[int, Tuple[float, float, bool, np.ndarray]] = {}
+
+    def _cell_state(self, cell_id: int, west: float, south: float, size: float) -> Tuple[float, float, bool, np.ndarray]:
+        """(ref_x, ref_y, ref_inside, edges): a reference point inside the cell, whether it lies
+        in this polygon, and the edges that pass through the cell."""
+        state = self._cells.get(cell_id)
+        if state is None:
+            low_y, high_y = np.minimum(self.y1, self.y2), np.maximum(self.y1, self.y2)
+            band = np.flatnonzero((high_y >= south) & (low_y <= south + size))
+            low_x = np.minimum(self.x1[band], self.x2[band])
+            high_x = np.maximum(self.x1[band], self.x2[band])
+            edges = band[(high_x >= west) & (low_x <= west + size)]
+            # Off-centre so the reference point does not sit on a vertex of a regular grid-aligned outline.
+            ref_x, ref_y = west + size * 0.5137, south + size * 0.4871
+            ref_inside = bool(self._ray_parity(np.array([ref_x]), np.array([ref_y]), band)[0])
+            state = (ref_x, ref_y, ref_inside, edges)
+            self._cells[cell_id] = state
+        return state
+
+    def _ray_parity(self, lon: np.ndarray, lat: np.ndarray, edges: np.ndarray) -> np.ndarray:
+        """Even-odd ray casting towards +lon against the given edges."""
+        x1, y1, x2, y2 = self.x1[edges], self.y1[edges], self.x2[edges], self.y2[edges]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            straddles = (y1 > lat[:, None]) != (y2 > lat[:, None])
+            crossing_x = x1 + (lat[:, None] - y1) * (x2 - x1) / (y2 - y1)
+            return (straddles & (lon[:, None] < crossing_x)).sum(axis=1) % 2 == 1
+
+    def contains(self, lon: np.ndarray, lat: np.ndarray, cell_id: int, west: float, south: float,
+                 size: float) -> np.ndarray:
+        """Whether each point of one grid cell lies in this polygon.
+
+        A point is inside iff the cell's reference point is, flipped once for every
+        polygon edge crossing the segment between them; only the few edges passing
+        through the cell are tested.
+        """
+        ref_x, ref_y, ref_inside, edges = self._cell_state(cell_id, west, south, size)
+        inside = np.full(len(lon), ref_inside, dtype=bool)
+        if not len(edges):
+            return inside
+        cx, cy, dx, dy = self.x1[edges], self.y1[edges], self.x2[edges], self.y2[edges]
+        step = max(1, MAX_BLOCK // len(edges))
+        for start in range(0, len(lon), step):
+            px = lon[start:start + step, None]
+            py = lat[start:start + step, None]
+            # Proper segment intersection by orientation signs.
+            side_ref = (dx - cx) * (ref_y - cy) - (dy - cy) * (ref_x - cx)
+            side_point = (dx - cx) * (py - cy) - (dy - cy) * (px - cx)
+            side_c = (px - ref_x) * (cy - ref_y) - (py - ref_y) * (cx - ref_x)
+            side_d = (px - ref_x) * (dy - ref_y) - (py - ref_y) * (dx - ref_x)
+            crossings = ((side_ref * side_point) < 0) & ((side_c * side_d) < 0)
+            inside[start:start + step] ^= crossings.sum(axis=1) % 2 == 1
+        return inside
+
+
+class ReverseGeocoder:
+    """Grid-indexed country polygons resolving coordinate arrays to ISO alpha-2 codes."""
+
+    def __init__(self, countries: List[Tuple[str, str, List[List[List[List[float]]]]]],
+                 cell_degrees: float = GEOCODER_GRID_DEGREES, nearest_km: float = GEOCODER_NEAREST_KM,
+                 territories: Sequence[Tuple[str, str, float, float, float]] = ()):
+        """`countries` is a list of (iso_code, name, polygons), each polygon a list of rings;
+        `territories` a list of (iso_code, name, latitude, longitude, radius_km)."""
+        self.cell = float(cell_degrees)
+        self.nearest_km = nearest_km
+        self.codes = [code for code, _, _ in countries]
+        self.names = [name for _, name, _ in countries]
+        index = {code: i for i, code in enumerate(self.codes)}
+        self.territories: List[Tuple[int, float, float, float]] = []
+        for code, name, lat, lon, radius_km in territories:
+            if code not in index:
+                index[code] = len(self.codes)
+                self.codes.append(code)
+                self.names.append(name)
+            self.territories.append((index[code], float(lat), float(lon), float(radius_km)))
+        self.parts: List[_Part] = []
+        for index, (_, _, polygons) in enumerate(countries):
+            for rings in polygons:
+                if rings and len(rings[0]) >= 3:
+                    self.parts.append(_Part(index, rings))
+        self.columns = int(math.ceil(360 / self.cell))
+        self.rows = int(math.ceil(180 / self.cell))
+        cells: Dict[int, List[int]] = {}
+        for part_index, part in enumerate(self.parts):
+            min_x, min_y, max_x, max_y = part.bbox
+            col_lo, col_hi = self._column(min_x), self._column(max_x)
+            row_lo, row_hi = self._row(min_y), self._row(max_y)
+            for row in range(row_lo, row_hi + 1):
+                for col in range(col_lo, col_hi + 1):
+                    cells.setdefault(row * self.columns + col, []).append(part_index)
+        self.cells = {cell: np.array(parts, dtype=np.int32) for cell, parts in cells.items()}
+        self._reach_cache: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def from_geojson(cls, path: str, **kwargs: Any) -> "ReverseGeocoder":
+        """Loads a GeoJSON FeatureCollection of country (Multi)Polygons, and Points with a RADIUS_KM property."""
+        with open(path, "r", encoding="utf-8") as f:
+            collection = json.load(f)
+        countries, territories = [], []
+        for feature in collection.get("features", []):
+            properties = feature.get("properties") or {}
+            geometry = feature.get("geometry") or {}
+            code = _first_property(properties, ISO_PROPERTIES)
+            if not code:
+                continue
+            name = _first_property(properties, NAME_PROPERTIES) or code.upper()
+            if geometry.get("type") == "Polygon":
+                polygons = [geometry["coordinates"]]
+            elif geometry.get("type") == "MultiPolygon":
+                polygons = geometry["coordinates"]
+            elif geometry.get("type") == "Point" and properties.get("RADIUS_KM"):
+                lon, lat = geometry["coordinates"][:2]
+                territories.append((code.upper(), name, lat, lon, float(properties["RADIUS_KM"])))
+                continue
+            else:
+                continue
+            countries.append((code.upper(), name, polygons))
+        if not countries:
+            raise ValueError(f"No country polygons with an ISO alpha-2 property found in {path}")
+        return cls(countries, territories=territories, **kwargs)
+
+    def _column(self, lon: float) -> int:
+        return min(self.columns - 1, max(0, int((lon + 180.0) // self.cell)))
+
+    def _row(self, lat: float) -> int:
+        return min(self.rows - 1, max(0, int((lat + 90.0) // self.cell)))
+
+    def lookup(self, latitudes: Sequence[float], longitudes: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Resolves coordinate arrays to country indices.
+
+        Returns (country_index, exact): country_index is -1 where no country was
+        found, and exact is False where the nearest-vertex fallback or a small
+        territory's radius was used.
+        """
+        lat = np.asarray(latitudes, dtype=np.float64)
+        lon = np.asarray(longitudes, dtype=np.float64)
+        result = np.full(len(lat), -1, dtype=np.int32)
+        exact = np.zeros(len(lat), dtype=bool)
+        valid = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180))
+        if not len(valid):
+            return result, exact
+        rows = np.minimum(self.rows - 1, ((lat[valid] + 90.0) // self.cell).astype(np.int64))
+        cols = np.minimum(self.columns - 1, ((lon[valid] + 180.0) // self.cell).astype(np.int64))
+        cell_ids = rows * self.columns + cols
+        order = np.argsort(cell_ids, kind="stable")
+        unique_cells, starts = np.unique(cell_ids[order], return_index=True)
+        bounds = np.append(starts, len(order))
+        for cell_id, start, end in zip(unique_cells, bounds[:-1], bounds[1:]):
+            points = valid[order[start:end]]
+            row, col = divmod(int(cell_id), self.columns)
+            west, south = -180.0 + col * self.cell, -90.0 + row * self.cell
+            pending = points
+            for part_index in self.cells.get(int(cell_id), ()):
+                part = self.parts[part_index]
+                hit = part.contains(lon[pending], lat[pending], int(cell_id), west, south, self.cell)
+                if hit.any():
+                    result[pending[hit]] = part.country
+                    exact[pending[hit]] = True
+                    pending = pending[~hit]
+                    if not len(pending):
+                        break
+            if len(pending) and self.nearest_km > 0:
+                self._nearest(pending, int(cell_id), lat, lon, result)
+        for country, t_lat, t_lon, radius_km in self.territories:
+            near = valid[(np.abs(lat[valid] - t_lat) <= radius_km / KM_PER_DEGREE)
+                         & (np.abs(lon[valid] - t_lon) <= radius_km / KM_PER_DEGREE / max(0.01, math.cos(math.radians(t_lat))))]
+            if len(near):
+                dx = np.radians(lon[near] - t_lon) * math.cos(math.radians(t_lat))
+                dy = np.radians(lat[near] - t_lat)
+                near = near[EARTH_RADIUS_KM * np.hypot(dx, dy) <= radius_km]
+                result[near] = country
+                exact[near] = False
+        return result, exact
+
+    def _reach(self, cell_id: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Boundary vertices (lon, lat, country) within nearest_km of a cell, cached per cell."""
+        reach = self._reach_cache.get(cell_id)
+        if reach is not None:
+            return reach
+        row, col = divmod(cell_id, self.columns)
+        candidates = set()
+        for r in range(max(0, row - 1), min(self.rows, row + 2)):
+            for c in range(col - 1, col + 2):
+                candidates.update(int(p) for p in self.cells.get(r * self.columns + c % self.columns, ()))
+        south, west = -90.0 + row * self.cell, -180.0 + col * self.cell
+        reach_lat = self.nearest_km / KM_PER_DEGREE
+        reach_lon = reach_lat / max(0.01, math.cos(math.radians(min(89.0, max(abs(south), abs(south + self.cell))))))
+        vx, vy, owner = [np.empty(0)], [np.empty(0)], [np.empty(0, dtype=np.int32)]
+        for p in candidates:
+            part = self.parts[p]
+            near = np.flatnonzero((part.y1 >= south - reach_lat) & (part.y1 <= south + self.cell + reach_lat)
+                                  & (part.x1 >= west - reach_lon) & (part.x1 <= west + self.cell + reach_lon))
+            vx.append(part.x1[near])
+            vy.append(part.y1[near])
+            owner.append(np.full(len(near), part.country, dtype=np.int32))
+        reach = (np.concatenate(vx), np.concatenate(vy), np.concatenate(owner))
+        self._reach_cache[cell_id] = reach
+        return reach
+
+    def _nearest(self, points: np.ndarray, cell_id: int, lat: np.ndarray, lon: np.ndarray, result: np.ndarray) -> None:
+        vx, vy, owner = self._reach(cell_id)
+        if not len(vx):
+            return
+        step = max(1, MAX_BLOCK // len(vx))
+        for start in range(0, len(points), step):
+            block = points[start:start + step]
+            # Equirectangular distance is accurate enough at tens of kilometres.
+            dx = np.radians(vx - lon[block, None]) * np.cos(np.radians(lat[block, None]))
+            dy = np.radians(vy - lat[block, None])
+            distance = EARTH_RADIUS_KM * np.hypot(dx, dy)
+            nearest = np.argmin(distance, axis=1)
+            close = distance[np.arange(len(block)), nearest] <= self.nearest_km
+            result[block[close]] = owner[nearest[close]]
+
+    def country_codes(self, latitudes: Sequence[float], longitudes: Sequence[float]) -> List[Optional[str]]:
+        """ISO alpha-2 code per coordinate pair, or None where it cannot be resolved."""
+        indices, _ = self.lookup(latitudes, longitudes)
+        return [self.codes[i] if i >= 0 else None for i in indices]
+
+
+_geocoder: Optional[ReverseGeocoder] = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder() -> ReverseGeocoder:
+    """Returns the process-wide geocoder, loading GEOCODER_BOUNDARIES_PATH on first use.
+
+    Raises OSError if the boundaries file is missing and ValueError if it holds no countries.
+    """
+    global _geocoder
+    if _geocoder is None:
+        with _geocoder_lock:
+            if _geocoder is None:
+                _geocoder = ReverseGeocoder.from_geojson(GEOCODER_BOUNDARIES_PATH)
+    return _geocoder
+
+
+def _offline_countries(geocoder: ReverseGeocoder, latitudes: np.ndarray,
+                       longitudes: np.ndarray) -> Tuple[List[str], Dict[str, str]]:
+    indices, _ = geocoder.lookup(latitudes, longitudes)
+    codes = [geocoder.codes[i] if i >= 0 else "" for i in indices]
+    return codes, {geocoder.codes[i]: geocoder.names[i] for i in np.unique(indices[indices >= 0])}
+
+
+def _geocoded_countries(latitudes: np.ndarray, longitudes: np.ndarray) -> Tuple[List[str], Dict[str, str]]:
+    # Distinct locations are geocoded once and repeats come from the geocode cache.
+    results = batch_google_maps_geocoding_tool(latitudes.tolist(), longitudes.tolist())["data"]["results"]
+    codes: List[str] = []
+    names: Dict[str, str] = {}
+    for result in results:
+        data = result.get("data") or {}
+        code = str(data.get("country_code") or "").upper() if result.get("status") == "success" else ""
+        if code == "XX":
+            code = ""
+        if code:
+            names.setdefault(code, data.get("country") or code)
+        codes.append(code)
+    return codes, names
+
+
+def resolve_transaction_countries(review_handle: str, tool_context: Optional[ToolContext] = None) -> dict:
+    """
+    Determines the country where each of the review's transactions took place from its
+    latitude/longitude in one batch, and reports transactions whose location country
+    differs from the counterparty country. Coordinates are resolved offline from the
+    country boundaries file; only locations it cannot place (small islands, or every
+    location if the file cannot be loaded) are geocoded through Google Maps (cached, so
+    repeated locations cost one lookup).
+
+    Args:
+        review_handle (str): The handle returned by load_review_transactions.
+
+    Returns:
+        dict: A dictionary containing:
+              - 'status' (str): "success" or "error".
+              - 'data' (dict, optional): 'source' ("offline" or "google_maps"), 'geocoded_locations'
+                (locations sent to Google Maps), 'located_transactions', 'resolved', 'unresolved' and 'countries' (country_code, country_name, transaction_count,
+                amount, transaction_ids), plus 'location_counterparty_mismatches'.
+              - 'error_message' (str, optional): A description of the error if status is "error".
+    """
+    try:
+        table = resolve_table(review_handle, tool_context)
+    except ValueError as e:
+        return {"status": "error", "error_message": str(e)}
+
+    located = np.flatnonzero(~(np.isnan(table.latitude) | np.isnan(table.longitude)))
+    try:
+        geocoder = get_geocoder()
+    except (OSError, ValueError) as e:
+        print(f"Offline reverse geocoder unavailable, geocoding locations instead: {e}")
+        geocoder = None
+    latitudes, longitudes = table.latitude[located], table.longitude[located]
+    if geocoder is not None:
+        source = "offline"
+        codes, names = _offline_countries(geocoder, latitudes, longitudes)
+        missed = np.flatnonzero(np.array(codes, dtype=object) == "")
+    else:
+        source = "google_maps"
+        codes, names, missed = [""] * len(located), {}, np.arange(len(located))
+    if len(missed):
+        geocoded, geocoded_names = _geocoded_countries(latitudes[missed], longitudes[missed])
+        for i, code in zip(missed, geocoded):
+            codes[i] = code
+        for code, name in geocoded_names.items():
+            names.setdefault(code, name)
+    location_codes = np.array(codes, dtype=object)
+
+    countries = []
+    for code in sorted(names):
+        rows = located[location_codes == code]
+        countries.append({
+            "country_code": code,
+            "country_name": names[code],
+            "transaction_count": len(rows),
+            "amount": round(float(np.abs(table.amount_pence[rows]).sum()) / 100, 2),
+            "transaction_ids": [str(i) for i in table.ids[rows[:MAX_LISTED_TRANSACTIONS]]],
+        })
+    countries.sort(key=lambda c: c["transaction_count"], reverse=True)
+
+    resolved = location_codes != ""
+    counterparty_codes = np.array(table.countries, dtype=object)[table.country_code[located]]
+    mismatch = resolved & (counterparty_codes != "") & (location_codes != counterparty_codes)
+    return {"status": "success", "data": {
+        "source": source,
+        "geocoded_locations": len(missed),
+        "located_transactions": len(located),
+        "resolved": int(resolved.sum()),
+        "unresolved": int((~resolved).sum()),
+        "countries": countries,
+        "location_counterparty_mismatches": [
+            {"transaction_id": str(table.ids[located[i]]), "location_country": location_codes[i],
+             "counterparty_country": counterparty_codes[i]}
+            for i in np.flatnonzero(mismatch)[:MAX_LISTED_TRANSACTIONS]
+        ],
+        "location_counterparty_mismatch_count": int(mismatch.sum()),
+    }}
@@ -1,16 +1,18 @@
 # aml_agent/sub_agents/entity_linkage_analysis_agent/agent.py
 from google.adk.agents import Agent
-from aml_agent.bank_api_client import (
+from aml_agent.async_bank_api_client import (
     check_entity_against_watchlists,
     get_company_director_information,
-    # fetch_user_profile # Assuming this is from aml_agent.bank_api_client if needed, or a shared client
+    fetch_user_profile,
 )
-# If fetch_user_profile is intended to be from financial_concierge or a truly common place:
-# from financial_concierge.bank_api_client import fetch_user_profile as fc_fetch_user_profile
-# Or if it's defined within aml_agent.bank_api_client (even if copied):
-from aml_agent.bank_api_client import fetch_user_profile
-
+from aml_agent.transaction_table import query_review_transactions, summarize_review_transactions
+from aml_agent.watchlist_index import screen_counterparties_locally
+from aml_agent.counterparty_screening import batch_check_counterparties_against_watchlists
+from aml_agent.counterparty_graph import analyze_counterparty_network
+from aml_agent.director_prefetch import get_business_counterparty_directors
+from aml_agent.policy_engine import scope_findings
 
+from common.offload import offload
 from . import prompt
 from config import DEFAULT_LLM_MODEL as MODEL
 
@@ -19,15 +21,13 @@ entity_linkage_analysis_agent = Agent(
     name="entity_linkage_analysis_agent",
     instruction=prompt.ENTITY_LINKAGE_ANALYSIS_PROMPT,
     output_key="entity_linkage_analysis_output",
-    #TODO Define the tools for the Entity Linkage Analysis Agent.
-    #     This agent needs tools to gather information about entities (individuals and companies).
-    #     1. Import the necessary functions from `aml_agent.bank_api_client`:
-    #        - `check_entity_against_watchlists`
-    #        - `get_company_director_information`
-    #        - `fetch_user_profile`
-    #     2. Create a list containing these imported functions.
-    #     Refer to the ADK documentation for how to add tools to an agent.
-    #====Start your code here====
-    tools=[], # Replace this with the actual list of tools
-    #====End your code here====
+    # Keeps a copy of the output under the review's handle for the policy engine.
+    after_agent_callback=scope_findings,
+    # The bank API tools are async (aml_agent/async_bank_api_client.py); the rest block for
+    # seconds and run in worker threads, see common/offload.py.
+    tools=[check_entity_against_watchlists, get_company_director_information, fetch_user_profile,
+           *(offload(tool) for tool in (screen_counterparties_locally,
+                                        batch_check_counterparties_against_watchlists,
+                                        get_business_counterparty_directors, analyze_counterparty_network,
+                                        summarize_review_transactions, query_review_transactions))],
 )
@@ -1,10 +1,16 @@
 # aml_agent/sub_agents/geographic_risk_assessment_agent/agent.py
 from google.adk.agents import Agent
-from aml_agent.bank_api_client import (
+from aml_agent.async_bank_api_client import (
     get_country_risk_rating,
-    direct_google_maps_geocoding_tool # Use the direct tool placeholder
+    get_country_risk_ratings,
+    direct_google_maps_geocoding_tool, # Use the direct tool placeholder
+    batch_google_maps_geocoding_tool,
     # get_ip_geolocation_details is removed as per user feedback
 )
+from aml_agent.reverse_geocoder import resolve_transaction_countries
+from aml_agent.transaction_table import query_review_transactions, summarize_review_transactions
+from aml_agent.policy_engine import scope_findings
+from common.offload import offload
 from . import prompt
 from config import DEFAULT_LLM_MODEL as MODEL
 
@@ -13,14 +19,12 @@ geographic_risk_assessment_agent = Agent(
     name="geographic_risk_assessment_agent",
     instruction=prompt.GEOGRAPHIC_RISK_ASSESSMENT_PROMPT,
     output_key="geographic_risk_assessment_output",
-    #TODO Define the tools for the Geographic Risk Assessment Agent.
-    #     This agent needs tools to assess risks associated with geographic locations.
-    #     1. Import the necessary functions from `aml_agent.bank_api_client`:
-    #        - `get_country_risk_rating`
-    #        - `direct_google_maps_geocoding_tool`
-    #     2. Create a list containing these imported functions.
-    #     Refer to the ADK documentation for how to add tools to an agent.
-    #====Start your code here====
-    tools=[], # Replace this with the actual list of tools
-    #====End your code here====
+    # Keeps a copy of the output under the review's handle for the policy engine.
+    after_agent_callback=scope_findings,
+    # The bank API tools are async (aml_agent/async_bank_api_client.py); the rest run in
+    # worker threads, see common/offload.py.
+    tools=[get_country_risk_ratings, get_country_risk_rating, direct_google_maps_geocoding_tool,
+           batch_google_maps_geocoding_tool,
+           *(offload(tool) for tool in (resolve_transaction_countries, summarize_review_transactions,
+                                        query_review_transactions))],
 )
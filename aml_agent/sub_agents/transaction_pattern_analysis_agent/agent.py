@@ -1,6 +1,12 @@
 # aml_agent/sub_agents/transaction_pattern_analysis_agent/agent.py
 from google.adk.agents import Agent
-from aml_agent.bank_api_client import get_account_profile_and_history_summary
+from aml_agent.async_bank_api_client import get_account_profile_and_history_summary
+from aml_agent.detectors.pass_through import detect_rapid_movement
+from aml_agent.detectors.profile_deviation import assess_profile_deviation
+from aml_agent.detectors.structuring import detect_structuring
+from aml_agent.transaction_table import query_review_transactions
+from aml_agent.policy_engine import scope_findings
+from common.offload import offload
 from . import prompt
 from config import DEFAULT_LLM_MODEL as MODEL
 
@@ -9,12 +15,11 @@ transaction_pattern_analysis_agent = Agent(
     name="transaction_pattern_analysis_agent",
     instruction=prompt.TRANSACTION_PATTERN_ANALYSIS_PROMPT,
     output_key="transaction_pattern_analysis_output",
-    #TODO Define the tools for the Transaction Pattern Analysis Agent.
-    #     This agent needs a tool to get a summary of the account's profile and history.
-    #     1. Import the `get_account_profile_and_history_summary` function from `aml_agent.bank_api_client`.
-    #     2. Create a list containing this imported function.
-    #     Refer to the ADK documentation for how to add tools to an agent.
-    #====Start your code here====
-    tools=[], # Replace this with the actual list of tools
-    #====End your code here====
+    # Keeps a copy of the output under the review's handle for the policy engine.
+    after_agent_callback=scope_findings,
+    # The profile summary is fetched by the async client; the blocking detectors run in worker
+    # threads so the agent does not stall its siblings in the analysis stage.
+    tools=[get_account_profile_and_history_summary,
+           *(offload(tool) for tool in (detect_structuring, detect_rapid_movement, assess_profile_deviation,
+                                        query_review_transactions))],
 )
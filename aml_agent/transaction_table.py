@@ -0,0 +1,503 @@
+# aml_agent/transaction_table.py
+"""Columnar transaction table shared by the AML tools within a review.
+
+A review's transaction history is decoded once into typed NumPy columns
+(signed integer pence, epoch seconds, categorical country / counterparty /
+transaction-type codes) held in a process-wide registry. Session state only
+carries a short handle to it, so every sub-agent tool in the same review reads
+the same table instead of re-fetching or re-parsing the transaction JSON. The
+coordinator passes that handle (load_review_transactions) to the sub-agents in
+place of the transaction list; they query it through query_review_transactions
+and summarize_review_transactions.
+
+Rows are kept in time order (unparseable timestamps last), which makes time
+windows a binary search. Times are epoch seconds in UTC: a timestamp's UTC
+offset ("Z", "+02:00", "-0500") is applied when it is parsed.
+"""
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from google.adk.tools import ToolContext
+
+from aml_agent.bank_api_client import fetch_transaction_history
+from common import records
+from config import REVIEW_QUERY_LIMIT, TRANSACTION_TABLE_REGISTRY_SIZE
+
+# Transaction types whose amounts are outflows even when the API sends them unsigned.
+DEBIT_TYPES = frozenset({
+    "withdrawal", "cash_withdrawal", "debit", "transfer_out", "card_payment", "payment",
+    "direct_debit", "standing_order", "fee", "international_transfer",
+})
+SECONDS_PER_DAY = 86400
+STATE_KEY_PREFIX = "transaction_table:"
+
+TimeBound = Union[None, str, date, datetime, int]
+
+
+def extract_transactions(history: Any) -> List[Any]:
+    """Returns the list of transactions inside a fetch_transaction_history result or payload.
+
+    Raises ValueError if `history` is an error result.
+    """
+    if isinstance(history, dict) and "status" in history:
+        if history.get("status") != "success":
+            raise ValueError(history.get("error_message") or "Transaction history could not be retrieved.")
+        history = history.get("data")
+    if isinstance(history, dict):
+        history = history.get("data", history.get("transactions"))
+    return list(history or [])
+
+
+# What may follow YYYY-MM-DDTHH:MM:SS: fractional seconds, then "Z" or a +HH[:MM] offset.
+_TIME_SUFFIX_RE = re.compile(r"(?:\.\d*)?(Z|[+-]\d{2}(?::?\d{2})?)?")
+
+
+def _split_offset(value: str) -> Tuple[str, int]:
+    """Splits an ISO-8601 timestamp into its local part (to the second) and its UTC offset in seconds."""
+    local, suffix = value[:19], value[19:].strip()
+    if not suffix or suffix == "Z":
+        return local, 0
+    match = _TIME_SUFFIX_RE.fullmatch(suffix)
+    offset = match.group(1) if match else None
+    if offset is None or offset == "Z":
+        return local, 0
+    seconds = int(offset[1:3]) * 3600 + (int(offset[-2:]) * 60 if len(offset) > 3 else 0)
+    return local, -seconds if offset[0] == "-" else seconds
+
+
+def _parse_times(values: List[str]) -> np.ndarray:
+    # NumPy does not parse UTC offsets, so they are split off and applied afterwards.
+    split = [_split_offset(value) if value else ("NaT", 0) for value in values]
+    trimmed = [local for local, _ in split]
+    try:
+        times = np.array(trimmed, dtype="datetime64[s]")
+    except ValueError:
+        parsed = []
+        for value in trimmed:
+            try:
+                parsed.append(np.datetime64(value, "s"))
+            except ValueError:
+                parsed.append(np.datetime64("NaT"))
+        times = np.array(parsed, dtype="datetime64[s]")
+    offsets = np.fromiter((offset for _, offset in split), dtype=np.int64, count=len(split))
+    return times - offsets.astype("timedelta64[s]")
+
+
+def _encode(values: Iterable[str]) -> Tuple[np.ndarray, Tuple[str, ...]]:
+    """Dictionary-encodes strings into int32 codes; the empty string is always code 0."""
+    lookup: Dict[str, int] = {"": 0}
+    codes = [lookup.setdefault(value, len(lookup)) for value in values]
+    return np.array(codes, dtype=np.int32), tuple(lookup)
+
+
+def _epoch(bound: TimeBound) -> Optional[int]:
+    if bound is None or isinstance(bound, (int, np.integer)):
+        return bound
+    if isinstance(bound, (date, datetime)):
+        bound = bound.isoformat()
+    local, offset = _split_offset(str(bound))
+    return int(np.datetime64(local, "s").astype("int64")) - offset
+
+
+def _to_pence(value: Any) -> int:
+    try:
+        return int(round(float(value) * 100))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+class TransactionTable:
+    """Parallel typed columns, one element per transaction, sorted by time.
+
+    Columns: ids (object), epoch (int64 seconds), valid_time (bool),
+    amount_pence (int64, outflows negative), is_cash (bool), latitude /
+    longitude (float64, NaN if unknown) and the categorical codes type_code,
+    country_code, counterparty_code and account_code (int32) indexing into the
+    `types`, `countries`, `counterparties` and `accounts` tuples. Subsets share
+    those tuples. Counterparty accounts are "BANK_IDENTIFIER/ACCOUNT_NUMBER"
+    ("" if the transaction carries no account number).
+    """
+
+    __slots__ = ("ids", "epoch", "valid_time", "amount_pence", "is_cash", "latitude", "longitude",
+                 "type_code", "types", "country_code", "countries", "counterparty_code", "counterparties",
+                 "account_code", "accounts")
+
+    CATEGORICAL = {"transaction_type": ("type_code", "types"), "country": ("country_code", "countries"),
+                   "counterparty": ("counterparty_code", "counterparties"),
+                   "counterparty_account": ("account_code", "accounts")}
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Any]) -> "TransactionTable":
+        """Builds a table from transaction dicts or common.records.Transaction records."""
+        rows = [txn if isinstance(txn, dict) else records.to_builtins(txn) for txn in transactions]
+        times = _parse_times([str(r.get("timestamp") or r.get("date") or "") for r in rows])
+        valid_time = ~np.isnat(times)
+        epoch = np.where(valid_time, times.astype("int64"), np.iinfo(np.int64).max)
+        amount = np.array([_to_pence(r.get("amount")) for r in rows], dtype=np.int64)
+        type_code, types = _encode(str(r.get("transaction_type") or "").lower() for r in rows)
+        # Negative amounts are outflows; unsigned outflows are recognised by their type.
+        is_debit_type = np.array([t in DEBIT_TYPES for t in types], dtype=bool)[type_code]
+        amount = np.where((amount > 0) & is_debit_type, -amount, amount)
+        country_code, countries = _encode((r.get("counterparty_country") or "").upper() for r in rows)
+        counterparty_code, counterparties = _encode(r.get("counterparty_name") or "" for r in rows)
+        account_code, accounts = _encode(_account_key(r) for r in rows)
+
+        table = cls.__new__(cls)
+        table.ids = np.array([str(r.get("transaction_id") or f"row_{i}") for i, r in enumerate(rows)], dtype=object)
+        table.epoch = epoch
+        table.valid_time = valid_time
+        table.amount_pence = amount
+        table.is_cash = np.array([bool(r.get("is_cash_transaction")) for r in rows], dtype=bool)
+        table.latitude = np.array([_coordinate(r.get("transaction_location_latitude")) for r in rows], dtype=np.float64)
+        table.longitude = np.array([_coordinate(r.get("transaction_location_longitude")) for r in rows], dtype=np.float64)
+        table.type_code, table.types = type_code, types
+        table.country_code, table.countries = country_code, countries
+        table.counterparty_code, table.counterparties = counterparty_code, counterparties
+        table.account_code, table.accounts = account_code, accounts
+        return table.take(np.argsort(epoch, kind="stable"))
+
+    @classmethod
+    def from_history(cls, history: Any) -> "TransactionTable":
+        """Accepts a table, a fetch_transaction_history result or payload, or a list of transactions."""
+        if isinstance(history, cls):
+            return history
+        return cls.from_transactions(extract_transactions(history))
+
+    # --- Column access ----------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def amount(self) -> np.ndarray:
+        """Signed amounts in pounds (float64)."""
+        return self.amount_pence / 100.0
+
+    @property
+    def country(self) -> np.ndarray:
+        return np.array(self.countries, dtype=object)[self.country_code]
+
+    @property
+    def counterparty(self) -> np.ndarray:
+        return np.array(self.counterparties, dtype=object)[self.counterparty_code]
+
+    @property
+    def counterparty_account(self) -> np.ndarray:
+        return np.array(self.accounts, dtype=object)[self.account_code]
+
+    @property
+    def transaction_type(self) -> np.ndarray:
+        return np.array(self.types, dtype=object)[self.type_code]
+
+    def iso(self, index: int) -> Optional[str]:
+        if not self.valid_time[index]:
+            return None
+        return str(np.datetime64(int(self.epoch[index]), "s")) + "Z"
+
+    # --- Queries -----------------------------------------------------------------
+
+    def take(self, index: Union[np.ndarray, slice]) -> "TransactionTable":
+        """Returns the rows selected by an index array, boolean mask or slice (order preserved)."""
+        table = TransactionTable.__new__(TransactionTable)
+        for name in ("ids", "epoch", "valid_time", "amount_pence", "is_cash", "latitude", "longitude",
+                     "type_code", "country_code", "counterparty_code", "account_code"):
+            setattr(table, name, getattr(self, name)[index])
+        table.types, table.countries, table.counterparties = self.types, self.countries, self.counterparties
+        table.accounts = self.accounts
+        return table
+
+    def filter(self, mask: Optional[np.ndarray] = None, direction: Optional[str] = None,
+               is_cash: Optional[bool] = None, min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+               countries: Optional[Sequence[str]] = None, counterparties: Optional[Sequence[str]] = None,
+               transaction_types: Optional[Sequence[str]] = None) -> "TransactionTable":
+        """Returns the rows matching every given condition.
+
+        direction is "credit" (inflows) or "debit" (outflows); min_amount and
+        max_amount bound the absolute amount in pounds, max_amount exclusive.
+        """
+        keep = np.ones(len(self), dtype=bool) if mask is None else np.asarray(mask, dtype=bool).copy()
+        if direction == "credit":
+            keep &= self.amount_pence > 0
+        elif direction == "debit":
+            keep &= self.amount_pence < 0
+        elif direction is not None:
+            raise ValueError(f"direction must be 'credit' or 'debit', got {direction!r}")
+        if is_cash is not None:
+            keep &= self.is_cash == is_cash
+        size = np.abs(self.amount_pence)
+        if min_amount is not None:
+            keep &= size >= int(round(min_amount * 100))
+        if max_amount is not None:
+            keep &= size < int(round(max_amount * 100))
+        if countries is not None:
+            keep &= self._isin("country", [c.upper() for c in countries])
+        if counterparties is not None:
+            keep &= self._isin("counterparty", counterparties)
+        if transaction_types is not None:
+            keep &= self._isin("transaction_type", [t.lower() for t in transaction_types])
+        return self.take(keep)
+
+    def _isin(self, column: str, values: Sequence[str]) -> np.ndarray:
+        code_attr, categories_attr = self.CATEGORICAL[column]
+        wanted = set(values)
+        selected = np.array([c in wanted for c in getattr(self, categories_attr)], dtype=bool)
+        return selected[getattr(self, code_attr)]
+
+    def window(self, start: TimeBound = None, end: TimeBound = None) -> "TransactionTable":
+        """Returns the rows with start <= timestamp < end (dates, ISO strings or epoch seconds)."""
+        valid = int(self.valid_time.sum())
+        lo = 0 if start is None else int(np.searchsorted(self.epoch[:valid], _epoch(start), side="left"))
+        hi = valid if end is None else int(np.searchsorted(self.epoch[:valid], _epoch(end), side="left"))
+        return self.take(slice(lo, max(lo, hi)))
+
+    def rolling(self, window_seconds: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """For each timed row, the forward window [t, t + window_seconds).
+
+        Returns (end, count, total_pence): `end` is the exclusive end row of the
+        window, `count` its number of rows and `total_pence` its absolute amount.
+        """
+        valid = int(self.valid_time.sum())
+        epoch = self.epoch[:valid]
+        end = np.searchsorted(epoch, epoch + window_seconds, side="left")
+        prefix = np.concatenate(([0], np.cumsum(np.abs(self.amount_pence[:valid]))))
+        start = np.arange(valid)
+        return end, end - start, prefix[end] - prefix[start]
+
+    def group_by(self, key: str) -> List[Dict[str, Any]]:
+        """Aggregates by "country", "counterparty", "counterparty_account", "transaction_type", "day" or "month".
+
+        Returns one {key, count, inflow, outflow, net} dict per group (pounds),
+        largest gross flow first.
+        """
+        if key in self.CATEGORICAL:
+            code_attr, categories_attr = self.CATEGORICAL[key]
+            codes, labels = getattr(self, code_attr), getattr(self, categories_attr)
+        elif key in ("day", "month"):
+            times = np.where(self.valid_time, self.epoch, 0).astype("datetime64[s]")
+            times = times.astype("datetime64[D]" if key == "day" else "datetime64[M]")
+            labels_array, codes = np.unique(times, return_inverse=True)
+            labels = [str(label) for label in labels_array]
+            codes = np.where(self.valid_time, codes, len(labels))
+            labels = labels + [""]
+        else:
+            raise ValueError(f"Cannot group transactions by {key!r}")
+        size = len(labels)
+        counts = np.bincount(codes, minlength=size)
+        inflow = np.bincount(codes, weights=np.where(self.amount_pence > 0, self.amount_pence, 0), minlength=size)
+        outflow = np.bincount(codes, weights=np.where(self.amount_pence < 0, -self.amount_pence, 0), minlength=size)
+        present = np.flatnonzero(counts)
+        present = present[np.argsort(-(inflow[present] + outflow[present]), kind="stable")]
+        return [
+            {key: labels[g], "count": int(counts[g]), "inflow": round(float(inflow[g]) / 100, 2),
+             "outflow": round(float(outflow[g]) / 100, 2), "net": round(float(inflow[g] - outflow[g]) / 100, 2)}
+            for g in present
+        ]
+
+    def to_dicts(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Compact row dicts (id, timestamp, amount, type, counterparty, country, location) for the LLM."""
+        rows = []
+        for i in range(len(self) if limit is None else min(limit, len(self))):
+            row = {
+                "transaction_id": self.ids[i],
+                "timestamp": self.iso(i),
+                "amount": int(self.amount_pence[i]) / 100,
+                "transaction_type": self.types[self.type_code[i]],
+                "counterparty_name": self.counterparties[self.counterparty_code[i]] or None,
+                "counterparty_country": self.countries[self.country_code[i]] or None,
+                "is_cash_transaction": bool(self.is_cash[i]),
+            }
+            if not np.isnan(self.latitude[i]) and not np.isnan(self.longitude[i]):
+                row["latitude"], row["longitude"] = float(self.latitude[i]), float(self.longitude[i])
+            rows.append(row)
+        return rows
+
+    def summary(self) -> Dict[str, Any]:
+        valid = self.epoch[self.valid_time]
+        return {
+            "transaction_count": len(self),
+            "first_timestamp": self.iso(0) if len(valid) else None,
+            "last_timestamp": self.iso(len(valid) - 1) if len(valid) else None,
+            "total_inflow": round(float(self.amount_pence[self.amount_pence > 0].sum()) / 100, 2),
+            "total_outflow": round(float(-self.amount_pence[self.amount_pence < 0].sum()) / 100, 2),
+            "cash_transaction_count": int(self.is_cash.sum()),
+            "counterparty_countries": sorted(set(self.countries[c] for c in np.unique(self.country_code)) - {""}),
+        }
+
+
+def _account_key(row: Dict[str, Any]) -> str:
+    number = str(row.get("counterparty_account_number") or "").strip()
+    if not number:
+        return ""
+    return f"{str(row.get('counterparty_bank_identifier') or '').strip().upper()}/{number}"
+
+
+def _coordinate(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+# --- Registry -------------------------------------------------------------------
+
+_tables: "OrderedDict[str, TransactionTable]" = OrderedDict()
+_tables_lock = threading.Lock()
+
+
+def table_handle(account_number: str, start_date: str, end_date: str) -> str:
+    return f"{account_number}:{start_date}:{end_date}"
+
+
+def register_table(handle: str, table: TransactionTable) -> str:
+    """Stores a table under `handle`, evicting the least recently used beyond the registry size."""
+    with _tables_lock:
+        _tables[handle] = table
+        _tables.move_to_end(handle)
+        while len(_tables) > TRANSACTION_TABLE_REGISTRY_SIZE:
+            _tables.popitem(last=False)
+    return handle
+
+
+def get_table(handle: str) -> Optional[TransactionTable]:
+    with _tables_lock:
+        table = _tables.get(handle)
+        if table is not None:
+            _tables.move_to_end(handle)
+        return table
+
+
+def load_table(account_number: str, start_date: str, end_date: str,
+               tool_context: Optional[ToolContext] = None) -> TransactionTable:
+    """Returns the review's transaction table, building it on first use.
+
+    The handle is recorded in session state (tool_context.state) so later tools and
+    sub-agents of the same review find it. Raises ValueError if the history cannot
+    be fetched.
+    """
+    handle = table_handle(account_number, start_date, end_date)
+    state_key = STATE_KEY_PREFIX + handle
+    table = get_table(handle)
+    if table is None:
+        table = TransactionTable.from_history(fetch_transaction_history(account_number, start_date, end_date))
+        register_table(handle, table)
+    if tool_context is not None and state_key not in tool_context.state:
+        tool_context.state[state_key] = handle
+    return table
+
+
+def resolve_table(review_handle: str, tool_context: Optional[ToolContext] = None) -> TransactionTable:
+    """Returns the table behind a review handle, rebuilding it if it was evicted.
+
+    Raises ValueError for a malformed handle or if the history cannot be fetched.
+    """
+    table = get_table(review_handle)
+    if table is not None:
+        return table
+    parts = str(review_handle).split(":")
+    if len(parts) != 3 or not all(parts):
+        raise ValueError(f"Unknown review handle {review_handle!r}; call load_review_transactions first.")
+    return load_table(*parts, tool_context=tool_context)
+
+
+# --- Agent tools ------------------------------------------------------------------
+
+def load_review_transactions(account_number: str, start_date: str, end_date: str,
+                             tool_context: Optional[ToolContext] = None) -> dict:
+    """
+    Retrieves the account's transaction history for the review period and keeps it
+    server-side for the rest of the review. Returns a short `review_handle` plus an
+    overview instead of the transactions themselves; pass the handle to the sub-agents,
+    whose tools read the transactions from it.
+
+    Args:
+        account_number (str): The account number under review.
+        start_date (str): Start of the review period (YYYY-MM-DD).
+        end_date (str): End of the review period (YYYY-MM-DD).
+
+    Returns:
+        dict: A dictionary containing:
+              - 'status' (str): "success" or "error".
+              - 'data' (dict, optional): 'review_handle', 'transaction_count', first/last timestamp,
+                total inflow/outflow, cash transaction count and counterparty countries.
+              - 'error_message' (str, optional): A description of the error if status is "error".
+    """
+    try:
+        table = load_table(account_number, start_date, end_date, tool_context)
+    except ValueError as e:
+        return {"status": "error", "error_message": f"Failed to fetch transaction history. {e}"}
+    return {"status": "success", "data": dict(review_handle=table_handle(account_number, start_date, end_date),
+                                              **table.summary())}
+
+
+def query_review_transactions(review_handle: str, direction: Optional[str] = None, is_cash: Optional[bool] = None,
+                              min_amount: Optional[float] = None, counterparty_country: Optional[str] = None,
+                              counterparty_name: Optional[str] = None, start: Optional[str] = None,
+                              end: Optional[str] = None, has_location: Optional[bool] = None,
+                              limit: Optional[int] = None, tool_context: Optional[ToolContext] = None) -> dict:
+    """
+    Returns transactions of the review that match the given filters, largest amounts first.
+    Use it to inspect specific transactions rather than requesting the whole history.
+
+    Args:
+        review_handle (str): The handle returned by load_review_transactions.
+        direction (str, optional): "credit" for inflows or "debit" for outflows.
+        is_cash (bool, optional): Only cash (True) or only non-cash (False) transactions.
+        min_amount (float, optional): Smallest absolute amount.
+        counterparty_country (str, optional): ISO country code of the counterparty.
+        counterparty_name (str, optional): Exact counterparty name.
+        start (str, optional): Earliest timestamp or date (inclusive).
+        end (str, optional): Latest timestamp or date (exclusive).
+        has_location (bool, optional): Only transactions with (True) or without (False) coordinates.
+        limit (int, optional): Maximum rows returned; defaults to 50.
+
+    Returns:
+        dict: A dictionary containing:
+              - 'status' (str): "success" or "error".
+              - 'data' (dict, optional): 'match_count' and 'transactions' (compact rows).
+              - 'error_message' (str, optional): A description of the error if status is "error".
+    """
+    try:
+        table = resolve_table(review_handle, tool_context).window(start, end)
+        mask = None
+        if has_location is not None:
+            mask = ~(np.isnan(table.latitude) | np.isnan(table.longitude)) == has_location
+        table = table.filter(
+            mask, direction=direction, is_cash=is_cash, min_amount=min_amount,
+            countries=[counterparty_country] if counterparty_country else None,
+            counterparties=[counterparty_name] if counterparty_name else None,
+        )
+    except ValueError as e:
+        return {"status": "error", "error_message": str(e)}
+    largest_first = table.take(np.argsort(-np.abs(table.amount_pence), kind="stable"))
+    return {"status": "success", "data": {
+        "match_count": len(table),
+        "transactions": largest_first.to_dicts(limit or REVIEW_QUERY_LIMIT),
+    }}
+
+
+def summarize_review_transactions(review_handle: str, group_by: str,
+                                  tool_context: Optional[ToolContext] = None) -> dict:
+    """
+    Aggregates the review's transactions by "country" (counterparty country), "counterparty",
+    "transaction_type", "day" or "month": count, inflow, outflow and net per group,
+    largest flows first.
+
+    Args:
+        review_handle (str): The handle returned by load_review_transactions.
+        group_by (str): One of "country", "counterparty", "transaction_type", "day", "month".
+
+    Returns:
+        dict: A dictionary containing:
+              - 'status' (str): "success" or "error".
+              - 'data' (dict, optional): 'group_count' and 'groups' (at most 100).
+              - 'error_message' (str, optional): A description of the error if status is "error".
+    """
+    try:
+        groups = resolve_table(review_handle, tool_context).group_by(group_by)
+    except ValueError as e:
+        return {"status": "error", "error_message": str(e)}
+    return {"status": "success", "data": {"group_count": len(groups), "groups": groups[:100]}}
@@ -0,0 +1,372 @@
+# aml_agent/watchlist_index.py
+"""Local watchlist screening engine over a watchlist snapshot file.
+
+Every name and alias of the snapshot is normalised (accents, punctuation and
+legal-form suffixes such as "Ltd" removed) and indexed two ways:
+- character trigrams, kept as NumPy posting arrays, so a query only scores
+  names sharing a good part of its trigrams (typos, transliterations);
+- a phonetic key (Soundex per token, sorted), so "Mohammed Aly" still finds
+  "Muhammad Ali" even when few trigrams survive.
+Candidates are scored with Jaro-Winkler on the name, on its sorted tokens and
+token by token, and filtered by date of birth, country and entity type where
+both sides carry one. screen_many() deduplicates its queries first, so sweeping
+a portfolio costs one pass per distinct name, with no HTTP calls.
+
+The snapshot is not shipped with the repository (see config.py). Without it,
+screen_counterparties_locally says so and screens every distinct counterparty
+through the watchlist service instead.
+"""
+import functools
+import json
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from google.adk.tools import ToolContext
+
+from aml_agent.transaction_table import resolve_table
+from config import (
+    WATCHLIST_MATCH_THRESHOLD,
+    WATCHLIST_MAX_CANDIDATES,
+    WATCHLIST_NGRAM_MIN_OVERLAP,
+    WATCHLIST_SNAPSHOT_PATH,
+)
+
+LEGAL_SUFFIXES = frozenset({
+    "ltd", "limited", "llc", "llp", "lp", "plc", "inc", "incorporated", "corp", "corporation", "co", "company",
+    "gmbh", "ag", "sa", "sarl", "srl", "spa", "bv", "nv", "fze", "fzco", "fzc", "jsc", "ooo", "pjsc", "holdings",
+})
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_SOUNDEX_CODES = {**dict.fromkeys("bfpv", "1"), **dict.fromkeys("cgjkqsxz", "2"), **dict.fromkeys("dt", "3"),
+                  "l": "4", **dict.fromkeys("mn", "5"), "r": "6"}
+
+
+def normalize_name(name: str) -> str:
+    """Lower-case ASCII tokens with punctuation and legal-form suffixes removed."""
+    ascii_name = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii")
+    tokens = _NON_ALNUM.sub(" ", ascii_name.lower()).split()
+    kept = [t for t in tokens if t not in LEGAL_SUFFIXES]
+    return " ".join(kept or tokens)
+
+
+def _soundex(token: str) -> str:
+    letters = [c for c in token if c.isalpha()]
+    if not letters:
+        return token
+    code, previous = [letters[0]], _SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        digit = _SOUNDEX_CODES.get(c, "")
+        if digit and digit != previous:
+            code.append(digit)
+        if c not in "hw":
+            previous = digit
+    return ("".join(code) + "000")[:4]
+
+
+def phonetic_key(normalized: str) -> str:
+    """Order-independent phonetic key of a normalised name."""
+    return " ".join(sorted(_soundex(t) for t in normalized.split()))
+
+
+def _trigrams(normalized: str) -> List[str]:
+    padded = f"  {normalized} "
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+def jaro_winkler(a: str, b: str, prefix_scale: float = 0.1) -> float:
+    """Jaro-Winkler similarity in [0, 1]."""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    reach = max(0, max(len(a), len(b)) // 2 - 1)
+    b_used = [False] * len(b)
+    a_matches = []
+    for i, c in enumerate(a):
+        end = min(len(b), i + reach + 1)
+        j = b.find(c, max(0, i - reach), end)
+        while j != -1 and b_used[j]:
+            j = b.find(c, j + 1, end)
+        if j != -1:
+            b_used[j] = True
+            a_matches.append(c)
+    matches = len(a_matches)
+    if not matches:
+        return 0.0
+    b_matches = [c for c, used in zip(b, b_used) if used]
+    transpositions = sum(x != y for x, y in zip(a_matches, b_matches)) / 2
+    jaro = (matches / len(a) + matches / len(b) + (matches - transpositions) / matches) / 3
+    prefix = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefix += 1
+    return jaro + prefix * prefix_scale * (1 - jaro)
+
+
+@functools.lru_cache(maxsize=65536)
+def _token_similarity(a: str, b: str) -> float:
+    # Name tokens repeat heavily across a watchlist ("mohammed", "smith"); memoised.
+    return jaro_winkler(a, b)
+
+
+def name_similarity(a: str, b: str) -> float:
+    """Best of whole-name, sorted-token and token-by-token Jaro-Winkler for normalised names."""
+    a_tokens, b_tokens = a.split(), b.split()
+    score = jaro_winkler(a, b)
+    a_sorted, b_sorted = sorted(a_tokens), sorted(b_tokens)
+    if a_sorted != a_tokens or b_sorted != b_tokens:
+        score = max(score, jaro_winkler(" ".join(a_sorted), " ".join(b_sorted)))
+    if a_tokens and b_tokens and score < 1.0:
+        short, long = sorted((a_tokens, b_tokens), key=len)
+        per_token = sum(max(_token_similarity(t, u) for u in long) for t in short) / len(short)
+        # A name covering only part of the other (missing middle names) is discounted.
+        score = max(score, per_token * (len(short) / len(long)) ** 0.5)
+    return score
+
+
+def _dates_agree(query: Optional[str], listed: Sequence[str]) -> bool:
+    if not query or not listed:
+        return True
+    # Compare at the precision both sides carry ("1970" vs "1970-03-02").
+    return any(query[:min(len(query), len(d))] == d[:min(len(query), len(d))] for d in listed)
+
+
+def _as_list(value: Any) -> List[str]:
+    if value is None or value == "":
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value if v]
+    return [str(value)]
+
+
+class WatchlistIndex:
+    """In-memory screening index over watchlist entries (names and aliases)."""
+
+    def __init__(self, entries: Iterable[Dict[str, Any]], version: Optional[str] = None):
+        self.version = version
+        self.entries: List[Dict[str, Any]] = []
+        names: List[str] = []
+        owners: List[int] = []
+        postings: Dict[str, List[int]] = {}
+        phonetic: Dict[str, List[int]] = {}
+        for entry in entries:
+            primary = entry.get("name") or entry.get("entity_name")
+            if not primary:
+                continue
+            entry_index = len(self.entries)
+            self.entries.append({
+                "entry_id": str(entry.get("entry_id") or entry.get("id") or entry_index),
+                "name": str(primary),
+                "entity_type": (entry.get("entity_type") or "").lower() or None,
+                "list_name": entry.get("list_name") or "Watchlist",
+                "reason": entry.get("reason") or entry.get("match_reason") or "",
+                "dates_of_birth": _as_list(entry.get("dates_of_birth") or entry.get("date_of_birth")),
+                "countries": [c.upper() for c in _as_list(entry.get("countries") or entry.get("country"))],
+            })
+            for raw in [primary] + _as_list(entry.get("aliases")):
+                normalized = normalize_name(raw)
+                if not normalized:
+                    continue
+                name_index = len(names)
+                names.append(normalized)
+                owners.append(entry_index)
+                for gram in _trigrams(normalized):
+                    postings.setdefault(gram, []).append(name_index)
+                phonetic.setdefault(phonetic_key(normalized), []).append(name_index)
+        self.names = names
+        self.owners = np.array(owners, dtype=np.int32)
+        self.gram_counts = np.array([len(_trigrams(n)) for n in names], dtype=np.int32)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self.phonetic = {key: np.array(ids, dtype=np.int32) for key, ids in phonetic.items()}
+
+    @classmethod
+    def from_snapshot(cls, path: str) -> "WatchlistIndex":
+        """Loads a snapshot: a JSON list, {"version": ..., "entries": [...]} or JSON Lines."""
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        version = None
+        try:
+            body = json.loads(text)
+        except ValueError:
+            body = [json.loads(line) for line in text.splitlines() if line.strip()]
+        if isinstance(body, dict):
+            version = body.get("version")
+            body = body.get("entries") or []
+        return cls(body, version=str(version) if version is not None else None)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _candidates(self, normalized: str, min_overlap: float, max_candidates: int) -> np.ndarray:
+        grams = _trigrams(normalized)
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        found = [self.phonetic.get(phonetic_key(normalized), np.empty(0, dtype=np.int32))]
+        if lists:
+            ids, shared = np.unique(np.concatenate(lists), return_counts=True)
+            # Dice-style overlap, so long names do not match everything that shares a few grams.
+            overlap = 2 * shared / (len(grams) + self.gram_counts[ids])
+            keep = np.flatnonzero(overlap >= min_overlap)
+            keep = keep[np.argsort(-overlap[keep], kind="stable")][:max_candidates]
+            found.append(ids[keep])
+        return np.unique(np.concatenate(found))
+
+    def screen(self, name: str, entity_type: Optional[str] = None, country: Optional[str] = None,
+               date_of_birth: Optional[str] = None, aliases: Optional[List[str]] = None,
+               threshold: float = WATCHLIST_MATCH_THRESHOLD, min_overlap: float = WATCHLIST_NGRAM_MIN_OVERLAP,
+               max_candidates: int = WATCHLIST_MAX_CANDIDATES) -> List[Dict[str, Any]]:
+        """Returns the watchlist entries matching a name (or any alias), best first, one per entry."""
+        best: Dict[int, Dict[str, Any]] = {}
+        country = country.upper() if country else None
+        entity_type = entity_type.lower() if entity_type else None
+        for query in [name] + list(aliases or []):
+            normalized = normalize_name(query)
+            if not normalized:
+                continue
+            key = phonetic_key(normalized)
+            for name_index in self._candidates(normalized, min_overlap, max_candidates):
+                entry_index = int(self.owners[name_index])
+                entry = self.entries[entry_index]
+                if entity_type and entry["entity_type"] and entity_type != entry["entity_type"]:
+                    continue
+                if country and entry["countries"] and country not in entry["countries"]:
+                    continue
+                if not _dates_agree(date_of_birth, entry["dates_of_birth"]):
+                    continue
+                listed = self.names[name_index]
+                score = name_similarity(normalized, listed)
+                if score < threshold or score <= best.get(entry_index, {}).get("score", -1):
+                    continue
+                best[entry_index] = {
+                    "entry_id": entry["entry_id"],
+                    "list_name": entry["list_name"],
+                    "listed_name": entry["name"],
+                    "matched_name": listed,
+                    "score": round(score, 3),
+                    "phonetic_match": key == phonetic_key(listed),
+                    "match_reason": entry["reason"],
+                }
+        return sorted(best.values(), key=lambda m: m["score"], reverse=True)
+
+    def screen_many(self, entities: Sequence[Dict[str, Any]], **kwargs: Any) -> List[List[Dict[str, Any]]]:
+        """Screens many entities ({"entity_name", "entity_type", "country", "date_of_birth", "aliases"}).
+
+        Entities that normalise to the same name with the same filters are screened once.
+        """
+        results: Dict[Tuple, List[Dict[str, Any]]] = {}
+        keys = []
+        for entity in entities:
+            key = (normalize_name(entity.get("entity_name") or ""), (entity.get("entity_type") or "").lower(),
+                   (entity.get("country") or "").upper(), entity.get("date_of_birth") or "",
+                   tuple(sorted(normalize_name(a) for a in entity.get("aliases") or [])))
+            keys.append(key)
+            if key not in results:
+                results[key] = self.screen(entity.get("entity_name") or "", entity.get("entity_type"),
+                                           entity.get("country"), entity.get("date_of_birth"),
+                                           entity.get("aliases"), **kwargs)
+        return [results[key] for key in keys]
+
+
+_index: Optional[WatchlistIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_watchlist_index() -> WatchlistIndex:
+    """Returns the process-wide index, loading WATCHLIST_SNAPSHOT_PATH on first use.
+
+    Raises OSError if the snapshot file is missing and ValueError if it cannot be parsed.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = WatchlistIndex.from_snapshot(WATCHLIST_SNAPSHOT_PATH)
+                print(f"Watchlist snapshot loaded: {len(_index)} entries, version {_index.version}")
+    return _index
+
+
+def _service_screening(table: Any, reason: str) -> dict:
+    # Imported here: counterparty_screening builds on this module's name normalisation.
+    from aml_agent.counterparty_screening import screen_counterparties
+
+    data = screen_counterparties(table)
+    matches = [{
+        "counterparty_name": hit["counterparty_name"],
+        "counterparty_countries": [hit["counterparty_country"]] if hit["counterparty_country"] else [],
+        "transaction_count": hit["transaction_count"],
+        "amount": hit["amount"],
+        "watchlist_matches": [{"list_name": d.get("list_name"), "listed_name": d.get("matched_name"),
+                               "match_reason": d.get("match_reason"), "confirmed": True}
+                              for d in hit["watchlist_details"]],
+    } for hit in data["hits"]]
+    return {"status": "success", "data": {
+        "source": "watchlist_service",
+        "fallback_reason": reason,
+        "counterparties_screened": data["screened"],
+        "watchlist_version": None,
+        "match_count": len(matches),
+        "matches": matches,
+        "errors": data["errors"],
+    }}
+
+
+def screen_counterparties_locally(review_handle: str, tool_context: Optional[ToolContext] = None) -> dict:
+    """
+    Screens every counterparty of the review's transactions against the bank's local
+    watchlist snapshot in one pass (fuzzy name matching, filtered by counterparty country).
+    Use it before screening individual entities with check_entity_against_watchlists.
+    If no snapshot is installed, every distinct counterparty is screened through the
+    watchlist service instead and the matches returned are already confirmed.
+
+    Args:
+        review_handle (str): The handle returned by load_review_transactions.
+
+    Returns:
+        dict: A dictionary containing:
+              - 'status' (str): "success" or "error".
+              - 'data' (dict, optional): 'source' ("local_snapshot" or "watchlist_service"),
+                'counterparties_screened', 'watchlist_version', 'match_count' and 'matches', each with
+                counterparty_name, counterparty_countries, transaction_count, amount and 'watchlist_matches'
+                (list_name, listed_name, score, match_reason; 'confirmed' instead of a score from the service).
+                From the service, also 'fallback_reason' and 'errors' (counterparties that could not be screened).
+              - 'error_message' (str, optional): A description of the error if status is "error".
+    """
+    try:
+        table = resolve_table(review_handle, tool_context)
+    except ValueError as e:
+        return {"status": "error", "error_message": str(e)}
+    try:
+        index = get_watchlist_index()
+    except (OSError, ValueError) as e:
+        print(f"Watchlist snapshot unavailable, screening through the watchlist service: {e}")
+        return _service_screening(table, f"Watchlist snapshot unavailable: {e}")
+
+    # One screening per distinct (counterparty, country) pair.
+    pairs = {(int(p), int(c)) for p, c in zip(table.counterparty_code, table.country_code)}
+    entities = [{"entity_name": table.counterparties[p], "country": table.countries[c] or None}
+                for p, c in sorted(pairs) if table.counterparties[p]]
+    matches: Dict[str, Dict[str, Any]] = {}
+    for entity, hits in zip(entities, index.screen_many(entities)):
+        if not hits:
+            continue
+        name = entity["entity_name"]
+        rows = np.flatnonzero(table.counterparty_code == table.counterparties.index(name))
+        found = matches.setdefault(name, {
+            "counterparty_name": name,
+            "counterparty_countries": sorted({table.countries[c] for c in table.country_code[rows] if table.countries[c]}),
+            "transaction_count": len(rows),
+            "amount": round(float(np.abs(table.amount_pence[rows]).sum()) / 100, 2),
+            "watchlist_matches": [],
+        })
+        known = {m["entry_id"] for m in found["watchlist_matches"]}
+        found["watchlist_matches"].extend(h for h in hits if h["entry_id"] not in known)
+    ranked = sorted(matches.values(), key=lambda m: max(h["score"] for h in m["watchlist_matches"]), reverse=True)
+    return {"status": "success", "data": {
+        "source": "local_snapshot",
+        "counterparties_screened": len({e["entity_name"] for e in entities}),
+        "watchlist_version": index.version,
+        "match_count": len(ranked),
+        "matches": ranked,
+    }}
@@ -0,0 +1,3 @@
+# common/__init__.py
+# Shared infrastructure used by the aml_agent, underwriting_agent and
+# financial_concierge bank API clients.
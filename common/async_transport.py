@@ -0,0 +1,173 @@
+# common/async_transport.py
+"""Shared, pooled asyncio HTTP transport for the async bank API clients.
+
+The async_bank_api_client modules use one httpx.AsyncClient per running event
+loop, so ADK tools declared with `async def` never block the server's loop while
+waiting on the network. Pool sizing and timeouts follow the same config.py
+settings as the synchronous transport in common/transport.py, and so does the
+per-endpoint retry / circuit-breaker / hedging policy of common/resilience.py
+and the rate limits of common/rate_limit.py.
+"""
+import asyncio
+import time
+import weakref
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from config import (
+    HTTP_ASYNC_MAX_CONNECTIONS,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_POOL_MAXSIZE,
+    HTTP_READ_TIMEOUT,
+)
+from common import rate_limit, resilience
+from common.transport import host_pool_sizes
+
+DEFAULT_TIMEOUT = httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+# httpx clients are bound to the loop they were first used on, so keep one per loop.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+class AsyncCircuitOpenError(httpx.TransportError):
+    """Raised instead of calling an endpoint whose circuit is open."""
+
+
+def _build_client() -> httpx.AsyncClient:
+    mounts = {}
+    for host, size in host_pool_sizes().items():
+        limits = httpx.Limits(max_connections=size, max_keepalive_connections=size)
+        mounts[f"all://{host}"] = httpx.AsyncHTTPTransport(limits=limits)
+    return httpx.AsyncClient(
+        timeout=DEFAULT_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=HTTP_ASYNC_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_POOL_MAXSIZE,
+        ),
+        mounts=mounts,
+        follow_redirects=True,  # Match requests' default behaviour.
+    )
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Returns the pooled AsyncClient for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _build_client()
+        _clients[loop] = client
+    return client
+
+
+async def aclose_client() -> None:
+    """Closes the running loop's AsyncClient and its pooled connections."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def _timed(send: Callable[[], Awaitable[httpx.Response]], state: resilience.EndpointState) -> httpx.Response:
+    started = time.monotonic()
+    response = await send()
+    if response.is_success:
+        state.latency.record(time.monotonic() - started)
+    return response
+
+
+async def _send_hedged(send: Callable[[], Awaitable[httpx.Response]], delay: float,
+                       state: resilience.EndpointState) -> httpx.Response:
+    primary = asyncio.ensure_future(send())
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return primary.result()
+        state.hedges += 1
+        backup = asyncio.ensure_future(send())
+        tasks.add(backup)
+        error = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is backup:
+                        state.hedge_wins += 1
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()  # The losing request is abandoned and its connection released.
+
+
+async def request(method: str, url: str, stream: bool = False, **kwargs) -> httpx.Response:
+    """Sends a request through the loop's pooled client. Mirrors httpx.request().
+
+    Runs under the endpoint's policy from common/resilience.py (async counterpart
+    of resilience.call) and raises AsyncCircuitOpenError while its circuit is open.
+    With stream=True the body is left unread, as with requests' stream=True; the
+    caller reads it with aiter_bytes() and must aclose() the response.
+    """
+    client = get_async_client()
+    limiter = rate_limit.limiter_for(url)
+    state = resilience.state_for(url)
+    state.calls += 1
+    attempts = state.attempts_for(method)
+    # As in resilience.call: streamed and rate-limited calls are not hedged.
+    hedge_delay = None if stream or limiter is not None else state.hedge_delay(method)
+    if stream:
+        send = lambda: client.send(client.build_request(method, url, **kwargs), stream=True)
+    else:
+        send = lambda: client.request(method, url, **kwargs)
+    for attempt in range(1, attempts + 1):
+        if not state.breaker.allow():
+            raise AsyncCircuitOpenError(f"Circuit open for endpoint '{state.name}'; failing fast.")
+        timed = lambda: _timed(send, state)
+        if limiter is not None:
+            timed = lambda unlimited=timed: limiter.call_async(unlimited)
+        try:
+            if hedge_delay is not None:
+                response = await _send_hedged(timed, hedge_delay, state)
+            else:
+                response = await timed()
+        except httpx.TransportError:
+            state.breaker.record_failure()
+            if attempt == attempts:
+                raise
+            delay = resilience.backoff_delay(state.policy, attempt)
+        except BaseException:
+            state.breaker.release()
+            raise
+        else:
+            if response.status_code >= 500:
+                state.breaker.record_failure()
+            else:
+                state.breaker.record_success()
+            if response.status_code not in resilience.RETRY_STATUSES or attempt == attempts:
+                return response
+            delay = resilience.retry_after_seconds(response.headers.get("Retry-After"), state.policy.backoff_max)
+            if delay is None:
+                delay = resilience.backoff_delay(state.policy, attempt)
+            await response.aclose()
+        state.retries += 1
+        print(f"Retrying {method} {state.name} in {delay:.2f}s (attempt {attempt + 1}/{attempts})")
+        await asyncio.sleep(delay)
+
+
+async def get(url: str, params: Optional[Dict] = None, **kwargs) -> httpx.Response:
+    return await request("GET", url, params=params, **kwargs)
+
+
+async def post(url: str, json: Optional[Dict] = None, **kwargs) -> httpx.Response:
+    return await request("POST", url, json=json, **kwargs)
+
+
+async def put(url: str, json: Optional[Dict] = None, **kwargs) -> httpx.Response:
+    return await request("PUT", url, json=json, **kwargs)
+
+
+async def delete(url: str, **kwargs) -> httpx.Response:
+    return await request("DELETE", url, **kwargs)
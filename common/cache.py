@@ -0,0 +1,207 @@
+# common/cache.py
+"""TTL + LRU caching for slowly-changing reference-data endpoints.
+
+Each cached endpoint owns a TTLCache. The `cached` decorator wraps a sync or
+async tool function so that successful results are kept for the endpoint's TTL.
+Once an entry expires it can still be served for `stale_ttl` seconds while a
+single background call refreshes it (stale-while-revalidate). Hit/miss counters
+for every cache (including other caches added with register_cache) are
+available through cache_stats().
+
+Values are deep-copied on the way in and out, so a caller that edits a result
+(e.g. adds a key to a tool's 'data') never changes what other callers get.
+"""
+import asyncio
+import copy
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from config import CACHE_MAXSIZE, CACHE_STALE_WHILE_REVALIDATE
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+_registry: Dict[str, Any] = {}
+_registry_lock = threading.Lock()
+# Keeps background refresh tasks referenced until they finish.
+_background_tasks = set()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, name: str, ttl: float, maxsize: int = CACHE_MAXSIZE,
+                 stale_ttl: float = CACHE_STALE_WHILE_REVALIDATE):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        register_cache(self)
+
+    def lookup(self, key: Hashable) -> Tuple[str, Any]:
+        """Returns (FRESH | STALE | MISS, a copy of the value) and updates the counters."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            state, value = MISS, None
+            if entry is not None:
+                value, expires_at = entry
+                if now < expires_at:
+                    state = FRESH
+                    self.hits += 1
+                elif now < expires_at + self.stale_ttl:
+                    state = STALE
+                    self.stale_hits += 1
+                else:
+                    del self._entries[key]
+                    value = None
+            if state == MISS:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+        return state, copy.deepcopy(value)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def begin_refresh(self, key: Hashable) -> bool:
+        """Claims the background refresh for `key`; False if one is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: Hashable) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            }
+
+
+def register_cache(cache: Any) -> None:
+    """Adds a cache (anything with `name` and `stats()`) to the cache_stats() report."""
+    with _registry_lock:
+        _registry[cache.name] = cache
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Returns the counters of every TTLCache created in this process, by name."""
+    with _registry_lock:
+        caches = list(_registry.values())
+    return {cache.name: cache.stats() for cache in caches}
+
+
+def is_success(result: Any) -> bool:
+    """Default cacheability check: only successful tool results are cached."""
+    return isinstance(result, dict) and result.get("status") == "success"
+
+
+def make_call_key(signature: inspect.Signature, args, kwargs) -> str:
+    """Builds a stable key for one call, independent of positional vs keyword style."""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return json.dumps(bound.arguments, sort_keys=True, default=str)
+
+
+def cached(cache: TTLCache, should_cache: Callable[[Any], bool] = is_success):
+    """Decorates a sync or async function so its results are served from `cache`.
+
+    The same TTLCache can back both the sync and async variant of an endpoint.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        if inspect.iscoroutinefunction(func):
+            async def refresh_async(key, args, kwargs):
+                try:
+                    result = await func(*args, **kwargs)
+                    if should_cache(result):
+                        cache.set(key, result)
+                except Exception as e:
+                    print(f"Background refresh failed for cache '{cache.name}': {e}")
+                finally:
+                    cache.end_refresh(key)
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = make_call_key(signature, args, kwargs)
+                state, value = cache.lookup(key)
+                if state == FRESH:
+                    return value
+                if state == STALE:
+                    if cache.begin_refresh(key):
+                        task = asyncio.get_running_loop().create_task(refresh_async(key, args, kwargs))
+                        _background_tasks.add(task)
+                        task.add_done_callback(_background_tasks.discard)
+                    return value
+                result = await func(*args, **kwargs)
+                if should_cache(result):
+                    cache.set(key, result)
+                return result
+
+            return async_wrapper
+
+        def refresh(key, args, kwargs):
+            try:
+                result = func(*args, **kwargs)
+                if should_cache(result):
+                    cache.set(key, result)
+            except Exception as e:
+                print(f"Background refresh failed for cache '{cache.name}': {e}")
+            finally:
+                cache.end_refresh(key)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_call_key(signature, args, kwargs)
+            state, value = cache.lookup(key)
+            if state == FRESH:
+                return value
+            if state == STALE:
+                if cache.begin_refresh(key):
+                    threading.Thread(target=refresh, args=(key, args, kwargs), daemon=True).start()
+                return value
+            result = func(*args, **kwargs)
+            if should_cache(result):
+                cache.set(key, result)
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,255 @@
+# common/geocode_cache.py
+"""Persistent (SQLite) cache of reverse-geocoding results keyed by geohash.
+
+Merchant and ATM coordinates repeat across transactions and accounts, but the
+raw floats rarely match exactly. Coordinates are therefore quantized to a
+geohash cell of GEOCODE_CACHE_PRECISION characters (8 -> about 38 m x 19 m)
+and one geocoding result is kept per cell for GEOCODE_CACHE_TTL seconds. When
+the cache holds more than GEOCODE_CACHE_MAXSIZE cells the least recently used
+ones are evicted.
+
+geocode_batch() (and geocode_batch_async()) deduplicates a batch down to its distinct cells before any
+lookup, so spend and latency scale with unique locations rather than with
+transaction count. Counters are reported through common.cache.cache_stats().
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from common.cache import register_cache
+from config import (
+    GEOCODE_BATCH_WORKERS,
+    GEOCODE_CACHE_MAXSIZE,
+    GEOCODE_CACHE_PRECISION,
+    GEOCODE_CACHE_TTL,
+)
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocodes (
+    geohash TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_geocodes_last_used ON geocodes (last_used);
+"""
+# SQLite limits the number of bound parameters per statement.
+_MAX_PARAMS = 500
+
+
+def geohash(latitude: float, longitude: float, precision: int = GEOCODE_CACHE_PRECISION) -> str:
+    """Encodes a coordinate as a geohash of `precision` characters."""
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            value = value * 2 + (longitude >= mid)
+            lon_lo, lon_hi = (mid, lon_hi) if longitude >= mid else (lon_lo, mid)
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            value = value * 2 + (latitude >= mid)
+            lat_lo, lat_hi = (mid, lat_hi) if latitude >= mid else (lat_lo, mid)
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+class GeocodeCache:
+    """SQLite-backed TTL + LRU cache of geocoding payloads, one row per geohash cell."""
+
+    def __init__(self, name: str, path: str, ttl: float = GEOCODE_CACHE_TTL,
+                 maxsize: int = GEOCODE_CACHE_MAXSIZE, precision: int = GEOCODE_CACHE_PRECISION):
+        self.name = name
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.precision = precision
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.deduplicated = 0
+        register_cache(self)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads; keep one per thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def key(self, latitude: float, longitude: float) -> str:
+        return geohash(latitude, longitude, self.precision)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, Any]:
+        """Returns the fresh payloads among `keys` and marks them as recently used."""
+        conn = self._connection()
+        now = time.time()
+        found: Dict[str, Any] = {}
+        expired = 0
+        for start in range(0, len(keys), _MAX_PARAMS):
+            chunk = list(keys[start:start + _MAX_PARAMS])
+            marks = ",".join("?" * len(chunk))
+            for key, payload, fetched_at in conn.execute(
+                    f"SELECT geohash, payload, fetched_at FROM geocodes WHERE geohash IN ({marks})", chunk):
+                if now - fetched_at < self.ttl:
+                    found[key] = json.loads(payload)
+                else:
+                    expired += 1
+        if found:
+            with self._lock, conn:
+                conn.executemany("UPDATE geocodes SET last_used = ? WHERE geohash = ?",
+                                 [(now, key) for key in found])
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+            self.expired += expired
+        return found
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def note_deduplicated(self, count: int) -> None:
+        with self._lock:
+            self.deduplicated += count
+
+    def put_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        rows = [(key, json.dumps(payload), time.time()) for key, payload in items]
+        if not rows:
+            return
+        conn = self._connection()
+        with self._lock, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO geocodes (geohash, payload, fetched_at, last_used) VALUES (?, ?, ?, ?)",
+                [(key, payload, now, now) for key, payload, now in rows],
+            )
+            excess = conn.execute("SELECT COUNT(*) FROM geocodes").fetchone()[0] - self.maxsize
+            if excess > 0:
+                conn.execute("DELETE FROM geocodes WHERE geohash IN "
+                             "(SELECT geohash FROM geocodes ORDER BY last_used LIMIT ?)", (excess,))
+                self.evictions += excess
+
+    def put(self, key: str, payload: Any) -> None:
+        self.put_many([(key, payload)])
+
+    def purge_expired(self) -> int:
+        """Deletes entries older than the TTL; returns how many were removed."""
+        conn = self._connection()
+        with self._lock, conn:
+            return conn.execute("DELETE FROM geocodes WHERE fetched_at <= ?", (time.time() - self.ttl,)).rowcount
+
+    def clear(self) -> None:
+        conn = self._connection()
+        with self._lock, conn:
+            conn.execute("DELETE FROM geocodes")
+
+    def stats(self) -> Dict[str, Any]:
+        size = self._connection().execute("SELECT COUNT(*) FROM geocodes").fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": size,
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "precision": self.precision,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "deduplicated": self.deduplicated,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _plan_batch(cache: GeocodeCache, coordinates: Sequence[Tuple[float, float]]):
+    keys = [cache.key(lat, lon) for lat, lon in coordinates]
+    representative: Dict[str, Tuple[float, float]] = {}
+    for key, point in zip(keys, coordinates):
+        representative.setdefault(key, point)
+    cache.note_deduplicated(len(keys) - len(representative))
+    results: Dict[str, dict] = {key: {"status": "success", "data": payload}
+                                for key, payload in cache.get_many(list(representative)).items()}
+    missing = [key for key in representative if key not in results]
+    return keys, representative, results, missing
+
+
+def _finish_batch(cache: GeocodeCache, keys: List[str], representative: Dict[str, Tuple[float, float]],
+                  results: Dict[str, dict], missing: List[str], fetched: List[dict],
+                  should_cache: Callable[[dict], bool]) -> Dict[str, Any]:
+    hits = len(representative) - len(missing)
+    results.update(zip(missing, fetched))
+    cache.put_many((key, result["data"]) for key, result in zip(missing, fetched) if should_cache(result))
+    unique = len(representative)
+    return {
+        "results": [dict(results[key], geohash=key) for key in keys],
+        "stats": {
+            "coordinates": len(keys),
+            "unique_locations": unique,
+            "cache_hits": hits,
+            "fetched": len(missing),
+            "hit_rate": round(hits / unique, 3) if unique else 0.0,
+        },
+    }
+
+
+def _is_success(result: dict) -> bool:
+    return isinstance(result, dict) and result.get("status") == "success"
+
+
+def geocode_batch(cache: GeocodeCache, coordinates: Sequence[Tuple[float, float]],
+                  fetch: Callable[[float, float], dict], max_workers: int = GEOCODE_BATCH_WORKERS,
+                  should_cache: Callable[[dict], bool] = _is_success) -> Dict[str, Any]:
+    """Geocodes many (latitude, longitude) pairs through `cache`.
+
+    Coordinates are reduced to distinct geohash cells first; cached cells are
+    served from disk and only the remaining cells are passed to `fetch` (one
+    representative coordinate each, `max_workers` at a time). Returns
+    {"results": [...one per input, in order...], "stats": {...}}.
+    """
+    keys, representative, results, missing = _plan_batch(cache, coordinates)
+    fetched: List[dict] = []
+    if missing:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing))),
+                                thread_name_prefix="geocode") as pool:
+            fetched = list(pool.map(lambda key: fetch(*representative[key]), missing))
+    return _finish_batch(cache, keys, representative, results, missing, fetched, should_cache)
+
+
+async def geocode_batch_async(cache: GeocodeCache, coordinates: Sequence[Tuple[float, float]],
+                              fetch: Callable[[float, float], Awaitable[dict]],
+                              max_workers: int = GEOCODE_BATCH_WORKERS,
+                              should_cache: Callable[[dict], bool] = _is_success) -> Dict[str, Any]:
+    """Async variant of geocode_batch: `fetch` is a coroutine function, run `max_workers` at a time.
+
+    The SQLite reads and writes run in a worker thread so they do not block the event loop.
+    """
+    keys, representative, results, missing = await asyncio.to_thread(_plan_batch, cache, coordinates)
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def fetch_one(key: str) -> dict:
+        async with semaphore:
+            return await fetch(*representative[key])
+
+    fetched = list(await asyncio.gather(*(fetch_one(key) for key in missing)))
+    return await asyncio.to_thread(_finish_batch, cache, keys, representative, results, missing, fetched,
+                                   should_cache)
@@ -0,0 +1,26 @@
+# common/offload.py
+"""Runs blocking agent tools off the event loop.
+
+ADK calls synchronous tool functions on the event loop thread unless the run
+config enables a tool thread pool, and the nested runners behind AgentTool do
+not. A blocking tool (an HTTP call, a NumPy pass over a long history) then
+stalls every other agent running concurrently in the same ParallelAgent.
+`offload` wraps a sync tool in an async function with the same name, signature
+and docstring, which ADK awaits while the tool runs in a worker thread.
+"""
+import asyncio
+import functools
+import inspect
+from typing import Any, Callable
+
+
+def offload(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Returns an async tool that runs `func` in a worker thread (async functions are returned unchanged)."""
+    if inspect.iscoroutinefunction(func):
+        return func
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,237 @@
+# common/rate_limit.py
+"""Client-side rate limits and in-flight caps for quota-bound endpoints.
+
+Endpoints listed in config.RATE_LIMITS (by the endpoint names of
+common/resilience.py) get a process-wide EndpointLimiter that every sync and
+async caller shares:
+
+- A token bucket (implemented as GCRA) spaces requests at the configured rate
+  with a bounded burst. Callers reserve their slot and sleep until it, so the
+  request rate stays flat at the quota instead of bursting into 429s and backing
+  off; a 429 with Retry-After defers the whole bucket, not just the caller.
+- A max-in-flight cap queues callers FIFO once the cap is reached. Sync callers
+  block on an Event, async callers await a future; both draw on the same slots.
+
+Queue depth, wait times and observed 429s are reported by rate_limit_stats().
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from common.resilience import endpoint_name, retry_after_seconds
+from config import RATE_LIMITS
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Thread-safe token bucket of `rate` tokens per second holding up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1.0 / rate
+        self.tolerance = (max(1, burst) - 1) * self.interval
+        self._tat = 0.0  # Theoretical arrival time of the next request (GCRA).
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes the next token and returns how long to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tat, now)
+            self._tat = tat + self.interval
+            return max(0.0, tat - self.tolerance - now)
+
+    def defer(self, seconds: float) -> None:
+        """Makes no token available for the next `seconds` (e.g. after a 429)."""
+        with self._lock:
+            self._tat = max(self._tat, time.monotonic() + seconds + self.tolerance)
+
+
+class ConcurrencyLimit:
+    """FIFO in-flight cap shared by threads and event loops."""
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.in_flight = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self.in_flight < self.limit and not self._waiters:
+                self.in_flight += 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()  # The releasing caller hands its slot over before setting the event.
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.in_flight < self.limit and not self._waiters:
+                self.in_flight += 1
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove((loop, future))
+                    return_slot = False
+                except ValueError:
+                    # A release() already picked this waiter. If the hand-over was
+                    # cancelled, _grant passes the slot on; only a completed grant
+                    # (we were cancelled after it) is ours to return.
+                    return_slot = future.done() and not future.cancelled()
+            if return_slot:
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            if not self._waiters:
+                self.in_flight -= 1
+                return
+            waiter = self._waiters.popleft()
+        if isinstance(waiter, threading.Event):
+            waiter.set()
+        else:
+            loop, future = waiter
+            loop.call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future: asyncio.Future) -> None:
+        # Runs on the waiter's loop; the only place a cancelled hand-over is passed on.
+        if future.cancelled():
+            self.release()  # Pass the slot on to the next waiter.
+        else:
+            future.set_result(None)
+
+
+class EndpointLimiter:
+    """Rate limit and in-flight cap for one endpoint, with queueing metrics."""
+
+    def __init__(self, name: str, rate: Optional[float] = None, burst: int = 1, in_flight: Optional[int] = None):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.concurrency = ConcurrencyLimit(in_flight) if in_flight else None
+        self.rate = rate
+        self.requests = 0
+        self.delayed = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.max_queued = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    def _record_wait(self, waited: float) -> None:
+        with self._lock:
+            self.requests += 1
+            if waited > 0.001:
+                self.delayed += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            if self.concurrency is not None:
+                self.max_queued = max(self.max_queued, self.concurrency.queued)
+
+    def _observe(self, status_code: int, retry_after: Optional[str]) -> None:
+        if status_code != 429:
+            return
+        with self._lock:
+            self.rate_limited += 1
+        if self.bucket is not None:
+            delay = retry_after_seconds(retry_after, cap=60.0)
+            self.bucket.defer(delay if delay is not None else self.bucket.interval)
+
+    def call(self, send: Callable[[], Any]) -> Any:
+        """Runs a requests-style `send` once a slot and a token are available."""
+        started = time.monotonic()
+        if self.concurrency is not None:
+            self.concurrency.acquire()
+        try:
+            if self.bucket is not None:
+                time.sleep(self.bucket.reserve())
+            self._record_wait(time.monotonic() - started)
+            response = send()
+        finally:
+            if self.concurrency is not None:
+                self.concurrency.release()
+        self._observe(response.status_code, response.headers.get("Retry-After"))
+        return response
+
+    async def call_async(self, send: Callable[[], Awaitable[T]]) -> T:
+        """Async counterpart of call() for httpx-style coroutines."""
+        started = time.monotonic()
+        if self.concurrency is not None:
+            await self.concurrency.acquire_async()
+        try:
+            if self.bucket is not None:
+                await asyncio.sleep(self.bucket.reserve())
+            self._record_wait(time.monotonic() - started)
+            response = await send()
+        finally:
+            if self.concurrency is not None:
+                self.concurrency.release()
+        self._observe(response.status_code, response.headers.get("Retry-After"))
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rate_per_second": self.rate,
+                "max_in_flight": self.concurrency.limit if self.concurrency else None,
+                "in_flight": self.concurrency.in_flight if self.concurrency else None,
+                "queued": self.concurrency.queued if self.concurrency else 0,
+                "max_queued": self.max_queued,
+                "requests": self.requests,
+                "delayed": self.delayed,
+                "avg_wait_s": round(self.wait_seconds / self.requests, 4) if self.requests else 0.0,
+                "max_wait_s": round(self.max_wait_seconds, 4),
+                "rate_limited_429": self.rate_limited,
+            }
+
+
+def _parse_rate_limits(spec: str) -> Dict[str, EndpointLimiter]:
+    """Parses "endpoint:rate=5,burst=5,in_flight=4;endpoint:..." into limiters."""
+    limiters: Dict[str, EndpointLimiter] = {}
+    for item in spec.split(";"):
+        endpoint, sep, fields = item.strip().partition(":")
+        if not sep:
+            continue
+        settings: Dict[str, float] = {}
+        for field in fields.split(","):
+            key, sep, value = field.strip().partition("=")
+            try:
+                if not sep or key.strip() not in ("rate", "burst", "in_flight"):
+                    raise ValueError(field)
+                settings[key.strip()] = float(value)
+            except ValueError:
+                print(f"Ignoring invalid rate limit setting for '{endpoint}': {field!r} (rate_limit)")
+        name = endpoint.strip()
+        limiters[name] = EndpointLimiter(
+            name,
+            rate=settings.get("rate") or None,
+            burst=int(settings.get("burst", 1)),
+            in_flight=int(settings["in_flight"]) if settings.get("in_flight") else None,
+        )
+    return limiters
+
+
+_limiters = _parse_rate_limits(RATE_LIMITS)
+
+
+def limiter_for(url: str) -> Optional[EndpointLimiter]:
+    """Returns the limiter of the endpoint `url` belongs to, or None if it is unlimited."""
+    return _limiters.get(endpoint_name(url)) if _limiters else None
+
+
+def rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    """Returns the queueing metrics of every configured endpoint limiter."""
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
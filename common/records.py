@@ -0,0 +1,135 @@
+# common/records.py
+"""Typed, slot-based records for transaction, profile and account-detail payloads.
+
+Payloads are decoded with msgspec straight from the response bytes into Struct
+records, skipping the intermediate dicts that the stdlib json module builds. A
+Struct stores its fields in slots (no per-instance __dict__) and is not tracked by
+the garbage collector, which matters on 50k-row histories. to_builtins()/to_dicts()
+are the cheap way back to plain dicts when records are handed to the LLM; fields
+the API did not send are left out.
+
+Transaction fields follow the list documented in
+aml_agent.bank_api_client.fetch_transaction_history, and profile and account
+detail fields the ones the fetch_user_profile and fetch_account_details tools
+document (the clients return them through to_builtins()). Identifiers accept numbers
+as well as strings, since account numbers and bank codes are sometimes sent
+unquoted. Fields not declared here are dropped when decoding into records, so
+tools that must pass the API's payload through untouched keep using loads().
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import msgspec
+
+
+class Transaction(msgspec.Struct, omit_defaults=True, gc=False):
+    transaction_id: Union[str, int, None] = None
+    timestamp: Optional[str] = None
+    date: Optional[str] = None
+    amount: Optional[float] = None
+    currency: Optional[str] = None
+    transaction_type: Optional[str] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    balance_after_transaction: Optional[float] = None
+    counterparty_name: Optional[str] = None
+    counterparty_account_number: Union[str, int, None] = None
+    counterparty_bank_identifier: Union[str, int, None] = None
+    counterparty_country: Optional[str] = None
+    transaction_location_latitude: Optional[float] = None
+    transaction_location_longitude: Optional[float] = None
+    is_cash_transaction: Optional[bool] = None
+    originating_ip_address: Optional[str] = None
+
+    @property
+    def day(self) -> Optional[str]:
+        """The YYYY-MM-DD booking day, from timestamp or date."""
+        value = self.timestamp or self.date
+        return value[:10] if value else None
+
+
+class UserProfile(msgspec.Struct, omit_defaults=True, gc=False):
+    account_number: Union[str, int, None] = None
+    full_name: Optional[str] = None
+    email: Optional[str] = None
+    phone_number: Optional[str] = None
+    address: Union[str, Dict[str, Any], None] = None
+    date_of_birth: Optional[str] = None
+    account_type: Optional[str] = None
+    account_open_date: Optional[str] = None
+
+
+class AccountDetails(msgspec.Struct, omit_defaults=True):
+    account_number: Union[str, int, None] = None
+    account_type: Optional[str] = None
+    account_status: Optional[str] = None
+    currency: Optional[str] = None
+    current_balance: Optional[float] = None
+    available_balance: Optional[float] = None
+    overdraft_limit: Optional[float] = None
+    linked_products: Optional[List[Any]] = None
+
+
+class _TransactionEnvelope(msgspec.Struct):
+    # The API may nest the transaction array under either key.
+    data: Optional[List[Transaction]] = None
+    transactions: Optional[List[Transaction]] = None
+
+
+# strict=False accepts numbers sent as strings (e.g. "amount": "9500.00").
+_transactions_decoder = msgspec.json.Decoder(Union[List[Transaction], _TransactionEnvelope], strict=False)
+_transaction_decoder = msgspec.json.Decoder(Transaction, strict=False)
+_profile_decoder = msgspec.json.Decoder(UserProfile, strict=False)
+_account_details_decoder = msgspec.json.Decoder(AccountDetails, strict=False)
+_untyped_decoder = msgspec.json.Decoder()
+_encoder = msgspec.json.Encoder()
+
+# Raised for malformed JSON or payloads that do not fit the record types; a ValueError.
+DecodeError = msgspec.DecodeError
+
+
+def loads(raw: Union[bytes, str]) -> Any:
+    """Decodes JSON into plain dicts/lists, faster than json.loads."""
+    return _untyped_decoder.decode(raw)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encodes records, dicts or lists to JSON bytes."""
+    return _encoder.encode(obj)
+
+
+def decode_transactions(raw: Union[bytes, str]) -> Tuple[Optional[str], List[Transaction]]:
+    """Decodes a transactions payload into (envelope_key, records).
+
+    envelope_key is None for a bare array, else "data" or "transactions".
+    """
+    decoded = _transactions_decoder.decode(raw)
+    if isinstance(decoded, list):
+        return None, decoded
+    if decoded.data is not None:
+        return "data", decoded.data
+    return "transactions", decoded.transactions or []
+
+
+def decode_transaction(raw: Union[bytes, str]) -> Transaction:
+    """Decodes a single transaction object."""
+    return _transaction_decoder.decode(raw)
+
+
+def decode_user_profile(raw: Union[bytes, str]) -> UserProfile:
+    """Decodes a /users/{account}/profile payload."""
+    return _profile_decoder.decode(raw)
+
+
+def decode_account_details(raw: Union[bytes, str]) -> AccountDetails:
+    """Decodes a /users/{account}/account_details payload."""
+    return _account_details_decoder.decode(raw)
+
+
+def to_builtins(obj: Any) -> Any:
+    """Converts a record (or containers of records) back to dicts/lists."""
+    return msgspec.to_builtins(obj)
+
+
+def to_dicts(transactions: Iterable[Transaction]) -> List[Dict[str, Any]]:
+    """Converts records to the list of dicts handed to the LLM."""
+    return msgspec.to_builtins(list(transactions))
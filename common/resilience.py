@@ -0,0 +1,394 @@
+# common/resilience.py
+"""Per-endpoint retry, circuit-breaker and hedging policy for bank API calls.
+
+Every request sent through common/transport.py (and, via the same primitives,
+common/async_transport.py) is classified into an endpoint name such as
+"users.transactions" or "external_services.company_info.directors", and runs
+under that endpoint's Policy:
+
+- Idempotent calls are retried on connection errors, timeouts and 429/502/503/504
+  with full-jitter exponential backoff, honouring Retry-After when present.
+- A circuit breaker per endpoint opens after consecutive failures and makes calls
+  fail fast with CircuitOpenError until a trial call succeeds.
+- GETs on hedged endpoints send one duplicate request once the first has been
+  outstanding longer than the endpoint's observed latency percentile; the first
+  successful response wins. Endpoints under a client-side rate limit are never
+  hedged: their calls can sit in the limiter's queue for longer than the
+  percentile, and a hedge would spend quota on a request that was only queued.
+
+Transient failures are therefore absorbed below the tool functions instead of
+surfacing as {"status": "error"} dicts that the model retries with a full round-trip.
+"""
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from fnmatch import fnmatchcase
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from config import (
+    API_BASE_URL,
+    HTTP_API_POOL_MAXSIZE,
+    RESILIENCE_BACKOFF_BASE,
+    RESILIENCE_BACKOFF_MAX,
+    RESILIENCE_BREAKER_FAILURE_THRESHOLD,
+    RESILIENCE_BREAKER_RESET_SECONDS,
+    RESILIENCE_ENDPOINT_OVERRIDES,
+    RESILIENCE_HEDGE_ENDPOINTS,
+    RESILIENCE_HEDGE_MIN_SAMPLES,
+    RESILIENCE_HEDGE_PERCENTILE,
+    RESILIENCE_MAX_ATTEMPTS,
+)
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# Path segments that are followed by an identifier (account number, country code, ...)
+# which is not part of the endpoint name.
+_ID_PARENTS = frozenset({"users", "country_risk", "company_info", "loan_applications", "savings_goals"})
+_LATENCY_SAMPLES = 200
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling an endpoint whose circuit is open."""
+
+
+class Policy:
+    """Resilience settings for one endpoint."""
+
+    __slots__ = ("max_attempts", "backoff_base", "backoff_max", "failure_threshold",
+                 "reset_seconds", "hedge", "idempotent")
+
+    def __init__(self, max_attempts: int = RESILIENCE_MAX_ATTEMPTS,
+                 backoff_base: float = RESILIENCE_BACKOFF_BASE,
+                 backoff_max: float = RESILIENCE_BACKOFF_MAX,
+                 failure_threshold: int = RESILIENCE_BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds: float = RESILIENCE_BREAKER_RESET_SECONDS,
+                 hedge: bool = False,
+                 idempotent: bool = False):
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.hedge = hedge
+        # True marks non-GET calls of this endpoint as safe to retry (e.g. POST lookups).
+        self.idempotent = idempotent
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open trial call."""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Returns False if the call must fail fast."""
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == HALF_OPEN or (self.failure_threshold > 0 and self.failures >= self.failure_threshold):
+                if self.state != OPEN:
+                    self.times_opened += 1
+                    print(f"Circuit opened after {self.failures} consecutive failures (resilience)")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Ends a call whose outcome says nothing about the endpoint's health."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, maxlen: int = _LATENCY_SAMPLES):
+        self._samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class EndpointState:
+    """Policy, breaker, latency window and counters of one endpoint."""
+
+    def __init__(self, name: str, policy: Policy):
+        self.name = name
+        self.policy = policy
+        self.breaker = CircuitBreaker(policy.failure_threshold, policy.reset_seconds)
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self, method: str) -> Optional[float]:
+        """Seconds to wait before hedging this call, or None to not hedge."""
+        if not self.policy.hedge or method.upper() not in IDEMPOTENT_METHODS:
+            return None
+        return self.latency.percentile(RESILIENCE_HEDGE_PERCENTILE, RESILIENCE_HEDGE_MIN_SAMPLES)
+
+    def attempts_for(self, method: str) -> int:
+        if method.upper() in IDEMPOTENT_METHODS or self.policy.idempotent:
+            return self.policy.max_attempts
+        return 1
+
+    def stats(self) -> Dict[str, Any]:
+        p = self.latency.percentile(RESILIENCE_HEDGE_PERCENTILE)
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "times_opened": self.breaker.times_opened,
+            "rejected": self.breaker.rejected,
+            "calls": self.calls,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "latency_percentile_s": round(p, 4) if p is not None else None,
+        }
+
+
+_states: Dict[str, EndpointState] = {}
+_states_lock = threading.Lock()
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+
+
+def endpoint_name(url: str) -> str:
+    """Classifies a URL into the endpoint name that policies and breakers are keyed by.
+
+    API_BASE_URL paths drop identifiers and any "api/v1" prefix, e.g.
+    ".../users/123/transactions" -> "users.transactions". Other hosts are
+    named "host/path", e.g. "maps.googleapis.com/maps/api/geocode/json".
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    base = urlsplit(API_BASE_URL)
+    base_path = base.path.rstrip("/")
+    if host == (base.hostname or "").lower() and parts.path.startswith(base_path):
+        segments = [segment for segment in parts.path[len(base_path):].split("/") if segment]
+        if segments[:2] == ["api", "v1"]:
+            segments = segments[2:]
+        names: List[str] = []
+        skip_next = False
+        for segment in segments:
+            if not skip_next:
+                names.append(segment)
+            skip_next = not skip_next and segment in _ID_PARENTS
+        return ".".join(names) or host
+    return f"{host}{parts.path}"
+
+
+def _parse_overrides(spec: str) -> Dict[str, Dict[str, str]]:
+    """Parses "endpoint:field=value,field=value;endpoint:..." into a dict."""
+    overrides: Dict[str, Dict[str, str]] = {}
+    for item in spec.split(";"):
+        endpoint, sep, fields = item.strip().partition(":")
+        if not sep:
+            continue
+        for field in fields.split(","):
+            key, sep, value = field.strip().partition("=")
+            if sep and key.strip() in Policy.__slots__:
+                overrides.setdefault(endpoint.strip(), {})[key.strip()] = value.strip()
+            else:
+                print(f"Ignoring invalid resilience override for '{endpoint}': {field!r} (resilience)")
+    return overrides
+
+
+_OVERRIDES = _parse_overrides(RESILIENCE_ENDPOINT_OVERRIDES)
+_HEDGE_PATTERNS = [pattern.strip() for pattern in RESILIENCE_HEDGE_ENDPOINTS.split(",") if pattern.strip()]
+
+
+def policy_for(endpoint: str) -> Policy:
+    """Builds the configured Policy of an endpoint."""
+    policy = Policy(hedge=any(fnmatchcase(endpoint, pattern) for pattern in _HEDGE_PATTERNS))
+    for pattern, fields in _OVERRIDES.items():
+        if not fnmatchcase(endpoint, pattern):
+            continue
+        for key, value in fields.items():
+            default = getattr(policy, key)
+            try:
+                if isinstance(default, bool):
+                    setattr(policy, key, value.lower() in ("1", "true", "yes"))
+                else:
+                    setattr(policy, key, type(default)(value))
+            except ValueError:
+                print(f"Ignoring invalid resilience override {key}={value!r} for '{endpoint}' (resilience)")
+    policy.max_attempts = max(1, policy.max_attempts)
+    return policy
+
+
+def state_for(url: str) -> EndpointState:
+    """Returns the shared EndpointState for the endpoint a URL belongs to."""
+    name = endpoint_name(url)
+    state = _states.get(name)
+    if state is None:
+        with _states_lock:
+            state = _states.get(name)
+            if state is None:
+                state = _states[name] = EndpointState(name, policy_for(name))
+    return state
+
+
+def resilience_stats() -> Dict[str, Dict[str, Any]]:
+    """Returns breaker state and retry/hedge counters for every endpoint seen so far."""
+    with _states_lock:
+        states = list(_states.values())
+    return {state.name: state.stats() for state in states}
+
+
+def backoff_delay(policy: Policy, retry: int) -> float:
+    """Full-jitter exponential backoff before retry number `retry` (1-based)."""
+    return random.uniform(0, min(policy.backoff_max, policy.backoff_base * 2 ** (retry - 1)))
+
+
+def retry_after_seconds(value: Optional[str], cap: float) -> Optional[float]:
+    """Parses a Retry-After header (seconds or HTTP date), capped at `cap` seconds."""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(cap, max(0.0, seconds))
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _states_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(max_workers=2 * HTTP_API_POOL_MAXSIZE, thread_name_prefix="http-hedge")
+    return _hedge_executor
+
+
+def _close_quietly(future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _timed(send: Callable[[], requests.Response], state: EndpointState) -> requests.Response:
+    # Each request records its own latency, so a hedged call's late primary still
+    # counts and the percentile is not skewed by the hedge delay.
+    started = time.monotonic()
+    response = send()
+    if response.ok:
+        state.latency.record(time.monotonic() - started)
+    return response
+
+
+def _send_hedged(send: Callable[[], requests.Response], delay: float, state: EndpointState) -> requests.Response:
+    primary = _executor().submit(send)
+    done, _ = wait([primary], timeout=delay)
+    if done:
+        return primary.result()
+    state.hedges += 1
+    backup = _executor().submit(send)
+    pending = {primary, backup}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is backup:
+                    state.hedge_wins += 1
+                for loser in pending:
+                    loser.add_done_callback(_close_quietly)  # Release its pooled connection.
+                return future.result()
+            error = error or future.exception()
+    raise error
+
+
+def call(method: str, url: str, send: Callable[[], requests.Response], stream: bool = False,
+         limiter: Optional[Any] = None) -> requests.Response:
+    """Runs `send` under the policy of the endpoint `url` belongs to.
+
+    `limiter` (a common.rate_limit.EndpointLimiter) gates every attempt; time spent
+    waiting on it does not count towards the latency percentile. Rate-limited calls
+    are not hedged.
+    Returns the final response (which may still be an error status) or raises the
+    last requests exception; raises CircuitOpenError while the circuit is open.
+    """
+    state = state_for(url)
+    state.calls += 1
+    attempts = state.attempts_for(method)
+    # Streamed bodies are read by the caller after we return, so they are not hedged.
+    hedge_delay = None if stream or limiter is not None else state.hedge_delay(method)
+    for attempt in range(1, attempts + 1):
+        if not state.breaker.allow():
+            raise CircuitOpenError(f"Circuit open for endpoint '{state.name}'; failing fast.")
+        timed = lambda: _timed(send, state)
+        if limiter is not None:
+            timed = lambda unlimited=timed: limiter.call(unlimited)
+        try:
+            response = _send_hedged(timed, hedge_delay, state) if hedge_delay is not None else timed()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            state.breaker.record_failure()
+            if attempt == attempts:
+                raise
+            delay = backoff_delay(state.policy, attempt)
+        except BaseException:
+            state.breaker.release()
+            raise
+        else:
+            if response.status_code >= 500:
+                state.breaker.record_failure()
+            else:
+                state.breaker.record_success()
+            if response.status_code not in RETRY_STATUSES or attempt == attempts:
+                return response
+            delay = retry_after_seconds(response.headers.get("Retry-After"), state.policy.backoff_max)
+            if delay is None:
+                delay = backoff_delay(state.policy, attempt)
+            response.close()
+        state.retries += 1
+        print(f"Retrying {method} {state.name} in {delay:.2f}s (attempt {attempt + 1}/{attempts})")
+        time.sleep(delay)
@@ -0,0 +1,132 @@
+# common/single_flight.py
+"""Request coalescing ("single-flight") for identical in-flight API calls.
+
+Sub-agents of one session often ask for the same account data at the same time.
+A function decorated with `coalesced` runs at most once per distinct set of
+arguments at any moment: callers that arrive while a call is in flight wait for
+it and receive the same result object instead of issuing their own request.
+Nothing is remembered once the call completes; caching is common/cache.py's job.
+"""
+import asyncio
+import functools
+import inspect
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from common.cache import make_call_key
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key across threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Tuple[Any, bool]:
+        """Runs fn(*args, **kwargs) unless an identical call is in flight.
+
+        Returns (result, shared) where `shared` is True if this caller reused
+        another caller's result. Exceptions propagate to every waiter.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"executed": self.executed, "shared": self.shared, "in_flight": len(self._calls)}
+
+
+class AsyncSingleFlight:
+    """Coalesces concurrent coroutine calls that share a key on one event loop."""
+
+    def __init__(self):
+        self._tasks: Dict[Tuple[int, Hashable], asyncio.Task] = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Tuple[Any, bool]:
+        """Awaits fn(*args, **kwargs) unless an identical call is in flight."""
+        loop = asyncio.get_running_loop()
+        task_key = (id(loop), key)
+        task = self._tasks.get(task_key)
+        if task is not None:
+            self.shared += 1
+            # shield() so one waiter being cancelled does not cancel the shared call.
+            return await asyncio.shield(task), True
+
+        task = loop.create_task(fn(*args, **kwargs))
+        self._tasks[task_key] = task
+        self.executed += 1
+        task.add_done_callback(lambda _: self._tasks.pop(task_key, None))
+        return await asyncio.shield(task), False
+
+    def stats(self) -> Dict[str, int]:
+        return {"executed": self.executed, "shared": self.shared, "in_flight": len(self._tasks)}
+
+
+_default_group = SingleFlight()
+_default_async_group = AsyncSingleFlight()
+
+
+def single_flight_stats() -> Dict[str, Dict[str, int]]:
+    """Returns the counters of the process-wide sync and async groups."""
+    return {"sync": _default_group.stats(), "async": _default_async_group.stats()}
+
+
+def coalesced(func):
+    """Decorates a sync or async function so identical concurrent calls share one execution."""
+    signature = inspect.signature(func)
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            key = (name, make_call_key(signature, args, kwargs))
+            result, _ = await _default_async_group.do(key, func, *args, **kwargs)
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (name, make_call_key(signature, args, kwargs))
+        result, _ = _default_group.do(key, func, *args, **kwargs)
+        return result
+
+    return wrapper
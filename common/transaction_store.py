@@ -0,0 +1,261 @@
+# common/transaction_store.py
+"""Local on-disk (SQLite) store of transaction histories with delta fetch.
+
+Transactions are stored per transactions endpoint URL (API base + account) and
+per day, together with the date intervals that have been fetched. A request for
+a range is served from disk for every covered day and only the missing intervals
+are fetched from the API. Days close to the date an interval was fetched are
+treated as unsettled (TRANSACTION_STORE_RECENT_DAYS) and fetched again, so late
+postings and reversals are picked up.
+
+The store is opt-in (TRANSACTION_STORE_ENABLED) because it keeps raw customer
+transactions on disk. sweep_expired() deletes windows fetched more than
+TRANSACTION_STORE_RETENTION_DAYS ago, coverage rows superseded by a later
+fetch of the same days, and any transactions no remaining window covers. It
+runs when a process first opens the store and then every
+TRANSACTION_STORE_SWEEP_INTERVAL seconds on write.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from common import records, transaction_stream
+from config import (
+    TRANSACTION_STORE_PATH,
+    TRANSACTION_STORE_RECENT_DAYS,
+    TRANSACTION_STORE_RETENTION_DAYS,
+    TRANSACTION_STORE_SWEEP_INTERVAL,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    source_url TEXT NOT NULL,
+    txn_date TEXT NOT NULL,
+    transaction_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (source_url, transaction_id)
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_source_date ON transactions (source_url, txn_date);
+CREATE TABLE IF NOT EXISTS coverage (
+    source_url TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    fetched_on TEXT NOT NULL,
+    envelope_key TEXT,
+    envelope_fields TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_coverage_source ON coverage (source_url);
+"""
+
+_local = threading.local()
+_write_lock = threading.Lock()
+_next_sweep = 0.0
+
+
+def _connection() -> sqlite3.Connection:
+    # sqlite3 connections must not be shared across threads; keep one per thread.
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        directory = os.path.dirname(TRANSACTION_STORE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(TRANSACTION_STORE_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(coverage)")}
+        if "envelope_fields" not in columns:  # Stores created before envelope members were kept.
+            conn.execute("ALTER TABLE coverage ADD COLUMN envelope_fields TEXT")
+        _local.conn = conn
+        _maybe_sweep()
+    return conn
+
+
+def _maybe_sweep() -> None:
+    global _next_sweep
+    with _write_lock:
+        if time.monotonic() < _next_sweep:
+            return
+        _next_sweep = time.monotonic() + TRANSACTION_STORE_SWEEP_INTERVAL
+    sweep_expired()
+
+
+def sweep_expired(retention_days: int = TRANSACTION_STORE_RETENTION_DAYS, today: Optional[date] = None) -> Dict[str, int]:
+    """Deletes expired and superseded coverage rows and the transactions left uncovered.
+
+    Returns the number of coverage rows and transactions removed.
+    """
+    cutoff = ((today or date.today()) - timedelta(days=retention_days)).isoformat()
+    conn = _connection()
+    with _write_lock, conn:
+        expired = conn.execute("DELETE FROM coverage WHERE fetched_on < ?", (cutoff,)).rowcount
+        superseded = conn.execute(
+            "DELETE FROM coverage WHERE EXISTS (SELECT 1 FROM coverage AS newer WHERE newer.source_url = coverage.source_url"
+            " AND newer.rowid > coverage.rowid AND newer.start_date <= coverage.start_date"
+            " AND newer.end_date >= coverage.end_date)"
+        ).rowcount
+        uncovered = conn.execute(
+            "DELETE FROM transactions WHERE NOT EXISTS (SELECT 1 FROM coverage WHERE coverage.source_url = transactions.source_url"
+            " AND transactions.txn_date BETWEEN coverage.start_date AND coverage.end_date)"
+        ).rowcount
+    if expired or superseded or uncovered:
+        print(f"Transaction store sweep: removed {expired} expired and {superseded} superseded windows, "
+              f"{uncovered} transactions")
+    return {"expired_windows": expired, "superseded_windows": superseded, "transactions": uncovered}
+
+
+def is_storable_range(start_date: str, end_date: str) -> bool:
+    """True if the range uses plain YYYY-MM-DD dates the store can reason about."""
+    try:
+        return date.fromisoformat(start_date) <= date.fromisoformat(end_date)
+    except (TypeError, ValueError):
+        return False
+
+
+def _transaction_date(txn: Dict[str, Any], fallback: str) -> str:
+    value = txn.get("timestamp") or txn.get("date") or ""
+    day = str(value)[:10]
+    return day if len(day) == 10 else fallback
+
+
+def _transaction_id(txn: Dict[str, Any]) -> str:
+    txn_id = txn.get("transaction_id")
+    if txn_id:
+        return str(txn_id)
+    # No ID from the API: derive a stable one from the content.
+    return "sha1:" + hashlib.sha1(json.dumps(txn, sort_keys=True).encode()).hexdigest()
+
+
+def _settled_intervals(url: str) -> List[Tuple[date, date]]:
+    """Returns the merged intervals whose days are stored and considered settled."""
+    rows = _connection().execute(
+        "SELECT start_date, end_date, fetched_on FROM coverage WHERE source_url = ?", (url,)
+    ).fetchall()
+    intervals = []
+    for start, end, fetched_on in rows:
+        settled_end = min(date.fromisoformat(end),
+                          date.fromisoformat(fetched_on) - timedelta(days=TRANSACTION_STORE_RECENT_DAYS + 1))
+        start = date.fromisoformat(start)
+        if start <= settled_end:
+            intervals.append((start, settled_end))
+    intervals.sort()
+    merged: List[Tuple[date, date]] = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def missing_intervals(url: str, start_date: str, end_date: str) -> List[Tuple[str, str]]:
+    """Returns the inclusive sub-ranges of [start_date, end_date] that must be fetched."""
+    cursor = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    missing = []
+    for covered_start, covered_end in _settled_intervals(url):
+        if covered_end < cursor:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            missing.append((cursor.isoformat(), (covered_start - timedelta(days=1)).isoformat()))
+        cursor = covered_end + timedelta(days=1)
+        if cursor > end:
+            break
+    if cursor <= end:
+        missing.append((cursor.isoformat(), end.isoformat()))
+    return missing
+
+
+def save_window(url: str, start_date: str, end_date: str, envelope_key: Optional[str], transactions: List[Dict[str, Any]],
+                envelope_fields: Optional[Dict[str, Any]] = None) -> None:
+    """Replaces the stored transactions of one fetched window and records its coverage."""
+    rows = [
+        (url, _transaction_date(txn, start_date), _transaction_id(txn), records.dumps(txn).decode())
+        for txn in transactions
+    ]
+    conn = _connection()
+    with _write_lock, conn:
+        # Drop the window's old rows first so reversed/removed transactions disappear.
+        conn.execute(
+            "DELETE FROM transactions WHERE source_url = ? AND txn_date BETWEEN ? AND ?",
+            (url, start_date, end_date),
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO transactions (source_url, txn_date, transaction_id, payload) VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        conn.execute(
+            "INSERT INTO coverage (source_url, start_date, end_date, fetched_on, envelope_key, envelope_fields) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (url, start_date, end_date, date.today().isoformat(), envelope_key, json.dumps(envelope_fields or {})),
+        )
+    _maybe_sweep()
+
+
+def read_range(url: str, start_date: str, end_date: str) -> Iterator[Dict[str, Any]]:
+    """Yields stored transactions for the range in date order, without fetching."""
+    cursor = _connection().execute(
+        "SELECT payload FROM transactions WHERE source_url = ? AND txn_date BETWEEN ? AND ? ORDER BY txn_date, rowid",
+        (url, start_date, end_date),
+    )
+    for (payload,) in cursor:
+        yield records.loads(payload)
+
+
+def read_range_records(url: str, start_date: str, end_date: str) -> Iterator[records.Transaction]:
+    """Like read_range(), but decodes each stored row into a Transaction record."""
+    cursor = _connection().execute(
+        "SELECT payload FROM transactions WHERE source_url = ? AND txn_date BETWEEN ? AND ? ORDER BY txn_date, rowid",
+        (url, start_date, end_date),
+    )
+    for (payload,) in cursor:
+        yield records.decode_transaction(payload)
+
+
+def envelope(url: str, start_date: str, end_date: str) -> Tuple[Optional[str], Dict[str, Any]]:
+    """Returns the envelope key last seen from the API for this endpoint, and the other
+    envelope members shared by every stored window overlapping the range."""
+    latest = _connection().execute(
+        "SELECT envelope_key FROM coverage WHERE source_url = ? ORDER BY rowid DESC LIMIT 1", (url,)
+    ).fetchone()
+    if latest is None:
+        return None, {}
+    overlapping = _connection().execute(
+        "SELECT envelope_fields FROM coverage WHERE source_url = ? AND start_date <= ? AND end_date >= ?",
+        (url, end_date, start_date),
+    ).fetchall()
+    fields = transaction_stream.merge_envelope_fields([json.loads(f) if f else {} for (f,) in overlapping])
+    return latest[0], fields
+
+
+def sync_range(url: str, start_date: str, end_date: str) -> None:
+    """Fetches and stores every missing or unsettled interval of the range."""
+    for missing_start, missing_end in missing_intervals(url, start_date, end_date):
+        windows = transaction_stream.plan_windows(missing_start, missing_end) or [(missing_start, missing_end)]
+        for (window_start, window_end), (key, items, fields) in zip(windows, transaction_stream.iter_windows(url, windows)):
+            save_window(url, window_start, window_end, key, items, fields)
+
+
+def iter_range(url: str, start_date: str, end_date: str) -> Iterator[Dict[str, Any]]:
+    """Syncs the range, then yields its transactions from disk in date order."""
+    sync_range(url, start_date, end_date)
+    yield from read_range(url, start_date, end_date)
+
+
+def load_stored_range(url: str, start_date: str, end_date: str) -> Any:
+    """Returns the stored range in the API's payload shape, without fetching."""
+    key, fields = envelope(url, start_date, end_date)
+    return transaction_stream.wrap_payload(key, list(read_range(url, start_date, end_date)), fields)
+
+
+def load_range(url: str, start_date: str, end_date: str) -> Any:
+    """Syncs the range and returns it in the API's payload shape."""
+    sync_range(url, start_date, end_date)
+    return load_stored_range(url, start_date, end_date)
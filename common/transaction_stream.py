@@ -0,0 +1,395 @@
+# common/transaction_stream.py
+"""Date-windowed, streaming retrieval of /users/{account}/transactions.
+
+Long review periods are split into windows (calendar months by default) that are
+fetched concurrently through the shared transport. Each window's body is decoded
+incrementally with JsonArrayStreamParser, so the raw bytes of a window are never
+held alongside its decoded transactions. iter_transactions() yields transactions
+in date order while keeping at most TRANSACTION_FETCH_WORKERS windows buffered;
+load_transaction_history() rebuilds the payload shape the API itself returns,
+including the envelope's other top-level members that all windows agree on, so
+that fetch_transaction_history keeps its dict-returning signature.
+iter_transaction_records() is the typed counterpart for analytics code: each
+window is decoded straight into common.records.Transaction records.
+"""
+import asyncio
+import codecs
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from common import records, transport
+from config import (
+    TRANSACTION_FETCH_WORKERS,
+    TRANSACTION_SPLIT_THRESHOLD_DAYS,
+    TRANSACTION_STORE_ENABLED,
+    TRANSACTION_WINDOW_DAYS,
+)
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Top-level keys under which the API may nest the transaction array.
+ENVELOPE_KEYS = ("data", "transactions")
+_SKIPPABLE = " \t\r\n,"
+_WHITESPACE = " \t\r\n"
+_VALUE_START = '{["-0123456789tfn'
+
+
+class _Incomplete(Exception):
+    """The element starting at args[0] continues in a later chunk."""
+
+
+class JsonArrayStreamParser:
+    """Push parser that yields the objects of a JSON array as bytes arrive.
+
+    Accepts either a top-level array or an object whose top-level "data" /
+    "transactions" member holds the array; `envelope_key` records which (None
+    for a bare array). Only members of the top-level object are considered, so
+    a nested "data" key never matches. The object's other members are decoded
+    whole and kept in `envelope_fields`. Array elements are expected to be JSON
+    objects, as transactions are.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._state = "start"  # start -> array | members (<-> array) -> done
+        self._bare = False
+        self.done = False
+        self.envelope_key: Optional[str] = None
+        self.envelope_fields: Dict[str, Any] = {}
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        self._buffer += self._text.decode(chunk)
+        return self._drain()
+
+    def close(self) -> List[Any]:
+        self._buffer += self._text.decode(b"", final=True)
+        items = self._drain()
+        if not self.done or (self.envelope_key is None and not self._bare):
+            raise json.JSONDecodeError("Truncated or malformed transaction array", self._buffer, 0)
+        return items
+
+    def _value(self, buf: str, pos: int) -> Tuple[Any, int]:
+        """Decodes one complete value at `pos`; raises _Incomplete if it may continue in the next chunk."""
+        try:
+            value, end = self._decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if buf[pos] not in _VALUE_START:
+                raise
+            raise _Incomplete(pos)
+        if end >= len(buf):
+            raise _Incomplete(pos)  # A number such as 12 may still be 123 once more bytes arrive.
+        return value, end
+
+    def _drain(self) -> List[Any]:
+        items: List[Any] = []
+        buf = self._buffer
+        pos = 0
+        length = len(buf)
+        try:
+            while not self.done:
+                if self._state == "start":
+                    while pos < length and buf[pos] in _WHITESPACE:
+                        pos += 1
+                    if pos >= length:
+                        break
+                    if buf[pos] == "[":
+                        self._bare, self._state = True, "array"
+                    elif buf[pos] == "{":
+                        self._state = "members"
+                    else:
+                        raise json.JSONDecodeError("Expected a JSON array or object", buf, pos)
+                    pos += 1
+                elif self._state == "array":
+                    while pos < length and buf[pos] in _SKIPPABLE:
+                        pos += 1
+                    if pos >= length:
+                        break
+                    if buf[pos] == "]":
+                        pos += 1
+                        self._state = "done" if self._bare else "members"
+                        self.done = self._bare
+                        continue
+                    item, pos = self._value(buf, pos)
+                    items.append(item)
+                else:  # Members of the top-level object.
+                    while pos < length and buf[pos] in _SKIPPABLE:
+                        pos += 1
+                    if pos >= length:
+                        break
+                    if buf[pos] == "}":
+                        pos += 1
+                        self.done = True
+                        continue
+                    member = pos
+                    key, pos = self._value(buf, pos)
+                    while pos < length and buf[pos] in _WHITESPACE:
+                        pos += 1
+                    if pos >= length:
+                        raise _Incomplete(member)
+                    if buf[pos] != ":" or not isinstance(key, str):
+                        raise json.JSONDecodeError("Expected an object member", buf, pos)
+                    pos += 1
+                    while pos < length and buf[pos] in _WHITESPACE:
+                        pos += 1
+                    if pos >= length:
+                        raise _Incomplete(member)
+                    if key in ENVELOPE_KEYS and self.envelope_key is None and buf[pos] == "[":
+                        self.envelope_key, self._state = key, "array"
+                        pos += 1
+                        continue
+                    try:
+                        self.envelope_fields[key], pos = self._value(buf, pos)
+                    except _Incomplete:
+                        raise _Incomplete(member)
+        except _Incomplete as incomplete:
+            pos = incomplete.args[0]  # Resume from the start of the unfinished element or member.
+        self._buffer = "" if self.done else buf[pos:]
+        return items
+
+
+def split_date_range(start_date: str, end_date: str, window_days: int = TRANSACTION_WINDOW_DAYS) -> List[Tuple[str, str]]:
+    """Splits an inclusive YYYY-MM-DD range into consecutive inclusive windows.
+
+    window_days=0 produces calendar-month windows.
+    """
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    windows = []
+    cursor = start
+    while cursor <= end:
+        if window_days > 0:
+            window_end = cursor + timedelta(days=window_days - 1)
+        else:
+            next_month = date(cursor.year + cursor.month // 12, cursor.month % 12 + 1, 1)
+            window_end = next_month - timedelta(days=1)
+        window_end = min(window_end, end)
+        windows.append((cursor.isoformat(), window_end.isoformat()))
+        cursor = window_end + timedelta(days=1)
+    return windows
+
+
+def plan_windows(start_date: str, end_date: str) -> Optional[List[Tuple[str, str]]]:
+    """Returns the windows to fetch, or None when one plain request is preferable."""
+    try:
+        span = (date.fromisoformat(end_date) - date.fromisoformat(start_date)).days + 1
+    except (TypeError, ValueError):
+        return None  # Let the API validate unusual date formats itself.
+    if span <= TRANSACTION_SPLIT_THRESHOLD_DAYS:
+        return None
+    windows = split_date_range(start_date, end_date)
+    return windows if len(windows) > 1 else None
+
+
+Window = Tuple[Optional[str], List[Any], Dict[str, Any]]  # (envelope_key, transactions, envelope_fields)
+
+
+def fetch_window(url: str, start_date: str, end_date: str) -> Window:
+    """Streams one window and returns (envelope_key, transactions, envelope_fields)."""
+    params = {"start_date": start_date, "end_date": end_date}
+    print(f"\n=====API Call:======\n{url} (params: {params}, streamed)\n=================")
+    parser = JsonArrayStreamParser()
+    items: List[Any] = []
+    with transport.get(url, params=params, stream=True) as response:
+        print(f"Response: {response.status_code}\n=================")
+        if not response.ok:
+            response.content  # Read the body now so error handlers can still parse it.
+        response.raise_for_status()
+        try:
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                items.extend(parser.feed(chunk))
+            items.extend(parser.close())
+        except json.JSONDecodeError as e:
+            raise _decode_error(e)
+    return parser.envelope_key, items, parser.envelope_fields
+
+
+def _decode_error(e: ValueError) -> requests.exceptions.JSONDecodeError:
+    # Surface as requests' subclass so existing RequestException handlers catch it.
+    return requests.exceptions.JSONDecodeError(str(e), "", 0)
+
+
+def fetch_window_records(url: str, start_date: str, end_date: str) -> Window:
+    """Fetches one window and decodes it into (envelope_key, Transaction records, {}).
+
+    Typed callers only consume the records, so the other envelope members are not decoded.
+    """
+    params = {"start_date": start_date, "end_date": end_date}
+    print(f"\n=====API Call:======\n{url} (params: {params})\n=================")
+    response = transport.get(url, params=params)
+    print(f"Response: {response.status_code}\n=================")
+    response.raise_for_status()
+    try:
+        key, transactions = records.decode_transactions(response.content)
+    except records.DecodeError as e:
+        raise _decode_error(e)
+    return key, transactions, {}
+
+
+def iter_windows(url: str, windows: List[Tuple[str, str]], max_workers: int = TRANSACTION_FETCH_WORKERS,
+                 fetch: Callable[[str, str, str], Window] = fetch_window) -> Iterator[Window]:
+    """Fetches windows concurrently and yields (envelope_key, transactions, envelope_fields) per window, in order."""
+    # Submit lazily so at most `max_workers` windows are fetched/buffered ahead of the consumer.
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="txn-window") as executor:
+        pending = deque()
+        remaining = iter(windows)
+        try:
+            for window in remaining:
+                pending.append(executor.submit(fetch, url, *window))
+                if len(pending) >= max_workers:
+                    break
+            while pending:
+                result = pending.popleft().result()
+                for window in remaining:
+                    pending.append(executor.submit(fetch, url, *window))
+                    break
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def iter_transactions(url: str, start_date: str, end_date: str, max_workers: int = TRANSACTION_FETCH_WORKERS) -> Iterator[Any]:
+    """Yields the transactions of `url` for the range, window by window, in order.
+
+    Served through the local transaction store when it is enabled. Raises
+    requests exceptions on failure, like transport calls do.
+    """
+    if TRANSACTION_STORE_ENABLED:
+        from common import transaction_store  # Local import: the store fetches through this module.
+        if transaction_store.is_storable_range(start_date, end_date):
+            yield from transaction_store.iter_range(url, start_date, end_date)
+            return
+    windows = plan_windows(start_date, end_date) or [(start_date, end_date)]
+    for _, items, _ in iter_windows(url, windows, max_workers):
+        yield from items
+
+
+def iter_transaction_records(url: str, start_date: str, end_date: str, max_workers: int = TRANSACTION_FETCH_WORKERS) -> Iterator[records.Transaction]:
+    """Like iter_transactions(), but yields typed Transaction records."""
+    if TRANSACTION_STORE_ENABLED:
+        from common import transaction_store
+        if transaction_store.is_storable_range(start_date, end_date):
+            transaction_store.sync_range(url, start_date, end_date)
+            yield from transaction_store.read_range_records(url, start_date, end_date)
+            return
+    windows = plan_windows(start_date, end_date) or [(start_date, end_date)]
+    for _, items, _ in iter_windows(url, windows, max_workers, fetch=fetch_window_records):
+        yield from items
+
+
+def wrap_payload(envelope_key: Optional[str], transactions: List[Any],
+                 envelope_fields: Optional[Dict[str, Any]] = None) -> Any:
+    """Rebuilds the API's payload shape around a list of transactions."""
+    if envelope_key is None:
+        return transactions
+    return dict(envelope_fields or {}, **{envelope_key: transactions})
+
+
+def merge_envelope_fields(windows_fields: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The envelope members every window agrees on.
+
+    Members that differ between windows (a per-window count or date bound)
+    would be wrong for the merged range, so they are left out.
+    """
+    if not windows_fields:
+        return {}
+    first, *rest = windows_fields
+    return {key: value for key, value in first.items() if all(key in f and f[key] == value for f in rest)}
+
+
+def load_transaction_history(url: str, start_date: str, end_date: str) -> Any:
+    """Returns the decoded transactions payload for the range, as the API shapes it.
+
+    With the local transaction store enabled, stored days are served from disk and
+    only missing or unsettled intervals are fetched. Otherwise short ranges are a
+    single request and long ranges are fetched as concurrent windows and merged.
+    """
+    if TRANSACTION_STORE_ENABLED:
+        from common import transaction_store  # Local import: the store fetches through this module.
+        if transaction_store.is_storable_range(start_date, end_date):
+            return transaction_store.load_range(url, start_date, end_date)
+    return fetch_transaction_history_payload(url, start_date, end_date)
+
+
+def fetch_transaction_history_payload(url: str, start_date: str, end_date: str) -> Any:
+    """Fetches the range from the API, bypassing the local transaction store."""
+    windows = plan_windows(start_date, end_date)
+    if windows is None:
+        response = transport.get(url, params={"start_date": start_date, "end_date": end_date})
+        print(f"Response: {response.status_code}\n=================")
+        response.raise_for_status()
+        try:
+            return records.loads(response.content)
+        except records.DecodeError as e:
+            raise _decode_error(e)
+
+    envelope_key = None
+    transactions: List[Any] = []
+    windows_fields = []
+    for key, items, fields in iter_windows(url, windows, TRANSACTION_FETCH_WORKERS):
+        envelope_key = envelope_key or key
+        transactions.extend(items)
+        windows_fields.append(fields)
+    return wrap_payload(envelope_key, transactions, merge_envelope_fields(windows_fields))
+
+
+async def _fetch_window_async(url: str, start_date: str, end_date: str, semaphore: asyncio.Semaphore) -> Window:
+    from common import async_transport  # Imported lazily: httpx is only needed by async callers.
+
+    params = {"start_date": start_date, "end_date": end_date}
+    async with semaphore:
+        print(f"\n=====API Call:======\n{url} (params: {params}, streamed)\n=================")
+        parser = JsonArrayStreamParser()
+        items: List[Any] = []
+        response = await async_transport.get(url, params=params, stream=True)
+        try:
+            print(f"Response: {response.status_code}\n=================")
+            if response.is_error:
+                await response.aread()  # So error handlers can read the body.
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                items.extend(parser.feed(chunk))
+            items.extend(parser.close())
+        finally:
+            await response.aclose()
+        return parser.envelope_key, items, parser.envelope_fields
+
+
+async def load_transaction_history_async(url: str, start_date: str, end_date: str) -> Any:
+    """Async counterpart of load_transaction_history()."""
+    from common import async_transport
+
+    semaphore = asyncio.Semaphore(TRANSACTION_FETCH_WORKERS)
+    if TRANSACTION_STORE_ENABLED:
+        from common import transaction_store
+        if transaction_store.is_storable_range(start_date, end_date):
+            # SQLite calls are blocking, so they run in a worker thread; fetching stays async.
+            missing = await asyncio.to_thread(transaction_store.missing_intervals, url, start_date, end_date)
+            for missing_start, missing_end in missing:
+                windows = plan_windows(missing_start, missing_end) or [(missing_start, missing_end)]
+                results = await asyncio.gather(*(_fetch_window_async(url, start, end, semaphore) for start, end in windows))
+                for (window_start, window_end), (key, items, fields) in zip(windows, results):
+                    await asyncio.to_thread(transaction_store.save_window, url, window_start, window_end, key, items, fields)
+            return await asyncio.to_thread(transaction_store.load_stored_range, url, start_date, end_date)
+
+    windows = plan_windows(start_date, end_date)
+    if windows is None:
+        response = await async_transport.get(url, params={"start_date": start_date, "end_date": end_date})
+        print(f"Response: {response.status_code}\n=================")
+        response.raise_for_status()
+        try:
+            return records.loads(response.content)
+        except records.DecodeError as e:
+            raise json.JSONDecodeError(str(e), "", 0)
+
+    results = await asyncio.gather(*(_fetch_window_async(url, start, end, semaphore) for start, end in windows))
+    envelope_key = next((key for key, _, _ in results if key is not None), None)
+    transactions = [item for _, items, _ in results for item in items]
+    return wrap_payload(envelope_key, transactions, merge_envelope_fields([fields for _, _, fields in results]))
@@ -0,0 +1,135 @@
+# common/transport.py
+"""Shared, pooled HTTP transport for the bank API clients.
+
+All three bank_api_client modules route their calls through one process-wide
+requests.Session so that TCP/TLS connections to API_BASE_URL are kept alive and
+reused across tool calls. Every request gets the default connect/read timeouts
+from config.py unless the caller passes its own `timeout`, and runs under the
+endpoint's retry / circuit-breaker / hedging policy from common/resilience.py.
+Each attempt of a quota-bound endpoint also waits for common/rate_limit.py.
+"""
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common import rate_limit, resilience
+from config import (
+    API_BASE_URL,
+    HTTP_API_POOL_MAXSIZE,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_POOL_MAXSIZE_PER_HOST,
+    HTTP_READ_TIMEOUT,
+)
+
+DEFAULT_TIMEOUT: Tuple[float, float] = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout when the caller sets none."""
+
+    def __init__(self, *args, timeout: Tuple[float, float] = DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def _parse_host_pool_sizes(spec: str) -> Dict[str, int]:
+    """Parses "host=size,host=size" into a dict, ignoring malformed entries."""
+    sizes: Dict[str, int] = {}
+    for item in spec.split(","):
+        host, sep, size = item.strip().partition("=")
+        if not sep:
+            continue
+        try:
+            sizes[host.strip().lower()] = int(size)
+        except ValueError:
+            print(f"Ignoring invalid pool size for host '{host}': {size!r} (transport)")
+    return sizes
+
+
+def host_pool_sizes() -> Dict[str, int]:
+    """Returns the keep-alive pool size to use for each explicitly sized host."""
+    sizes = {}
+    api_host = urlsplit(API_BASE_URL).hostname
+    if api_host:
+        sizes[api_host.lower()] = HTTP_API_POOL_MAXSIZE
+    sizes.update(_parse_host_pool_sizes(HTTP_POOL_MAXSIZE_PER_HOST))
+    return sizes
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    default_adapter = TimeoutHTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+    )
+    session.mount("https://", default_adapter)
+    session.mount("http://", default_adapter)
+    # requests picks the adapter with the longest matching prefix, so a
+    # host-specific mount overrides the scheme-wide default above. Prefixes end
+    # in "/" or ":" (explicit port) so they never match a longer host name
+    # such as api.example.com.evil.net.
+    for host, size in host_pool_sizes().items():
+        adapter = TimeoutHTTPAdapter(pool_connections=1, pool_maxsize=size)
+        for scheme in ("https", "http"):
+            session.mount(f"{scheme}://{host}/", adapter)
+            session.mount(f"{scheme}://{host}:", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Returns the process-wide pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def close_session() -> None:
+    """Closes the shared session and its pooled connections (e.g. on shutdown)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """Sends a request through the shared session. Mirrors requests.request().
+
+    Raises resilience.CircuitOpenError (a requests ConnectionError) while the
+    endpoint's circuit is open.
+    """
+    session = get_session()
+    return resilience.call(method, url, lambda: session.request(method, url, **kwargs),
+                           stream=kwargs.get("stream", False), limiter=rate_limit.limiter_for(url))
+
+
+def get(url: str, params: Optional[Dict] = None, **kwargs) -> requests.Response:
+    return request("GET", url, params=params, **kwargs)
+
+
+def post(url: str, json: Optional[Dict] = None, **kwargs) -> requests.Response:
+    return request("POST", url, json=json, **kwargs)
+
+
+def put(url: str, json: Optional[Dict] = None, **kwargs) -> requests.Response:
+    return request("PUT", url, json=json, **kwargs)
+
+
+def delete(url: str, **kwargs) -> requests.Response:
+    return request("DELETE", url, **kwargs)
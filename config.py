@@ -9,3 +9,201 @@ DEFAULT_LLM_MODEL = "gemini-2.5-flash-preview-05-20"
 
 #TODO Generate a Google Maps API key from Google Cloud Console and add it here
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "REPLACE THIS WITH A GOOGLE MAPS API KEY")
+
+# --- Shared HTTP transport (see common/transport.py) ---
+# Timeouts are in seconds and apply to every bank API / Google Maps call that
+# does not pass an explicit timeout.
+HTTP_CONNECT_TIMEOUT = float(os.getenv("MONEYPENNY_HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("MONEYPENNY_HTTP_READ_TIMEOUT", "30"))
+# Number of distinct hosts whose connection pools are kept alive.
+HTTP_POOL_CONNECTIONS = int(os.getenv("MONEYPENNY_HTTP_POOL_CONNECTIONS", "10"))
+# Keep-alive connections retained per host unless overridden below.
+HTTP_POOL_MAXSIZE = int(os.getenv("MONEYPENNY_HTTP_POOL_MAXSIZE", "10"))
+# Per-host overrides as "host=size,host=size", e.g. "api.agenthack.uk=32".
+# The API_BASE_URL host gets HTTP_API_POOL_MAXSIZE unless listed here.
+HTTP_POOL_MAXSIZE_PER_HOST = os.getenv("MONEYPENNY_HTTP_POOL_MAXSIZE_PER_HOST", "")
+HTTP_API_POOL_MAXSIZE = int(os.getenv("MONEYPENNY_HTTP_API_POOL_MAXSIZE", "32"))
+# Upper bound on concurrent connections held by the async (httpx) client.
+HTTP_ASYNC_MAX_CONNECTIONS = int(os.getenv("MONEYPENNY_HTTP_ASYNC_MAX_CONNECTIONS", "100"))
+
+# --- Reference-data caching (see common/cache.py) ---
+# Time-to-live in seconds for each cached endpoint.
+CACHE_TTL_COUNTRY_RISK = int(os.getenv("MONEYPENNY_CACHE_TTL_COUNTRY_RISK", "86400"))
+CACHE_TTL_COMPANY_DIRECTORS = int(os.getenv("MONEYPENNY_CACHE_TTL_COMPANY_DIRECTORS", "86400"))
+CACHE_TTL_CREDIT_CARD_PRODUCTS = int(os.getenv("MONEYPENNY_CACHE_TTL_CREDIT_CARD_PRODUCTS", "3600"))
+CACHE_TTL_LOAN_PRODUCTS = int(os.getenv("MONEYPENNY_CACHE_TTL_LOAN_PRODUCTS", "900"))
+# For how long after expiry an entry may still be served while it is refreshed in the background.
+CACHE_STALE_WHILE_REVALIDATE = int(os.getenv("MONEYPENNY_CACHE_STALE_WHILE_REVALIDATE", "300"))
+# Maximum entries per endpoint cache before least-recently-used entries are evicted.
+CACHE_MAXSIZE = int(os.getenv("MONEYPENNY_CACHE_MAXSIZE", "1024"))
+
+# --- Country risk table (see aml_agent/country_risk_table.py) ---
+# Serve country ratings from an in-memory copy of the whole table, loaded in bulk at startup.
+COUNTRY_RISK_TABLE_ENABLED = os.getenv("MONEYPENNY_COUNTRY_RISK_TABLE_ENABLED", "1") == "1"
+# Seconds between conditional (If-None-Match) re-validations of the table.
+COUNTRY_RISK_REFRESH_SECONDS = float(os.getenv("MONEYPENNY_COUNTRY_RISK_REFRESH_SECONDS", "3600"))
+# How long a lookup waits for the initial load before falling back to the per-country endpoint.
+COUNTRY_RISK_LOAD_TIMEOUT = float(os.getenv("MONEYPENNY_COUNTRY_RISK_LOAD_TIMEOUT", "5"))
+# Concurrent per-country requests for codes missing from the table (or for all codes while it is unavailable).
+COUNTRY_RISK_FETCH_WORKERS = int(os.getenv("MONEYPENNY_COUNTRY_RISK_FETCH_WORKERS", "4"))
+
+# --- Geocoding cache (see common/geocode_cache.py) ---
+# Persistent cache of Google Maps reverse-geocoding results, keyed by geohash.
+GEOCODE_CACHE_PATH = os.getenv(
+    "MONEYPENNY_GEOCODE_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "moneypenny", "geocodes.sqlite3"),
+)
+# Geohash length coordinates are quantized to (7 -> ~153 m x 153 m, 8 -> ~38 m x 19 m).
+GEOCODE_CACHE_PRECISION = int(os.getenv("MONEYPENNY_GEOCODE_CACHE_PRECISION", "8"))
+GEOCODE_CACHE_TTL = int(os.getenv("MONEYPENNY_GEOCODE_CACHE_TTL", str(30 * 86400)))
+# Cells kept before least-recently-used ones are evicted.
+GEOCODE_CACHE_MAXSIZE = int(os.getenv("MONEYPENNY_GEOCODE_CACHE_MAXSIZE", "100000"))
+# Concurrent lookups for the cache misses of one batch.
+GEOCODE_BATCH_WORKERS = int(os.getenv("MONEYPENNY_GEOCODE_BATCH_WORKERS", "4"))
+
+# --- Windowed transaction history fetch (see common/transaction_stream.py) ---
+# Ranges longer than this many days are split into windows fetched concurrently.
+TRANSACTION_SPLIT_THRESHOLD_DAYS = int(os.getenv("MONEYPENNY_TRANSACTION_SPLIT_THRESHOLD_DAYS", "62"))
+# Window length in days; 0 means calendar-month windows.
+TRANSACTION_WINDOW_DAYS = int(os.getenv("MONEYPENNY_TRANSACTION_WINDOW_DAYS", "0"))
+# Maximum windows in flight (and therefore buffered) at once.
+TRANSACTION_FETCH_WORKERS = int(os.getenv("MONEYPENNY_TRANSACTION_FETCH_WORKERS", "4"))
+
+# --- Local transaction store (see common/transaction_store.py) ---
+# Off by default: the store keeps raw transactions (customer PII) on local disk.
+TRANSACTION_STORE_ENABLED = os.getenv("MONEYPENNY_TRANSACTION_STORE_ENABLED", "0") == "1"
+TRANSACTION_STORE_PATH = os.getenv(
+    "MONEYPENNY_TRANSACTION_STORE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "moneypenny", "transactions.sqlite3"),
+)
+# Days before the fetch date that are treated as unsettled and re-fetched on the next request.
+TRANSACTION_STORE_RECENT_DAYS = int(os.getenv("MONEYPENNY_TRANSACTION_STORE_RECENT_DAYS", "3"))
+# Fetched windows older than this many days are deleted together with their transactions.
+TRANSACTION_STORE_RETENTION_DAYS = int(os.getenv("MONEYPENNY_TRANSACTION_STORE_RETENTION_DAYS", "30"))
+# Seconds between retention sweeps of a long-running process (one also runs when the store opens).
+TRANSACTION_STORE_SWEEP_INTERVAL = int(os.getenv("MONEYPENNY_TRANSACTION_STORE_SWEEP_INTERVAL", "3600"))
+
+# --- Retry / circuit breaker / hedging policy (see common/resilience.py) ---
+# Attempts per call (1 = no retries). Only idempotent methods (GET, HEAD) are retried,
+# unless an endpoint is marked idempotent below.
+RESILIENCE_MAX_ATTEMPTS = int(os.getenv("MONEYPENNY_RESILIENCE_MAX_ATTEMPTS", "3"))
+# Full-jitter exponential backoff: sleep uniform(0, min(max, base * 2**retry)) seconds.
+RESILIENCE_BACKOFF_BASE = float(os.getenv("MONEYPENNY_RESILIENCE_BACKOFF_BASE", "0.25"))
+RESILIENCE_BACKOFF_MAX = float(os.getenv("MONEYPENNY_RESILIENCE_BACKOFF_MAX", "8"))
+# Consecutive failures (connection errors, timeouts, 5xx) that open an endpoint's circuit,
+# and for how many seconds an open circuit fails fast before a trial call is let through.
+RESILIENCE_BREAKER_FAILURE_THRESHOLD = int(os.getenv("MONEYPENNY_RESILIENCE_BREAKER_FAILURE_THRESHOLD", "5"))
+RESILIENCE_BREAKER_RESET_SECONDS = float(os.getenv("MONEYPENNY_RESILIENCE_BREAKER_RESET_SECONDS", "30"))
+# Endpoints (fnmatch patterns over endpoint names) whose GETs send a hedged duplicate once
+# they run longer than the endpoint's observed latency percentile. Endpoints listed in
+# RATE_LIMITS are never hedged, since a duplicate would spend their quota.
+RESILIENCE_HEDGE_ENDPOINTS = os.getenv("MONEYPENNY_RESILIENCE_HEDGE_ENDPOINTS", "external_services.*")
+RESILIENCE_HEDGE_PERCENTILE = float(os.getenv("MONEYPENNY_RESILIENCE_HEDGE_PERCENTILE", "0.95"))
+# Successful calls observed before hedging starts for an endpoint.
+RESILIENCE_HEDGE_MIN_SAMPLES = int(os.getenv("MONEYPENNY_RESILIENCE_HEDGE_MIN_SAMPLES", "20"))
+# Per-endpoint overrides as "endpoint:field=value;endpoint:field=value", where field is one of
+# max_attempts, backoff_base, backoff_max, failure_threshold, reset_seconds, hedge, idempotent.
+# e.g. "external_services.watchlist_check:idempotent=1;external_services.credit_report:max_attempts=1"
+RESILIENCE_ENDPOINT_OVERRIDES = os.getenv("MONEYPENNY_RESILIENCE_ENDPOINT_OVERRIDES", "")
+
+# --- Client-side rate limits (see common/rate_limit.py) ---
+# Per-endpoint limits as "endpoint:rate=<requests/s>,burst=<n>,in_flight=<n>;endpoint:...",
+# keyed by common/resilience.py endpoint names. Shared by every agent in the process.
+RATE_LIMITS = os.getenv(
+    "MONEYPENNY_RATE_LIMITS",
+    "external_services.watchlist_check:rate=5,burst=5,in_flight=4;"
+    "external_services.credit_report:rate=2,burst=2,in_flight=2;"
+    "maps.googleapis.com/maps/api/geocode/json:rate=50,burst=10,in_flight=10",
+)
+
+# --- AML detectors (see aml_agent/detectors/) ---
+# Cash reporting threshold and the band below it treated as "just below" (0.15 -> 8,500-9,999.99).
+STRUCTURING_THRESHOLD = float(os.getenv("MONEYPENNY_STRUCTURING_THRESHOLD", "10000"))
+STRUCTURING_BAND = float(os.getenv("MONEYPENNY_STRUCTURING_BAND", "0.15"))
+# Sliding window length and the minimum number of near-threshold cash transactions in it.
+STRUCTURING_WINDOW_DAYS = int(os.getenv("MONEYPENNY_STRUCTURING_WINDOW_DAYS", "7"))
+STRUCTURING_MIN_TRANSACTIONS = int(os.getenv("MONEYPENNY_STRUCTURING_MIN_TRANSACTIONS", "2"))
+# Maximum findings returned to the agent per detector run (largest first).
+DETECTOR_MAX_FINDINGS = int(os.getenv("MONEYPENNY_DETECTOR_MAX_FINDINGS", "20"))
+# Pass-through: credits of at least MIN_CREDIT of which MIN_RATIO leaves within WINDOW_HOURS;
+# episodes drained by PEAK_DROP_MIN_OUTFLOWS or more small debits are reported as "Peak and Drop".
+PASS_THROUGH_MIN_CREDIT = float(os.getenv("MONEYPENNY_PASS_THROUGH_MIN_CREDIT", "10000"))
+PASS_THROUGH_WINDOW_HOURS = float(os.getenv("MONEYPENNY_PASS_THROUGH_WINDOW_HOURS", "72"))
+PASS_THROUGH_MIN_RATIO = float(os.getenv("MONEYPENNY_PASS_THROUGH_MIN_RATIO", "0.8"))
+# Customers' home country (ISO alpha-2) when their profile gives none; credits from elsewhere are cross-border.
+BANK_HOME_COUNTRY = os.getenv("MONEYPENNY_BANK_HOME_COUNTRY", "GB").upper()
+PEAK_DROP_MIN_OUTFLOWS = int(os.getenv("MONEYPENNY_PEAK_DROP_MIN_OUTFLOWS", "5"))
+# Profile deviation: size z-score and turnover ratio (review period / expected monthly turnover)
+# that raise a flag, and the transaction-free gap after which an account counts as dormant.
+PROFILE_SIZE_Z_THRESHOLD = float(os.getenv("MONEYPENNY_PROFILE_SIZE_Z_THRESHOLD", "3.0"))
+PROFILE_TURNOVER_RATIO_THRESHOLD = float(os.getenv("MONEYPENNY_PROFILE_TURNOVER_RATIO_THRESHOLD", "2.0"))
+DORMANT_DAYS = int(os.getenv("MONEYPENNY_DORMANT_DAYS", "90"))
+# Accounts scored concurrently by profile_deviation_bulk.
+PROFILE_BULK_WORKERS = int(os.getenv("MONEYPENNY_PROFILE_BULK_WORKERS", "8"))
+
+# --- Transaction table (see aml_agent/transaction_table.py) ---
+# Reviews whose columnar transaction tables are kept in memory (least recently used evicted).
+TRANSACTION_TABLE_REGISTRY_SIZE = int(os.getenv("MONEYPENNY_TRANSACTION_TABLE_REGISTRY_SIZE", "32"))
+# Default number of rows query_review_transactions hands back to an agent.
+REVIEW_QUERY_LIMIT = int(os.getenv("MONEYPENNY_REVIEW_QUERY_LIMIT", "50"))
+
+# --- Offline reverse geocoding (see aml_agent/reverse_geocoder.py) ---
+# GeoJSON FeatureCollection of country boundaries with an ISO alpha-2 property. Defaults to the Natural Earth
+# 1:110m derivative shipped in aml_agent/data (public domain); point it at a finer set, e.g. Natural Earth
+# ne_50m_admin_0_countries.geojson, for sharper borders. Locations it cannot place go to the Google Maps geocoder.
+GEOCODER_BOUNDARIES_PATH = os.getenv(
+    "MONEYPENNY_GEOCODER_BOUNDARIES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "aml_agent", "data", "country_boundaries.geojson"),
+)
+# Grid cell size of the spatial index in degrees.
+GEOCODER_GRID_DEGREES = float(os.getenv("MONEYPENNY_GEOCODER_GRID_DEGREES", "1.0"))
+# Points outside every polygon are given the country of the nearest boundary vertex within this distance.
+GEOCODER_NEAREST_KM = float(os.getenv("MONEYPENNY_GEOCODER_NEAREST_KM", "25"))
+
+# --- Local watchlist screening (see aml_agent/watchlist_index.py) ---
+# Watchlist snapshot: a JSON list of entries, {"version": ..., "entries": [...]} or JSON Lines, each entry
+# with name, aliases, entity_type, dates_of_birth, countries, list_name and reason. Not shipped with the
+# repository (it comes from the bank's screening provider); without it counterparties are screened over HTTP.
+WATCHLIST_SNAPSHOT_PATH = os.getenv(
+    "MONEYPENNY_WATCHLIST_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "aml_agent", "data", "watchlist_snapshot.json"),
+)
+# Jaro-Winkler score (0-1) from which a name counts as a match.
+WATCHLIST_MATCH_THRESHOLD = float(os.getenv("MONEYPENNY_WATCHLIST_MATCH_THRESHOLD", "0.88"))
+# Minimum trigram overlap (Dice coefficient) for a listed name to be scored, and the cap on names scored per query.
+WATCHLIST_NGRAM_MIN_OVERLAP = float(os.getenv("MONEYPENNY_WATCHLIST_NGRAM_MIN_OVERLAP", "0.4"))
+WATCHLIST_MAX_CANDIDATES = int(os.getenv("MONEYPENNY_WATCHLIST_MAX_CANDIDATES", "50"))
+# Distinct counterparties screened concurrently by batch_check_counterparties_against_watchlists.
+WATCHLIST_BATCH_CONCURRENCY = int(os.getenv("MONEYPENNY_WATCHLIST_BATCH_CONCURRENCY", "4"))
+
+# --- Counterparty graph (see aml_agent/counterparty_graph.py) ---
+# Bank identifier (BIC) of the bank's own accounts, as it appears in counterparty_bank_identifier. Reviewed
+# accounts are keyed with it, so transfers between reviewed accounts meet in the graph; set it in production.
+COUNTERPARTY_GRAPH_BANK_IDENTIFIER = os.getenv("MONEYPENNY_COUNTERPARTY_GRAPH_BANK_IDENTIFIER", "").upper()
+# Longest fund-flow cycle searched for (hops) and the smallest amount each hop must carry.
+COUNTERPARTY_GRAPH_MAX_CYCLE_LENGTH = int(os.getenv("MONEYPENNY_COUNTERPARTY_GRAPH_MAX_CYCLE_LENGTH", "4"))
+COUNTERPARTY_GRAPH_MIN_CYCLE_AMOUNT = float(os.getenv("MONEYPENNY_COUNTERPARTY_GRAPH_MIN_CYCLE_AMOUNT", "1000"))
+
+# --- Company director prefetch (see aml_agent/director_prefetch.py) ---
+# Companies whose director information is fetched concurrently (results are cached per
+# (registration id, country) for CACHE_TTL_COMPANY_DIRECTORS).
+DIRECTOR_PREFETCH_WORKERS = int(os.getenv("MONEYPENNY_DIRECTOR_PREFETCH_WORKERS", "8"))
+
+# --- AML policy rule engine (see aml_agent/policy_engine.py) ---
+# When false, aml_policy_alignment_agent returns the rule engine's decision without a model call
+# (no narrative); batch reviews can also request this per review through session state.
+AML_POLICY_NARRATIVE = os.getenv("MONEYPENNY_AML_POLICY_NARRATIVE", "true").lower() in ("1", "true", "yes")
+
+# --- Portfolio batch review (see aml_agent/batch_review.py) ---
+# Accounts reviewed concurrently. Each review screens its counterparties on up to
+# WATCHLIST_BATCH_CONCURRENCY threads, so keep workers x that within HTTP_API_POOL_MAXSIZE.
+BATCH_REVIEW_WORKERS = int(os.getenv("MONEYPENNY_BATCH_REVIEW_WORKERS", "8"))
+# Reviews per Parquet part file; at most this many are redone after an interruption.
+BATCH_REVIEW_PARQUET_ROWS = int(os.getenv("MONEYPENNY_BATCH_REVIEW_PARQUET_ROWS", "1000"))
+# Watchlist results kept per (normalised counterparty name, country) for the rest of a sweep, and for how long (seconds).
+BATCH_REVIEW_SCREENING_CACHE_SIZE = int(os.getenv("MONEYPENNY_BATCH_REVIEW_SCREENING_CACHE_SIZE", "100000"))
+BATCH_REVIEW_SCREENING_CACHE_TTL = int(os.getenv("MONEYPENNY_BATCH_REVIEW_SCREENING_CACHE_TTL", "86400"))
+# Accounts (the first in the input) whose flows make up a sweep's counterparty graph; the
+# counterparty network of later accounts is not assessed and is listed in incomplete_sources.
+# The graph accounts' transactions and profiles stay in memory from the first pass until each is reviewed.
+BATCH_REVIEW_GRAPH_MAX_ACCOUNTS = int(os.getenv("MONEYPENNY_BATCH_REVIEW_GRAPH_MAX_ACCOUNTS", "10000"))
@@ -2,9 +2,18 @@
 import requests
 import json
 from typing import Optional
-from config import API_BASE_URL # Import from root config
+from config import API_BASE_URL, CACHE_TTL_CREDIT_CARD_PRODUCTS # Import from root config
+from common import transport # Shared pooled HTTP session with default timeouts
+from common.cache import TTLCache, cached
+from common.single_flight import coalesced
+from common import transaction_stream
+from common import records
 
+# The product catalogue changes rarely; shared with async_bank_api_client.
+CREDIT_CARD_PRODUCTS_CACHE = TTLCache("concierge.credit_card_products", ttl=CACHE_TTL_CREDIT_CARD_PRODUCTS)
 
+
+@coalesced
 def fetch_user_profile(account_number: str) -> dict:
     """
     Fetches basic profile information for the user associated with the given account_number.
@@ -21,9 +30,9 @@ def fetch_user_profile(account_number: str) -> dict:
               - 'error_message' (str, optional): A description of the error if status is "error".
     """
     try:
-        response = requests.get(f"{API_BASE_URL}/users/{account_number}/profile") # Use imported API_BASE_URL
+        response = transport.get(f"{API_BASE_URL}/users/{account_number}/profile") # Use imported API_BASE_URL
         response.raise_for_status() # Raises an HTTPError for bad responses (4XX or 5XX)
-        return {"status": "success", "data": response.json()}
+        return {"status": "success", "data": records.to_builtins(records.decode_user_profile(response.content))}
     except requests.exceptions.HTTPError as e:
         try:
             error_response = e.response.json()
@@ -42,10 +51,11 @@ def fetch_user_profile(account_number: str) -> dict:
     except requests.exceptions.RequestException as e:
         print(f"API RequestException fetching user profile for {account_number}: {e}")
         return {"status": "error", "error_message": f"Failed to fetch user profile. API request failed: {e}"}
-    except json.JSONDecodeError as e:
+    except (json.JSONDecodeError, records.DecodeError) as e:
         print(f"API JSONDecodeError for user profile {account_number}: {e}")
         return {"status": "error", "error_message": "Failed to fetch user profile. Invalid JSON response from API."}
 
+@coalesced
 def fetch_transaction_history(account_number: str, start_date: str, end_date: str) -> dict:
     """
     Retrieves a list of transactions for the specified account_number within a given date range.
@@ -63,11 +73,10 @@ def fetch_transaction_history(account_number: str, start_date: str, end_date: st
                 Example: [{'transaction_id': 'txn_1', 'date': '2023-01-15', ...}]
               - 'error_message' (str, optional): A description of the error if status is "error".
     """
-    params = {"start_date": start_date, "end_date": end_date}
     try:
-        response = requests.get(f"{API_BASE_URL}/users/{account_number}/transactions", params=params) # Use imported API_BASE_URL
-        response.raise_for_status()
-        return {"status": "success", "data": response.json()}
+        # Long ranges are fetched as concurrent date windows and merged.
+        data = transaction_stream.load_transaction_history(f"{API_BASE_URL}/users/{account_number}/transactions", start_date, end_date) # Use imported API_BASE_URL
+        return {"status": "success", "data": data}
     except requests.exceptions.HTTPError as e:
         try:
             error_response = e.response.json()
@@ -90,6 +99,7 @@ def fetch_transaction_history(account_number: str, start_date: str, end_date: st
         print(f"API JSONDecodeError for transaction history {account_number}: {e}")
         return {"status": "error", "error_message": "Failed to fetch transaction history. Invalid JSON response from API."}
 
+@coalesced
 def fetch_account_details(account_number: str) -> dict:
     """
     Fetches comprehensive details about the user's account associated with the given account_number.
@@ -106,9 +116,9 @@ def fetch_account_details(account_number: str) -> dict:
               - 'error_message' (str, optional): A description of the error if status is "error".
     """
     try:
-        response = requests.get(f"{API_BASE_URL}/users/{account_number}/account_details") # Use imported API_BASE_URL
+        response = transport.get(f"{API_BASE_URL}/users/{account_number}/account_details") # Use imported API_BASE_URL
         response.raise_for_status()
-        return {"status": "success", "data": response.json()}
+        return {"status": "success", "data": records.to_builtins(records.decode_account_details(response.content))}
     except requests.exceptions.HTTPError as e:
         try:
             error_response = e.response.json()
@@ -127,10 +137,12 @@ def fetch_account_details(account_number: str) -> dict:
     except requests.exceptions.RequestException as e:
         print(f"API RequestException fetching account details for {account_number}: {e}")
         return {"status": "error", "error_message": f"Failed to fetch account details. API request failed: {e}"}
-    except json.JSONDecodeError as e:
+    except (json.JSONDecodeError, records.DecodeError) as e:
         print(f"API JSONDecodeError for account details {account_number}: {e}")
         return {"status": "error", "error_message": "Failed to fetch account details. Invalid JSON response from API."}
 
+@cached(CREDIT_CARD_PRODUCTS_CACHE)
+@coalesced
 def fetch_credit_card_products() -> dict:
     """
     Retrieves a list of available credit card products offered by Moneypenny's Bank.
@@ -144,7 +156,7 @@ def fetch_credit_card_products() -> dict:
               - 'error_message' (str, optional): A description of the error if status is "error".
     """
     try:
-        response = requests.get(f"{API_BASE_URL}/products/credit_cards") # Use imported API_BASE_URL
+        response = transport.get(f"{API_BASE_URL}/products/credit_cards") # Use imported API_BASE_URL
         response.raise_for_status()
         return {"status": "success", "data": response.json()}
     except requests.exceptions.HTTPError as e:
@@ -195,7 +207,7 @@ def create_savings_goal(account_number: str, goal_name: str, target_amount: floa
         payload["initial_contribution"] = initial_contribution
     
     try:
-        response = requests.post(f"{API_BASE_URL}/users/{account_number}/savings_goals", json=payload) # Use imported API_BASE_URL
+        response = transport.post(f"{API_BASE_URL}/users/{account_number}/savings_goals", json=payload) # Use imported API_BASE_URL
         response.raise_for_status()
         return response.json() # Assuming API returns a dict like: {"status": "success", "goal_id": "...", ...}
     except requests.exceptions.HTTPError as e:
@@ -220,6 +232,7 @@ def create_savings_goal(account_number: str, goal_name: str, target_amount: floa
         print(f"API JSONDecodeError creating savings goal for {account_number}: {e}")
         return {"status": "error", "error_message": "Failed to create savings goal. Invalid JSON response from API."}
 
+@coalesced
 def get_savings_goals(account_number: str) -> dict:
     """
     Retrieves all active savings goals for a user.
@@ -231,7 +244,7 @@ def get_savings_goals(account_number: str) -> dict:
         dict: A dictionary containing status and a list of savings goal objects in 'data' on success.
     """
     try:
-        response = requests.get(f"{API_BASE_URL}/users/{account_number}/savings_goals") # Use imported API_BASE_URL
+        response = transport.get(f"{API_BASE_URL}/users/{account_number}/savings_goals") # Use imported API_BASE_URL
         response.raise_for_status()
         return response.json() # Assuming API returns a dict like: {"status": "success", "data": [...goals...]}
     except requests.exceptions.HTTPError as e:
@@ -288,7 +301,7 @@ def update_savings_goal(account_number: str, goal_id: str, add_contribution: Opt
         return {"status": "error", "error_message": "No update information provided for savings goal."}
 
     try:
-        response = requests.put(f"{API_BASE_URL}/users/{account_number}/savings_goals/{goal_id}", json=payload) # Use imported API_BASE_URL
+        response = transport.put(f"{API_BASE_URL}/users/{account_number}/savings_goals/{goal_id}", json=payload) # Use imported API_BASE_URL
         response.raise_for_status()
         return response.json() # Assuming API returns a dict like: {"status": "success", "data": {...updated_goal...}}
     except requests.exceptions.HTTPError as e:
@@ -325,7 +338,7 @@ def delete_savings_goal(account_number: str, goal_id: str) -> dict:
         dict: A dictionary containing status and message.
     """
     try:
-        response = requests.delete(f"{API_BASE_URL}/users/{account_number}/savings_goals/{goal_id}") # Use imported API_BASE_URL
+        response = transport.delete(f"{API_BASE_URL}/users/{account_number}/savings_goals/{goal_id}") # Use imported API_BASE_URL
         response.raise_for_status()
         if response.status_code == 204: # Handle 204 No Content specifically
             return {"status": "success", "message": "Savings goal deleted successfully."}
@@ -1,7 +1,7 @@
 # financial_concierge/sub_agents/account_data_agent/agent.py
 from google.adk.agents import Agent
 
-from financial_concierge.bank_api_client import (
+from financial_concierge.async_bank_api_client import (
     fetch_user_profile,
     fetch_transaction_history,
     fetch_account_details
@@ -16,7 +16,7 @@ account_data_agent = Agent(
     output_key="account_data_output", # Consistent with other agents' output_key naming
     #TODO Define the tools for the Account Data Agent.
     #     This agent is responsible for fetching various pieces of account-specific data.
-    #     1. Import the necessary functions from `financial_concierge.bank_api_client`:
+    #     1. Import the necessary functions from `financial_concierge.async_bank_api_client`:
     #        - `fetch_user_profile`
     #        - `fetch_transaction_history`
     #        - `fetch_account_details`
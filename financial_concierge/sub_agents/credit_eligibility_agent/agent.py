@@ -1,7 +1,7 @@
 # financial_concierge/sub_agents/credit_eligibility_agent/agent.py
 from google.adk.agents import Agent
 
-from financial_concierge.bank_api_client import (
+from financial_concierge.async_bank_api_client import (
     fetch_user_profile,
     fetch_transaction_history,
     fetch_account_details,
@@ -17,7 +17,7 @@ credit_eligibility_agent = Agent(
     output_key="credit_eligibility_output",
     #TODO Define the tools for the Credit Eligibility Agent.
     #     This agent assesses credit eligibility and provides credit card recommendations.
-    #     1. Import the necessary functions from `financial_concierge.bank_api_client`:
+    #     1. Import the necessary functions from `financial_concierge.async_bank_api_client`:
     #        - `fetch_user_profile`
     #        - `fetch_transaction_history` (useful for understanding financial behavior)
     #        - `fetch_account_details`
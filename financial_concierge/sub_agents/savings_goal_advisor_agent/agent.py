@@ -1,7 +1,7 @@
 # financial_concierge/sub_agents/savings_goal_advisor_agent/agent.py
 from google.adk.agents import Agent
 
-from financial_concierge.bank_api_client import (
+from financial_concierge.async_bank_api_client import (
     create_savings_goal,
     get_savings_goals,
     update_savings_goal,
@@ -19,7 +19,7 @@ savings_goal_advisor_agent = Agent(
     output_key="savings_goal_advisor_output",
     #TODO Define the tools for the Savings Goal Advisor Agent.
     #     This agent helps users create, manage, and track their savings goals.
-    #     1. Import the necessary functions from `financial_concierge.bank_api_client`:
+    #     1. Import the necessary functions from `financial_concierge.async_bank_api_client`:
     #        - `create_savings_goal`
     #        - `get_savings_goals`
     #        - `update_savings_goal`
@@ -1,7 +1,7 @@
 # financial_concierge/sub_agents/spending_advisor_agent/agent.py
 from google.adk.agents import Agent
 
-from financial_concierge.bank_api_client import (
+from financial_concierge.async_bank_api_client import (
     fetch_user_profile,
     fetch_transaction_history,
     fetch_account_details
@@ -16,7 +16,7 @@ spending_advisor_agent = Agent(
     output_key="spending_advisor_output",
     #TODO Define the tools for the Spending Advisor Agent.
     #     This agent analyzes spending patterns and provides advice.
-    #     1. Import the necessary functions from `financial_concierge.bank_api_client`:
+    #     1. Import the necessary functions from `financial_concierge.async_bank_api_client`:
     #        - `fetch_user_profile`
     #        - `fetch_transaction_history`
     #        - `fetch_account_details`
@@ -0,0 +1,3 @@
+# mock_api/__init__.py
+# Local mock of the Moneypenny API for offline development, benchmarks and load
+# tests. Run with `python -m mock_api` and point MONEYPENNY_API_BASE_URL at it.
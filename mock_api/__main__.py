@@ -0,0 +1,59 @@
+# mock_api/__main__.py
+# Command-line entry point: python -m mock_api --port 8080 --seed 42 --latency lognormal:40:0.5
+import argparse
+from typing import Dict, List
+
+from mock_api.generator import DataGenerator
+from mock_api.server import FaultInjector, MockApiServer
+
+
+def _pairs(items: List[str], option: str) -> Dict[str, str]:
+    pairs = {}
+    for item in items:
+        pattern, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"{option} expects PATTERN=VALUE, got {item!r}")
+        pairs[pattern] = value
+    return pairs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m mock_api", description="Local mock of the Moneypenny API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--seed", type=int, default=42, help="Seed for generated data and fault sampling.")
+    parser.add_argument("--transactions-per-day", type=float, default=4.0,
+                        help="Mean card transactions per account per day (salary, rent etc. come on top).")
+    parser.add_argument("--latency", default="none",
+                        help='Default latency model: none | fixed:MS | uniform:MIN_MS:MAX_MS | lognormal:MEDIAN_MS:SIGMA.')
+    parser.add_argument("--endpoint-latency", action="append", default=[], metavar="PATTERN=MODEL",
+                        help='Per-endpoint latency, e.g. "external_services.*=lognormal:400:0.8". Repeatable.')
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with an injected error.")
+    parser.add_argument("--endpoint-error-rate", action="append", default=[], metavar="PATTERN=RATE",
+                        help='Per-endpoint error rate, e.g. "users.transactions=0.05". Repeatable.')
+    parser.add_argument("--error-statuses", default="500,502,503,429", help="Statuses used for injected errors.")
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    args = parser.parse_args()
+
+    faults = FaultInjector(
+        seed=args.seed,
+        latency=args.latency,
+        endpoint_latency=_pairs(args.endpoint_latency, "--endpoint-latency"),
+        error_rate=args.error_rate,
+        endpoint_error_rate={k: float(v) for k, v in _pairs(args.endpoint_error_rate, "--endpoint-error-rate").items()},
+        error_statuses=tuple(int(s) for s in args.error_statuses.split(",") if s.strip()),
+    )
+    generator = DataGenerator(seed=args.seed, transactions_per_day=args.transactions_per_day)
+    server = MockApiServer((args.host, args.port), generator, faults, quiet=not args.verbose)
+    print(f"Mock Moneypenny API listening on {server.base_url}")
+    print(f"Run the agents against it with: export MONEYPENNY_API_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
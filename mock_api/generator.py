@@ -0,0 +1,333 @@
+# mock_api/generator.py
+"""Seeded, deterministic synthetic data for the mock Moneypenny API.
+
+Every value is derived from (seed, account, day) alone, so any date window of an
+account's history can be generated independently, in any order, and is identical
+on every run with the same seed. Transactions are produced lazily day by day,
+which lets the server stream histories of millions of rows without holding them.
+
+A fixed share of accounts (SUSPICIOUS_SHARE) additionally carries AML typologies:
+cash deposits kept just under the 10,000 reporting threshold and funds that are
+received and passed on within a day or two.
+"""
+import hashlib
+import math
+import random
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+FIRST_NAMES = ["James", "Olivia", "Amelia", "Noah", "Isla", "George", "Ava", "Arthur", "Mia", "Leo",
+               "Freya", "Oscar", "Grace", "Harry", "Lily", "Jack", "Sophia", "Theo", "Ella", "Muhammad"]
+LAST_NAMES = ["Smith", "Jones", "Taylor", "Brown", "Williams", "Wilson", "Johnson", "Davies", "Patel", "Robinson",
+              "Wright", "Thompson", "Evans", "Walker", "White", "Roberts", "Green", "Hall", "Khan", "Clarke"]
+CITIES = [  # (city, latitude, longitude, postcode prefix)
+    ("London", 51.5074, -0.1278, "EC1"), ("Manchester", 53.4808, -2.2426, "M1"),
+    ("Birmingham", 52.4862, -1.8904, "B1"), ("Leeds", 53.8008, -1.5491, "LS1"),
+    ("Glasgow", 55.8642, -4.2518, "G1"), ("Bristol", 51.4545, -2.5879, "BS1"),
+    ("Edinburgh", 55.9533, -3.1883, "EH1"), ("Cardiff", 51.4816, -3.1791, "CF10"),
+]
+MERCHANTS = [  # (name, category, typical amount)
+    ("Tesco", "Groceries", 45), ("Sainsbury's", "Groceries", 38), ("Pret A Manger", "Eating Out", 9),
+    ("Shell", "Transport", 60), ("TfL", "Transport", 7), ("Amazon UK", "Shopping", 32),
+    ("Netflix", "Subscriptions", 11), ("Boots", "Health", 14), ("Argos", "Shopping", 55),
+    ("Nando's", "Eating Out", 28), ("British Gas", "Utilities", 95), ("Thames Water", "Utilities", 40),
+    ("Trainline", "Travel", 48), ("Odeon", "Entertainment", 22), ("Uber", "Transport", 16),
+]
+COUNTRY_RISK = {
+    "GB": ("Low", "FATF member with robust AML framework."),
+    "IE": ("Low", "EU member state with robust AML framework."),
+    "FR": ("Low", "EU member state with robust AML framework."),
+    "DE": ("Low", "EU member state with robust AML framework."),
+    "US": ("Low", "FATF member with robust AML framework."),
+    "ES": ("Medium", "Elevated exposure to cash-intensive sectors."),
+    "AE": ("Medium", "Regional financial hub; increased monitoring."),
+    "TR": ("High", "On FATF increased monitoring list."),
+    "PA": ("High", "Weaknesses in beneficial ownership transparency."),
+    "NG": ("High", "On FATF increased monitoring list."),
+    "KY": ("High", "Offshore financial centre with secrecy concerns."),
+    "IR": ("Sanctioned", "Subject to comprehensive sanctions."),
+    "KP": ("Sanctioned", "Subject to comprehensive sanctions."),
+    "RU": ("Sanctioned", "Subject to sectoral and financial sanctions."),
+}
+FOREIGN_COUNTRIES = ["IE", "FR", "DE", "US", "ES", "AE", "TR", "PA", "NG", "KY"]
+WATCHLIST_NAMES = {  # Synthetic names that always hit, for exercising the positive path.
+    "ivan petrov": ("OFAC SDN", "Sanctioned individual."),
+    "global shell holdings ltd": ("Internal High-Risk Entities List", "Previous SAR filed."),
+    "red crescent trading fze": ("UN Consolidated List", "Designated entity."),
+}
+SUSPICIOUS_SHARE = 0.1
+STRUCTURING_THRESHOLD = 10000
+
+
+def _rng(*parts: Any) -> random.Random:
+    digest = hashlib.blake2b("|".join(str(p) for p in parts).encode(), digest_size=8).digest()
+    return random.Random(int.from_bytes(digest, "big"))
+
+
+class DataGenerator:
+    """Deterministic synthetic data keyed by account number and day."""
+
+    def __init__(self, seed: int = 42, transactions_per_day: float = 4.0, history_start: str = "2015-01-01"):
+        self.seed = seed
+        self.transactions_per_day = transactions_per_day
+        self.history_start = date.fromisoformat(history_start)
+
+    # --- Accounts ---------------------------------------------------------------
+
+    def account_exists(self, account_number: str) -> bool:
+        # Any 6-12 digit number is an account; everything else is a 404.
+        return account_number.isdigit() and 6 <= len(account_number) <= 12
+
+    def is_business(self, account_number: str) -> bool:
+        return _rng(self.seed, account_number, "business").random() < 0.2
+
+    def is_suspicious(self, account_number: str) -> bool:
+        return _rng(self.seed, account_number, "suspicious").random() < SUSPICIOUS_SHARE
+
+    def _home(self, account_number: str):
+        return _rng(self.seed, account_number, "home").choice(CITIES)
+
+    def _name(self, account_number: str) -> str:
+        rng = _rng(self.seed, account_number, "name")
+        if self.is_business(account_number):
+            return f"{rng.choice(LAST_NAMES)} & {rng.choice(LAST_NAMES)} {rng.choice(['Ltd', 'Trading Ltd', 'Holdings Ltd'])}"
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+    def _open_date(self, account_number: str) -> date:
+        rng = _rng(self.seed, account_number, "opened")
+        return self.history_start + timedelta(days=rng.randrange(0, 3000))
+
+    def profile(self, account_number: str) -> Dict[str, Any]:
+        rng = _rng(self.seed, account_number, "profile")
+        name = self._name(account_number)
+        city, _, _, postcode = self._home(account_number)
+        birth = date(1950, 1, 1) + timedelta(days=rng.randrange(0, 18000))
+        return {
+            "account_number": account_number,
+            "full_name": name,
+            "email": f"{name.split()[0].lower()}.{account_number[-4:]}@example.com",
+            "phone_number": f"+447{rng.randrange(100000000, 999999999)}",
+            "address": {"line1": f"{rng.randrange(1, 250)} High Street", "city": city,
+                        "postcode": f"{postcode} {rng.randrange(1, 9)}AB", "country": "GB"},
+            "date_of_birth": birth.isoformat(),
+            "account_type": "Business Current" if self.is_business(account_number) else "Personal Current",
+            "account_open_date": self._open_date(account_number).isoformat(),
+        }
+
+    def account_details(self, account_number: str) -> Dict[str, Any]:
+        rng = _rng(self.seed, account_number, "details")
+        balance = round(self._day_balance(account_number, date.today()), 2)
+        overdraft = rng.choice([0, 250, 500, 1000, 2500])
+        return {
+            "account_number": account_number,
+            "account_type": self.profile(account_number)["account_type"],
+            "account_status": "active",
+            "currency": "GBP",
+            "current_balance": balance,
+            "available_balance": round(balance + overdraft, 2),
+            "overdraft_limit": overdraft,
+            "linked_products": rng.sample(["Savings Account", "Credit Card", "Mortgage", "ISA"], rng.randrange(0, 3)),
+        }
+
+    def aml_profile_summary(self, account_number: str) -> Dict[str, Any]:
+        rng = _rng(self.seed, account_number, "aml")
+        business = self.is_business(account_number)
+        return {
+            "account_type": "Business" if business else "Personal",
+            "customer_since": self._open_date(account_number).isoformat(),
+            "primary_business_activity": rng.choice(["Retail", "Import/Export", "Consulting", "Hospitality"]) if business else "N/A",
+            "expected_monthly_turnover": rng.choice([5000, 20000, 80000]) if business else rng.choice([1500, 3000, 6000]),
+            "avg_transaction_size": round(rng.uniform(40, 400 if business else 90), 2),
+            "typical_counterparty_countries": ["GB"] + rng.sample(FOREIGN_COUNTRIES[:5], rng.randrange(0, 3)),
+            "known_alerts_history_count": rng.randrange(1, 4) if self.is_suspicious(account_number) else 0,
+        }
+
+    # --- Transactions -----------------------------------------------------------
+
+    def _day_balance(self, account_number: str, day: date) -> float:
+        # A smooth, deterministic opening balance per day, so windows need no running state.
+        rng = _rng(self.seed, account_number, "balance")
+        base, swing, period = rng.uniform(500, 20000), rng.uniform(200, 3000), rng.uniform(25, 35)
+        return base + swing * math.sin(2 * math.pi * day.toordinal() / period)
+
+    def transactions_for_day(self, account_number: str, day: date) -> List[Dict[str, Any]]:
+        """Returns one account's transactions on one day, in time order."""
+        rng = _rng(self.seed, account_number, day.isoformat())
+        city, lat, lon, _ = self._home(account_number)
+        business = self.is_business(account_number)
+        rows = []
+
+        count = min(int(rng.expovariate(1.0 / self.transactions_per_day) + 0.5), int(self.transactions_per_day * 10) + 1)
+        for _ in range(count):
+            name, category, typical = rng.choice(MERCHANTS)
+            rows.append(self._row(rng, -round(rng.lognormvariate(math.log(typical), 0.6), 2), "debit", name,
+                                  category, "GB", lat, lon, is_cash=False))
+        if rng.random() < 0.03:
+            rows.append(self._row(rng, -float(rng.choice([20, 50, 100, 200])), "cash_withdrawal", "ATM Withdrawal",
+                                  "Cash", "GB", lat, lon, is_cash=True))
+        if day.day == 25:
+            amount = round(rng.uniform(8000, 40000) if business else rng.uniform(1800, 5500), 2)
+            rows.append(self._row(rng, amount, "credit", "Client Payments" if business else "Employer Ltd Salary",
+                                  "Income", "GB", None, None, is_cash=False))
+        if day.day == 1:
+            rows.append(self._row(rng, -round(rng.uniform(650, 2200), 2), "debit", "Landlord Lettings",
+                                  "Housing", "GB", None, None, is_cash=False))
+        if rng.random() < 0.01:
+            country = rng.choice(FOREIGN_COUNTRIES)
+            rows.append(self._row(rng, -round(rng.uniform(200, 6000), 2), "international_transfer",
+                                  f"{rng.choice(LAST_NAMES)} Imports", "Transfers", country, None, None, is_cash=False))
+        if self.is_suspicious(account_number):
+            rows.extend(self._typologies(account_number, day, rng, lat, lon))
+
+        rows.sort(key=lambda row: row["timestamp"])
+        balance = self._day_balance(account_number, day)
+        for index, row in enumerate(rows):
+            balance += row["amount"]
+            row["transaction_id"] = f"txn_{account_number}_{day:%Y%m%d}_{index:04d}"
+            row["timestamp"] = f"{day.isoformat()}T{row['timestamp']}Z"
+            row["date"] = day.isoformat()
+            row["balance_after_transaction"] = round(balance, 2)
+        return rows
+
+    def _typologies(self, account_number: str, day: date, rng: random.Random, lat: float, lon: float) -> List[Dict[str, Any]]:
+        rows = []
+        # Structuring: bursts of cash deposits just below the reporting threshold.
+        if rng.random() < 0.04:
+            for _ in range(rng.randrange(2, 5)):
+                amount = round(rng.uniform(0.88, 0.99) * STRUCTURING_THRESHOLD, 2)
+                rows.append(self._row(rng, amount, "cash_deposit", "Branch Cash Deposit", "Cash", "GB",
+                                      lat + rng.uniform(-0.05, 0.05), lon + rng.uniform(-0.05, 0.05), is_cash=True))
+        # Pass-through: a large inbound credit forwarded abroad the same day or the next.
+        pass_through_rng = _rng(self.seed, account_number, "pass_through", day.isoformat())
+        if pass_through_rng.random() < 0.02:
+            amount = round(pass_through_rng.uniform(15000, 90000), 2)
+            rows.append(self._row(rng, amount, "credit", "Global Shell Holdings Ltd", "Transfers", "KY", None, None, is_cash=False))
+        previous = day - timedelta(days=1)
+        previous_rng = _rng(self.seed, account_number, "pass_through", previous.isoformat())
+        if previous_rng.random() < 0.02:
+            inbound = round(previous_rng.uniform(15000, 90000), 2)
+            rows.append(self._row(rng, -round(inbound * rng.uniform(0.93, 0.99), 2), "international_transfer",
+                                  "Red Crescent Trading FZE", "Transfers", rng.choice(["AE", "TR", "PA"]), None, None, is_cash=False))
+        return rows
+
+    def _row(self, rng: random.Random, amount: float, transaction_type: str, counterparty: str, category: str,
+             country: str, lat: Optional[float], lon: Optional[float], is_cash: bool) -> Dict[str, Any]:
+        seconds = rng.randrange(6 * 3600, 23 * 3600)
+        counterparty_rng = _rng(self.seed, "counterparty", counterparty)
+        row = {
+            "timestamp": f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}",
+            "amount": amount,
+            "currency": "GBP",
+            "transaction_type": transaction_type,
+            "description": counterparty if not is_cash else category,
+            "category": category,
+            "counterparty_name": counterparty,
+            "counterparty_account_number": str(counterparty_rng.randrange(10000000, 99999999)),
+            "counterparty_bank_identifier": f"{counterparty_rng.choice(['BARC', 'LOYD', 'HSBC', 'NWBK', 'MONZ'])}{country}2L",
+            "counterparty_country": country,
+            "is_cash_transaction": is_cash,
+            "originating_ip_address": None if is_cash else f"81.{rng.randrange(0, 255)}.{rng.randrange(0, 255)}.{rng.randrange(1, 254)}",
+        }
+        if lat is not None:
+            row["transaction_location_latitude"] = round(lat + rng.uniform(-0.02, 0.02), 5)
+            row["transaction_location_longitude"] = round(lon + rng.uniform(-0.02, 0.02), 5)
+        return row
+
+    def iter_transactions(self, account_number: str, start_date: date, end_date: date) -> Iterator[List[Dict[str, Any]]]:
+        """Yields the account's transactions one day at a time for the inclusive range."""
+        day = max(start_date, self._open_date(account_number))
+        while day <= end_date:
+            yield self.transactions_for_day(account_number, day)
+            day += timedelta(days=1)
+
+    # --- Reference data and external services -----------------------------------
+
+    def country_risk(self, country_code: str) -> Dict[str, Any]:
+        rating, reason = COUNTRY_RISK.get(country_code.upper(), ("Medium", "No specific assessment; default rating applied."))
+        return {"country_code": country_code.upper(), "aml_risk_rating": rating, "reason_for_rating": reason}
+
+    def country_risk_table(self) -> List[Dict[str, Any]]:
+        return [self.country_risk(code) for code in sorted(COUNTRY_RISK)]
+
+    def watchlist_check(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        name = str(request.get("entity_name", ""))
+        names = [name] + list(request.get("aliases") or [])
+        details = []
+        for candidate in names:
+            hit = WATCHLIST_NAMES.get(candidate.strip().lower())
+            if hit:
+                details.append({"list_name": hit[0], "match_reason": hit[1], "matched_name": candidate})
+        return {"entity_name": name, "is_on_watchlist": bool(details), "watchlist_details": details}
+
+    def company_directors(self, company_registration_id: str, country_code: str) -> Dict[str, Any]:
+        rng = _rng(self.seed, "company", company_registration_id)
+        directors = []
+        for _ in range(rng.randrange(1, 5)):
+            directors.append({
+                "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                "role": rng.choice(["Director", "Company Secretary", "Managing Director"]),
+                "appointed_on": (date(2000, 1, 1) + timedelta(days=rng.randrange(0, 8000))).isoformat(),
+                "nationality": rng.choice(["GB", "GB", "GB", "IE", "AE", "TR"]),
+            })
+        return {"company_registration_id": company_registration_id, "country_code": country_code.upper(),
+                "company_name": f"{rng.choice(LAST_NAMES)} {rng.choice(['Ltd', 'Holdings Ltd', 'Trading Ltd'])}",
+                "directors": directors}
+
+    def credit_report(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        rng = _rng(self.seed, "credit", sorted((request.get("applicant_identifier") or {}).items()))
+        return {"credit_score": rng.randrange(420, 850), "bureau": "MockBureau",
+                "open_credit_lines": rng.randrange(0, 9), "missed_payments_last_24m": rng.choice([0, 0, 0, 1, 2, 4]),
+                "total_outstanding_debt": round(rng.uniform(0, 45000), 2), "bankruptcies": 0,
+                "report_date": date.today().isoformat()}
+
+    def fraud_check(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        rng = _rng(self.seed, "fraud", sorted(str(item) for item in (request.get("applicant_data") or {}).items()))
+        score = round(rng.betavariate(1.5, 12), 3)
+        return {"fraud_risk_score": score, "fraud_risk_level": "High" if score > 0.4 else "Medium" if score > 0.2 else "Low",
+                "checks_performed": ["identity", "device", "velocity"], "alerts": ["velocity_anomaly"] if score > 0.4 else []}
+
+    def property_valuation(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        rng = _rng(self.seed, "property", sorted((request.get("property_address") or {}).items()))
+        anchor = request.get("purchase_price") or request.get("estimated_value_applicant") or rng.uniform(150000, 900000)
+        value = round(float(anchor) * rng.uniform(0.9, 1.05), -3)
+        return {"property_type": request.get("property_type"), "valuation_amount": value, "currency": "GBP",
+                "confidence_level": rng.choice(["High", "Medium"]), "valuation_date": date.today().isoformat()}
+
+    def business_risk(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        rng = _rng(self.seed, "business", request.get("business_registration_id"))
+        return {"business_registration_id": request.get("business_registration_id"),
+                "business_risk_rating": rng.choice(["Low", "Low", "Medium", "High"]),
+                "years_trading": rng.randrange(0, 40), "sector": rng.choice(["Retail", "Construction", "Hospitality", "Technology"]),
+                "adverse_media_hits": rng.choice([0, 0, 0, 1])}
+
+    def credit_card_products(self) -> List[Dict[str, Any]]:
+        return [
+            {"product_id": "MP_REWARDS_CLASSIC", "name": "Moneypenny Rewards Classic Card", "annual_fee": 0, "apr": 24.9,
+             "rewards": "1% cashback on groceries", "eligibility": {"min_income": 15000}},
+            {"product_id": "MP_TRAVEL_PLUS", "name": "Moneypenny Travel Plus Card", "annual_fee": 95, "apr": 27.9,
+             "rewards": "No FX fees; airport lounge access", "eligibility": {"min_income": 40000}},
+            {"product_id": "MP_BUILDER", "name": "Moneypenny Credit Builder Card", "annual_fee": 0, "apr": 34.9,
+             "rewards": "None", "eligibility": {"min_income": 0}},
+        ]
+
+    def loan_products(self, request: Dict[str, Any]) -> List[Dict[str, Any]]:
+        risk = float(request.get("risk_score") or 600)
+        base = 4.5 + max(0.0, (750 - risk) / 40)
+        loan_type = request.get("loan_type", "personal")
+        return [
+            {"product_id": f"MP_{str(loan_type).upper()}_STANDARD", "loan_type": loan_type, "indicative_apr": round(base, 2),
+             "max_amount": 50000, "term_months_range": [12, 84]},
+            {"product_id": f"MP_{str(loan_type).upper()}_FLEX", "loan_type": loan_type, "indicative_apr": round(base + 1.5, 2),
+             "max_amount": 25000, "term_months_range": [6, 60], "early_repayment_fee": 0},
+        ]
+
+    def initial_savings_goals(self, account_number: str) -> List[Dict[str, Any]]:
+        rng = _rng(self.seed, account_number, "goals")
+        goals = []
+        for index in range(rng.randrange(0, 3)):
+            target = float(rng.choice([1000, 2500, 5000, 10000]))
+            goals.append({"goal_id": f"goal_{account_number}_{index}", "goal_name": rng.choice(["Holiday Fund", "Emergency Fund", "New Car", "House Deposit"]),
+                          "target_amount": target, "current_amount": round(target * rng.uniform(0, 0.9), 2),
+                          "target_date": (date.today() + timedelta(days=rng.randrange(60, 900))).isoformat(), "status": "active",
+                          "created_at": datetime(2024, 1, 1).isoformat()})
+        return goals
@@ -0,0 +1,437 @@
+# mock_api/server.py
+"""Local stand-in for the Moneypenny API, with latency and error injection.
+
+Implements every endpoint the three bank_api_client modules call (the Google
+Maps geocoding call is external and not mocked), backed by the seeded
+DataGenerator. Point MONEYPENNY_API_BASE_URL at http://<host>:<port>/api to run
+the agents, benchmarks or load tests against it; requests are routed after
+stripping the "/api" base path and the underwriting "/api/v1" prefix.
+
+Faults are configured per endpoint name, using the names from
+common/resilience.py (e.g. "users.transactions", "external_services.*"):
+- latency models: "none", "fixed:<ms>", "uniform:<min_ms>:<max_ms>" or
+  "lognormal:<median_ms>:<sigma>";
+- error rates: the share of requests answered with one of `error_statuses`
+  instead of the real response (429/503 carry a Retry-After header).
+Fault sampling uses its own seeded RNG, so a single-threaded run is reproducible.
+"""
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import date, datetime, timezone
+from fnmatch import fnmatchcase
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from common import records
+from mock_api.generator import DataGenerator
+
+_PREFIX_RE = re.compile(r"^(/api)?(/api/v1)?(?=/)")
+
+
+class LatencyModel:
+    """Samples a response delay in seconds from a parsed latency spec."""
+
+    def __init__(self, spec: str = "none"):
+        self.spec = spec
+        kind, *params = spec.split(":")
+        try:
+            values = [float(p) for p in params]
+        except ValueError:
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+        expected = {"none": 0, "fixed": 1, "uniform": 2, "lognormal": 2}
+        if kind not in expected or len(values) != expected[kind]:
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+        self.kind = kind
+        self.values = values
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.values[0] / 1000
+        if self.kind == "uniform":
+            return rng.uniform(*self.values) / 1000
+        if self.kind == "lognormal":
+            median_ms, sigma = self.values
+            return rng.lognormvariate(math.log(median_ms), sigma) / 1000
+        return 0.0
+
+
+class FaultInjector:
+    """Per-endpoint latency and error injection."""
+
+    def __init__(self, seed: int = 42, latency: str = "none", endpoint_latency: Optional[Dict[str, str]] = None,
+                 error_rate: float = 0.0, endpoint_error_rate: Optional[Dict[str, float]] = None,
+                 error_statuses: Tuple[int, ...] = (500, 502, 503, 429)):
+        self.default_latency = LatencyModel(latency)
+        self.endpoint_latency = {pattern: LatencyModel(spec) for pattern, spec in (endpoint_latency or {}).items()}
+        self.error_rate = error_rate
+        self.endpoint_error_rate = dict(endpoint_error_rate or {})
+        self.error_statuses = error_statuses
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _match(table: Dict[str, Any], endpoint: str, default: Any) -> Any:
+        for pattern, value in table.items():
+            if fnmatchcase(endpoint, pattern):
+                return value
+        return default
+
+    def sample(self, endpoint: str) -> Tuple[float, Optional[int]]:
+        """Returns (delay_seconds, injected_status or None) for one request."""
+        model = self._match(self.endpoint_latency, endpoint, self.default_latency)
+        rate = self._match(self.endpoint_error_rate, endpoint, self.error_rate)
+        with self._lock:
+            delay = model.sample(self._rng)
+            status = self._rng.choice(self.error_statuses) if rate and self._rng.random() < rate else None
+        return delay, status
+
+
+class ApiError(Exception):
+    """Maps to an error response shaped like the real API's error bodies."""
+
+    _REASONS = {400: "Bad Request", 404: "Not Found", 429: "Too Many Requests", 500: "Internal Server Error",
+                502: "Bad Gateway", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+    def __init__(self, status: int, message: Any):
+        super().__init__(message)
+        self.status = status
+        self.body = {"statusCode": status, "error": self._REASONS.get(status, "Error"), "message": message}
+
+
+def _parse_date(value: Optional[str], name: str) -> date:
+    try:
+        return date.fromisoformat(value or "")
+    except ValueError:
+        raise ApiError(400, [f"{name} must be a valid ISO 8601 date string"])
+
+
+class MockState:
+    """Mutable server-side state: savings goals and loan applications."""
+
+    def __init__(self, generator: DataGenerator):
+        self.generator = generator
+        self.savings_goals: Dict[str, List[Dict[str, Any]]] = {}
+        self.loan_applications: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    def goals_for(self, account_number: str) -> List[Dict[str, Any]]:
+        # Caller holds self.lock.
+        if account_number not in self.savings_goals:
+            self.savings_goals[account_number] = self.generator.initial_savings_goals(account_number)
+        return self.savings_goals[account_number]
+
+
+class MockApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API behind its load balancer.
+    server: "MockApiServer"
+
+    # --- Plumbing ---------------------------------------------------------------
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        payload = records.dumps(body) if body is not None else b""
+        self.send_response(status)
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_chunk(self, data: bytes) -> None:
+        if data:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw) if raw else {}
+        except ValueError:
+            raise ApiError(400, ["Request body must be valid JSON"])
+        if not isinstance(body, dict):
+            raise ApiError(400, ["Request body must be a JSON object"])
+        return body
+
+    def _dispatch(self, method: str) -> None:
+        parts = urlsplit(self.path)
+        path = _PREFIX_RE.sub("", parts.path).rstrip("/")
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        for route_method, pattern, endpoint, handler in ROUTES:
+            if route_method != method:
+                continue
+            match = pattern.fullmatch(path)
+            if match is None:
+                continue
+            delay, injected = self.server.faults.sample(endpoint)
+            if delay:
+                time.sleep(delay)
+            try:
+                if method in ("POST", "PUT"):
+                    body = self._read_json()  # Always drain the body so the connection stays usable.
+                else:
+                    body = {}
+                if injected is not None:
+                    retry = {"Retry-After": "1"} if injected in (429, 503) else None
+                    self._send_json(injected, ApiError(injected, "Injected fault").body, retry)
+                    return
+                handler(self, query=query, body=body, **match.groupdict())
+            except ApiError as e:
+                self._send_json(e.status, e.body)
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True  # Client went away (e.g. a cancelled hedge).
+            return
+        if method in ("POST", "PUT"):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._send_json(404, ApiError(404, f"Cannot {method} {parts.path}").body)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    # --- Accounts ---------------------------------------------------------------
+
+    def _account(self, account_number: str) -> str:
+        if not self.server.generator.account_exists(account_number):
+            raise ApiError(404, f"User with account number {account_number} not found")
+        return account_number
+
+    def get_profile(self, account_number, **_):
+        self._send_json(200, self.server.generator.profile(self._account(account_number)))
+
+    def get_account_details(self, account_number, **_):
+        self._send_json(200, self.server.generator.account_details(self._account(account_number)))
+
+    def get_aml_profile_summary(self, account_number, **_):
+        self._send_json(200, self.server.generator.aml_profile_summary(self._account(account_number)))
+
+    def get_transactions(self, account_number, query, **_):
+        self._account(account_number)
+        start = _parse_date(query.get("start_date"), "start_date")
+        end = _parse_date(query.get("end_date"), "end_date")
+        if start > end:
+            raise ApiError(400, ["start_date must not be after end_date"])
+        # Streamed with chunked encoding: histories can be far larger than memory allows.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._send_chunk(b"[")
+        first = True
+        for rows in self.server.generator.iter_transactions(account_number, start, end):
+            if not rows:
+                continue
+            encoded = records.dumps(rows)[1:-1]
+            self._send_chunk(encoded if first else b"," + encoded)
+            first = False
+        self._send_chunk(b"]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    # --- AML data and external services ------------------------------------------
+
+    def get_country_risk(self, country_code, **_):
+        if not re.fullmatch(r"[A-Za-z]{2}", country_code):
+            raise ApiError(400, ["country_code must be an ISO 3166-1 alpha-2 code"])
+        self._send_json(200, self.server.generator.country_risk(country_code))
+
+    def get_country_risk_table(self, **_):
+        body = self.server.generator.country_risk_table()
+        etag = '"%s"' % hashlib.sha1(records.dumps(body)).hexdigest()[:16]
+        if self.headers.get("If-None-Match") == etag:
+            self._send_json(304, None, {"ETag": etag})
+            return
+        self._send_json(200, {"version": etag.strip('"'), "countries": body}, {"ETag": etag})
+
+    def post_watchlist_check(self, body, **_):
+        if not body.get("entity_name") or body.get("entity_type") not in ("individual", "organization"):
+            raise ApiError(400, ["entity_name is required", "entity_type must be one of: individual, organization"])
+        self._send_json(200, self.server.generator.watchlist_check(body))
+
+    def get_company_directors(self, company_registration_id, query, **_):
+        self._send_json(200, self.server.generator.company_directors(company_registration_id, query.get("country_code", "GB")))
+
+    def post_credit_report(self, body, **_):
+        if not body.get("consent_given"):
+            raise ApiError(400, ["consent_given must be true"])
+        self._send_json(200, self.server.generator.credit_report(body))
+
+    def post_fraud_check(self, body, **_):
+        self._send_json(200, self.server.generator.fraud_check(body))
+
+    def post_property_valuation(self, body, **_):
+        self._send_json(200, self.server.generator.property_valuation(body))
+
+    def post_business_risk(self, body, **_):
+        self._send_json(200, self.server.generator.business_risk(body))
+
+    # --- Products -----------------------------------------------------------------
+
+    def get_credit_cards(self, **_):
+        self._send_json(200, self.server.generator.credit_card_products())
+
+    def post_loan_products(self, body, **_):
+        self._send_json(200, self.server.generator.loan_products(body))
+
+    # --- Underwriting -----------------------------------------------------------------
+
+    def post_loan_application(self, body, **_):
+        application_id = f"APP-{uuid.uuid4().hex[:10].upper()}"
+        application = dict(body, application_id=application_id, status="submitted",
+                           created_at=datetime.now(timezone.utc).isoformat(), documents=[])
+        with self.server.state.lock:
+            self.server.state.loan_applications[application_id] = application
+        self._send_json(201, {"application_id": application_id, "status": "submitted", "message": "Loan application created."})
+
+    def _application(self, application_id: str) -> Dict[str, Any]:
+        application = self.server.state.loan_applications.get(application_id)
+        if application is None:
+            raise ApiError(404, f"Loan application {application_id} not found")
+        return application
+
+    def get_loan_application_status(self, application_id, **_):
+        with self.server.state.lock:
+            application = self._application(application_id)
+            body = {"application_id": application_id, "status": application["status"],
+                    "documents_received": len(application["documents"]), "created_at": application["created_at"]}
+        self._send_json(200, body)
+
+    def post_loan_application_documents(self, application_id, body, **_):
+        with self.server.state.lock:
+            application = self._application(application_id)
+            application["documents"].extend(body.get("documents") or [])
+            application["status"] = "documents_received"
+            count = len(application["documents"])
+        self._send_json(200, {"application_id": application_id, "status": "documents_received", "documents_received": count})
+
+    def post_loan_offer_document(self, body, **_):
+        document_id = f"DOC-{uuid.uuid4().hex[:10].upper()}"
+        self._send_json(201, {"document_id": document_id, "application_id": body.get("application_id"),
+                              "document_url": f"https://documents.example.com/offers/{document_id}.pdf",
+                              "offer_expiry_date": body.get("offer_expiry_date")})
+
+    # --- Savings goals ------------------------------------------------------------
+
+    def get_savings_goals(self, account_number, **_):
+        self._account(account_number)
+        with self.server.state.lock:
+            goals = [dict(goal) for goal in self.server.state.goals_for(account_number) if goal["status"] != "deleted"]
+        self._send_json(200, {"status": "success", "data": goals})
+
+    def post_savings_goal(self, account_number, body, **_):
+        self._account(account_number)
+        if not body.get("goal_name") or body.get("target_amount") is None:
+            raise ApiError(400, ["goal_name is required", "target_amount is required"])
+        goal = {"goal_id": f"goal_{uuid.uuid4().hex[:8]}", "goal_name": body["goal_name"],
+                "target_amount": body["target_amount"], "current_amount": body.get("initial_contribution") or 0,
+                "target_date": body.get("target_date"), "status": "active", "created_at": datetime.now(timezone.utc).isoformat()}
+        with self.server.state.lock:
+            self.server.state.goals_for(account_number).append(goal)
+        self._send_json(201, {"status": "success", "goal_id": goal["goal_id"], "message": "Savings goal created.", "data": goal})
+
+    def _goal(self, account_number: str, goal_id: str) -> Dict[str, Any]:
+        for goal in self.server.state.goals_for(account_number):
+            if goal["goal_id"] == goal_id and goal["status"] != "deleted":
+                return goal
+        raise ApiError(404, f"Savings goal {goal_id} not found")
+
+    def put_savings_goal(self, account_number, goal_id, body, **_):
+        self._account(account_number)
+        with self.server.state.lock:
+            goal = self._goal(account_number, goal_id)
+            if body.get("add_contribution") is not None:
+                goal["current_amount"] = round(goal["current_amount"] + float(body["add_contribution"]), 2)
+            for field in ("goal_name", "target_amount", "target_date", "status"):
+                if body.get(field) is not None:
+                    goal[field] = body[field]
+            updated = dict(goal)
+        self._send_json(200, {"status": "success", "message": "Savings goal updated.", "data": updated})
+
+    def delete_savings_goal(self, account_number, goal_id, **_):
+        self._account(account_number)
+        with self.server.state.lock:
+            self._goal(account_number, goal_id)["status"] = "deleted"
+        self._send_json(204, None)
+
+
+def _route(method: str, path: str, endpoint: str, handler: Callable) -> Tuple[str, "re.Pattern", str, Callable]:
+    pattern = re.compile(re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", path))
+    return method, pattern, endpoint, handler
+
+
+# Endpoint names match common.resilience.endpoint_name(), so fault patterns read like client policies.
+ROUTES = [
+    _route("GET", "/users/{account_number}/transactions", "users.transactions", MockApiHandler.get_transactions),
+    _route("GET", "/users/{account_number}/profile", "users.profile", MockApiHandler.get_profile),
+    _route("GET", "/users/{account_number}/account_details", "users.account_details", MockApiHandler.get_account_details),
+    _route("GET", "/users/{account_number}/aml_profile_summary", "users.aml_profile_summary", MockApiHandler.get_aml_profile_summary),
+    _route("GET", "/users/{account_number}/savings_goals", "users.savings_goals", MockApiHandler.get_savings_goals),
+    _route("POST", "/users/{account_number}/savings_goals", "users.savings_goals", MockApiHandler.post_savings_goal),
+    _route("PUT", "/users/{account_number}/savings_goals/{goal_id}", "users.savings_goals", MockApiHandler.put_savings_goal),
+    _route("DELETE", "/users/{account_number}/savings_goals/{goal_id}", "users.savings_goals", MockApiHandler.delete_savings_goal),
+    _route("GET", "/aml_data/country_risk", "aml_data.country_risk", MockApiHandler.get_country_risk_table),
+    _route("GET", "/aml_data/country_risk/{country_code}", "aml_data.country_risk", MockApiHandler.get_country_risk),
+    _route("POST", "/external_services/watchlist_check", "external_services.watchlist_check", MockApiHandler.post_watchlist_check),
+    _route("GET", "/external_services/company_info/{company_registration_id}/directors",
+           "external_services.company_info.directors", MockApiHandler.get_company_directors),
+    _route("POST", "/external_services/credit_report", "external_services.credit_report", MockApiHandler.post_credit_report),
+    _route("POST", "/external_services/fraud_check", "external_services.fraud_check", MockApiHandler.post_fraud_check),
+    _route("POST", "/external_services/property_valuation", "external_services.property_valuation", MockApiHandler.post_property_valuation),
+    _route("POST", "/external_services/business_risk", "external_services.business_risk", MockApiHandler.post_business_risk),
+    _route("GET", "/products/credit_cards", "products.credit_cards", MockApiHandler.get_credit_cards),
+    _route("POST", "/underwriting/applicable_loan_products", "underwriting.applicable_loan_products", MockApiHandler.post_loan_products),
+    _route("POST", "/underwriting/loan_applications", "underwriting.loan_applications", MockApiHandler.post_loan_application),
+    _route("GET", "/underwriting/loan_applications/{application_id}/status", "underwriting.loan_applications.status",
+           MockApiHandler.get_loan_application_status),
+    _route("POST", "/underwriting/loan_applications/{application_id}/documents", "underwriting.loan_applications.documents",
+           MockApiHandler.post_loan_application_documents),
+    _route("POST", "/underwriting/document_generation/loan_offer", "underwriting.document_generation.loan_offer",
+           MockApiHandler.post_loan_offer_document),
+]
+
+
+class MockApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address: Tuple[str, int], generator: DataGenerator, faults: FaultInjector, quiet: bool = True):
+        self.generator = generator
+        self.faults = faults
+        self.state = MockState(generator)
+        self.quiet = quiet
+        super().__init__(address, MockApiHandler)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, generator: Optional[DataGenerator] = None,
+                 faults: Optional[FaultInjector] = None, quiet: bool = True) -> MockApiServer:
+    """Starts the mock API on a background thread and returns it (port=0 picks a free port).
+
+    Set MONEYPENNY_API_BASE_URL to `server.base_url` before config.py is imported,
+    and call server.shutdown() when done.
+    """
+    server = MockApiServer((host, port), generator or DataGenerator(), faults or FaultInjector(), quiet=quiet)
+    threading.Thread(target=server.serve_forever, name="mock-api", daemon=True).start()
+    return server
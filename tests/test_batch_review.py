@@ -0,0 +1,167 @@
+# tests/test_batch_review.py
+import json
+from concurrent.futures import wait as real_wait
+
+import pytest
+
+from aml_agent import batch_review, counterparty_graph, counterparty_screening
+from aml_agent.batch_review import JsonlResultWriter, read_review_requests, run_batch_review
+from aml_agent.transaction_table import TransactionTable
+from aml_agent.watchlist_index import WatchlistIndex
+
+BANK = "MNPYGB2L"
+A, B = "11111111", "22222222"
+
+
+def _table(*payments):
+    """payments: (signed amount, counterparty name, bank identifier, account number)."""
+    return TransactionTable.from_transactions([
+        {"transaction_id": f"t{i}", "timestamp": f"2024-03-{i + 1:02d}T10:00:00Z", "amount": amount,
+         "transaction_type": "transfer_in" if amount > 0 else "transfer_out", "counterparty_name": name,
+         "counterparty_bank_identifier": bank, "counterparty_account_number": number}
+        for i, (amount, name, bank, number) in enumerate(payments)
+    ])
+
+
+# A pays B, B pays Carol Shell, Carol Shell pays A: the first hop is only known from A's review.
+TABLES = {
+    A: _table((-5000, "Bob Jones", BANK, B), (4800, "Carol Shell", "BARCGB22", "33333333")),
+    B: _table((-4900, "Carol Shell", "BARCGB22", "33333333")),
+}
+
+
+@pytest.fixture
+def bank(monkeypatch):
+    """Serves TABLES and a clean profile, and counts the counterparty watchlist checks."""
+    screened = []
+
+    def load_table(account_number, start_date, end_date):
+        if account_number not in TABLES:
+            raise ValueError("No transactions.")
+        return TABLES[account_number]
+
+    def check(entity_name, **kwargs):
+        screened.append(entity_name)
+        return {"status": "success", "data": {"is_on_watchlist": False, "watchlist_details": []}}
+
+    def no_snapshot():
+        raise OSError("No such file")
+
+    monkeypatch.setattr(counterparty_graph, "COUNTERPARTY_GRAPH_BANK_IDENTIFIER", BANK)
+    monkeypatch.setattr(batch_review, "load_table", load_table)
+    monkeypatch.setattr(batch_review, "fetch_user_profile", lambda account_number: {
+        "status": "success", "data": {"full_name": f"Holder {account_number}", "address": {"country": "GB"}}})
+    monkeypatch.setattr(batch_review, "get_account_profile_and_history_summary",
+                        lambda account_number: {"status": "error", "error_message": "Unavailable."})
+    monkeypatch.setattr(batch_review, "check_entity_against_watchlists", lambda **kwargs: {
+        "status": "success", "data": {"is_on_watchlist": False, "watchlist_details": []}})
+    monkeypatch.setattr(batch_review, "get_watchlist_index", no_snapshot)
+    monkeypatch.setattr(counterparty_screening, "check_entity_against_watchlists", check)
+    return screened
+
+
+def _requests(path, *accounts):
+    path.write_text("".join(json.dumps({"account_number": account, "start_date": "2024-03-01",
+                                        "end_date": "2024-03-31"}) + "\n" for account in accounts))
+    return str(path)
+
+
+def _results(path):
+    return {record["account_number"]: record for record in map(json.loads, path.read_text().splitlines())}
+
+
+def test_requests_are_read_from_csv_and_json_lines(tmp_path):
+    csv_path = tmp_path / "reviews.csv"
+    csv_path.write_text("account_number,start_date,end_date\n 123 ,2024-01-01,2024-01-31\n456,,2024-01-31\n")
+    assert list(read_review_requests(str(csv_path))) == [
+        {"account_number": "123", "start_date": "2024-01-01", "end_date": "2024-01-31"}]
+    jsonl_path = tmp_path / "reviews.jsonl"
+    jsonl_path.write_text('{"account_number": 789, "start_date": "2024-02-01", "end_date": "2024-02-29"}\n\n')
+    assert [r["account_number"] for r in read_review_requests(str(jsonl_path))] == ["789"]
+
+
+def test_jsonl_writer_cuts_a_partial_last_line(tmp_path):
+    path = tmp_path / "results.jsonl"
+    record = {"account_number": A, "start_date": "2024-03-01", "end_date": "2024-03-31", "status": "success"}
+    path.write_text(json.dumps(record) + '\n{"account_number": "2222')
+    writer = JsonlResultWriter(str(path))
+    writer.write(dict(record, account_number=B, status="error"))
+    writer.close()
+    assert JsonlResultWriter(str(path)).completed() == {
+        f"{A}:2024-03-01:2024-03-31": "success", f"{B}:2024-03-01:2024-03-31": "error"}
+
+
+@pytest.mark.parametrize("order", [(A, B), (B, A)])
+@pytest.mark.parametrize("workers", [1, 4])
+def test_cycles_do_not_depend_on_input_order_or_workers(bank, tmp_path, order, workers):
+    output = tmp_path / "results.jsonl"
+    counts = run_batch_review(_requests(tmp_path / "reviews.jsonl", *order), str(output), max_workers=workers)
+    assert counts["reviewed"] == 2 and not counts["interrupted"]
+    results = _results(output)
+    assert results[A]["cycle_count"] == 1
+    assert "counterparty_network" not in results[A]["incomplete_sources"]
+
+
+def test_resumed_sweep_evaluates_against_the_whole_graph(bank, tmp_path):
+    output = tmp_path / "results.jsonl"
+    output.write_text(json.dumps({"account_number": B, "start_date": "2024-03-01", "end_date": "2024-03-31",
+                                  "status": "success"}) + "\n")
+    counts = run_batch_review(_requests(tmp_path / "reviews.jsonl", B, A), str(output))
+    assert (counts["reviewed"], counts["skipped"]) == (1, 1)
+    assert _results(output)[A]["cycle_count"] == 1
+
+
+def test_accounts_past_the_graph_cap_are_marked_incomplete(bank, tmp_path, monkeypatch):
+    build = batch_review.build_sweep_graph
+    monkeypatch.setattr(batch_review, "build_sweep_graph",
+                        lambda requests, pool, window, fetched: build(requests, pool, 1, window, fetched))
+    output = tmp_path / "results.jsonl"
+    run_batch_review(_requests(tmp_path / "reviews.jsonl", B, A), str(output))
+    results = _results(output)
+    assert results[A]["incomplete_sources"] == ["account_profile", "counterparty_network"]
+    assert results[A]["cycle_count"] == 0
+    assert "counterparty_network" not in results[B]["incomplete_sources"]
+
+
+def test_histories_and_profiles_are_fetched_once_per_sweep(bank, tmp_path, monkeypatch):
+    fetches = []
+    for name in ("load_table", "fetch_user_profile"):
+        fetch = getattr(batch_review, name)
+        monkeypatch.setattr(batch_review, name, lambda *args, fetch=fetch, name=name: (
+            fetches.append((name, args[0])), fetch(*args))[1])
+    output = tmp_path / "results.jsonl"
+    run_batch_review(_requests(tmp_path / "reviews.jsonl", A, B), str(output), max_workers=2)
+    assert sorted(fetches) == [("fetch_user_profile", A), ("fetch_user_profile", B), ("load_table", A), ("load_table", B)]
+    assert _results(output)[A]["cycle_count"] == 1
+
+
+def test_counterparties_are_screened_once_per_sweep(bank, tmp_path):
+    run_batch_review(_requests(tmp_path / "reviews.jsonl", A, B), str(tmp_path / "results.jsonl"), max_workers=1)
+    assert sorted(bank) == ["Bob Jones", "Carol Shell"]
+
+
+def test_local_snapshot_sends_only_candidates_to_the_service(bank, tmp_path, monkeypatch):
+    index = WatchlistIndex([{"entry_id": "1", "name": "Carol Shel", "entity_type": "individual"}], version="test")
+    monkeypatch.setattr(batch_review, "get_watchlist_index", lambda: index)
+    run_batch_review(_requests(tmp_path / "reviews.jsonl", A, B), str(tmp_path / "results.jsonl"), max_workers=1)
+    assert bank == ["Carol Shell"]
+
+
+def test_interrupt_writes_reviews_that_already_finished(bank, tmp_path, monkeypatch):
+    # All reviews finish before the first is written; Ctrl-C then arrives while writing.
+    monkeypatch.setattr(batch_review, "wait", lambda futures, return_when: real_wait(futures))
+    write = JsonlResultWriter.write
+    interrupts = []
+
+    def interrupted_write(self, record):
+        if not interrupts:
+            interrupts.append(record["account_number"])
+            raise KeyboardInterrupt
+        write(self, record)
+
+    monkeypatch.setattr(JsonlResultWriter, "write", interrupted_write)
+    output = tmp_path / "results.jsonl"
+    accounts = [f"9000000{i}" for i in range(4)]
+    counts = run_batch_review(_requests(tmp_path / "reviews.jsonl", *accounts), str(output), max_workers=2)
+    assert counts["interrupted"] and counts["errors"] == 4
+    assert sorted(_results(output)) == accounts
@@ -0,0 +1,119 @@
+# tests/test_cache.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from common import cache as cache_module
+from common.cache import FRESH, MISS, STALE, TTLCache, cached
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    return clock
+
+
+def test_entries_go_fresh_then_stale_then_missing(clock):
+    cache = TTLCache("test.expiry", ttl=10, stale_ttl=5)
+    cache.set("k", 1)
+    assert cache.lookup("k") == (FRESH, 1)
+    clock.now += 12
+    assert cache.lookup("k") == (STALE, 1)
+    clock.now += 5
+    assert cache.lookup("k") == (MISS, None)
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache("test.lru", ttl=10, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.lookup("a")
+    cache.set("c", 3)
+    assert cache.lookup("b")[0] == MISS
+    assert cache.lookup("a") == (FRESH, 1)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_callers_cannot_corrupt_cached_values(clock):
+    cache = TTLCache("test.copies", ttl=10)
+
+    @cached(cache)
+    def fetch(code):
+        return {"status": "success", "data": {"country_code": code, "tags": []}}
+
+    first = fetch("GB")
+    first["data"]["tags"].append("edited")
+    second = fetch("GB")
+    second["data"]["country_code"] = "XX"
+    assert fetch("GB") == {"status": "success", "data": {"country_code": "GB", "tags": []}}
+    assert cache.stats()["hits"] == 2
+
+
+def test_errors_are_not_cached_and_keys_ignore_call_style(clock):
+    cache = TTLCache("test.keys", ttl=10)
+    calls = []
+
+    @cached(cache)
+    def fetch(code, detail=False):
+        calls.append(code)
+        return {"status": "error" if code == "ZZ" else "success", "data": code}
+
+    fetch("ZZ")
+    fetch("ZZ")
+    fetch("GB")
+    fetch(code="GB")
+    fetch("GB", detail=False)
+    assert calls == ["ZZ", "ZZ", "GB"]
+
+
+def test_stale_entry_is_served_while_one_refresh_runs(clock):
+    cache = TTLCache("test.swr", ttl=10, stale_ttl=60)
+    release = threading.Event()
+    calls = []
+
+    @cached(cache)
+    def fetch(code):
+        calls.append(code)
+        if len(calls) > 1:
+            release.wait(5)
+        return {"status": "success", "data": len(calls)}
+
+    assert fetch("GB")["data"] == 1
+    clock.now += 11
+    assert fetch("GB")["data"] == 1
+    assert fetch("GB")["data"] == 1
+    release.set()
+    for _ in range(500):
+        if not cache._refreshing:
+            break
+        time.sleep(0.01)
+    assert len(calls) == 2
+    assert fetch("GB")["data"] == 2
+
+
+def test_async_variant_shares_the_cache(clock):
+    cache = TTLCache("test.async", ttl=10)
+    calls = []
+
+    @cached(cache)
+    async def fetch(code):
+        calls.append(code)
+        return {"status": "success", "data": code}
+
+    async def run():
+        return [await fetch("GB"), await fetch(code="GB")]
+
+    assert asyncio.run(run()) == [{"status": "success", "data": "GB"}] * 2
+    assert calls == ["GB"]
@@ -0,0 +1,84 @@
+# tests/test_counterparty_graph.py
+import pytest
+
+from aml_agent import counterparty_graph
+from aml_agent.counterparty_graph import CounterpartyGraph, _UnionFind, account_node
+from aml_agent.transaction_table import TransactionTable
+
+BANK = "MNPYGB2L"
+
+
+@pytest.fixture(autouse=True)
+def own_bank(monkeypatch):
+    monkeypatch.setattr(counterparty_graph, "COUNTERPARTY_GRAPH_BANK_IDENTIFIER", BANK)
+
+
+def _table(*payments):
+    """payments: (signed amount, counterparty name, bank identifier, account number)."""
+    return TransactionTable.from_transactions([
+        {"transaction_id": f"t{i}", "timestamp": f"2024-03-{i + 1:02d}T10:00:00Z", "amount": amount,
+         "transaction_type": "transfer_in" if amount > 0 else "transfer_out", "counterparty_name": name,
+         "counterparty_bank_identifier": bank, "counterparty_account_number": number}
+        for i, (amount, name, bank, number) in enumerate(payments)
+    ])
+
+
+def test_union_find_merges_sets_and_keeps_their_links():
+    sets = _UnionFind()
+    a, b, c, d = (("entity", n) for n in "abcd")
+    sets.union(a, b, "ab")
+    sets.union(c, d, "cd")
+    assert sets.find(a) == sets.find(b) != sets.find(c)
+    sets.union(b, d, "bd")
+    root = sets.find(a)
+    assert {sets.find(n) for n in (a, b, c, d)} == {root}
+    assert sorted(sets.members[root]) == [a, b, c, d]
+    assert sorted(reason for _, _, reason in sets.links[root]) == ["ab", "bd", "cd"]
+    assert len(sets.members) == 1
+
+
+def test_own_bank_accounts_are_keyed_like_reviewed_accounts():
+    assert account_node("12345678") == account_node(12345678, "mnpygb2l") == account_node("12345678", "MNPYGB2LXXX")
+    assert account_node("12345678", "BARCGB22") != account_node("12345678")
+    assert account_node("12345678", "") == ("account", "/12345678")
+
+
+def test_cycle_through_another_reviewed_account_closes():
+    graph = CounterpartyGraph()
+    graph.add_review("11111111", _table((-5000, "Bob Jones", "MNPYGB2LXXX", "22222222"),
+                                        (4800, "Carol Shell", "BARCGB22", "33333333")))
+    assert graph.find_cycles("11111111") == []
+    # The first hop is only known from the first review, where B is a counterparty account.
+    graph.add_review("22222222", _table((-4900, "Carol Shell", "BARCGB22", "33333333")))
+    (cycle,) = graph.find_cycles("11111111")
+    assert cycle["length"] == 3 and cycle["amount_round_tripped"] == 4800.0
+    # A transfer seen in both reviews is counted once, and reviewing again replaces the earlier contribution.
+    graph.add_review("22222222", _table((5000, "Alice Smith", BANK, "11111111"),
+                                        (-4900, "Carol Shell", "BARCGB22", "33333333")))
+    assert graph.find_cycles("11111111")[0]["hops"][0]["transaction_count"] == 1
+    graph.add_review("22222222", _table((5000, "Alice Smith", BANK, "11111111")))
+    assert graph.find_cycles("11111111") == []
+
+
+def test_shared_director_links_companies_into_one_cluster():
+    graph = CounterpartyGraph()
+    graph.add_company_directors("Acme Ltd", "0001", "gb", {"directors": [{"name": "John Smith"}]})
+    graph.add_company_directors("Bolt Ltd", "0002", "GB", {"directors": [{"name": "JOHN SMITH", "role": "Secretary"}]})
+    table = _table((-6000, "Acme Ltd", "BARCGB22", "44444444"), (5900, "Bolt Ltd", "HSBCGB2L", "55555555"))
+    graph.add_review("11111111", table)
+    (cycle,) = graph.find_cycles("11111111")
+    assert cycle["length"] == 2 and cycle["amount_round_tripped"] == 5900.0
+    (cluster,) = graph.linked_clusters("11111111", table)
+    assert {"Acme Ltd", "Bolt Ltd", "John Smith"} <= set(cluster["entities"])
+    assert (cluster["review_inflow"], cluster["review_outflow"]) == (5900.0, 6000.0)
+
+
+def test_cycles_are_bounded_by_length_and_hop_amount():
+    graph = CounterpartyGraph()
+    chain = ["11111111", "22222222", "33333333", "44444444", "55555555"]
+    for payer, payee in zip(chain, chain[1:] + chain[:1]):
+        graph.add_review(payer, _table((-2000, f"Holder {payee}", BANK, payee)))
+    assert graph.find_cycles(chain[0], max_length=4) == []
+    assert graph.find_cycles(chain[0], max_length=5)[0]["length"] == 5
+    assert graph.find_cycles(chain[0], max_length=5, min_amount=2500) == []
+    assert graph.stats()["reviewed_accounts"] == 5
@@ -0,0 +1,67 @@
+# tests/test_country_risk.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from aml_agent import async_bank_api_client, bank_api_client
+
+
+class Tracker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def __enter__(self):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.active -= 1
+
+
+def _rating(code):
+    if code == "ZZ":
+        return {"status": "error", "error_message": "404 Not Found"}
+    return {"status": "success", "data": {"country_code": code, "aml_risk_rating": "Low", "reason_for_rating": "-"}}
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    for module in (bank_api_client, async_bank_api_client):
+        monkeypatch.setattr(module, "COUNTRY_RISK_TABLE_ENABLED", False)
+        monkeypatch.setattr(module, "COUNTRY_RISK_FETCH_WORKERS", 3)
+    return Tracker()
+
+
+def _check(data):
+    assert [r["country_code"] for r in data["ratings"]] == ["GB", "FR", "DE", "ZZ", "AE"]
+    assert data["ratings"][3]["error_message"] == "404 Not Found"
+    assert data["fetched"] == ["GB", "FR", "DE", "ZZ", "AE"]
+
+
+def test_missing_codes_are_fetched_concurrently(tracker, monkeypatch):
+    def fetch(code):
+        with tracker:
+            time.sleep(0.05)
+        return _rating(code)
+
+    monkeypatch.setattr(bank_api_client, "_fetch_country_risk_rating", fetch)
+    _check(bank_api_client.get_country_risk_ratings(["gb", "FR", "DE", "GB", "ZZ", "AE"])["data"])
+    assert tracker.peak == 3
+
+
+def test_async_missing_codes_are_gathered(tracker, monkeypatch):
+    async def fetch(code):
+        with tracker:
+            await asyncio.sleep(0.05)
+        return _rating(code)
+
+    monkeypatch.setattr(async_bank_api_client, "_fetch_country_risk_rating", fetch)
+    result = asyncio.run(async_bank_api_client.get_country_risk_ratings(["gb", "FR", "DE", "GB", "ZZ", "AE"]))
+    _check(result["data"])
+    assert tracker.peak == 3
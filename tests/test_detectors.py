@@ -0,0 +1,79 @@
+# tests/test_detectors.py
+from aml_agent.detectors.pass_through import find_pass_through
+from aml_agent.detectors.profile_deviation import profile_deviation
+from aml_agent.detectors.structuring import find_structuring
+
+
+def _tx(tx_id, timestamp, amount, tx_type, country=None, cash=False):
+    return {"transaction_id": tx_id, "timestamp": timestamp, "amount": amount, "transaction_type": tx_type,
+            "counterparty_country": country, "is_cash_transaction": cash}
+
+
+def _forwarded(country, out_country=None):
+    # A 20,000 credit paid on whole two days later, by default to the same country.
+    return [_tx("in", "2024-05-01T09:00:00Z", 20000, "transfer_in", country),
+            _tx("out", "2024-05-03T09:00:00Z", 19500, "transfer_out", out_country or country)]
+
+
+def test_pass_through_episode_is_matched():
+    data = find_pass_through(_forwarded("GB"), home_country="GB")
+    (episode,) = data["episodes"]
+    assert episode["pattern_type"] == "Rapid Movement of Funds"
+    assert episode["outflow_transaction_ids"] == ["out"]
+    assert episode["pass_through_ratio"] == 0.975
+    assert episode["holding_time_hours"] == 48.0
+    assert episode["risk_level"] == "Medium"
+
+
+def test_cross_border_is_judged_against_the_customers_home_country():
+    assert find_pass_through(_forwarded("FR"), home_country="GB")["episodes"][0]["risk_level"] == "High"
+    assert find_pass_through(_forwarded("FR"), home_country="fr")["episodes"][0]["risk_level"] == "Medium"
+    assert find_pass_through(_forwarded("GB"), home_country="FR")["episodes"][0]["risk_level"] == "High"
+    # A credit of unknown origin forwarded at home is domestic; foreign money forwarded at home is not.
+    assert find_pass_through(_forwarded(None, "GB"), home_country="GB")["episodes"][0]["risk_level"] == "Medium"
+    assert find_pass_through(_forwarded("FR", "GB"), home_country="FR")["episodes"][0]["risk_level"] == "High"
+    assert find_pass_through(_forwarded("FR", "GB"), home_country="GB")["episodes"][0]["risk_level"] == "High"
+
+
+def test_many_small_outflows_are_peak_and_drop():
+    history = [_tx("in", "2024-05-01T09:00:00Z", 15000, "Deposit")]
+    history += [_tx(f"out{i}", f"2024-05-01T1{i}:00:00Z", 2900, "Withdrawal") for i in range(5)]
+    (episode,) = find_pass_through(history)["episodes"]
+    assert episode["pattern_type"] == "Peak and Drop" and episode["outflow_count"] == 5
+
+
+def test_structuring_clusters_near_threshold_cash():
+    history = [_tx(f"c{i}", f"2024-05-0{i + 1}T10:00:00Z", 9500, "Deposit", cash=True) for i in range(3)]
+    history.append(_tx("big", "2024-05-02T12:00:00Z", 12000, "Deposit", cash=True))
+    history.append(_tx("wire", "2024-05-02T13:00:00Z", 9500, "Deposit"))
+    data = find_structuring(history)
+    (cluster,) = data["clusters"]
+    assert cluster["direction"] == "deposit"
+    assert cluster["transaction_ids"] == ["c0", "c1", "c2"]
+    assert cluster["total_amount"] == 28500.0
+
+
+def test_dormancy_needs_a_start_date_or_a_real_gap():
+    profile = {"expected_monthly_turnover": 1000, "avg_transaction_size": 500}
+    busy = [_tx(f"t{i}", f"2024-06-{i + 1:02d}T10:00:00Z", 600, "Deposit") for i in range(4)]
+    for start_date in (None, "", "not a date"):
+        for history in (busy, busy[:1]):
+            data = profile_deviation(history, profile, start_date=start_date)
+            assert not data["dormancy"]["dormant_to_active"]
+            assert 0 <= data["dormancy"]["longest_gap_days"] <= 1
+            assert "dormant_to_active" not in data["deviation_flags"]
+    data = profile_deviation(busy, profile, start_date="2024-01-01", end_date="2024-06-30")
+    assert data["dormancy"]["dormant_to_active"]
+    assert data["dormancy"]["reactivated_on"] == "2024-06-01"
+
+
+def test_profile_deviation_flags_turnover_sizes_and_new_countries():
+    profile = {"expected_monthly_turnover": 1000, "avg_transaction_size": 100, "typical_counterparty_countries": ["GB"]}
+    history = [_tx(f"t{i}", f"2024-06-{i + 1:02d}T10:00:00Z", 100, "Deposit", "GB") for i in range(10)]
+    history.append(_tx("big", "2024-06-20T10:00:00Z", 5000, "transfer_in", "AE"))
+    data = profile_deviation(history, profile, "2024-06-01", "2024-06-30")
+    assert data["turnover_ratio"] >= 5
+    assert data["transaction_size"]["top_outliers"][0]["transaction_id"] == "big"
+    assert data["counterparty_countries"]["new_countries"] == ["AE"]
+    assert set(data["deviation_flags"]) == {"turnover_above_profile", "transaction_size_outliers",
+                                            "new_counterparty_countries"}
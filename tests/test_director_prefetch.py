@@ -0,0 +1,93 @@
+# tests/test_director_prefetch.py
+import pytest
+
+from aml_agent import director_prefetch
+from aml_agent.director_prefetch import get_business_counterparty_directors, prefetch_company_directors
+from aml_agent.transaction_table import TransactionTable
+
+REGISTRY = {
+    ("100", "GB"): {"company_name": "Acme Trading Ltd", "directors": [
+        {"name": "John SMITH", "role": "Director"}, {"name": "Ann Lee", "role": "Secretary"}]},
+    ("200", "GB"): {"company_name": "Beta Holdings Ltd", "directors": [
+        {"name": "john smith", "role": "Director"}, {"name": "Ann Lee", "role": "Director"}]},
+    ("100", "IE"): {"company_name": "Acme Ireland Ltd", "directors": [{"name": "John Smith", "role": "Director"}]},
+    ("300", "GB"): {"company_name": "Gamma Ltd", "directors": [{"name": "Solo Person", "role": "Director"}]},
+}
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """Serves REGISTRY in place of the directors endpoint and records every lookup."""
+    calls = []
+
+    def lookup(company_registration_id, country_code):
+        calls.append((company_registration_id, country_code))
+        data = REGISTRY.get((company_registration_id, country_code))
+        if data is None:
+            return {"status": "error", "error_message": "Company not found."}
+        return {"status": "success", "data": data}
+
+    monkeypatch.setattr(director_prefetch, "get_company_director_information", lookup)
+    return calls
+
+
+def test_companies_are_looked_up_once_per_registration_id_and_country(lookups):
+    result = prefetch_company_directors([
+        {"company_registration_id": "100", "country_code": "GB", "counterparty_name": "ACME TRADING"},
+        {"company_registration_id": " 100 ", "country_code": "gb", "counterparty_name": "Acme Trading Ltd"},
+        {"company_registration_id": "100", "country_code": "GB", "counterparty_name": "ACME TRADING"},
+        {"company_registration_id": "100", "country_code": "IE"},
+    ], max_workers=4)
+    assert sorted(lookups) == [("100", "GB"), ("100", "IE")]
+    assert result["companies_requested"] == 2
+    assert result["companies"]["GB/100"]["counterparty_names"] == ["ACME TRADING", "Acme Trading Ltd"]
+    assert result["companies"]["IE/100"]["counterparty_names"] == []
+
+
+def test_invalid_and_unknown_companies_are_reported_as_errors(lookups):
+    result = prefetch_company_directors([
+        {"company_registration_id": "", "country_code": "GB"},
+        {"company_registration_id": "100"},
+        {"company_registration_id": "999", "country_code": "GB", "counterparty_name": "Ghost Ltd"},
+        {"company_registration_id": "300", "country_code": "GB"},
+    ])
+    assert sorted(lookups) == [("300", "GB"), ("999", "GB")]
+    assert [error.get("company") for error in result["errors"][:2]] == [
+        {"company_registration_id": "", "country_code": "GB"}, {"company_registration_id": "100"}]
+    assert result["errors"][2] == {"company_registration_id": "999", "country_code": "GB",
+                                   "counterparty_names": ["Ghost Ltd"], "error_message": "Company not found."}
+    assert list(result["companies"]) == ["GB/300"]
+
+
+def test_directors_are_merged_by_normalised_name_across_companies(lookups):
+    result = prefetch_company_directors([
+        {"company_registration_id": registration_id, "country_code": country_code}
+        for registration_id, country_code in (("100", "GB"), ("200", "GB"), ("100", "IE"), ("300", "GB"))
+    ])
+    smith = result["directors"]["john smith"]
+    assert sorted(a["company"] for a in smith["appointments"]) == ["GB/100", "GB/200", "IE/100"]
+    assert result["shared_directors"] == [
+        {"name": "John SMITH", "companies": ["Acme Ireland Ltd", "Acme Trading Ltd", "Beta Holdings Ltd"]},
+        {"name": "Ann Lee", "companies": ["Acme Trading Ltd", "Beta Holdings Ltd"]},
+    ]
+    assert "solo person" in result["directors"]
+
+
+def test_tool_lists_business_counterparties_that_were_not_looked_up(lookups, monkeypatch):
+    table = TransactionTable.from_transactions([
+        {"transaction_id": f"t{i}", "timestamp": f"2024-03-0{i + 1}T10:00:00Z", "amount": -100,
+         "transaction_type": "transfer_out", "counterparty_name": name}
+        for i, name in enumerate(("Acme Trading Ltd", "Delta Logistics Ltd", "Jane Doe"))
+    ])
+    monkeypatch.setattr(director_prefetch, "resolve_table", lambda handle, tool_context=None: table)
+    result = get_business_counterparty_directors(
+        [{"company_registration_id": "100", "country_code": "GB", "counterparty_name": "Acme Trading Ltd"}],
+        review_handle="1:2024-03-01:2024-03-31")
+    assert result["status"] == "success"
+    assert result["data"]["unresolved_business_counterparties"] == ["Delta Logistics Ltd"]
+
+    def unknown(handle, tool_context=None):
+        raise ValueError("Unknown review handle")
+
+    monkeypatch.setattr(director_prefetch, "resolve_table", unknown)
+    assert get_business_counterparty_directors([], review_handle="bad")["status"] == "error"
@@ -0,0 +1,59 @@
+# tests/test_geocode_cache.py
+import asyncio
+import threading
+
+from aml_agent import async_bank_api_client
+from common.geocode_cache import GeocodeCache, geocode_batch, geocode_batch_async
+
+
+class RecordingCache(GeocodeCache):
+    """Records the thread of every SQLite access."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = set()
+
+    def _connection(self):
+        self.threads.add(threading.get_ident())
+        return super()._connection()
+
+
+def _fetch(latitude, longitude):
+    return {"status": "success", "data": {"country_code": "GB", "lat": latitude, "lon": longitude}}
+
+
+def test_batch_geocodes_each_location_once_and_caches_it(tmp_path):
+    cache = GeocodeCache("test.geocode.sync", str(tmp_path / "geocode.sqlite3"))
+    calls = []
+
+    def fetch(latitude, longitude):
+        calls.append((latitude, longitude))
+        return _fetch(latitude, longitude)
+
+    points = [(51.5, -0.12), (51.5000001, -0.1200001), (48.85, 2.35)]
+    first = geocode_batch(cache, points, fetch)
+    assert len(calls) == 2 and first["stats"]["unique_locations"] == 2
+    second = geocode_batch(cache, points, fetch)
+    assert len(calls) == 2 and second["stats"]["cache_hits"] == 2
+    assert [r["data"]["country_code"] for r in second["results"]] == ["GB"] * 3
+
+
+def test_async_paths_keep_sqlite_off_the_event_loop(tmp_path, monkeypatch):
+    cache = RecordingCache("test.geocode.async", str(tmp_path / "geocode.sqlite3"))
+
+    async def fetch(latitude, longitude):
+        return _fetch(latitude, longitude)
+
+    async def run():
+        loop_thread = threading.get_ident()
+        await geocode_batch_async(cache, [(51.5, -0.12), (48.85, 2.35)], fetch)
+        await geocode_batch_async(cache, [(51.5, -0.12)], fetch)
+        await async_bank_api_client.direct_google_maps_geocoding_tool(40.0, -3.7)
+        await async_bank_api_client.direct_google_maps_geocoding_tool(40.0, -3.7)
+        return loop_thread
+
+    monkeypatch.setattr(async_bank_api_client, "GEOCODE_CACHE", cache)
+    monkeypatch.setattr(async_bank_api_client, "_google_maps_reverse_geocode", fetch)
+    loop_thread = asyncio.run(run())
+    assert cache.threads and loop_thread not in cache.threads
+    assert cache.stats()["size"] == 3
@@ -0,0 +1,120 @@
+# tests/test_mock_api.py
+import json
+import random
+from datetime import date
+
+import pytest
+import requests
+
+from aml_agent import bank_api_client as aml_client
+from aml_agent.country_risk_table import CountryRiskTable
+from financial_concierge import bank_api_client as concierge_client
+from mock_api.generator import DataGenerator
+from mock_api.server import FaultInjector, LatencyModel, start_server
+from underwriting_agent import bank_api_client as underwriting_client
+
+ACCOUNT = "12345678"
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = start_server(port=0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def clients(server, monkeypatch):
+    """Points the three sync bank API clients at the mock server."""
+    monkeypatch.setattr(aml_client, "AML_API_BASE_URL", server.base_url)
+    monkeypatch.setattr(concierge_client, "API_BASE_URL", server.base_url)
+    monkeypatch.setattr(underwriting_client, "UW_API_BASE_URL", server.base_url)
+    return server
+
+
+def test_routes_dispatch_with_either_base_path(server):
+    root = server.base_url[:-len("/api")]
+    for prefix in ("", "/api", "/api/api/v1"):
+        response = requests.get(f"{root}{prefix}/users/{ACCOUNT}/profile", timeout=5)
+        assert response.status_code == 200 and response.json()["account_number"] == ACCOUNT
+    assert requests.get(f"{server.base_url}/users/{ACCOUNT}/account_details/", timeout=5).json()["currency"] == "GBP"
+
+
+def test_unknown_routes_accounts_and_bad_queries_get_api_errors(server):
+    missing = requests.get(f"{server.base_url}/users/{ACCOUNT}/nothing", timeout=5)
+    assert missing.status_code == 404 and missing.json()["message"].startswith("Cannot GET")
+    assert requests.delete(f"{server.base_url}/users/{ACCOUNT}/profile", timeout=5).status_code == 404
+    assert requests.get(f"{server.base_url}/users/abc/profile", timeout=5).status_code == 404
+    bad_dates = requests.get(f"{server.base_url}/users/{ACCOUNT}/transactions",
+                             params={"start_date": "2024-02-01", "end_date": "2024-01-01"}, timeout=5)
+    assert bad_dates.status_code == 400 and bad_dates.json()["statusCode"] == 400
+    # A rejected POST body is drained, so the kept-alive connection still serves the next request.
+    with requests.Session() as session:
+        assert session.post(f"{server.base_url}/nowhere", json={"a": 1}, timeout=5).status_code == 404
+        assert session.get(f"{server.base_url}/products/credit_cards", timeout=5).status_code == 200
+
+
+def test_transactions_are_streamed_in_chunks(server):
+    params = {"start_date": "2024-03-01", "end_date": "2024-03-07"}
+    with requests.get(f"{server.base_url}/users/{ACCOUNT}/transactions", params=params, stream=True, timeout=5) as response:
+        assert response.headers["Transfer-Encoding"] == "chunked" and "Content-Length" not in response.headers
+        rows = json.loads(b"".join(response.iter_content(4096)))
+    expected = [row for day in DataGenerator().iter_transactions(ACCOUNT, date(2024, 3, 1), date(2024, 3, 7))
+                for row in day]
+    assert [row["transaction_id"] for row in rows] == [row["transaction_id"] for row in expected]
+
+
+def test_country_risk_table_is_revalidated_with_its_etag(server):
+    table = CountryRiskTable("mock_api.country_risk", f"{server.base_url}/aml_data/country_risk")
+    assert table.refresh() and table.etag and table.get("GB")
+    assert table.refresh() and table.not_modified == 1
+    stale = requests.get(table.url, headers={"If-None-Match": '"stale"'}, timeout=5)
+    assert stale.status_code == 200 and stale.headers["ETag"] == table.etag
+
+
+def test_latency_specs_are_validated():
+    assert LatencyModel("fixed:250").sample(random.Random(0)) == 0.25
+    assert 0.01 <= LatencyModel("uniform:10:20").sample(random.Random(0)) <= 0.02
+    for spec in ("fixed", "uniform:10", "gamma:1:2", "fixed:fast"):
+        with pytest.raises(ValueError):
+            LatencyModel(spec)
+
+
+def test_faults_are_injected_per_endpoint_and_reproducibly():
+    rates = {"users.aml_*": 1.0}
+    first, second = (FaultInjector(seed=7, endpoint_error_rate=rates, error_rate=0.5) for _ in range(2))
+    assert [first.sample("users.profile") for _ in range(20)] == [second.sample("users.profile") for _ in range(20)]
+    assert all(first.sample("users.aml_profile_summary")[1] for _ in range(10))
+    server = start_server(port=0, faults=FaultInjector(endpoint_error_rate=rates, error_statuses=(429,)))
+    try:
+        injected = requests.get(f"{server.base_url}/users/{ACCOUNT}/aml_profile_summary", timeout=5)
+        assert injected.status_code == 429 and injected.headers["Retry-After"] == "1"
+        assert injected.json()["message"] == "Injected fault"
+        assert requests.get(f"{server.base_url}/users/{ACCOUNT}/profile", timeout=5).status_code == 200
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_sync_clients_run_against_the_server(clients):
+    profile = aml_client.fetch_user_profile(ACCOUNT)
+    assert profile["status"] == "success" and profile["data"]["account_number"] == ACCOUNT
+    history = aml_client.fetch_transaction_history(ACCOUNT, "2024-03-01", "2024-03-07")
+    assert history["status"] == "success" and history["data"]
+    assert aml_client.get_account_profile_and_history_summary(ACCOUNT)["status"] == "success"
+    assert aml_client.fetch_user_profile("abc")["status"] == "error"
+
+    assert concierge_client.fetch_account_details(ACCOUNT)["data"]["currency"] == "GBP"
+    created = concierge_client.create_savings_goal(ACCOUNT, "Holiday", 1500.0)
+    assert created["status"] == "success"
+    goal_id = created["data"]["goal_id"]
+    assert concierge_client.update_savings_goal(ACCOUNT, goal_id, add_contribution=100.0)["status"] == "success"
+    assert goal_id in [goal["goal_id"] for goal in concierge_client.get_savings_goals(ACCOUNT)["data"]]
+    assert concierge_client.delete_savings_goal(ACCOUNT, goal_id)["status"] == "success"
+    assert goal_id not in [goal["goal_id"] for goal in concierge_client.get_savings_goals(ACCOUNT)["data"]]
+
+    application = underwriting_client.create_loan_application(ACCOUNT, "personal", 5000.0, "Car", 36)
+    assert application["status"] == "success"
+    status = underwriting_client.get_loan_application_status(application["data"]["application_id"])
+    assert status["data"]["status"] == "submitted"
@@ -0,0 +1,133 @@
+# tests/test_policy_engine.py
+import json
+from types import SimpleNamespace
+
+import pytest
+from google.genai import types
+
+from aml_agent import policy_engine
+from aml_agent.policy_engine import (
+    DECISION_STATE_KEY,
+    REVIEW_STATE_KEY,
+    apply_policy_rules,
+    evaluate_facts,
+    evaluate_policy,
+    scope_findings,
+    scoped_state_key,
+)
+
+
+def _fact(kind, label="", level=None, **extra):
+    return dict({"kind": kind, "label": label, "level": level, "detail": f"{kind} {label}", "transaction_ids": []},
+                **extra)
+
+
+@pytest.mark.parametrize("fact, rule_id", [
+    (_fact("watchlist_hit", "OFAC SDN"), "HS-01"),
+    (_fact("jurisdiction", "IR", "Sanctioned", expected=False), "HS-02"),
+    (_fact("pattern", "structuring", "High"), "HS-03"),
+    (_fact("pattern", "rapid movement of funds", "High"), "HS-04"),
+    (_fact("linked_entity", "suspected shell company", "High"), "HS-05"),
+    (_fact("jurisdiction", "AE", "High", expected=False), "MS-01"),
+    (_fact("pattern", "peak and drop", "Medium"), "MS-02"),
+    (_fact("profile_flag", "dormant_to_active"), "MS-03"),
+    (_fact("pattern", "structuring", "Medium"), "MS-04"),
+    (_fact("watchlist_hit", "Internal High-Risk Entities List"), "MS-05"),
+    (_fact("linked_cluster", "shared account"), "MS-06"),
+    (_fact("fund_cycle", "cycle"), "MS-07"),
+    (_fact("pattern", "ip address mismatch", "High"), "MS-08"),
+    (_fact("jurisdiction", "AE", "High", expected=True), "LS-01"),
+    (_fact("profile_flag", "transaction_size_outliers"), "LS-02"),
+    (_fact("linked_entity", "frequent counterparty"), "LS-03"),
+])
+def test_each_risk_factor_fires_on_its_conditions(fact, rule_id):
+    assert [t["rule_id"] for t in evaluate_facts([fact])["triggered_factors"]] == [rule_id]
+
+
+def test_a_fact_counts_only_towards_its_most_severe_factor():
+    decision = evaluate_facts([_fact("pattern", "structuring", "High"), _fact("pattern", "structuring", "Medium")])
+    assert [(t["rule_id"], t["evidence_count"]) for t in decision["triggered_factors"]] == [("HS-03", 1), ("MS-04", 1)]
+
+
+@pytest.mark.parametrize("facts, risk, aggregation", [
+    ([_fact("watchlist_hit", "UN Consolidated List")], "Critical", "AG-01"),
+    ([_fact("jurisdiction", "IR", "Sanctioned"), _fact("pattern", "structuring", "High"),
+      _fact("pattern", "layering", "High")], "Critical", "AG-02"),
+    ([_fact("pattern", "structuring", "High")], "High", "AG-03"),
+    ([_fact("fund_cycle"), _fact("profile_flag", "turnover_above_profile")], "High", "AG-04"),
+    ([_fact("fund_cycle"), _fact("fund_cycle")], "Medium", "AG-05"),
+    ([_fact("linked_entity", f"concern {i}") for i in range(5)], "Medium", "AG-06"),
+    ([_fact("linked_entity", "concern")], "Low", "AG-07"),
+    ([], "Low", "AG-07"),
+])
+def test_aggregation_and_escalation(facts, risk, aggregation):
+    decision = evaluate_facts(facts)
+    assert decision["overall_aml_risk_assessment"] == risk
+    assert decision["aggregation_rule"]["rule_id"] == aggregation
+    assert decision["recommended_action"] == policy_engine.POLICY_RULESET["actions"][risk]
+
+
+def test_profile_countries_turn_high_risk_jurisdictions_into_low_factors():
+    findings = {"country_risk": {"ratings": [{"country_code": "AE", "aml_risk_rating": "High"}]}}
+    assert evaluate_policy(findings)["triggered_factors"][0]["rule_id"] == "MS-01"
+    findings["account_profile"] = {"typical_counterparty_countries": ["ae"]}
+    assert evaluate_policy(findings)["triggered_factors"][0]["rule_id"] == "LS-01"
+
+
+REQUEST = {"account_number": "12345678", "start_date": "2024-01-01", "end_date": "2024-03-31"}
+HANDLE = "12345678:2024-01-01:2024-03-31"
+STRUCTURING_HIGH = {"flagged_patterns": [{"pattern_type": "Structuring", "risk_level_assessment": "High"}]}
+STRUCTURING_MEDIUM = {"flagged_patterns": [{"pattern_type": "Structuring", "risk_level_assessment": "Medium"}]}
+
+
+def _context(state, request, agent_name="aml_policy_alignment_agent"):
+    content = types.Content(role="user", parts=[types.Part(text=json.dumps(request))])
+    return SimpleNamespace(state=state, user_content=content, agent_name=agent_name)
+
+
+@pytest.fixture(autouse=True)
+def narrative(monkeypatch):
+    monkeypatch.setattr(policy_engine, "AML_POLICY_NARRATIVE", True)
+
+
+def _decision(state):
+    return json.loads(state[DECISION_STATE_KEY])
+
+
+def test_request_findings_win_over_session_state():
+    state = {scoped_state_key("transaction_pattern_analysis_output", HANDLE): STRUCTURING_MEDIUM}
+    apply_policy_rules(_context(state, dict(REQUEST, transaction_pattern_analysis=STRUCTURING_HIGH)))
+    assert _decision(state)["overall_aml_risk_assessment"] == "High"
+
+
+def test_state_from_another_review_is_ignored():
+    state = {"transaction_pattern_analysis_output": STRUCTURING_HIGH,
+             scoped_state_key("transaction_pattern_analysis_output", "999:2024-01-01:2024-03-31"): STRUCTURING_HIGH,
+             REVIEW_STATE_KEY: {"review_handle": "999:2024-01-01:2024-03-31",
+                                "account_profile": {"typical_counterparty_countries": ["AE"]}}}
+    apply_policy_rules(_context(state, REQUEST))
+    assert _decision(state)["overall_aml_risk_assessment"] == "Low"
+
+
+def test_analysis_outputs_are_scoped_by_review_and_picked_up_with_the_profile():
+    state = {"transaction_pattern_analysis_output": STRUCTURING_MEDIUM,
+             "geographic_risk_assessment_output": {"flagged_transactions_geo": [
+                 {"transaction_id": "t1", "determined_country_code": "AE", "country_aml_risk_rating": "High"}]},
+             REVIEW_STATE_KEY: dict(REQUEST, review_handle=HANDLE,
+                                    account_profile={"typical_counterparty_countries": ["AE"]})}
+    for agent in ("transaction_pattern_analysis_agent", "geographic_risk_assessment_agent", "entity_linkage_analysis_agent"):
+        assert scope_findings(_context(state, REQUEST, agent)) is None
+    assert state[scoped_state_key("transaction_pattern_analysis_output", HANDLE)] == STRUCTURING_MEDIUM
+    assert scoped_state_key("entity_linkage_analysis_output", HANDLE) not in state
+    apply_policy_rules(_context(state, REQUEST))
+    decision = _decision(state)
+    assert [t["rule_id"] for t in decision["triggered_factors"]] == ["MS-04", "LS-01"]
+
+
+def test_batch_mode_returns_the_decision_without_a_model_call():
+    state = {policy_engine.BATCH_MODE_STATE_KEY: True}
+    content = apply_policy_rules(_context(state, dict(REQUEST, transaction_pattern_analysis=STRUCTURING_HIGH)))
+    output = json.loads(content.parts[0].text)
+    assert output["account_number"] == "12345678"
+    assert output["triggered_rule_ids"] == ["HS-03", "AG-03"]
+    assert state[policy_engine.OUTPUT_KEY] == content.parts[0].text
@@ -0,0 +1,115 @@
+# tests/test_rate_limit.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from common import rate_limit
+from common.rate_limit import ConcurrencyLimit, EndpointLimiter, TokenBucket
+
+
+def test_token_bucket_allows_a_burst_then_spaces_requests():
+    bucket = TokenBucket(rate=10, burst=3)
+    waits = [bucket.reserve() for _ in range(5)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] == pytest.approx(0.1, abs=0.01)
+    assert waits[4] == pytest.approx(0.2, abs=0.01)
+
+
+def test_defer_blocks_the_whole_bucket():
+    bucket = TokenBucket(rate=100, burst=5)
+    bucket.defer(2.0)
+    assert bucket.reserve() == pytest.approx(2.0, abs=0.05)
+
+
+def test_parse_rate_limits_skips_invalid_fields():
+    limiters = rate_limit._parse_rate_limits("a.b:rate=5,burst=2,in_flight=3;c.d:rate=x,in_flight=1")
+    assert limiters["a.b"].rate == 5 and limiters["a.b"].concurrency.limit == 3
+    assert limiters["c.d"].bucket is None and limiters["c.d"].concurrency.limit == 1
+
+
+def test_sync_waiters_are_served_in_order():
+    limit = ConcurrencyLimit(1)
+    limit.acquire()
+    order = []
+
+    def worker(n):
+        limit.acquire()
+        order.append(n)
+        limit.release()
+
+    threads = []
+    for n in range(3):
+        threads.append(threading.Thread(target=worker, args=(n,)))
+        threads[-1].start()
+        while limit.queued < n + 1:
+            time.sleep(0.001)
+    limit.release()
+    for thread in threads:
+        thread.join(5)
+    assert order == [0, 1, 2]
+    assert limit.in_flight == 0
+
+
+def test_waiter_cancelled_before_the_hand_over_runs_returns_the_slot_once():
+    async def scenario():
+        limit = ConcurrencyLimit(1)
+        await limit.acquire_async()
+        waiter = asyncio.ensure_future(limit.acquire_async())
+        await asyncio.sleep(0)
+        assert limit.queued == 1
+        limit.release()  # Picks the waiter and schedules _grant ...
+        waiter.cancel()  # ... which the waiter's cancellation overtakes.
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+        return limit
+
+    limit = asyncio.run(scenario())
+    assert limit.in_flight == 0 and limit.queued == 0
+
+
+def test_waiter_cancelled_after_the_hand_over_returns_the_slot():
+    async def scenario():
+        limit = ConcurrencyLimit(1)
+        await limit.acquire_async()
+        waiter = asyncio.ensure_future(limit.acquire_async())
+        await asyncio.sleep(0)
+        limit.release()
+        await asyncio.sleep(0)  # _grant runs and completes the hand-over.
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return limit
+
+    limit = asyncio.run(scenario())
+    assert limit.in_flight == 0
+
+
+def test_cancelled_hand_over_passes_the_slot_to_the_next_waiter():
+    async def scenario():
+        limit = ConcurrencyLimit(1)
+        await limit.acquire_async()
+        first = asyncio.ensure_future(limit.acquire_async())
+        second = asyncio.ensure_future(limit.acquire_async())
+        await asyncio.sleep(0)
+        limit.release()
+        first.cancel()
+        await asyncio.wait_for(second, 1)
+        assert limit.in_flight == 1
+        limit.release()
+        return limit
+
+    assert asyncio.run(scenario()).in_flight == 0
+
+
+def test_limiter_defers_the_bucket_on_429():
+    class Response:
+        status_code = 429
+        headers = {"Retry-After": "1"}
+
+    limiter = EndpointLimiter("test.429", rate=100, burst=1, in_flight=2)
+    limiter.call(lambda: Response())
+    assert limiter.stats()["rate_limited_429"] == 1
+    assert limiter.bucket.reserve() == pytest.approx(1.0, abs=0.05)
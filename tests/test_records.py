@@ -0,0 +1,69 @@
+# tests/test_records.py
+import pytest
+import requests
+
+from aml_agent import bank_api_client as aml_client
+from common import records, transport
+from financial_concierge import bank_api_client as concierge_client
+from underwriting_agent import bank_api_client as underwriting_client
+
+
+def test_numeric_identifiers_and_string_amounts_decode():
+    payload = (b'[{"transaction_id": 17, "amount": "-9500.00", "counterparty_account_number": 12345678,'
+               b' "counterparty_bank_identifier": 400515, "unknown_field": "x"}]')
+    key, (txn,) = records.decode_transactions(payload)
+    assert key is None
+    assert txn.transaction_id == 17 and txn.amount == -9500.0
+    assert txn.counterparty_account_number == 12345678 and txn.counterparty_bank_identifier == 400515
+    assert records.to_dicts([txn]) == [{"transaction_id": 17, "amount": -9500.0, "counterparty_account_number": 12345678,
+                                        "counterparty_bank_identifier": 400515}]
+
+
+@pytest.mark.parametrize("key", ["data", "transactions"])
+def test_enveloped_payload_reports_its_key(key):
+    envelope, transactions = records.decode_transactions(f'{{"{key}": [{{"timestamp": "2024-01-05T10:00:00Z"}}]}}')
+    assert envelope == key
+    assert transactions[0].day == "2024-01-05"
+
+
+def test_payloads_that_do_not_fit_raise_decode_error():
+    with pytest.raises(records.DecodeError):
+        records.decode_transactions(b'[{"amount": {"value": 1}}]')
+
+
+def test_profile_and_account_details_decode_into_records():
+    profile = records.decode_user_profile(
+        b'{"account_number": 12345678, "full_name": "Jane Doe", "address": {"city": "Leeds", "country": "GB"},'
+        b' "internal_score": 7}')
+    assert isinstance(profile, records.UserProfile)
+    assert records.to_builtins(profile) == {"account_number": 12345678, "full_name": "Jane Doe",
+                                            "address": {"city": "Leeds", "country": "GB"}}
+    details = records.decode_account_details(b'{"account_number": "1", "current_balance": "250.50", "linked_products": []}')
+    assert (details.current_balance, details.linked_products, details.overdraft_limit) == (250.5, [], None)
+    with pytest.raises(records.DecodeError):
+        records.decode_account_details(b'{"current_balance": {"amount": 1}}')
+
+
+def _response(body: bytes) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    return response
+
+
+@pytest.mark.parametrize("client", [aml_client, concierge_client, underwriting_client])
+def test_clients_return_profiles_as_decoded_records(client, monkeypatch):
+    monkeypatch.setattr(transport, "get", lambda url, **kwargs: _response(
+        b'{"account_number": "123", "full_name": "Jane Doe", "date_of_birth": "1980-02-01", "extra": 1}'))
+    assert client.fetch_user_profile("123") == {"status": "success", "data": {
+        "account_number": "123", "full_name": "Jane Doe", "date_of_birth": "1980-02-01"}}
+    monkeypatch.setattr(transport, "get", lambda url, **kwargs: _response(b'{"full_name": ["Jane"]}'))
+    assert client.fetch_user_profile("123")["status"] == "error"
+
+
+@pytest.mark.parametrize("client", [concierge_client, underwriting_client])
+def test_clients_return_account_details_as_decoded_records(client, monkeypatch):
+    monkeypatch.setattr(transport, "get", lambda url, **kwargs: _response(
+        b'{"account_number": "123", "current_balance": 10.5, "overdraft_limit": "250"}'))
+    assert client.fetch_account_details("123")["data"] == {
+        "account_number": "123", "current_balance": 10.5, "overdraft_limit": 250.0}
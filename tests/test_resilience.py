@@ -0,0 +1,119 @@
+# tests/test_resilience.py
+import io
+import time
+
+import pytest
+import requests
+
+from common import resilience
+from common.rate_limit import EndpointLimiter
+from common.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, Policy
+from config import API_BASE_URL, RESILIENCE_HEDGE_MIN_SAMPLES
+
+real_sleep = time.sleep
+
+
+def _response(status: int = 200, retry_after: str = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.raw = io.BytesIO(b"")
+    if retry_after is not None:
+        response.headers["Retry-After"] = retry_after
+    return response
+
+
+@pytest.fixture(autouse=True)
+def fresh_endpoints(monkeypatch):
+    monkeypatch.setattr(resilience, "_states", {})
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+
+
+def test_endpoint_names_drop_identifiers_and_prefixes():
+    assert resilience.endpoint_name(f"{API_BASE_URL}/users/123/transactions") == "users.transactions"
+    assert resilience.endpoint_name(f"{API_BASE_URL}/api/v1/aml_data/country_risk/GB") == "aml_data.country_risk"
+    assert resilience.endpoint_name("https://maps.googleapis.com/maps/api/geocode/json?latlng=1,2") == \
+        "maps.googleapis.com/maps/api/geocode/json"
+
+
+def test_backoff_and_retry_after_are_capped():
+    policy = Policy(backoff_base=1, backoff_max=3)
+    assert all(0 <= resilience.backoff_delay(policy, retry) <= 3 for retry in range(1, 10))
+    assert resilience.retry_after_seconds("2.5", cap=8) == 2.5
+    assert resilience.retry_after_seconds("120", cap=8) == 8
+    assert resilience.retry_after_seconds("soon", cap=8) is None
+
+
+def test_breaker_opens_then_lets_one_trial_through(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: clock[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10)
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    clock[0] += 10
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()  # Only one trial call at a time.
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_idempotent_calls_retry_transient_statuses():
+    responses = iter([_response(503), _response(429, retry_after="1"), _response(200)])
+    response = resilience.call("GET", f"{API_BASE_URL}/users/1/profile", lambda: next(responses))
+    assert response.status_code == 200
+    assert resilience.state_for(f"{API_BASE_URL}/users/1/profile").retries == 2
+
+
+def test_non_idempotent_calls_are_not_retried():
+    calls = []
+    response = resilience.call("POST", f"{API_BASE_URL}/loan_applications",
+                               lambda: calls.append(1) or _response(503))
+    assert response.status_code == 503 and len(calls) == 1
+
+
+def test_open_circuit_fails_fast():
+    url = f"{API_BASE_URL}/users/1/account_details"
+    state = resilience.state_for(url)
+    for _ in range(state.policy.failure_threshold):
+        state.breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        resilience.call("GET", url, lambda: _response(200))
+
+
+def _slow_then_fast():
+    calls = []
+
+    def send():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            real_sleep(0.3)
+        return _response(200)
+    return send, calls
+
+
+def _prime(url: str) -> None:
+    state = resilience.state_for(url)
+    for _ in range(RESILIENCE_HEDGE_MIN_SAMPLES):
+        state.latency.record(0.01)
+
+
+def test_slow_gets_on_hedged_endpoints_send_one_duplicate(monkeypatch):
+    monkeypatch.setattr(resilience.time, "sleep", real_sleep)
+    url = f"{API_BASE_URL}/external_services/company_info/123/directors"
+    _prime(url)
+    send, calls = _slow_then_fast()
+    assert resilience.call("GET", url, send).status_code == 200
+    assert len(calls) == 2
+    assert resilience.state_for(url).hedge_wins == 1
+
+
+def test_rate_limited_endpoints_are_never_hedged(monkeypatch):
+    monkeypatch.setattr(resilience.time, "sleep", real_sleep)
+    url = f"{API_BASE_URL}/external_services/company_info/456/directors"
+    _prime(url)
+    send, calls = _slow_then_fast()
+    limiter = EndpointLimiter("test.limited", rate=100, burst=1, in_flight=1)
+    assert resilience.call("GET", url, send, limiter=limiter).status_code == 200
+    assert len(calls) == 1
+    assert resilience.state_for(url).hedges == 0
@@ -0,0 +1,142 @@
+# tests/test_reverse_geocoder.py
+import numpy as np
+import pytest
+
+from aml_agent import reverse_geocoder
+from aml_agent.reverse_geocoder import ReverseGeocoder, resolve_transaction_countries
+from aml_agent.transaction_table import TransactionTable, register_table
+from config import GEOCODER_BOUNDARIES_PATH
+
+AA = [[[-2, 50], [0, 50], [0, 52], [-2, 52], [-2, 50]]]
+# BB has a hole filled by the enclave CC.
+HOLE = [[0.5, 50.5], [1.5, 50.5], [1.5, 51.5], [0.5, 51.5], [0.5, 50.5]]
+BB = [[[0, 50], [2, 50], [2, 52], [0, 52], [0, 50]], HOLE]
+CC = [HOLE]
+# A concave "C" spanning several grid cells, with diagonal edges.
+DD = [[[10, 40], [14.3, 40.2], [14.1, 41.1], [11.2, 41.4], [11.3, 42.6], [14.2, 42.7], [13.9, 43.8],
+       [10.1, 43.6], [10, 40]]]
+
+
+def _geocoder(**kwargs):
+    return ReverseGeocoder([("AA", "Aland", [AA]), ("BB", "Beeland", [BB]), ("CC", "Ceeland", [CC]),
+                            ("DD", "Deeland", [DD])], **kwargs)
+
+
+def _ray_casting(ring, lon, lat):
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+        if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def test_points_resolve_across_borders_holes_and_cells():
+    geocoder = _geocoder(nearest_km=0)
+    points = {
+        (51.0, -1.0): "AA", (51.0, -0.001): "AA", (51.0, 0.001): "BB",
+        (50.25, 1.0): "BB", (51.0, 1.0): "CC", (50.999, 1.499): "CC", (51.0, 1.501): "BB",
+        # Exactly on grid lines inside a polygon.
+        (51.0, -2.0 + 1e-9): "AA", (50.0 + 1e-9, 1.0): "BB",
+        (51.0, 2.5): None, (91.0, 0.0): None, (float("nan"), 1.0): None,
+    }
+    lats, lons = zip(*points)
+    assert geocoder.country_codes(lats, lons) == list(points.values())
+
+
+def test_point_on_a_shared_border_goes_to_one_neighbour():
+    assert _geocoder().country_codes([51.0], [0.0])[0] in ("AA", "BB")
+
+
+def test_grid_lookup_matches_plain_ray_casting():
+    geocoder = _geocoder(cell_degrees=0.5, nearest_km=0)
+    rng = np.random.default_rng(7)
+    lats, lons = rng.uniform(39.5, 44.5, 3000), rng.uniform(9.5, 14.5, 3000)
+    expected = ["DD" if _ray_casting(DD[0], lon, lat) else None for lat, lon in zip(lats, lons)]
+    assert geocoder.country_codes(lats, lons) == expected
+
+
+def test_points_just_off_the_coast_snap_to_the_nearest_boundary_vertex():
+    geocoder = _geocoder(nearest_km=25)
+    indices, exact = geocoder.lookup([52.1, 52.05, 51.0], [-2.0, 2.05, 2.1])
+    assert [geocoder.codes[i] if i >= 0 else None for i in indices] == ["AA", "BB", None]
+    assert not exact.any()
+
+
+def test_small_territories_take_points_within_their_radius():
+    geocoder = ReverseGeocoder([("BB", "Beeland", [BB])], territories=[("SS", "Smallia", 51.0, 0.25, 10)])
+    indices, exact = geocoder.lookup([51.0, 51.05, 50.9], [0.25, 0.3, 0.45])
+    assert [geocoder.codes[i] for i in indices] == ["SS", "SS", "BB"]
+    assert exact.tolist() == [False, False, True]
+
+
+def test_shipped_boundaries_resolve_known_places():
+    geocoder = ReverseGeocoder.from_geojson(GEOCODER_BOUNDARIES_PATH)
+    places = {
+        (51.5072, -0.1276): "GB", (48.8566, 2.3522): "FR", (40.7128, -74.006): "US", (-33.87, 151.21): "AU",
+        (35.68, 139.69): "JP", (-23.55, -46.63): "BR", (6.52, 3.38): "NG", (25.2, 55.27): "AE",
+        # Too small for the polygons, resolved from their capital and area.
+        (1.35, 103.82): "SG", (1.46, 103.76): "MY", (22.32, 114.17): "HK", (47.14, 9.52): "LI",
+        (0.0, -30.0): None,
+    }
+    lats, lons = zip(*places)
+    assert geocoder.country_codes(lats, lons) == list(places.values())
+
+
+def _register(handle):
+    return register_table(handle, TransactionTable.from_transactions([
+        {"transaction_id": "t1", "timestamp": "2024-01-01T10:00:00Z", "amount": 10, "counterparty_country": "BB",
+         "transaction_location_latitude": 51.0, "transaction_location_longitude": -1.0},
+        {"transaction_id": "t2", "timestamp": "2024-01-02T10:00:00Z", "amount": 20, "counterparty_country": "BB",
+         "transaction_location_latitude": 51.0, "transaction_location_longitude": 1.0},
+        {"transaction_id": "t3", "timestamp": "2024-01-03T10:00:00Z", "amount": 30},
+    ]))
+
+
+def test_resolves_review_locations_offline(monkeypatch):
+    monkeypatch.setattr(reverse_geocoder, "get_geocoder", _geocoder)
+    data = resolve_transaction_countries(_register("geo-test:2024-01-01:2024-01-31"))["data"]
+    assert data["source"] == "offline"
+    assert (data["located_transactions"], data["resolved"], data["unresolved"]) == (2, 2, 0)
+    assert sorted(c["country_code"] for c in data["countries"]) == ["AA", "CC"]
+    assert {m["transaction_id"] for m in data["location_counterparty_mismatches"]} == {"t1", "t2"}
+
+
+def test_only_locations_off_the_polygons_are_geocoded(monkeypatch):
+    calls = []
+
+    def geocode(latitudes, longitudes):
+        calls.append(list(zip(latitudes, longitudes)))
+        return {"status": "success", "data": {"results": [
+            {"status": "success", "data": {"country_code": "BM", "country": "Bermuda"}}]}}
+
+    monkeypatch.setattr(reverse_geocoder, "get_geocoder", lambda: _geocoder(nearest_km=0))
+    monkeypatch.setattr(reverse_geocoder, "batch_google_maps_geocoding_tool", geocode)
+    handle = register_table("geo-test:2024-03-01:2024-03-31", TransactionTable.from_transactions([
+        {"transaction_id": "t1", "timestamp": "2024-03-01T10:00:00Z", "amount": 10,
+         "transaction_location_latitude": 51.0, "transaction_location_longitude": -1.0},
+        {"transaction_id": "t2", "timestamp": "2024-03-02T10:00:00Z", "amount": 20,
+         "transaction_location_latitude": 32.3, "transaction_location_longitude": -64.78},
+    ]))
+    data = resolve_transaction_countries(handle)["data"]
+    assert calls == [[(32.3, -64.78)]]
+    assert (data["source"], data["geocoded_locations"], data["resolved"]) == ("offline", 1, 2)
+    assert sorted(c["country_code"] for c in data["countries"]) == ["AA", "BM"]
+
+
+def test_falls_back_to_geocoding_without_a_boundaries_file(monkeypatch):
+    def missing():
+        raise OSError("No such file")
+
+    def geocode(latitudes, longitudes):
+        results = [{"status": "success", "data": {"country_code": "FR", "country": "France"}},
+                   {"status": "error", "data": {"country_code": "XX"}}]
+        return {"status": "success", "data": {"results": results[:len(latitudes)]}}
+
+    monkeypatch.setattr(reverse_geocoder, "get_geocoder", missing)
+    monkeypatch.setattr(reverse_geocoder, "batch_google_maps_geocoding_tool", geocode)
+    data = resolve_transaction_countries(_register("geo-test:2024-02-01:2024-02-29"))["data"]
+    assert data["source"] == "google_maps"
+    assert (data["resolved"], data["unresolved"]) == (1, 1)
+    assert data["countries"] == [{"country_code": "FR", "country_name": "France", "transaction_count": 1,
+                                  "amount": 10.0, "transaction_ids": ["t1"]}]
+    assert data["location_counterparty_mismatch_count"] == 1
@@ -0,0 +1,141 @@
+# tests/test_single_flight.py
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from common.single_flight import AsyncSingleFlight, SingleFlight, coalesced, single_flight_stats
+
+WAITERS = 8
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def _run_concurrently(group, fn, key="k"):
+    """Starts WAITERS identical calls, releases the leader once all others wait on it, and returns the outcomes."""
+    with ThreadPoolExecutor(WAITERS) as pool:
+        futures = [pool.submit(group.do, key, fn) for _ in range(WAITERS)]
+        _wait_for(lambda: group.stats()["shared"] >= WAITERS - 1)
+        fn.release.set()
+        return [future.exception() or future.result() for future in futures]
+
+
+class _Gated:
+    """A call that blocks until released, counting its executions."""
+
+    def __init__(self, error=None):
+        self.release = threading.Event()
+        self.calls = 0
+        self.error = error
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return {"call": self.calls}
+
+
+def test_concurrent_identical_calls_run_once():
+    group, fn = SingleFlight(), _Gated()
+    outcomes = _run_concurrently(group, fn)
+    assert fn.calls == 1
+    assert all(result is outcomes[0][0] for result, _ in outcomes)
+    assert sorted(shared for _, shared in outcomes) == [False] + [True] * (WAITERS - 1)
+    assert group.stats() == {"executed": 1, "shared": WAITERS - 1, "in_flight": 0}
+
+
+def test_an_exception_reaches_every_waiter_and_the_next_call_retries():
+    group, fn = SingleFlight(), _Gated(error=ValueError("upstream down"))
+    outcomes = _run_concurrently(group, fn)
+    assert fn.calls == 1 and all(outcome is fn.error for outcome in outcomes)
+    fn.error = None
+    assert group.do("k", fn) == ({"call": 2}, False)
+
+
+def test_different_keys_are_not_coalesced():
+    group = SingleFlight()
+    assert group.do("a", lambda: 1) == (1, False)
+    assert group.do("b", lambda: 2) == (2, False)
+    assert group.stats()["executed"] == 2
+
+
+def test_decorated_calls_with_equivalent_arguments_share_a_key():
+    release, calls = threading.Event(), []
+
+    @coalesced
+    def fetch(account_number, detail=False):
+        calls.append(account_number)
+        release.wait(5)
+        return [account_number, detail]
+
+    shared = single_flight_stats()["sync"]["shared"]
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(fetch, "123")
+        _wait_for(lambda: calls)
+        second = pool.submit(fetch, account_number="123", detail=False)
+        _wait_for(lambda: single_flight_stats()["sync"]["shared"] > shared)
+        release.set()
+        assert first.result() is second.result()
+    assert calls == ["123"]
+
+
+def _gather(group, fn, *keys):
+    async def scenario():
+        return await asyncio.gather(*(group.do(key, fn) for key in keys), return_exceptions=True)
+    return asyncio.run(scenario())
+
+
+def test_async_concurrent_identical_calls_run_once():
+    group, calls = AsyncSingleFlight(), []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"call": len(calls)}
+
+    outcomes = _gather(group, fetch, *["k"] * WAITERS)
+    assert len(calls) == 1
+    assert all(result is outcomes[0][0] for result, _ in outcomes)
+    assert group.stats() == {"executed": 1, "shared": WAITERS - 1, "in_flight": 0}
+
+
+def test_async_exception_reaches_every_waiter_and_the_next_call_retries():
+    group, calls = AsyncSingleFlight(), []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if len(calls) == 1:
+            raise ValueError("upstream down")
+        return "ok"
+
+    outcomes = _gather(group, fetch, *["k"] * WAITERS)
+    assert len(calls) == 1 and all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert _gather(group, fetch, "k") == [("ok", False)]
+
+
+def test_async_cancelled_waiter_does_not_cancel_the_shared_call():
+    group = AsyncSingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    async def scenario():
+        leader = asyncio.ensure_future(group.do("k", fetch))
+        waiter = asyncio.ensure_future(group.do("k", fetch))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader
+
+    assert asyncio.run(scenario()) == ("ok", False)
@@ -0,0 +1,67 @@
+# tests/test_transaction_store.py
+import threading
+from datetime import date
+
+import pytest
+
+from common import transaction_store
+
+URL = "http://api/users/1/transactions"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(transaction_store, "TRANSACTION_STORE_PATH", str(tmp_path / "store.sqlite3"))
+    monkeypatch.setattr(transaction_store, "_local", threading.local())
+    monkeypatch.setattr(transaction_store, "_next_sweep", float("inf"))
+    yield transaction_store
+    conn = getattr(transaction_store._local, "conn", None)
+    if conn is not None:
+        conn.close()
+
+
+def _txn(day: str, txn_id: str) -> dict:
+    return {"transaction_id": txn_id, "timestamp": f"{day}T10:00:00Z", "amount": -10.0}
+
+
+def _set_fetched_on(store, fetched_on: str, start_date: str) -> None:
+    conn = store._connection()
+    with conn:
+        conn.execute("UPDATE coverage SET fetched_on = ? WHERE start_date = ?", (fetched_on, start_date))
+
+
+def test_stored_days_are_not_fetched_again(store):
+    store.save_window(URL, "2024-01-01", "2024-01-31", "data", [_txn("2024-01-05", "a")], {"account_number": "1"})
+    assert store.missing_intervals(URL, "2024-01-01", "2024-02-10") == [("2024-02-01", "2024-02-10")]
+    assert store.load_stored_range(URL, "2024-01-01", "2024-01-31") == {
+        "account_number": "1", "data": [_txn("2024-01-05", "a")]}
+
+
+def test_sweep_removes_expired_windows_and_their_transactions(store):
+    store.save_window(URL, "2024-01-01", "2024-01-31", "data", [_txn("2024-01-05", "a")])
+    store.save_window(URL, "2024-02-01", "2024-02-29", "data", [_txn("2024-02-05", "b")])
+    _set_fetched_on(store, "2024-03-01", "2024-01-01")
+    _set_fetched_on(store, "2024-03-25", "2024-02-01")
+    removed = store.sweep_expired(retention_days=30, today=date(2024, 4, 10))
+    assert removed == {"expired_windows": 1, "superseded_windows": 0, "transactions": 1}
+    assert list(store.read_range(URL, "2024-01-01", "2024-02-29")) == [_txn("2024-02-05", "b")]
+    assert store.missing_intervals(URL, "2024-01-01", "2024-02-29")[0] == ("2024-01-01", "2024-01-31")
+
+
+def test_sweep_drops_coverage_rows_superseded_by_a_later_fetch(store):
+    store.save_window(URL, "2024-01-10", "2024-01-20", "data", [_txn("2024-01-15", "a")])
+    store.save_window(URL, "2024-01-01", "2024-01-31", "data", [_txn("2024-01-15", "a"), _txn("2024-01-25", "b")])
+    removed = store.sweep_expired(retention_days=10_000)
+    assert removed == {"expired_windows": 0, "superseded_windows": 1, "transactions": 0}
+    assert [t["transaction_id"] for t in store.read_range(URL, "2024-01-01", "2024-01-31")] == ["a", "b"]
+
+
+def test_store_is_opt_in_by_default(monkeypatch):
+    import importlib
+
+    import config
+    monkeypatch.delenv("MONEYPENNY_TRANSACTION_STORE_ENABLED", raising=False)
+    try:
+        assert importlib.reload(config).TRANSACTION_STORE_ENABLED is False
+    finally:
+        importlib.reload(config)
@@ -0,0 +1,98 @@
+# tests/test_transaction_stream.py
+import json
+
+import pytest
+
+from common import transaction_stream
+from common.transaction_stream import JsonArrayStreamParser, merge_envelope_fields, wrap_payload
+
+TRANSACTIONS = [{"transaction_id": f"t{i}", "amount": -12.5 * i, "description": "Café [1]"} for i in range(4)]
+
+
+def _parse(payload: bytes, chunk_size: int):
+    parser = JsonArrayStreamParser()
+    items = []
+    for i in range(0, len(payload), chunk_size):
+        items.extend(parser.feed(payload[i:i + chunk_size]))
+    items.extend(parser.close())
+    return parser, items
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1000])
+def test_bare_array_in_any_chunking(chunk_size):
+    parser, items = _parse(json.dumps(TRANSACTIONS).encode(), chunk_size)
+    assert items == TRANSACTIONS
+    assert parser.envelope_key is None and parser.envelope_fields == {}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 1000])
+def test_envelope_members_are_kept_and_nested_keys_ignored(chunk_size):
+    payload = {"meta": {"data": [{"nested": True}], "transactions": []}, "status": "success",
+               "transactions": TRANSACTIONS, "count": 1234, "next": None}
+    parser, items = _parse(json.dumps(payload).encode(), chunk_size)
+    assert items == TRANSACTIONS
+    assert parser.envelope_key == "transactions"
+    assert parser.envelope_fields == {"meta": payload["meta"], "status": "success", "count": 1234, "next": None}
+    assert wrap_payload(parser.envelope_key, items, parser.envelope_fields) == payload
+
+
+def test_non_array_member_named_like_the_envelope_key_is_a_field():
+    parser, items = _parse(b'{"data": "v2", "transactions": [{"transaction_id": "a"}]}', 4)
+    assert parser.envelope_key == "transactions"
+    assert parser.envelope_fields == {"data": "v2"}
+    assert items == [{"transaction_id": "a"}]
+
+
+@pytest.mark.parametrize("payload", [b'[{"a": 1}', b'{"data": [{"a": 1}]', b'{"status": "ok"}', b'"text"'])
+def test_truncated_or_arrayless_payloads_raise(payload):
+    with pytest.raises(json.JSONDecodeError):
+        _parse(payload, 3)
+
+
+def test_merge_keeps_only_members_all_windows_agree_on():
+    merged = merge_envelope_fields([{"account": "1", "count": 3, "currency": "GBP"},
+                                    {"account": "1", "count": 5, "currency": "GBP"},
+                                    {"account": "1", "currency": "GBP"}])
+    assert merged == {"account": "1", "currency": "GBP"}
+    assert merge_envelope_fields([]) == {}
+
+
+def test_windowed_fetch_rebuilds_the_envelope(monkeypatch):
+    monkeypatch.setattr(transaction_stream, "TRANSACTION_SPLIT_THRESHOLD_DAYS", 31)
+    windows = []
+
+    def fake_window(url, start, end):
+        windows.append((start, end))
+        return "data", [{"transaction_id": start}], {"account_number": "1", "window_start": start}
+
+    iter_windows = transaction_stream.iter_windows
+    monkeypatch.setattr(transaction_stream, "iter_windows",
+                        lambda url, windows, max_workers: iter_windows(url, windows, max_workers, fetch=fake_window))
+    payload = transaction_stream.fetch_transaction_history_payload("http://api/users/1/transactions",
+                                                                  "2024-01-01", "2024-03-31")
+    assert windows == [("2024-01-01", "2024-01-31"), ("2024-02-01", "2024-02-29"), ("2024-03-01", "2024-03-31")]
+    assert payload == {"account_number": "1", "data": [{"transaction_id": s} for s, _ in windows]}
+
+
+def test_async_windows_go_through_the_endpoint_policy_and_limiter(monkeypatch):
+    import asyncio
+    import httpx
+    from common import async_transport, rate_limit, resilience
+
+    statuses = [503, 200]
+
+    def handler(request):
+        status = statuses.pop(0)
+        body = b'{"data": [{"transaction_id": "t1"}]}' if status == 200 else b"{}"
+        return httpx.Response(status, stream=httpx.ByteStream(body))
+
+    limiter = rate_limit.EndpointLimiter("transactions", in_flight=1)
+    monkeypatch.setattr(async_transport, "_build_client",
+                        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(rate_limit, "limiter_for", lambda url: limiter)
+    monkeypatch.setattr(resilience, "backoff_delay", lambda policy, attempt: 0)
+    url = "http://stream-policy.test/users/1/transactions"
+    semaphore = asyncio.Semaphore(1)
+    window = asyncio.run(transaction_stream._fetch_window_async(url, "2024-01-01", "2024-01-31", semaphore))
+    assert window == ("data", [{"transaction_id": "t1"}], {})
+    assert limiter.requests == 2 and resilience.state_for(url).retries == 1
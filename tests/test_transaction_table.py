@@ -0,0 +1,51 @@
+# tests/test_transaction_table.py
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from aml_agent.transaction_table import TransactionTable, _parse_times
+
+
+def _epoch(value: str) -> int:
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp())
+
+
+def test_offsets_are_normalised_to_utc():
+    values = ["2024-03-01T10:00:00Z", "2024-03-01T10:00:00+02:00", "2024-03-01T10:00:00.250-0500",
+              "2024-03-01T10:00:00+05", "2024-03-01T10:00:00", "2024-03-01", "not a time", ""]
+    times = _parse_times(values).astype("int64")
+    assert times[0] == _epoch("2024-03-01T10:00:00+00:00")
+    assert times[1] == _epoch("2024-03-01T08:00:00+00:00")
+    assert times[2] == _epoch("2024-03-01T15:00:00+00:00")
+    assert times[3] == _epoch("2024-03-01T05:00:00+00:00")
+    assert times[4] == times[0]
+    assert times[5] == _epoch("2024-03-01T00:00:00+00:00")
+    assert np.isnat(_parse_times(values)[6:]).all()
+
+
+def test_rows_with_offsets_are_ordered_and_windowed_in_utc():
+    table = TransactionTable.from_transactions([
+        {"transaction_id": "paris", "timestamp": "2024-03-01T00:30:00+01:00", "amount": 1},   # 23:30 UTC on Feb 29
+        {"transaction_id": "london", "timestamp": "2024-03-01T00:10:00Z", "amount": 1},
+        {"transaction_id": "new_york", "timestamp": "2024-02-29T19:20:00-05:00", "amount": 1},  # 00:20 UTC
+        {"transaction_id": "unknown", "timestamp": "garbage", "amount": 1},
+    ])
+    assert list(table.ids) == ["paris", "london", "new_york", "unknown"]
+    assert list(table.window("2024-03-01", "2024-03-02").ids) == ["london", "new_york"]
+    aware = datetime(2024, 3, 1, 1, 15, tzinfo=timezone(timedelta(hours=1)))  # 00:15 UTC
+    assert list(table.window(aware).ids) == ["new_york"]
+    assert table.iso(0) == "2024-02-29T23:30:00Z"
+
+
+def test_unsigned_debits_and_summary():
+    table = TransactionTable.from_transactions([
+        {"transaction_id": "a", "timestamp": "2024-01-01T09:00:00Z", "amount": "100.10", "transaction_type": "Deposit",
+         "counterparty_country": "gb", "is_cash_transaction": True},
+        {"transaction_id": "b", "timestamp": "2024-01-02T09:00:00Z", "amount": 40, "transaction_type": "withdrawal",
+         "counterparty_country": "FR"},
+    ])
+    assert list(table.amount_pence) == [10010, -4000]
+    summary = table.summary()
+    assert summary["total_inflow"] == 100.1 and summary["total_outflow"] == 40.0
+    assert summary["cash_transaction_count"] == 1
+    assert summary["counterparty_countries"] == ["FR", "GB"]
@@ -0,0 +1,19 @@
+# tests/test_transport.py
+from common import transport
+
+
+def _session(monkeypatch):
+    monkeypatch.setattr(transport, "host_pool_sizes", lambda: {"api.example.com": 32})
+    return transport._build_session()
+
+
+def test_host_mount_matches_host_with_and_without_port(monkeypatch):
+    session = _session(monkeypatch)
+    for url in ("https://api.example.com/v1/users", "http://api.example.com:8080/v1", "https://API.example.com/"):
+        assert session.get_adapter(url)._pool_maxsize == 32
+
+
+def test_host_mount_does_not_match_sibling_hosts(monkeypatch):
+    session = _session(monkeypatch)
+    for url in ("https://api.example.com.evil.net/v1", "https://api.example.community/", "http://api.example.comx:80/"):
+        assert session.get_adapter(url)._pool_maxsize == transport.HTTP_POOL_MAXSIZE
@@ -0,0 +1,120 @@
+# tests/test_watchlist_index.py
+import pytest
+
+from aml_agent import counterparty_screening, watchlist_index
+from aml_agent.transaction_table import TransactionTable, register_table
+from aml_agent.watchlist_index import (
+    WatchlistIndex,
+    _soundex,
+    jaro_winkler,
+    normalize_name,
+    phonetic_key,
+    screen_counterparties_locally,
+)
+
+ENTRIES = [
+    {"entry_id": "1", "name": "Muhammad Ali", "entity_type": "individual", "list_name": "OFAC SDN",
+     "dates_of_birth": ["1970-03-02"], "countries": ["AE"]},
+    {"entry_id": "2", "name": "Ivan Petrov", "aliases": ["Ivan Petroff"], "entity_type": "individual",
+     "list_name": "OFAC SDN"},
+    {"entry_id": "3", "name": "Red Crescent Trading FZE", "entity_type": "organization",
+     "list_name": "UN Consolidated List", "countries": ["AE"]},
+    {"entry_id": "4", "name": "Nordic Timber Export AB", "entity_type": "organization"},
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return WatchlistIndex(ENTRIES, version="test")
+
+
+def test_names_are_normalised():
+    assert normalize_name("  Société Générale, SA ") == "societe generale"
+    assert normalize_name("ACME Holdings Ltd.") == "acme"
+    assert normalize_name("Ltd") == "ltd"
+
+
+def test_soundex_and_order_independent_phonetic_keys():
+    assert [_soundex(t) for t in ("robert", "rupert", "ashcraft", "tymczak", "pfister")] == \
+        ["r163", "r163", "a261", "t522", "p236"]
+    assert phonetic_key("aly mohammed") == phonetic_key("muhammad ali")
+
+
+def test_jaro_winkler_reference_values():
+    assert jaro_winkler("martha", "marhta") == pytest.approx(0.961, abs=1e-3)
+    assert jaro_winkler("dwayne", "duane") == pytest.approx(0.84, abs=1e-3)
+    assert jaro_winkler("dixon", "dicksonx") == pytest.approx(0.813, abs=1e-3)
+    assert jaro_winkler("same", "same") == 1.0 and jaro_winkler("", "x") == 0.0
+
+
+def test_trigram_candidates_respect_the_overlap_floor(index):
+    names = lambda ids: {index.names[i] for i in ids}
+    # "betrov" and "petrov" differ in Soundex, so only the trigrams can find the entry.
+    assert names(index._candidates("ivan betrov", min_overlap=0.4, max_candidates=50)) == {"ivan petrov", "ivan petroff"}
+    assert names(index._candidates("ivan betrov", min_overlap=0.95, max_candidates=50)) == set()
+    assert len(index._candidates("ivan betrov", min_overlap=0.0, max_candidates=1)) == 1
+
+
+def test_phonetic_key_finds_spellings_trigrams_miss(index):
+    assert "muhammad ali" in {index.names[i] for i in index._candidates("mohammed aly", 0.99, 50)}
+    (hit,) = index.screen("Mohammed Aly", threshold=0.8)
+    assert hit["entry_id"] == "1" and hit["phonetic_match"]
+
+
+def test_matches_are_cut_at_the_threshold(index):
+    (hit,) = index.screen("Ivan Petrof")
+    assert hit["entry_id"] == "2" and 0.88 <= hit["score"] < 1
+    assert index.screen("Ivan Petrof", threshold=0.99) == []
+    assert index.screen("Igor Pavlov") == []
+
+
+def test_filters_on_country_birth_date_and_entity_type(index):
+    assert index.screen("Muhammad Ali", country="AE", date_of_birth="1970")
+    assert index.screen("Muhammad Ali", country="GB") == []
+    assert index.screen("Muhammad Ali", date_of_birth="1981-01-01") == []
+    assert index.screen("Red Crescent Trading", entity_type="individual") == []
+    assert index.screen("Red Crescent Trading Ltd", entity_type="organization")[0]["entry_id"] == "3"
+
+
+def test_screen_many_screens_each_distinct_entity_once(index, monkeypatch):
+    calls = []
+    screen = index.screen
+    monkeypatch.setattr(index, "screen", lambda *args, **kwargs: calls.append(args[0]) or screen(*args, **kwargs))
+    results = index.screen_many([{"entity_name": "IVAN PETROV"}, {"entity_name": "Ivan Petrov Ltd"},
+                                 {"entity_name": "Nobody Inparticular"}])
+    assert len(calls) == 2
+    assert [bool(r) for r in results] == [True, True, False]
+
+
+def _register(handle):
+    return register_table(handle, TransactionTable.from_transactions([
+        {"transaction_id": "t1", "timestamp": "2024-01-01T10:00:00Z", "amount": 500,
+         "counterparty_name": "Red Crescent Trading FZE", "counterparty_country": "AE"},
+        {"transaction_id": "t2", "timestamp": "2024-01-02T10:00:00Z", "amount": 20,
+         "counterparty_name": "Corner Shop", "counterparty_country": "GB"},
+    ]))
+
+
+def test_local_screening_uses_the_snapshot(index, monkeypatch):
+    monkeypatch.setattr(watchlist_index, "get_watchlist_index", lambda: index)
+    data = screen_counterparties_locally(_register("wl-test:2024-01-01:2024-01-31"))["data"]
+    assert data["source"] == "local_snapshot" and data["watchlist_version"] == "test"
+    assert [m["counterparty_name"] for m in data["matches"]] == ["Red Crescent Trading FZE"]
+
+
+def test_local_screening_falls_back_to_the_service_without_a_snapshot(monkeypatch):
+    def missing():
+        raise OSError("No such file")
+
+    def check(entity_name, **kwargs):
+        details = [{"list_name": "UN Consolidated List", "match_reason": "Designated entity.",
+                    "matched_name": entity_name}] if "Crescent" in entity_name else []
+        return {"status": "success", "data": {"is_on_watchlist": bool(details), "watchlist_details": details}}
+
+    monkeypatch.setattr(watchlist_index, "get_watchlist_index", missing)
+    monkeypatch.setattr(counterparty_screening, "check_entity_against_watchlists", check)
+    data = screen_counterparties_locally(_register("wl-test:2024-02-01:2024-02-29"))["data"]
+    assert data["source"] == "watchlist_service" and data["counterparties_screened"] == 2
+    (match,) = data["matches"]
+    assert match["counterparty_countries"] == ["AE"] and match["amount"] == 500.0
+    assert match["watchlist_matches"][0]["confirmed"]
@@ -2,11 +2,19 @@
 import requests
 import json
 from typing import Optional, List, Dict, Any
-from config import API_BASE_URL # Import from root config
+from config import API_BASE_URL, CACHE_TTL_LOAN_PRODUCTS # Import from root config
+from common import transport # Shared pooled HTTP session with default timeouts
+from common.cache import TTLCache, cached
+from common.single_flight import coalesced
+from common import transaction_stream
+from common import records
 
 # UW_BASE_URL can be an alias or directly use API_BASE_URL
 UW_API_BASE_URL = API_BASE_URL # Using the shared base URL
 
+# Product/rate lookups are pure reads of the rate card; shared with async_bank_api_client.
+LOAN_PRODUCTS_CACHE = TTLCache("underwriting.loan_products", ttl=CACHE_TTL_LOAN_PRODUCTS)
+
 def _log_api_call(url: str, method: str, params: Optional[Dict] = None, payload: Optional[Dict] = None):
     log_message = f"\n=====API Call:======\n{method} {url}"
     if params:
@@ -52,44 +60,45 @@ def _handle_json_decode_error(e: json.JSONDecodeError, func_name: str, context:
     return {"status": "error", "error_message": error_message}
 
 # --- Existing User/Account functions (logging updated) ---
+@coalesced
 def fetch_user_profile(account_number: str) -> dict:
     """Fetches basic profile information for the user."""
     url = f"{UW_API_BASE_URL}/users/{account_number}/profile"
     _log_api_call(url, "GET")
     try:
-        response = requests.get(url)
+        response = transport.get(url)
         _log_api_response(response)
         response.raise_for_status()
-        return {"status": "success", "data": response.json()}
+        return {"status": "success", "data": records.to_builtins(records.decode_user_profile(response.content))}
     except requests.exceptions.RequestException as e:
         return _handle_api_error(e, "fetch_user_profile", f"account {account_number}")
-    except json.JSONDecodeError as e:
+    except (json.JSONDecodeError, records.DecodeError) as e:
         return _handle_json_decode_error(e, "fetch_user_profile", f"account {account_number}")
 
+@coalesced
 def fetch_account_details(account_number: str) -> dict:
     """Fetches comprehensive details about the user's account."""
     url = f"{UW_API_BASE_URL}/users/{account_number}/account_details"
     _log_api_call(url, "GET")
     try:
-        response = requests.get(url)
+        response = transport.get(url)
         _log_api_response(response)
         response.raise_for_status()
-        return {"status": "success", "data": response.json()}
+        return {"status": "success", "data": records.to_builtins(records.decode_account_details(response.content))}
     except requests.exceptions.RequestException as e:
         return _handle_api_error(e, "fetch_account_details", f"account {account_number}")
-    except json.JSONDecodeError as e:
+    except (json.JSONDecodeError, records.DecodeError) as e:
         return _handle_json_decode_error(e, "fetch_account_details", f"account {account_number}")
 
+@coalesced
 def fetch_transaction_history(account_number: str, start_date: str, end_date: str) -> dict:
     """Retrieves a list of transactions for the specified account."""
     params = {"start_date": start_date, "end_date": end_date}
     url = f"{UW_API_BASE_URL}/users/{account_number}/transactions"
     _log_api_call(url, "GET", params=params)
     try:
-        response = requests.get(url, params=params)
-        _log_api_response(response)
-        response.raise_for_status()
-        return {"status": "success", "data": response.json()}
+        # Long ranges are fetched as concurrent date windows and merged.
+        return {"status": "success", "data": transaction_stream.load_transaction_history(url, start_date, end_date)}
     except requests.exceptions.RequestException as e:
         return _handle_api_error(e, "fetch_transaction_history", f"account {account_number}")
     except json.JSONDecodeError as e:
@@ -108,7 +117,7 @@ def create_loan_application(account_number: str, loan_type: str, amount_requeste
     }
     _log_api_call(url, "POST", payload=payload)
     try:
-        response = requests.post(url, json=payload)
+        response = transport.post(url, json=payload)
         _log_api_response(response)
         response.raise_for_status()
         return {"status": "success", "data": response.json()}
@@ -117,12 +126,13 @@ def create_loan_application(account_number: str, loan_type: str, amount_requeste
     except json.JSONDecodeError as e:
         return _handle_json_decode_error(e, "create_loan_application")
 
+@coalesced
 def get_loan_application_status(application_id: str) -> dict:
     """Retrieves the current status of an existing loan application."""
     url = f"{UW_API_BASE_URL}/api/v1/underwriting/loan_applications/{application_id}/status"
     _log_api_call(url, "GET")
     try:
-        response = requests.get(url)
+        response = transport.get(url)
         _log_api_response(response)
         response.raise_for_status()
         return {"status": "success", "data": response.json()}
@@ -137,7 +147,7 @@ def update_loan_application_documents(application_id: str, documents: List[Dict[
     payload = {"documents": documents}
     _log_api_call(url, "POST", payload=payload)
     try:
-        response = requests.post(url, json=payload)
+        response = transport.post(url, json=payload)
         _log_api_response(response)
         response.raise_for_status()
         return {"status": "success", "data": response.json()}
@@ -159,7 +169,7 @@ def get_credit_report(applicant_identifier: Dict[str, Any], consent_given: bool)
     }
     _log_api_call(url, "POST", payload=payload)
     try:
-        response = requests.post(url, json=payload)
+        response = transport.post(url, json=payload)
         _log_api_response(response)
         response.raise_for_status()
         return {"status": "success", "data": response.json()}
@@ -176,7 +186,7 @@ def perform_fraud_check(applicant_data: Dict[str, Any], transaction_context: Opt
         payload["transaction_context"] = transaction_context
     _log_api_call(url, "POST", payload=payload)
     try:
-        response = requests.post(url, json=payload)
+        response = transport.post(url, json=payload)
         _log_api_response(response)
         response.raise_for_status()
         return {"status": "success", "data": response.json()}
@@ -199,7 +209,7 @@ def get_property_valuation(property_address: Dict[str, str], property_type: str,
         
     _log_api_call(url, "POST", payload=payload)
     try:
-        response = requests.post(url, json=payload)
+        response = transport.post(url, json=payload)
         _log_api_response(response)
         response.raise_for_status()
         return {"status": "success", "data": response.json()}
@@ -219,7 +229,7 @@ def assess_business_risk(business_registration_id: str, country_code: str, finan
         payload["financial_summary"] = financial_summary
     _log_api_call(url, "POST", payload=payload)
     try:
-        response = requests.post(url, json=payload)
+        response = transport.post(url, json=payload)
         _log_api_response(response)
         response.raise_for_status()
         return {"status": "success", "data": response.json()}
@@ -229,6 +239,8 @@ def assess_business_risk(business_registration_id: str, country_code: str, finan
         return _handle_json_decode_error(e, "assess_business_risk", f"business ID {business_registration_id}")
 
 # --- Internal Bank Systems (Products, Rates) ---
+@cached(LOAN_PRODUCTS_CACHE)
+@coalesced
 def get_applicable_loan_products_and_rates(loan_type: str, risk_score: int, dti_ratio: float, loan_amount_requested: float, term_months_requested: int, customer_segment: Optional[str] = None, collateral_type: Optional[str] = None) -> dict:
     """Fetches suitable internal loan products and indicative rates via backend."""
     url = f"{UW_API_BASE_URL}/api/v1/underwriting/applicable_loan_products"
@@ -246,7 +258,7 @@ def get_applicable_loan_products_and_rates(loan_type: str, risk_score: int, dti_
         
     _log_api_call(url, "POST", payload=payload)
     try:
-        response = requests.post(url, json=payload)
+        response = transport.post(url, json=payload)
         _log_api_response(response)
         response.raise_for_status()
         return {"status": "success", "data": response.json()}
@@ -268,7 +280,7 @@ def generate_loan_offer_document(application_id: str, applicant_details: Dict[st
     }
     _log_api_call(url, "POST", payload=payload)
     try:
-        response = requests.post(url, json=payload)
+        response = transport.post(url, json=payload)
         _log_api_response(response)
         response.raise_for_status()
         return {"status": "success", "data": response.json()}
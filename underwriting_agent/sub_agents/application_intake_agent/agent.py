@@ -6,7 +6,7 @@ from google.adk.agents import Agent
 # Import API client functions.
 # It will try to use the shared ones from financial_concierge first,
 # then fall back to stubs defined in underwriting_agent's own bank_api_client.
-from underwriting_agent.bank_api_client import (
+from underwriting_agent.async_bank_api_client import (
     fetch_user_profile,
     fetch_account_details,
     create_loan_application
@@ -25,7 +25,7 @@ application_intake_agent = Agent(
     output_key="application_intake_output",
     #TODO Define the tools for the Application Intake Agent.
     #     This agent is responsible for gathering initial application data and user information.
-    #     1. Import the necessary functions from `underwriting_agent.bank_api_client`:
+    #     1. Import the necessary functions from `underwriting_agent.async_bank_api_client`:
     #        - `fetch_user_profile`
     #        - `fetch_account_details`
     #        - `create_loan_application`
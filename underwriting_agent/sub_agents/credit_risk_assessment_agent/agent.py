@@ -1,7 +1,7 @@
 # underwriting_agent/sub_agents/credit_risk_assessment_agent/agent.py
 from google.adk.agents import Agent
 
-from underwriting_agent.bank_api_client import (
+from underwriting_agent.async_bank_api_client import (
     get_credit_report,
     perform_fraud_check,
     get_property_valuation,
@@ -19,7 +19,7 @@ credit_risk_assessment_agent = Agent(
     output_key="credit_risk_assessment_output",
     #TODO Define the tools for the Credit Risk Assessment Agent.
     #     This agent is responsible for assessing various aspects of credit risk.
-    #     1. Import the necessary functions from `underwriting_agent.bank_api_client`:
+    #     1. Import the necessary functions from `underwriting_agent.async_bank_api_client`:
     #        - `get_credit_report`
     #        - `perform_fraud_check`
     #        - `get_property_valuation`
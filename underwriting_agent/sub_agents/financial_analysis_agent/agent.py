@@ -2,7 +2,7 @@
 from google.adk.agents import Agent
 # from google.adk.tools import ReadFileTool
 
-from underwriting_agent.bank_api_client import fetch_transaction_history
+from underwriting_agent.async_bank_api_client import fetch_transaction_history
 from . import prompt
 from config import DEFAULT_LLM_MODEL as MODEL
 
@@ -19,7 +19,7 @@ financial_analysis_agent = Agent(
     output_key="financial_analysis_output",
     #TODO Define the tools for the Financial Analysis Agent.
     #     This agent is responsible for analyzing financial data, including transaction history and potentially documents.
-    #     1. Import `fetch_transaction_history` from `underwriting_agent.bank_api_client`.
+    #     1. Import `fetch_transaction_history` from `underwriting_agent.async_bank_api_client`.
     #     2. Consider if the `read_file` tool is needed for analyzing financial statements or other documents.
     #        If so, include `read_file` directly in the list (it's a system-provided tool).
     #     3. Create a list containing these functions/tools.